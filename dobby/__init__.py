@@ -33,6 +33,28 @@ if sys.version_info[:2] < (2, 7):
     raise ImportError(m % sys.version_info[:2])
 del sys
 
-# These are import orderwise
-from dobby.nwinfo.networksummary import NetworkSummary
-from dobby.nwparser.parsemanager import ParseManager
+# The public API is imported on first access (PEP 562), so that 'import dobby'
+# and the command line start without loading the parsers and models
+_LAZY_ATTRIBUTES = {
+    'NetworkSummary': 'dobby.nwinfo.networksummary',
+    'ParseManager': 'dobby.nwparser.parsemanager',
+}
+_SUBPACKAGES = ('nwinfo', 'nwmetrics', 'nwmodel', 'nwparser', 'utils')
+
+__all__ = sorted(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    import importlib
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    elif name in _SUBPACKAGES:
+        value = importlib.import_module('dobby.' + name)
+    else:
+        raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
+    # Cache it so that later lookups do not come back here
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES) | set(_SUBPACKAGES))
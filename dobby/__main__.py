@@ -0,0 +1,5 @@
+import sys
+
+from dobby.cli import main
+
+sys.exit(main())
@@ -0,0 +1,167 @@
+"""Command line entry point.
+
+    dobby watch SUMMARY_DIR     parse new click summaries as they are written
+    dobby bench                 benchmark the parsers on synthetic summaries
+"""
+import argparse
+import sys
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+
+def print_summary(window, network_summary, latency):
+    print ("Parsed {0}: {1} endpoints, {2} edges, {3} flows in {4:.3f}s".format(
+        window.base, len(network_summary.mac_to_endpoints) + len(network_summary.ip_to_endpoints),
+        len(network_summary.edges), len(network_summary.ip_flows), latency))
+    sys.stdout.flush()
+
+def watch(args):
+    import asyncio
+    import concurrent.futures
+    import signal
+
+    import dobby.nwparser.parsemanager as parsemanager
+    import dobby.nwparser.watcher as watcher
+
+    if args.processes:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=args.workers)
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=args.workers)
+    parse_manager = parsemanager.ParseManager(max_summaries=args.max_summaries,
+                                              max_summary_age=args.max_summary_age,
+                                              max_summary_bytes=args.max_summary_bytes,
+                                              streaming=args.streaming,
+                                              columnar_flows=args.columnar_flows,
+                                              compact_models=args.compact_models,
+                                              archive=args.archive_dir,
+                                              sql_store=args.sql_store,
+                                              node_ids='stable' if args.stable_node_ids else None,
+                                              oui_registry=args.oui_registry)
+    summary_watcher = watcher.SummaryWatcher(parse_manager, args.summary_dir,
+                                             summary_format=args.format,
+                                             executor=executor,
+                                             poll_interval=args.poll_interval,
+                                             settle_time=args.settle_time,
+                                             window_length=args.window_length,
+                                             process_existing=args.process_existing,
+                                             on_summary=print_summary)
+    metrics_exporter = None
+    if args.metrics_port is not None:
+        import dobby.nwparser.exporter as exporter
+        metrics_exporter = exporter.MetricsExporter(parse_manager, port=args.metrics_port).start()
+        print ("Serving metrics on http://{0}:{1}/metrics".format(metrics_exporter.host, metrics_exporter.port))
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, summary_watcher.stop)
+        await summary_watcher.run()
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown(wait=True)
+        if metrics_exporter is not None:
+            metrics_exporter.stop()
+    return 0
+
+def bench(args):
+    import dobby.nwparser.benchmark as benchmark
+
+    if args.imports:
+        measured, regressions = benchmark.check_import_budgets(repeat=args.repeat)
+        for module, seconds in measured.items():
+            print ("{0:<30} {1:>8.1f}ms (budget {2:.0f}ms)".format(module, seconds * 1000,
+                                                               benchmark.IMPORT_BUDGETS[module] * 1000))
+        for regression in regressions:
+            print ("Import of {0} is over budget: {1:.1f}ms > {2:.0f}ms".format(
+                regression.case, regression.value * 1000, regression.baseline * 1000))
+        return 1 if regressions else 0
+    baseline = benchmark.load_results(args.baseline) if args.baseline else None
+    results = benchmark.run(scale=args.scale, summary_format=args.format, cases=args.cases or benchmark.CASES,
+                            repeat=args.repeat, seed=args.seed, links=args.links, flows=args.flows,
+                            directory=args.keep_dir)
+    print (benchmark.format_results(results, baseline=baseline))
+    if args.save:
+        benchmark.save_results(results, args.save)
+    if baseline is None:
+        return 0
+    regressions = benchmark.compare(results, baseline, tolerance=args.tolerance)
+    for regression in regressions:
+        print ("Regression in {0}: {1} {2} -> {3}".format(regression.case, regression.metric,
+                                                         regression.baseline, regression.value))
+    return 1 if regressions else 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='dobby', description='Process summaries generated by click')
+    subparsers = parser.add_subparsers(dest='command')
+    watch_parser = subparsers.add_parser('watch', help='parse new summaries written to a directory')
+    watch_parser.add_argument('summary_dir', help='directory start_dobby.sh writes summaries to')
+    watch_parser.add_argument('--format', choices=['xml', 'json'], default='xml',
+                              help='summary format to parse (default: xml)')
+    watch_parser.add_argument('--workers', type=int, default=4, help='decoding workers')
+    watch_parser.add_argument('--processes', action='store_true',
+                              help='decode on a process pool instead of threads')
+    watch_parser.add_argument('--streaming', action='store_true',
+                              help='decode JSON summaries incrementally')
+    watch_parser.add_argument('--columnar-flows', action='store_true',
+                              help='store TCP flows in a columnar flow table')
+    watch_parser.add_argument('--compact-models', action='store_true',
+                              help='build summaries from the __slots__ model classes')
+    watch_parser.add_argument('--poll-interval', type=float, default=1.0)
+    watch_parser.add_argument('--settle-time', type=float, default=1.0,
+                              help='seconds a file must be unchanged before it is parsed')
+    watch_parser.add_argument('--window-length', type=float, default=300)
+    watch_parser.add_argument('--max-summaries', type=int, default=None,
+                              help='number of parsed windows to keep')
+    watch_parser.add_argument('--max-summary-age', type=float, default=None,
+                              help='drop windows older than this many seconds')
+    watch_parser.add_argument('--max-summary-bytes', type=int, default=None,
+                              help='approximate memory limit for the parsed windows')
+    watch_parser.add_argument('--archive-dir', default=None,
+                              help='archive windows dropped from memory to this directory')
+    watch_parser.add_argument('--sql-store', default=None,
+                              help='also write every window to this SQLite database')
+    watch_parser.add_argument('--stable-node-ids', action='store_true',
+                              help='derive node IDs from MAC/IP so they match across windows')
+    watch_parser.add_argument('--oui-registry', action='append', default=None,
+                              help='IEEE OUI registry file (oui.csv, mam.csv, oui36.csv or manuf) '
+                                   'to label MACs with their vendor; may be repeated')
+    watch_parser.add_argument('--metrics-port', type=int, default=None,
+                              help='serve Prometheus metrics on this port of 127.0.0.1')
+    watch_parser.add_argument('--process-existing', action='store_true',
+                              help='also parse the windows already in the directory')
+    watch_parser.set_defaults(func=watch)
+
+    bench_parser = subparsers.add_parser('bench', help='benchmark the parsers on synthetic summaries')
+    bench_parser.add_argument('--scale', choices=['tiny', 'small', 'medium', 'large', 'huge'], default='small',
+                              help='links and flows of the synthetic window (default: small)')
+    bench_parser.add_argument('--links', type=int, default=None, help='override the links of the scale')
+    bench_parser.add_argument('--flows', type=int, default=None, help='override the flows of the scale')
+    bench_parser.add_argument('--format', choices=['xml', 'json'], default='json')
+    bench_parser.add_argument('--cases', nargs='+', default=None,
+                              choices=['wireless', 'node', 'tcpmystery', 'tcploss', 'parse_manager'])
+    bench_parser.add_argument('--repeat', type=int, default=3)
+    bench_parser.add_argument('--seed', type=int, default=0)
+    bench_parser.add_argument('--save', default=None, help='write the results to this JSON file')
+    bench_parser.add_argument('--baseline', default=None,
+                              help='compare with these saved results, exit with 1 on a regression')
+    bench_parser.add_argument('--tolerance', type=float, default=0.25,
+                              help='allowed growth of time and memory over the baseline (default: 0.25)')
+    bench_parser.add_argument('--imports', action='store_true',
+                              help='measure the import time of dobby instead, against IMPORT_BUDGETS')
+    bench_parser.add_argument('--keep-dir', default=None,
+                              help='write the synthetic summaries to this directory and keep them')
+    bench_parser.set_defaults(func=bench)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not getattr(args, 'func', None):
+        parser.print_help()
+        return 1
+    return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
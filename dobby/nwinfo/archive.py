@@ -0,0 +1,190 @@
+"""Append-only on-disk archive of parsed network summaries.
+
+An archive is a directory holding two files:
+
+    windows.dat     the summaries, snapshot.save_summary output back to back
+    windows.idx     a header and one fixed size record per summary,
+                    (start_ts, end_ts, offset, length), sorted by start_ts
+
+The index is read through mmap and bisected like summaryhistory.SummaryHistory
+bisects its start times, so find() and between() only read the records near
+the queried times and load the summaries they return, with each summary read
+from its own slice of the memory-mapped data file. Summaries archived out of
+order are inserted in place in the index; the data file is only appended to.
+
+Loaded summaries are frozen new objects: endpoints are shared within a summary but
+not with the summaries in memory or other loaded ones.
+"""
+import bisect
+import io
+import mmap
+import os
+import struct
+
+import dobby.nwinfo.snapshot as snapshot
+import dobby.nwinfo.summaryhistory as summaryhistory
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+DATA_FILE = 'windows.dat'
+INDEX_FILE = 'windows.idx'
+INDEX_MAGIC = b'DOBBYIDX'
+INDEX_VERSION = 1
+# Magic, version, flags and the longest window length archived
+INDEX_HEADER = struct.Struct('<8sHHd')
+INDEX_RECORD = struct.Struct('<ddQQ')
+
+
+class _StartTimes(object):
+    """Sequence of the start times of an index map, for bisect.
+    """
+    def __init__(self, index_map, count):
+        self.index_map = index_map
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, position):
+        return INDEX_RECORD.unpack_from(self.index_map, INDEX_HEADER.size + position * INDEX_RECORD.size)[0]
+
+
+class WindowArchive(object):
+    """Network summaries archived in directory (created if missing); see the
+    module docstring for the layout.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._data_file = open(os.path.join(directory, DATA_FILE), 'a+b')
+        index_path = os.path.join(directory, INDEX_FILE)
+        self._index_file = open(index_path, 'r+b' if os.path.exists(index_path) else 'w+b')
+        header = self._index_file.read(INDEX_HEADER.size)
+        if not header:
+            self.max_length = 0.0
+            self._index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, self.max_length))
+            self._index_file.flush()
+        else:
+            magic, version, flags, self.max_length = INDEX_HEADER.unpack(header)
+            if magic != INDEX_MAGIC:
+                raise ValueError("Not a dobby archive index: {0}".format(index_path))
+            if version > INDEX_VERSION:
+                raise ValueError("Archive index version {0} is newer than the supported version {1}".format(
+                    version, INDEX_VERSION))
+        self._index_map = None
+        self._data_map = None
+
+    def __len__(self):
+        self._index_file.seek(0, io.SEEK_END)
+        return (self._index_file.tell() - INDEX_HEADER.size) // INDEX_RECORD.size
+
+    def __repr__(self):
+        return "WindowArchive({0!r}, {1} summaries)".format(self.directory, len(self))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._unmap()
+        self._data_file.close()
+        self._index_file.close()
+
+    def _unmap(self):
+        if self._index_map is not None:
+            self._index_map.close()
+            self._index_map = None
+        if self._data_map is not None:
+            self._data_map.close()
+            self._data_map = None
+
+    def _map(self, stream):
+        return mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _records(self):
+        """The index map and its number of records.
+        """
+        count = len(self)
+        if not count:
+            return None, 0
+        if self._index_map is None:
+            self._index_map = self._map(self._index_file)
+        return self._index_map, count
+
+    def append(self, network_summary):
+        """Write network_summary at the end of the data file and index it.
+        """
+        self._data_file.seek(0, io.SEEK_END)
+        offset = self._data_file.tell()
+        writer = snapshot.SnapshotWriter(self._data_file)
+        writer.write(network_summary)
+        # The summary is on disk before the index points at it
+        self._data_file.flush()
+
+        start_ts, end_ts = summaryhistory.window_key(network_summary)
+        record = INDEX_RECORD.pack(start_ts, end_ts, offset, writer.offset)
+        index_map, count = self._records()
+        position = bisect.bisect_right(_StartTimes(index_map, count), start_ts) if count else 0
+        self._unmap()
+        record_offset = INDEX_HEADER.size + position * INDEX_RECORD.size
+        self._index_file.seek(record_offset)
+        later_records = self._index_file.read()
+        self._index_file.seek(record_offset)
+        self._index_file.write(record + later_records)
+        if network_summary.start_ts is not None and network_summary.end_ts is not None and \
+           end_ts - start_ts > self.max_length:
+            self.max_length = end_ts - start_ts
+            self._index_file.seek(0)
+            self._index_file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, self.max_length))
+        self._index_file.flush()
+
+    add = append
+
+    def entries(self):
+        """(start_ts, end_ts) of the archived summaries, in start_ts order,
+        without loading them.
+        """
+        index_map, count = self._records()
+        return [INDEX_RECORD.unpack_from(index_map, INDEX_HEADER.size + position * INDEX_RECORD.size)[:2]
+                for position in range(count)]
+
+    def _load(self, offset, length, sections):
+        if self._data_map is None or len(self._data_map) < offset + length:
+            if self._data_map is not None:
+                self._data_map.close()
+            self._data_map = self._map(self._data_file)
+        network_summary = snapshot.load_summary(io.BytesIO(self._data_map[offset:offset + length]),
+                                                sections=sections)
+        return network_summary.freeze()
+
+    def _candidates(self, start_ts, end_ts):
+        """Records of summaries that may overlap [start_ts, end_ts], latest first.
+        """
+        index_map, count = self._records()
+        if not count:
+            return
+        start_times = _StartTimes(index_map, count)
+        first = bisect.bisect_left(start_times, start_ts - self.max_length)
+        last = bisect.bisect_right(start_times, end_ts)
+        for position in range(last - 1, first - 1, -1):
+            yield INDEX_RECORD.unpack_from(index_map, INDEX_HEADER.size + position * INDEX_RECORD.size)
+
+    def find(self, timestamp, sections=snapshot.ALL_SECTIONS):
+        """The latest summary with start_ts <= timestamp < end_ts, or None.
+        """
+        for start_ts, end_ts, offset, length in self._candidates(timestamp, timestamp):
+            if start_ts <= timestamp < end_ts:
+                return self._load(offset, length, sections)
+        return None
+
+    def between(self, start_ts, end_ts, sections=snapshot.ALL_SECTIONS):
+        """Summaries overlapping [start_ts, end_ts), in start_ts order.
+        """
+        records = [(offset, length) for window_start, window_end, offset, length
+                   in self._candidates(start_ts, end_ts)
+                   if window_start < end_ts and window_end > start_ts]
+        records.reverse()
+        return [self._load(offset, length, sections) for offset, length in records]
@@ -0,0 +1,435 @@
+"""Columnar store for the TCP flows of a network summary.
+
+Every parsed TCP flow normally becomes a TCPFlow holding three TCPMetrics and
+their Stats, each with its own __dict__. A FlowTable keeps the same numbers in
+parallel typed columns instead (one row per flow): IPs as uint32, ports as
+uint16 and every metric as a float64, with NaN standing for a missing value.
+The columns are stdlib arrays so rows can be appended while a summary is being
+parsed; when numpy is installed the aggregates run vectorized over zero-copy
+numpy views of them.
+
+NetworkSummary.ip_flows of a summary with a flow table is a read-only mapping
+with the usual (src_ip, sport, dst_ip, dport) flow keys whose values are TCPFlowView objects, lazy TCPFlow
+look-alikes that build their metrics from the columns on access.
+"""
+import array
+import collections.abc
+import heapq
+import math
+import sys
+
+import dobby.nwmetrics.metrics as metrics
+import dobby.nwmodel.flow as flowmodel
+import dobby.utils.compact as compact
+import dobby.utils.cowmap as cowmap
+import dobby.utils.keys as keys
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+NAN = float('nan')
+# Approximate cost of a row_index entry: the packed flow key, its row number and the dict slot
+FLOW_INDEX_BYTES = 100
+
+FLOW = 'flow'
+SRC_TO_DST = 'src_to_dst'
+DST_TO_SRC = 'dst_to_src'
+METRIC_GROUPS = (FLOW, SRC_TO_DST, DST_TO_SRC)
+
+# Metric columns of a group and the TCPMetrics field each one holds. The
+# whole-flow group only carries what tcpmystery and tcploss report for it.
+RTT_COLUMNS = (('rtt_min', 'min_val'), ('rtt_avg', 'avg_val'),
+               ('rtt_max', 'max_val'), ('rtt_var', 'var_val'))
+RTT_FIELDS = frozenset(field for column, field in RTT_COLUMNS)
+FLOW_METRIC_COLUMNS = (('duration', 'duration'), ('loss', 'total_loss'))
+DIRECTION_METRIC_COLUMNS = (('mtu', 'mtu'), ('acks', 'total_acks'), ('pkts', 'total_pkts'),
+                            ('bytes', 'total_bytes'), ('loss', 'total_loss'))
+# All groups share the begin and end of the flow
+TIMESTAMP_COLUMNS = (('begin', 'start_ts'), ('end', 'end_ts'))
+
+# Row flags: whether a group has timestamps and an rtt_stats set
+GROUP_FLAGS = dict((group, (1 << (2 * index), 1 << (2 * index + 1)))
+                   for index, group in enumerate(METRIC_GROUPS))
+
+
+def group_columns(group):
+    """Return the (column, TCPMetrics field) pairs of a metric group.
+    """
+    prefix = '' if group == FLOW else group + '_'
+    group_metric_columns = FLOW_METRIC_COLUMNS if group == FLOW else DIRECTION_METRIC_COLUMNS
+    return tuple((prefix + column, field) for column, field in group_metric_columns + RTT_COLUMNS)
+
+COLUMN_TYPES = collections.OrderedDict(
+    [('src_ip', 'I'), ('dst_ip', 'I'), ('sport', 'H'), ('dport', 'H'), ('flags', 'H')] +
+    [(column, 'd') for column, field in TIMESTAMP_COLUMNS] +
+    [(column, 'd') for group in METRIC_GROUPS for column, field in group_columns(group)])
+NUMPY_TYPES = {'I': 'uint32', 'H': 'uint16', 'd': 'float64'}
+
+# numpy takes longer to import than all of dobby, so it is imported when a
+# flow table first aggregates a column; False until then
+_numpy = False
+
+def get_numpy():
+    """The numpy module, or None when it is not installed.
+    """
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy as _numpy
+        except ImportError:
+            _numpy = None
+    return _numpy
+
+def __getattr__(name):
+    # flowtable.numpy as when numpy was imported with the module
+    if name == 'numpy':
+        return get_numpy()
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
+
+def pack_flow(src_ip, sport, dst_ip, dport):
+    return (int(src_ip) << 64) | (int(sport) << 48) | (int(dst_ip) << 16) | int(dport)
+
+def _none_if_nan(value):
+    return None if value != value else value
+
+def _nan_if_none(value):
+    return NAN if value is None else float(value)
+
+
+class FlowTable(object):
+    """Parallel columns holding one TCP flow per row.
+    """
+    def __init__(self):
+        self.columns = collections.OrderedDict((column, array.array(type_code))
+                                               for column, type_code in COLUMN_TYPES.items())
+        # Endpoints are shared with ip_to_endpoints, rows only point at them
+        self.src_endpoints = []
+        self.dst_endpoints = []
+        self.row_index = {}
+        self.group_columns = dict((group, dict((field, column) for column, field in
+                                               TIMESTAMP_COLUMNS + group_columns(group)))
+                                  for group in METRIC_GROUPS)
+        # Set when the summary owning the table is frozen
+        self.frozen = False
+
+    def __len__(self):
+        return len(self.src_endpoints)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the table, in bytes.
+        """
+        size = sum(column.itemsize * len(column) for column in self.columns.values())
+        return size + sys.getsizeof(self.src_endpoints) + sys.getsizeof(self.dst_endpoints) + \
+               sys.getsizeof(self.row_index) + FLOW_INDEX_BYTES * len(self.row_index)
+
+    def copy(self):
+        """A writable copy of the table; the endpoints are shared.
+        """
+        table = FlowTable()
+        table.columns = collections.OrderedDict((column, array.array(values.typecode, values))
+                                                for column, values in self.columns.items())
+        table.src_endpoints = list(self.src_endpoints)
+        table.dst_endpoints = list(self.dst_endpoints)
+        table.row_index = dict(self.row_index)
+        return table
+
+    def _check_writable(self):
+        if self.frozen:
+            raise cowmap.FrozenMapError("frozen flow table can not be modified, copy() it")
+
+    def find_row(self, src_ip, sport, dst_ip, dport):
+        return self.row_index.get(pack_flow(src_ip, sport, dst_ip, dport), None)
+
+    def add_row(self, src_ip, sport, dst_ip, dport, src_endpoint=None, dst_endpoint=None):
+        """Return the row of a flow, appending an empty one for a new flow.
+        """
+        return self._add_row(src_ip, sport, dst_ip, dport, src_endpoint, dst_endpoint)[0]
+
+    def _add_row(self, src_ip, sport, dst_ip, dport, src_endpoint, dst_endpoint):
+        # (row, True if it was appended)
+        packed = pack_flow(src_ip, sport, dst_ip, dport)
+        row = self.row_index.get(packed, None)
+        if row is not None:
+            return row, False
+        self._check_writable()
+        row = len(self.src_endpoints)
+        self.row_index[packed] = row
+        columns = self.columns
+        columns['src_ip'].append(int(src_ip))
+        columns['dst_ip'].append(int(dst_ip))
+        columns['sport'].append(int(sport))
+        columns['dport'].append(int(dport))
+        columns['flags'].append(0)
+        for column, type_code in COLUMN_TYPES.items():
+            if type_code == 'd':
+                columns[column].append(NAN)
+        self.src_endpoints.append(src_endpoint)
+        self.dst_endpoints.append(dst_endpoint)
+        return row, True
+
+    def update_metrics(self, row, group, **updated_stats):
+        """Store TCPMetrics fields of a metric group in a row.
+        """
+        self._check_writable()
+        columns = self.columns
+        fields = self.group_columns[group]
+        ts_flag, rtt_flag = GROUP_FLAGS[group]
+        for field, value in updated_stats.items():
+            if field == 'rtt_stats':
+                self._update_rtt(row, group, value)
+                continue
+            column = fields.get(field, None)
+            if column is None:
+                raise ValueError("{0} of {1} metrics is not stored in the flow table".format(field, group))
+            columns[column][row] = _nan_if_none(value)
+            if field in ('start_ts', 'end_ts'):
+                columns['flags'][row] |= ts_flag
+
+    def _update_rtt(self, row, group, rtt_stats):
+        ts_flag, rtt_flag = GROUP_FLAGS[group]
+        fields = self.group_columns[group]
+        flags = self.columns['flags']
+        if rtt_stats is None:
+            flags[row] &= ~rtt_flag
+            for column, field in RTT_COLUMNS:
+                self.columns[fields[field]][row] = NAN
+            return
+        extra = [name for name, value in compact.attributes(rtt_stats).items()
+                 if value is not None and name not in RTT_FIELDS]
+        if extra:
+            raise ValueError("rtt_stats fields {0} are not stored in the flow table".format(extra))
+        for column, field in RTT_COLUMNS:
+            self.columns[fields[field]][row] = _nan_if_none(getattr(rtt_stats, field))
+        flags[row] |= rtt_flag
+
+    def update_flow(self, src_ip, sport, dst_ip, dport, src_endpoint=None, dst_endpoint=None,
+                    flow_metrics=None, flow_metrics_src_to_dst=None, flow_metrics_dst_to_src=None):
+        """Add or update a flow; metrics are TCPMetrics fields per group.
+        Returns True if the flow was added, False if it was updated.
+        """
+        row, added = self._add_row(src_ip, sport, dst_ip, dport, src_endpoint, dst_endpoint)
+        for group, updated_stats in zip(METRIC_GROUPS, (flow_metrics, flow_metrics_src_to_dst,
+                                                        flow_metrics_dst_to_src)):
+            if updated_stats:
+                self.update_metrics(row, group, **updated_stats)
+        return added
+
+    def metrics(self, row, group):
+        """Build the TCPMetrics of a group of a row.
+        """
+        columns = self.columns
+        fields = self.group_columns[group]
+        ts_flag, rtt_flag = GROUP_FLAGS[group]
+        flags = columns['flags'][row]
+        params = dict((field, _none_if_nan(columns[column][row])) for field, column in fields.items()
+                      if field not in RTT_FIELDS)
+        if not flags & ts_flag:
+            params['start_ts'] = params['end_ts'] = None
+        if flags & rtt_flag:
+            params['rtt_stats'] = metrics.Stats(**dict((field, _none_if_nan(columns[fields[field]][row]))
+                                                       for column, field in RTT_COLUMNS))
+        return metrics.TCPMetrics(**params)
+
+    def flow_key(self, row):
+        columns = self.columns
+        return keys.flow_key(columns['src_ip'][row], columns['sport'][row],
+                             columns['dst_ip'][row], columns['dport'][row])
+
+    def view(self, row):
+        return TCPFlowView(self, row)
+
+    def flows(self):
+        """Mapping of flow keys to TCPFlowView, used as NetworkSummary.ip_flows.
+        """
+        return FlowMapping(self)
+
+    def column(self, name):
+        """Return a copy of a column, as a numpy array when numpy is installed.
+        """
+        numpy = get_numpy()
+        if numpy is not None:
+            return self._numpy_view(name).copy()
+        return array.array(self.columns[name].typecode, self.columns[name])
+
+    def _numpy_view(self, name):
+        # Views must not outlive the call: arrays cannot grow while exported
+        column = self.columns[name]
+        numpy = get_numpy()
+        return numpy.frombuffer(column, dtype=NUMPY_TYPES[column.typecode]) if len(column) \
+            else numpy.zeros(0, dtype=NUMPY_TYPES[column.typecode])
+
+    def _values(self, name):
+        return [value for value in self.columns[name] if value == value]
+
+    def sum(self, name):
+        """Sum of a column, ignoring missing values.
+        """
+        numpy = get_numpy()
+        if numpy is not None:
+            return float(numpy.nansum(self._numpy_view(name)))
+        return float(math.fsum(self._values(name)))
+
+    def mean(self, name):
+        """Mean of a column ignoring missing values, None if there are none.
+        """
+        numpy = get_numpy()
+        if numpy is not None:
+            values = self._numpy_view(name)
+            present = values[~numpy.isnan(values)] if values.dtype.kind == 'f' else values
+            return float(present.mean()) if len(present) else None
+        values = self._values(name)
+        return math.fsum(values) / len(values) if values else None
+
+    def min(self, name):
+        numpy = get_numpy()
+        if numpy is not None:
+            values = self._numpy_view(name)
+            present = values[~numpy.isnan(values)] if values.dtype.kind == 'f' else values
+            return present.min().item() if len(present) else None
+        values = self._values(name)
+        return min(values) if values else None
+
+    def max(self, name):
+        numpy = get_numpy()
+        if numpy is not None:
+            values = self._numpy_view(name)
+            present = values[~numpy.isnan(values)] if values.dtype.kind == 'f' else values
+            return present.max().item() if len(present) else None
+        values = self._values(name)
+        return max(values) if values else None
+
+    def top_rows(self, name, k, lowest=False, rows=None):
+        """Rows of the k largest (smallest with lowest=True) values of a
+        column, best first, ignoring missing values; only the given rows
+        when rows is not None. Uses numpy.argpartition when numpy is
+        installed, a bounded heap (O(n log k)) otherwise.
+        """
+        if k <= 0:
+            return []
+        numpy = get_numpy()
+        if numpy is not None:
+            values = self._numpy_view(name).astype('float64')
+            row_numbers = numpy.arange(len(values)) if rows is None else numpy.asarray(rows, dtype='int64')
+            values = values[row_numbers]
+            present = ~numpy.isnan(values)
+            values, row_numbers = values[present], row_numbers[present]
+            if not lowest:
+                values = -values
+            if len(values) > k:
+                selected = numpy.argpartition(values, k - 1)[:k]
+                values, row_numbers = values[selected], row_numbers[selected]
+            # Stable, so ties keep row order like the heap selection
+            return row_numbers[numpy.argsort(values, kind='stable')].tolist()
+        column = self.columns[name]
+        candidates = ((column[row], row) for row in (range(len(column)) if rows is None else rows)
+                      if column[row] == column[row])
+        if lowest:
+            return [row for value, row in heapq.nsmallest(k, candidates)]
+        return [row for value, row in heapq.nlargest(k, candidates, key=lambda candidate: (candidate[0],
+                                                                                          -candidate[1]))]
+
+    def group_sum(self, key_name, value_name):
+        """Sum a column per distinct value of another, e.g. bytes per src_ip.
+        Returns {key: sum}, ignoring missing values.
+        """
+        numpy = get_numpy()
+        if numpy is not None:
+            keys = self._numpy_view(key_name)
+            values = self._numpy_view(value_name)
+            unique_keys, inverse = numpy.unique(keys, return_inverse=True)
+            sums = numpy.bincount(inverse, weights=numpy.nan_to_num(values), minlength=len(unique_keys))
+            return dict(zip(unique_keys.tolist(), sums.tolist()))
+        sums = {}
+        for key, value in zip(self.columns[key_name], self.columns[value_name]):
+            sums[key] = sums.get(key, 0.0) + (value if value == value else 0.0)
+        return sums
+
+
+class TCPFlowView(flowmodel.TCPFlow):
+    """A TCPFlow backed by a row of a FlowTable.
+
+    The metrics are built from the columns each time they are read, so update
+    them through the update_flow_metrics* methods rather than in place.
+    """
+    def __init__(self, flow_table, row):
+        self.flow_table = flow_table
+        self.row = row
+
+    edge_list = property(lambda self: [])
+    flow_type = property(lambda self: flowmodel.FlowType.TCP)
+    src_endpoint = property(lambda self: self.flow_table.src_endpoints[self.row])
+    dst_endpoint = property(lambda self: self.flow_table.dst_endpoints[self.row])
+    sport = property(lambda self: float(self.flow_table.columns['sport'][self.row]))
+    dport = property(lambda self: float(self.flow_table.columns['dport'][self.row]))
+    flow_metrics = property(lambda self: self.flow_table.metrics(self.row, FLOW))
+    flow_metrics_src_to_dst = property(lambda self: self.flow_table.metrics(self.row, SRC_TO_DST))
+    flow_metrics_dst_to_src = property(lambda self: self.flow_table.metrics(self.row, DST_TO_SRC))
+
+    def update_flow_metrics(self, **metrics):
+        self.flow_table.update_metrics(self.row, FLOW, **metrics)
+
+    def update_flow_metrics_src_to_dst(self, **metrics):
+        self.flow_table.update_metrics(self.row, SRC_TO_DST, **metrics)
+
+    def update_flow_metrics_dst_to_src(self, **metrics):
+        self.flow_table.update_metrics(self.row, DST_TO_SRC, **metrics)
+
+    # The columns only hold the latest values, there are no running aggregates
+    accumulate_flow_metrics = update_flow_metrics
+    accumulate_flow_metrics_src_to_dst = update_flow_metrics_src_to_dst
+    accumulate_flow_metrics_dst_to_src = update_flow_metrics_dst_to_src
+
+    def __eq__(self, other):
+        if isinstance(other, self.__class__):
+            return self.flow_table is other.flow_table and self.row == other.row
+        return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((id(self.flow_table), self.row))
+
+
+class FlowValuesView(collections.abc.ValuesView):
+    def __iter__(self):
+        flow_table = self._mapping.flow_table
+        for row in range(len(flow_table)):
+            yield flow_table.view(row)
+
+class FlowItemsView(collections.abc.ItemsView):
+    def __iter__(self):
+        flow_table = self._mapping.flow_table
+        for row in range(len(flow_table)):
+            yield flow_table.flow_key(row), flow_table.view(row)
+
+class FlowMapping(collections.abc.Mapping):
+    """Read-only flow key -> TCPFlowView mapping over a FlowTable.
+    """
+    def __init__(self, flow_table):
+        self.flow_table = flow_table
+
+    def __getitem__(self, key):
+        try:
+            row = self.flow_table.find_row(*key)
+        except (TypeError, ValueError):
+            row = None
+        if row is None:
+            raise KeyError(key)
+        return self.flow_table.view(row)
+
+    def __iter__(self):
+        for row in range(len(self.flow_table)):
+            yield self.flow_table.flow_key(row)
+
+    def __len__(self):
+        return len(self.flow_table)
+
+    def values(self):
+        return FlowValuesView(self)
+
+    def items(self):
+        return FlowItemsView(self)
+
+    def __repr__(self):
+        return "FlowMapping({0} flows)".format(len(self))
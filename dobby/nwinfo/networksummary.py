@@ -3,24 +3,200 @@
 
 from __future__ import division
 
+import copy
+
+import dobby.nwmodel.phymodel as phymodel
+import dobby.utils.cowmap as cowmap
+
 __author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
 
+# The dicts of a summary, all of them cowmap.CowMap
+SUMMARY_MAPS = ('mac_to_endpoints', 'ip_to_endpoints', 'nodes', 'edges', 'ip_flows', 'apps', 'phy_models',
+                'adjacency')
+
+
+def edge_macs(edge):
+    """MACs (integers) of the two ends of an edge, None for an end without one.
+    """
+    return phymodel.mac_value(edge.endpoint_a), phymodel.mac_value(edge.endpoint_b)
+
+
 class NetworkSummary(object):
     """Info parsed so far
+
+    The dicts of a summary are copy-on-write maps (cowmap.CowMap). A summary
+    is built in place; freeze() makes it read-only once it is published and
+    derive() starts a new summary from a frozen one that shares its entries
+    and only stores what changes.
+
+    adjacency indexes the edges by the MACs of their ends (MAC -> set of edge
+    keys), so neighbors(), degree() and incident_edges() of a MAC or a node
+    cost O(degree). Edges are added with add_edge() to keep it up to date; it
+    is rebuilt from edges when a summary is created with them.
     """
     def __init__(self, start_ts=None, end_ts=None,
                  mac_to_endpoints=None, ip_to_endpoints=None,
                  nodes=None, edges=None, ip_flows=None,
-                 phy_models=None, apps=None):
+                 phy_models=None, apps=None, flow_table=None):
         self.start_ts = start_ts
         self.end_ts = end_ts
-        self.mac_to_endpoints = mac_to_endpoints if mac_to_endpoints else {}
-        self.ip_to_endpoints = ip_to_endpoints if ip_to_endpoints else {}
-        self.nodes = nodes if nodes else {}
-        self.edges = edges if edges else {}
-        self.ip_flows = ip_flows if ip_flows else {}
-        self.apps = apps if apps else {}
-        self.phy_models = phy_models if phy_models else {}
+        self.frozen = False
+        self.mac_to_endpoints = cowmap.CowMap.wrap(mac_to_endpoints)
+        self.ip_to_endpoints = cowmap.CowMap.wrap(ip_to_endpoints)
+        self.nodes = cowmap.CowMap.wrap(nodes)
+        self.edges = cowmap.CowMap.wrap(edges)
+        # With a flowtable.FlowTable the TCP flows are stored in its columns
+        # and ip_flows is a read-only view of them
+        self.flow_table = flow_table
+        if flow_table is not None and not ip_flows:
+            self.ip_flows = flow_table.flows()
+        else:
+            self.ip_flows = cowmap.CowMap.wrap(ip_flows)
+        self.apps = cowmap.CowMap.wrap(apps)
+        self.phy_models = cowmap.CowMap.wrap(phy_models)
+        self.adjacency = cowmap.CowMap()
+        for key, edge in self.edges.items():
+            self._index_edge(key, edge)
+
+    def freeze(self):
+        """Make the summary read-only.
+        """
+        self.frozen = True
+        for name in SUMMARY_MAPS:
+            entries = getattr(self, name)
+            if isinstance(entries, cowmap.CowMap):
+                entries.freeze()
+        if self.flow_table is not None:
+            self.flow_table.frozen = True
+        return self
+
+    def derive(self):
+        """Freeze the summary and return a new one with the same contents.
+        The maps of the new summary are layered on the frozen ones; a flow
+        table is copied.
+        """
+        self.freeze()
+        network_summary = copy.copy(self)
+        network_summary.frozen = False
+        for name in SUMMARY_MAPS:
+            entries = getattr(self, name)
+            if isinstance(entries, cowmap.CowMap):
+                setattr(network_summary, name, entries.derive())
+        if self.flow_table is not None:
+            network_summary.flow_table = self.flow_table.copy()
+            network_summary.ip_flows = network_summary.flow_table.flows()
+        return network_summary
+
+    def writable(self):
+        """This summary while it is being built, a summary derived from it
+        once it is frozen.
+        """
+        return self.derive() if self.frozen else self
+
+    def _index_edge(self, key, edge):
+        for mac in set(edge_macs(edge)):
+            if mac is None:
+                continue
+            edge_keys = self.adjacency.owned(mac)
+            if edge_keys is None:
+                self.adjacency[mac] = set([key])
+            else:
+                edge_keys.add(key)
+
+    def add_edge(self, key, edge):
+        """Store edge under key in edges and index it by the MACs of its ends.
+        """
+        previous = self.edges.get(key, None)
+        if previous is not None and edge_macs(previous) != edge_macs(edge):
+            self.remove_edge(key)
+        self.edges[key] = edge
+        self._index_edge(key, edge)
+
+    def remove_edge(self, key):
+        edge = self.edges[key]
+        del self.edges[key]
+        for mac in set(edge_macs(edge)):
+            edge_keys = self.adjacency.owned(mac)
+            if edge_keys is not None:
+                edge_keys.discard(key)
+                if not edge_keys:
+                    del self.adjacency[mac]
+
+    def owned_endpoint(self, endpoint):
+        """endpoint, safe to update in place: an endpoint inherited from a
+        frozen summary is copied (CowMap.owned) and the copy replaces it in
+        mac_to_endpoints, ip_to_endpoints and the endpoints of its node.
+        """
+        mac = phymodel.mac_value(endpoint)
+        if mac is not None:
+            owned = self.mac_to_endpoints.owned(mac)
+        else:
+            ip_keys = [key for key in endpoint.ip_infos if self.ip_to_endpoints.get(key, None) is endpoint]
+            owned = self.ip_to_endpoints.owned(ip_keys[0]) if ip_keys else None
+        if owned is None or owned is endpoint:
+            return endpoint
+        for key in owned.ip_infos:
+            if self.ip_to_endpoints.get(key, None) is endpoint:
+                self.ip_to_endpoints[key] = owned
+        node = self.nodes.get(owned.node_id, None) if owned.node_id is not None else None
+        if node is not None and any(node_endpoint is endpoint for node_endpoint in node.endpoints):
+            node = self.nodes.owned(owned.node_id)
+            node.endpoints = [owned if node_endpoint is endpoint else node_endpoint
+                              for node_endpoint in node.endpoints]
+        return owned
+
+    def incident_edges(self, mac):
+        """(key, edge) of the edges with an end at mac (an integer, string or
+        PhysicalAddress).
+        """
+        return [(key, self.edges[key]) for key in self.adjacency.get(phymodel.mac_value(mac), ())]
+
+    def neighbors(self, mac):
+        """MACs at the other end of the edges of mac.
+        """
+        mac = phymodel.mac_value(mac)
+        neighbors = set()
+        for key, edge in self.incident_edges(mac):
+            mac_a, mac_b = edge_macs(edge)
+            neighbor = mac_b if mac_a == mac else mac_a
+            if neighbor is not None:
+                neighbors.add(neighbor)
+        return neighbors
+
+    def degree(self, mac):
+        return len(self.adjacency.get(phymodel.mac_value(mac), ()))
+
+    def _node_macs(self, node_id):
+        node = self.nodes.get(node_id, None)
+        if node is None:
+            return set()
+        macs = set(phymodel.mac_value(endpoint) for endpoint in node.endpoints)
+        macs.discard(None)
+        return macs
+
+    def node_edges(self, node_id):
+        """(key, edge) of the edges of the endpoints of a node.
+        """
+        edge_keys = set()
+        for mac in self._node_macs(node_id):
+            edge_keys.update(self.adjacency.get(mac, ()))
+        return [(key, self.edges[key]) for key in edge_keys]
+
+    def node_neighbors(self, node_id):
+        """node_ids of the nodes at the other end of the edges of a node.
+        """
+        node_macs = self._node_macs(node_id)
+        neighbors = set()
+        for mac in node_macs:
+            for neighbor_mac in self.neighbors(mac):
+                endpoint = self.mac_to_endpoints.get(neighbor_mac, None)
+                neighbor_id = getattr(endpoint, 'node_id', None)
+                if neighbor_id is not None and neighbor_id != node_id:
+                    neighbors.add(neighbor_id)
+        return neighbors
+
+    def node_degree(self, node_id):
+        return len(self.node_edges(node_id))
 
     def __str__(self):
         return_string = "Network Summary:"
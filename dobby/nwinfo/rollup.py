@@ -0,0 +1,189 @@
+"""Rollups of consecutive network summaries into coarser windows.
+
+A rollup is a NetworkSummary covering a fixed period (an hour, a day) into
+which every window starting in that period is merged as it is published:
+endpoints are unioned by MAC and IP, edge and flow metrics merged with
+Metrics.merge and wifi models get the union of their clients. A query over
+a long range then reads a few precomputed rollups instead of every window.
+"""
+import functools
+
+import dobby.nwinfo.networksummary as networksummary
+import dobby.nwinfo.summaryhistory as summaryhistory
+import dobby.nwmetrics.metrics as metrics
+import dobby.nwmodel.models as modelset
+import dobby.utils.cowmap as cowmap
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+HOUR = 3600
+DAY = 24 * HOUR
+DEFAULT_PERIODS = (HOUR, DAY)
+
+
+def _add_endpoint(rollup_summary, network_summary, endpoints, key, endpoint):
+    if key in endpoints:
+        return
+    endpoints[key] = endpoint
+    node = network_summary.nodes.get(endpoint.node_id, None)
+    if node is not None and endpoint.node_id not in rollup_summary.nodes:
+        rollup_summary.nodes[endpoint.node_id] = node
+
+def merge_summary(rollup_summary, network_summary, models=modelset.DEFAULT_MODELS):
+    """Fold network_summary into rollup_summary in place and return it.
+
+    Endpoints and nodes seen first in network_summary are shared with it;
+    edges, flows and wifi models of the rollup are its own objects, so the
+    merged window is never modified.
+    """
+    for key, endpoint in network_summary.mac_to_endpoints.items():
+        _add_endpoint(rollup_summary, network_summary, rollup_summary.mac_to_endpoints, key, endpoint)
+    for key, endpoint in network_summary.ip_to_endpoints.items():
+        _add_endpoint(rollup_summary, network_summary, rollup_summary.ip_to_endpoints, key, endpoint)
+
+    for key, wifi_model in network_summary.phy_models.items():
+        rollup_model = rollup_summary.phy_models.get(key, None)
+        if rollup_model is None:
+            rollup_summary.phy_models[key] = cowmap.copy_entry(wifi_model)
+        else:
+            rollup_model.add_clients(clients=wifi_model.clients)
+
+    for key, edge in network_summary.edges.items():
+        rollup_edge = rollup_summary.edges.get(key, None)
+        if rollup_edge is None:
+            rollup_summary.add_edge(key, cowmap.copy_entry(edge))
+            continue
+        rollup_edge.update_undirected_metrics(metrics.merge_metrics(rollup_edge.edge_metrics, edge.edge_metrics))
+        rollup_edge.update_metrics_ab(metrics.merge_metrics(rollup_edge.edge_metrics_ab, edge.edge_metrics_ab))
+        rollup_edge.update_metrics_ba(metrics.merge_metrics(rollup_edge.edge_metrics_ba, edge.edge_metrics_ba))
+
+    for key, tcp_flow in network_summary.ip_flows.items():
+        rollup_flow = rollup_summary.ip_flows.get(key, None)
+        if rollup_flow is None:
+            rollup_flow = models.TCPFlow(src_endpoint=rollup_summary.ip_to_endpoints.get(key[0], tcp_flow.src_endpoint),
+                                         dst_endpoint=rollup_summary.ip_to_endpoints.get(key[2], tcp_flow.dst_endpoint),
+                                         sport=tcp_flow.sport, dport=tcp_flow.dport)
+            rollup_summary.ip_flows[key] = rollup_flow
+        # Metrics.merge builds new metrics, the window's are left untouched
+        rollup_flow.flow_metrics = rollup_flow.flow_metrics.merge(tcp_flow.flow_metrics)
+        rollup_flow.flow_metrics_src_to_dst = \
+            rollup_flow.flow_metrics_src_to_dst.merge(tcp_flow.flow_metrics_src_to_dst)
+        rollup_flow.flow_metrics_dst_to_src = \
+            rollup_flow.flow_metrics_dst_to_src.merge(tcp_flow.flow_metrics_dst_to_src)
+    return rollup_summary
+
+
+class RollupManager(object):
+    """Rollups of published summaries for every period in periods (seconds),
+    maintained incrementally by add_summary.
+
+    A window is merged into the rollup of the period it starts in; windows may
+    arrive out of order. The rollups of each period are kept in a
+    summaryhistory.SummaryHistory holding up to max_rollups of them.
+
+    Only the rollups of periods no other period divides are merged with every
+    window. A coarser period (a day) is derived from the finest period that
+    divides it (an hour): each hourly rollup is merged into its day once,
+    when a window of a later hour arrives or a daily rollup is read. Windows
+    arriving for an hour that was already merged into its day are merged
+    into both.
+
+    A window arriving for a period older than a rollup already evicted by
+    max_rollups is only merged into the derived periods: a rollup recreated
+    for it would hold that window alone and look complete.
+    """
+    def __init__(self, periods=DEFAULT_PERIODS, max_rollups=None, models=modelset.DEFAULT_MODELS):
+        self.periods = tuple(periods)
+        self.models = models
+        self.rollups = dict((period, summaryhistory.SummaryHistory(max_summaries=max_rollups,
+                                                                    on_evict=functools.partial(self._evicted, period)))
+                            for period in self.periods)
+        # period -> end of the latest rollup evicted, None while none was
+        self.evicted_until = dict((period, None) for period in self.periods)
+        # period -> the finest period dividing it, None for periods fed by the windows
+        self.sources = {}
+        for period in self.periods:
+            divisors = [source for source in self.periods if source < period and period % source == 0]
+            self.sources[period] = min(divisors) if divisors else None
+        # period -> {rollup start: rollup} of the rollups not merged into their derived periods yet
+        self.unmerged = dict((period, {}) for period in self.periods)
+        self.latest_start_ts = None
+
+    def _rollup(self, period, timestamp):
+        rollup_start = timestamp - timestamp % period
+        rollup_summary = self.rollups[period].find(rollup_start)
+        if rollup_summary is None:
+            rollup_summary = networksummary.NetworkSummary(start_ts=rollup_start,
+                                                           end_ts=rollup_start + period)
+            self.unmerged[period][rollup_start] = rollup_summary
+            evicted_until = self.evicted_until[period]
+            # A period older than an evicted rollup only feeds its derived periods
+            if evicted_until is None or rollup_start >= evicted_until:
+                self.rollups[period].append(rollup_summary)
+        return rollup_summary
+
+    def _evicted(self, period, rollup_summary):
+        if self.evicted_until[period] is None or rollup_summary.end_ts > self.evicted_until[period]:
+            self.evicted_until[period] = rollup_summary.end_ts
+
+    def _derived(self, period):
+        return [derived for derived, source in self.sources.items() if source == period]
+
+    def _merge(self, period, network_summary):
+        # network_summary into the rollup of period, and into the derived
+        # periods directly when that rollup was already merged into them
+        rollup_summary = self._rollup(period, network_summary.start_ts)
+        merge_summary(rollup_summary, network_summary, models=self.models)
+        if rollup_summary.start_ts not in self.unmerged[period]:
+            for derived in self._derived(period):
+                self._merge(derived, network_summary)
+
+    def _merge_finished(self, period, end_ts=None):
+        # Merge the rollups of period ending by end_ts (all of them for None)
+        # into their derived periods, finest first
+        derived_periods = self._derived(period)
+        unmerged = self.unmerged[period]
+        for rollup_start in sorted(unmerged):
+            rollup_summary = unmerged[rollup_start]
+            if end_ts is not None and rollup_summary.end_ts > end_ts:
+                continue
+            del unmerged[rollup_start]
+            for derived in derived_periods:
+                merge_summary(self._rollup(derived, rollup_start), rollup_summary, models=self.models)
+        for derived in derived_periods:
+            self._merge_finished(derived, end_ts)
+
+    def add_summary(self, network_summary):
+        """Merge a window into its rollups; windows without a start_ts are ignored.
+        """
+        if network_summary.start_ts is None:
+            return
+        if self.latest_start_ts is None or network_summary.start_ts > self.latest_start_ts:
+            self.latest_start_ts = network_summary.start_ts
+        for period in self.periods:
+            if self.sources[period] is None:
+                self._merge(period, network_summary)
+                self._merge_finished(period, self.latest_start_ts)
+
+    def flush(self):
+        """Merge every rollup into its derived periods, including the ones
+        still receiving windows.
+        """
+        for period in self.periods:
+            if self.sources[period] is None:
+                self._merge_finished(period)
+
+    def _history(self, period):
+        if self.sources[period] is not None:
+            self.flush()
+        return self.rollups[period]
+
+    def find(self, period, timestamp):
+        """The rollup of the given period containing timestamp, or None.
+        """
+        return self._history(period).find(timestamp)
+
+    def between(self, period, start_ts, end_ts):
+        """Rollups of the given period overlapping [start_ts, end_ts), in time order.
+        """
+        return self._history(period).between(start_ts, end_ts)
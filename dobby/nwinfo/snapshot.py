@@ -0,0 +1,460 @@
+"""Binary snapshots of a NetworkSummary.
+
+A snapshot file is a header, a sequence of sections and a directory:
+
+    MAGIC, version, flags                   header ('<8sHH')
+    section payloads                        written one after the other
+    directory                               (tag, offset, length) per section
+    directory offset, END_MAGIC             trailer ('<Q8s')
+
+Sections are written as soon as they are encoded, so saving streams to any
+writable file (offsets are counted, not asked of the file). Loading reads the
+trailer and directory first and then only the sections asked for.
+
+Model objects are pickled, but objects that several parts of a summary point
+at are written once: wifi models and endpoints go to tables of their own and
+every other reference to them is stored as its index in the table (a pickle
+persistent id). mac_to_endpoints and ip_to_endpoints are stored as endpoint
+index arrays next to their keys, an integer array unless the keys are not
+integers. TCP flows in a flowtable.FlowTable are written as its raw columns;
+TCPFlow objects are pickled in chunks of FLOW_CHUNK.
+
+Loading unpickles with SnapshotUnpickler, which only accepts the model
+classes in MODEL_CLASSES and a few standard library types, but snapshots
+should still only be loaded from trusted locations.
+"""
+import array
+import io
+import math
+import pickle
+import struct
+
+import dobby.nwinfo.flowtable as flowtable
+import dobby.nwinfo.networksummary as networksummary
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+MAGIC = b'DOBBYSNP'
+END_MAGIC = b'DOBBYEND'
+# Bumped when the layout of a section changes; older versions are still read
+SNAPSHOT_VERSION = 1
+HEADER = struct.Struct('<8sHH')
+TRAILER = struct.Struct('<Q8s')
+DIRECTORY_ENTRY = struct.Struct('<4sQQ')
+COUNT = struct.Struct('<Q')
+TIMESTAMPS = struct.Struct('<dd')
+COLUMN_HEADER = struct.Struct('<1sQ')
+
+# Header flags
+FLAG_FROZEN = 1
+
+# Section tags
+META = b'META'
+PHY_MODELS = b'PHYM'
+ENDPOINTS = b'ENDP'
+MAC_TO_ENDPOINTS = b'EMAC'
+IP_TO_ENDPOINTS = b'EIPS'
+NODES = b'NODE'
+EDGES = b'EDGE'
+FLOWS = b'FLOW'
+FLOW_TABLE = b'FTAB'
+APPS = b'APPS'
+
+# Summary attribute -> section holding it and tables its references point into
+SECTION_NAMES = {
+    'phy_models': PHY_MODELS,
+    'mac_to_endpoints': MAC_TO_ENDPOINTS,
+    'ip_to_endpoints': IP_TO_ENDPOINTS,
+    'nodes': NODES,
+    'edges': EDGES,
+    'ip_flows': FLOWS,
+    'apps': APPS,
+}
+ALL_SECTIONS = tuple(SECTION_NAMES)
+
+# Table tags used in persistent ids
+PHY_MODEL_REF = 'P'
+ENDPOINT_REF = 'E'
+NODE_REF = 'N'
+
+PICKLE_PROTOCOL = 4
+# TCPFlow objects pickled per chunk of the FLOWS section
+FLOW_CHUNK = 10000
+# Key type of endpoint maps whose keys are pickled
+PICKLED_KEYS = b'p'
+# Endpoint index standing for no endpoint
+NO_ENDPOINT = -1
+
+# The dobby classes (and pickle helper functions) a snapshot may contain
+MODEL_CLASSES = frozenset(
+    [('dobby.nwmodel.app', name) for name in ('NetworkApp', 'NetworkAppType')] +
+    [('dobby.nwmodel.edge', name) for name in ('Edge', 'CompactEdge', 'EdgeType')] +
+    [('dobby.nwmodel.endpoint', name) for name in ('EndPoint', 'CompactEndPoint')] +
+    [('dobby.nwmodel.flow', name) for name in ('Flow', 'CompactFlow', 'TCPFlow', 'CompactTCPFlow',
+                                               'FlowType')] +
+    [('dobby.nwmodel.ipinfo', name) for name in ('IPInfo', 'CompactIPInfo')] +
+    [('dobby.nwmodel.node', name) for name in ('Node', 'CompactNode', 'NodeType')] +
+    [('dobby.nwmodel.phymodel', name) for name in ('PhysicalModel', 'WifiPhysicalModel', 'PhysicalModelTypes',
+                                                   'PhysicalLayerMTU', '_unpickle_address')] +
+    [('dobby.nwmetrics.metrics', name) for name in ('Stats', 'CompactStats', 'RunningStats', 'Metrics',
+                                                    'CompactMetrics', 'WirelessMetrics',
+                                                    'CompactWirelessMetrics', 'TCPMetrics',
+                                                    'CompactTCPMetrics')] +
+    [('dobby.nwmetrics.sketch', 'QuantileSketch'), ('dobby.utils.cowmap', 'CowMap')])
+# Classes outside dobby that a snapshot may contain
+SAFE_CLASSES = {
+    ('builtins', 'set'), ('builtins', 'frozenset'), ('builtins', 'dict'), ('builtins', 'list'),
+    ('builtins', 'tuple'), ('builtins', 'object'), ('collections', 'OrderedDict'),
+    ('collections', 'Counter'), ('collections', 'defaultdict'), ('collections', 'deque'),
+    ('datetime', 'datetime'),
+    ('ipaddress', 'IPv4Address'), ('ipaddress', 'IPv6Address'), ('ipaddress', 'IPv4Network'),
+    ('uuid', 'UUID'), ('copyreg', '_reconstructor'), ('copyreg', '__newobj__'),
+}
+
+
+def _nan_if_none(value):
+    return float('nan') if value is None else value
+
+def _none_if_nan(value):
+    return None if math.isnan(value) else value
+
+
+class SnapshotPickler(pickle.Pickler):
+    """Pickler writing references to objects of the given tables as
+    (table tag, index) persistent ids.
+    """
+    def __init__(self, stream, tables):
+        pickle.Pickler.__init__(self, stream, protocol=PICKLE_PROTOCOL)
+        self.references = {}
+        for tag, objects in tables.items():
+            for index, obj in enumerate(objects):
+                self.references[id(obj)] = (tag, index)
+
+    def persistent_id(self, obj):
+        return self.references.get(id(obj), None)
+
+
+class SnapshotUnpickler(pickle.Unpickler):
+    """Unpickler resolving persistent ids in the loaded tables and refusing
+    every class that is not in MODEL_CLASSES or SAFE_CLASSES.
+    """
+    def __init__(self, stream, tables):
+        pickle.Unpickler.__init__(self, stream)
+        self.tables = tables
+
+    def persistent_load(self, persistent_id):
+        tag, index = persistent_id
+        try:
+            return self.tables[tag][index]
+        except (KeyError, IndexError):
+            raise pickle.UnpicklingError("Snapshot references missing {0} {1}".format(tag, index))
+
+    def find_class(self, module, name):
+        # Dotted names (protocol 4) would reach the attributes of allowed objects
+        if '.' not in name and ((module, name) in MODEL_CLASSES or (module, name) in SAFE_CLASSES):
+            return pickle.Unpickler.find_class(self, module, name)
+        raise pickle.UnpicklingError("Snapshot contains unsupported class {0}.{1}".format(module, name))
+
+
+class SnapshotWriter(object):
+    """Write a network summary to a binary stream, section by section.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.offset = 0
+        self.directory = []
+
+    def _write(self, data):
+        self.stream.write(data)
+        self.offset += len(data) if isinstance(data, bytes) else memoryview(data).nbytes
+
+    def _section(self, tag, chunks):
+        start = self.offset
+        for chunk in chunks:
+            self._write(chunk)
+        self.directory.append((tag, start, self.offset - start))
+
+    def _pickled(self, obj, tables):
+        buffer = io.BytesIO()
+        SnapshotPickler(buffer, tables).dump(obj)
+        return buffer.getvalue()
+
+    def write(self, network_summary):
+        flags = FLAG_FROZEN if getattr(network_summary, 'frozen', False) else 0
+        self._write(HEADER.pack(MAGIC, SNAPSHOT_VERSION, flags))
+        self._section(META, [TIMESTAMPS.pack(_nan_if_none(network_summary.start_ts),
+                                             _nan_if_none(network_summary.end_ts))])
+
+        flow_table = getattr(network_summary, 'flow_table', None)
+        phy_models = list(network_summary.phy_models.items())
+        endpoints = self._endpoint_table(network_summary, flow_table)
+        nodes = list(network_summary.nodes.items())
+
+        phy_model_tables = {PHY_MODEL_REF: [phy_model for key, phy_model in phy_models]}
+        self._section(PHY_MODELS, [self._pickled(phy_models, {})])
+        self._section(ENDPOINTS, [self._pickled(endpoints, phy_model_tables)])
+        endpoint_index = dict((id(endpoint), index) for index, endpoint in enumerate(endpoints))
+        self._section(MAC_TO_ENDPOINTS, self._endpoint_map(network_summary.mac_to_endpoints, 'Q',
+                                                           endpoint_index))
+        self._section(IP_TO_ENDPOINTS, self._endpoint_map(network_summary.ip_to_endpoints, 'I',
+                                                          endpoint_index))
+        tables = dict(phy_model_tables)
+        tables[ENDPOINT_REF] = endpoints
+        self._section(NODES, [self._pickled(nodes, tables)])
+        self._section(EDGES, [self._pickled(list(network_summary.edges.items()), tables)])
+        if flow_table is not None:
+            self._section(FLOW_TABLE, self._flow_table(flow_table, endpoint_index))
+        else:
+            self._section(FLOWS, self._flow_chunks(list(network_summary.ip_flows.items()), tables))
+        tables[NODE_REF] = [node for key, node in nodes]
+        self._section(APPS, [self._pickled(list(network_summary.apps.items()), tables)])
+
+        directory_offset = self.offset
+        self._write(COUNT.pack(len(self.directory)))
+        for tag, offset, length in self.directory:
+            self._write(DIRECTORY_ENTRY.pack(tag, offset, length))
+        self._write(TRAILER.pack(directory_offset, END_MAGIC))
+
+    @staticmethod
+    def _endpoint_table(network_summary, flow_table):
+        """Every endpoint of the summary, once.
+        """
+        if flow_table is not None:
+            flow_endpoints = (flow_table.src_endpoints, flow_table.dst_endpoints)
+        else:
+            tcp_flows = list(network_summary.ip_flows.values())
+            flow_endpoints = ([getattr(tcp_flow, 'src_endpoint', None) for tcp_flow in tcp_flows],
+                              [getattr(tcp_flow, 'dst_endpoint', None) for tcp_flow in tcp_flows])
+        # Keyed by id, which keeps the endpoints in the order they were first seen
+        endpoints = {}
+        for values in (network_summary.mac_to_endpoints.values(),
+                       network_summary.ip_to_endpoints.values()) + flow_endpoints:
+            values = list(values)
+            endpoints.update(zip(map(id, values), values))
+        endpoints.pop(id(None), None)
+        return list(endpoints.values())
+
+    def _endpoint_map(self, endpoints, key_type, endpoint_index):
+        indexes = array.array('i', (endpoint_index[id(endpoint)] for endpoint in endpoints.values()))
+        try:
+            keys = array.array(key_type, endpoints.keys())
+        except (TypeError, OverflowError):
+            # Keys that are not integers (or IPv6 ones) are pickled instead
+            return [PICKLED_KEYS, COUNT.pack(len(indexes)), indexes, self._pickled(list(endpoints.keys()), {})]
+        return [key_type.encode('ascii'), COUNT.pack(len(indexes)), indexes, keys]
+
+    def _flow_chunks(self, flows, tables):
+        yield COUNT.pack(len(flows))
+        for start in range(0, len(flows), FLOW_CHUNK):
+            chunk = self._pickled(flows[start:start + FLOW_CHUNK], tables)
+            yield COUNT.pack(len(chunk))
+            yield chunk
+
+    @staticmethod
+    def _flow_table(flow_table, endpoint_index):
+        endpoint_index = dict(endpoint_index)
+        endpoint_index[id(None)] = NO_ENDPOINT
+        def indexes(endpoints):
+            return array.array('i', map(endpoint_index.__getitem__, map(id, endpoints)))
+        columns = list(flow_table.columns.items())
+        columns += [('src_endpoint', indexes(flow_table.src_endpoints)),
+                    ('dst_endpoint', indexes(flow_table.dst_endpoints))]
+        yield COUNT.pack(len(columns))
+        for name, values in columns:
+            encoded_name = name.encode('ascii')
+            yield struct.pack('<H', len(encoded_name)) + encoded_name
+            yield COLUMN_HEADER.pack(values.typecode.encode('ascii'), len(values) * values.itemsize)
+            yield values
+
+
+class SnapshotReader(object):
+    """Random access to the sections of a snapshot file.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        header = stream.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError("Not a dobby snapshot: file too short")
+        magic, self.version, self.flags = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError("Not a dobby snapshot")
+        if self.version > SNAPSHOT_VERSION:
+            raise ValueError("Snapshot version {0} is newer than the supported version {1}".format(
+                self.version, SNAPSHOT_VERSION))
+        stream.seek(-TRAILER.size, io.SEEK_END)
+        directory_offset, end_magic = TRAILER.unpack(stream.read(TRAILER.size))
+        if end_magic != END_MAGIC:
+            raise ValueError("Truncated dobby snapshot")
+        stream.seek(directory_offset)
+        count, = COUNT.unpack(stream.read(COUNT.size))
+        self.sections = {}
+        for _ in range(count):
+            tag, offset, length = DIRECTORY_ENTRY.unpack(stream.read(DIRECTORY_ENTRY.size))
+            self.sections[tag] = (offset, length)
+        self.tables = {}
+
+    def _read(self, tag):
+        offset, length = self.sections[tag]
+        self.stream.seek(offset)
+        return self.stream.read(length)
+
+    def _unpickle(self, data):
+        return SnapshotUnpickler(io.BytesIO(data), self.tables).load()
+
+    def timestamps(self):
+        start_ts, end_ts = TIMESTAMPS.unpack(self._read(META))
+        return _none_if_nan(start_ts), _none_if_nan(end_ts)
+
+    def phy_models(self):
+        if PHY_MODEL_REF not in self.tables:
+            self._phy_models = self._unpickle(self._read(PHY_MODELS))
+            self.tables[PHY_MODEL_REF] = [phy_model for key, phy_model in self._phy_models]
+        return self._phy_models
+
+    def endpoints(self):
+        """The endpoint table, every endpoint of the summary.
+        """
+        if ENDPOINT_REF not in self.tables:
+            self.phy_models()
+            self.tables[ENDPOINT_REF] = self._unpickle(self._read(ENDPOINTS))
+        return self.tables[ENDPOINT_REF]
+
+    def _endpoint_map(self, tag):
+        endpoints = self.endpoints()
+        data = self._read(tag)
+        key_type = data[:1]
+        count, = COUNT.unpack_from(data, 1)
+        position = 1 + COUNT.size
+        indexes = array.array('i')
+        indexes.frombytes(data[position:position + count * indexes.itemsize])
+        position += count * indexes.itemsize
+        if key_type == PICKLED_KEYS:
+            keys = self._unpickle(data[position:])
+        else:
+            keys = array.array(key_type.decode('ascii'))
+            keys.frombytes(data[position:])
+        return dict(zip(keys, (endpoints[index] for index in indexes)))
+
+    def mac_to_endpoints(self):
+        return self._endpoint_map(MAC_TO_ENDPOINTS)
+
+    def ip_to_endpoints(self):
+        return self._endpoint_map(IP_TO_ENDPOINTS)
+
+    def nodes(self):
+        if NODE_REF not in self.tables:
+            self.endpoints()
+            self._nodes = self._unpickle(self._read(NODES))
+            self.tables[NODE_REF] = [node for key, node in self._nodes]
+        return dict(self._nodes)
+
+    def edges(self):
+        self.endpoints()
+        return dict(self._unpickle(self._read(EDGES)))
+
+    def apps(self):
+        self.nodes()
+        return dict(self._unpickle(self._read(APPS)))
+
+    def flow_table(self):
+        """The flowtable.FlowTable of a columnar summary, None otherwise.
+        """
+        if FLOW_TABLE not in self.sections:
+            return None
+        endpoints = self.endpoints()
+        data = memoryview(self._read(FLOW_TABLE))
+        count, = COUNT.unpack_from(data)
+        position = COUNT.size
+        columns = {}
+        for _ in range(count):
+            name_length, = struct.unpack_from('<H', data, position)
+            position += 2
+            name = bytes(data[position:position + name_length]).decode('ascii')
+            position += name_length
+            typecode, nbytes = COLUMN_HEADER.unpack_from(data, position)
+            position += COLUMN_HEADER.size
+            values = array.array(typecode.decode('ascii'))
+            values.frombytes(data[position:position + nbytes])
+            position += nbytes
+            columns[name] = values
+        table = flowtable.FlowTable()
+        for name in table.columns:
+            table.columns[name] = columns[name]
+        # NO_ENDPOINT (-1) picks the trailing None
+        row_endpoints = list(endpoints) + [None]
+        table.src_endpoints = list(map(row_endpoints.__getitem__, columns['src_endpoint']))
+        table.dst_endpoints = list(map(row_endpoints.__getitem__, columns['dst_endpoint']))
+        # flowtable.pack_flow, inlined
+        packed_flows = ((src_ip << 64) | (sport << 48) | (dst_ip << 16) | dport for src_ip, sport, dst_ip, dport
+                        in zip(columns['src_ip'], columns['sport'], columns['dst_ip'], columns['dport']))
+        table.row_index = dict(zip(packed_flows, range(len(table.src_endpoints))))
+        return table
+
+    def iter_flows(self):
+        """(flow key, TCPFlow) pairs of a summary without a flow table, read
+        one chunk at a time.
+        """
+        if FLOWS not in self.sections:
+            return
+        self.endpoints()
+        offset, length = self.sections[FLOWS]
+        self.stream.seek(offset)
+        count, = COUNT.unpack(self.stream.read(COUNT.size))
+        read = 0
+        while read < count:
+            chunk_length, = COUNT.unpack(self.stream.read(COUNT.size))
+            flows = self._unpickle(self.stream.read(chunk_length))
+            position = self.stream.tell()
+            for key, tcp_flow in flows:
+                yield key, tcp_flow
+            read += len(flows)
+            self.stream.seek(position)
+
+    def load(self, sections=ALL_SECTIONS):
+        """NetworkSummary holding the given sections (names of its attributes),
+        the others are left empty.
+        """
+        unknown = set(sections) - set(ALL_SECTIONS)
+        if unknown:
+            raise ValueError("Unknown snapshot sections: {0}".format(', '.join(sorted(unknown))))
+        start_ts, end_ts = self.timestamps()
+        loaded = {}
+        if 'phy_models' in sections:
+            loaded['phy_models'] = dict(self.phy_models())
+        if 'mac_to_endpoints' in sections:
+            loaded['mac_to_endpoints'] = self.mac_to_endpoints()
+        if 'ip_to_endpoints' in sections:
+            loaded['ip_to_endpoints'] = self.ip_to_endpoints()
+        if 'nodes' in sections:
+            loaded['nodes'] = self.nodes()
+        if 'edges' in sections:
+            loaded['edges'] = self.edges()
+        if 'apps' in sections:
+            loaded['apps'] = self.apps()
+        if 'ip_flows' in sections:
+            loaded['flow_table'] = self.flow_table()
+            if loaded['flow_table'] is None:
+                loaded['ip_flows'] = dict(self.iter_flows())
+        network_summary = networksummary.NetworkSummary(start_ts=start_ts, end_ts=end_ts, **loaded)
+        if self.flags & FLAG_FROZEN:
+            network_summary.freeze()
+        return network_summary
+
+
+def save_summary(network_summary, path_or_stream):
+    """Write network_summary to a file path or a binary stream.
+    """
+    if hasattr(path_or_stream, 'write'):
+        SnapshotWriter(path_or_stream).write(network_summary)
+        return
+    with open(path_or_stream, 'wb') as stream:
+        SnapshotWriter(stream).write(network_summary)
+
+def load_summary(path_or_stream, sections=ALL_SECTIONS):
+    """Read a summary saved with save_summary; only the given sections (see
+    SECTION_NAMES) are loaded.
+    """
+    if hasattr(path_or_stream, 'read'):
+        return SnapshotReader(path_or_stream).load(sections)
+    with open(path_or_stream, 'rb') as stream:
+        return SnapshotReader(stream).load(sections)
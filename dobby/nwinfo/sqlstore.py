@@ -0,0 +1,301 @@
+"""SQLite store of parsed network summaries.
+
+Every window written with add_summary becomes a row of windows and its
+endpoints, nodes, edges (with their wireless metrics) and TCP flows rows of
+normalized tables referring to it:
+
+    windows          window_id, start_ts, end_ts
+    endpoints        window_id, mac, ip, node_id          one row per address
+    nodes            window_id, node_id, node_name, node_type
+    edges            edge_id, window_id, mac_a, mac_b, edge_type
+    wireless_metrics edge_id, direction, WirelessMetrics fields, stats
+    flows            window_id, the columns of a flowtable.FlowTable
+
+MACs and IPv4 addresses are stored as integers (see dobby.utils.keys) and
+indexed, as are the flow 4-tuple and the window times, so lookups such as
+flows(ip=...) over months of windows read a few index pages instead of
+loading summaries. A window is written with executemany in one transaction.
+"""
+import sqlite3
+
+import dobby.nwinfo.flowtable as flowtable
+import dobby.nwmodel.phymodel as phymodel
+import dobby.utils.keys as keys
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+SCHEMA_VERSION = 1
+
+# Flow columns, those of a flow table but its row flags
+FLOW_COLUMNS = tuple(column for column in flowtable.COLUMN_TYPES if column != 'flags')
+WIRELESS_FIELDS = ('start_ts', 'end_ts', 'total_pkts', 'total_bytes', 'total_data_pkts',
+                   'total_data_bytes', 'total_retx', 'total_trans_time_usec',
+                   'avg_data_pkt_duration_usec')
+WIRELESS_STATS = ('noise_stats', 'snr_stats', 'rate_stats', 'size_stats')
+STATS_FIELDS = ('min_val', 'avg_val', 'max_val')
+WIRELESS_COLUMNS = WIRELESS_FIELDS + tuple('{0}_{1}'.format(name[:-len('_stats')], field[:-len('_val')])
+                                           for name in WIRELESS_STATS for field in STATS_FIELDS)
+# Edge metric directions, as the edge attributes holding them
+EDGE_DIRECTIONS = (('undirected', 'edge_metrics'), ('ab', 'edge_metrics_ab'), ('ba', 'edge_metrics_ba'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS windows (
+    window_id INTEGER PRIMARY KEY, start_ts REAL, end_ts REAL);
+CREATE INDEX IF NOT EXISTS windows_time ON windows (start_ts, end_ts);
+CREATE TABLE IF NOT EXISTS endpoints (
+    window_id INTEGER NOT NULL REFERENCES windows, mac INTEGER, ip INTEGER, node_id TEXT);
+CREATE INDEX IF NOT EXISTS endpoints_mac ON endpoints (mac);
+CREATE INDEX IF NOT EXISTS endpoints_ip ON endpoints (ip);
+CREATE TABLE IF NOT EXISTS nodes (
+    window_id INTEGER NOT NULL REFERENCES windows, node_id TEXT, node_name TEXT, node_type TEXT);
+CREATE INDEX IF NOT EXISTS nodes_node_id ON nodes (node_id);
+CREATE TABLE IF NOT EXISTS edges (
+    edge_id INTEGER PRIMARY KEY, window_id INTEGER NOT NULL REFERENCES windows,
+    mac_a INTEGER, mac_b INTEGER, edge_type TEXT);
+CREATE INDEX IF NOT EXISTS edges_mac_a ON edges (mac_a);
+CREATE INDEX IF NOT EXISTS edges_mac_b ON edges (mac_b);
+CREATE TABLE IF NOT EXISTS wireless_metrics (
+    edge_id INTEGER NOT NULL REFERENCES edges, direction TEXT, {wireless_columns});
+CREATE INDEX IF NOT EXISTS wireless_metrics_edge ON wireless_metrics (edge_id);
+CREATE TABLE IF NOT EXISTS flows (
+    window_id INTEGER NOT NULL REFERENCES windows, {flow_columns});
+CREATE INDEX IF NOT EXISTS flows_tuple ON flows (src_ip, sport, dst_ip, dport);
+CREATE INDEX IF NOT EXISTS flows_dst ON flows (dst_ip, dport);
+CREATE INDEX IF NOT EXISTS flows_window ON flows (window_id);
+""".format(wireless_columns=', '.join('{0} REAL'.format(column) for column in WIRELESS_COLUMNS),
+           flow_columns=', '.join('{0} {1}'.format(column, 'REAL' if type_code == 'd' else 'INTEGER')
+                                  for column, type_code in flowtable.COLUMN_TYPES.items()
+                                  if column != 'flags'))
+
+
+def _ip_value(address):
+    return keys.ip_key(address) if address is not None else None
+
+def _enum_name(value):
+    return getattr(value, 'name', value)
+
+def _stats_values(stats):
+    return tuple(getattr(stats, field, None) if stats is not None else None for field in STATS_FIELDS)
+
+def _wireless_row(edge_id, direction, edge_metrics):
+    row = (edge_id, direction) + tuple(getattr(edge_metrics, field, None) for field in WIRELESS_FIELDS)
+    for name in WIRELESS_STATS:
+        row += _stats_values(getattr(edge_metrics, name, None))
+    return row
+
+def _flow_row(window_id, key, tcp_flow):
+    """Row of the flows table for a TCPFlow, laid out like a flow table row.
+    """
+    values = {'src_ip': key[0], 'sport': key[1], 'dst_ip': key[2], 'dport': key[3]}
+    group_metrics = zip(flowtable.METRIC_GROUPS, (tcp_flow.flow_metrics, tcp_flow.flow_metrics_src_to_dst,
+                                                  tcp_flow.flow_metrics_dst_to_src))
+    for group, tcp_metrics in group_metrics:
+        if tcp_metrics is None:
+            continue
+        for column, field in flowtable.TIMESTAMP_COLUMNS:
+            if values.get(column, None) is None:
+                values[column] = getattr(tcp_metrics, field, None)
+        rtt_stats = getattr(tcp_metrics, 'rtt_stats', None)
+        for column, field in flowtable.group_columns(group):
+            if field in flowtable.RTT_FIELDS:
+                values[column] = getattr(rtt_stats, field, None) if rtt_stats is not None else None
+            else:
+                values[column] = getattr(tcp_metrics, field, None)
+    return (window_id,) + tuple(values.get(column, None) for column in FLOW_COLUMNS)
+
+def _time_filter(start_ts, end_ts, table='windows'):
+    """WHERE terms and parameters selecting windows overlapping [start_ts, end_ts).
+    """
+    terms, params = [], []
+    if end_ts is not None:
+        terms.append('{0}.start_ts < ?'.format(table))
+        params.append(end_ts)
+    if start_ts is not None:
+        terms.append('{0}.end_ts > ?'.format(table))
+        params.append(start_ts)
+    return terms, params
+
+
+class SummaryStore(object):
+    """Network summaries in the SQLite database at path (':memory:' for a
+    private in-memory one). Query results are sqlite3.Row objects.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise ValueError("Store schema version {0} is newer than the supported version {1}".format(
+                version, SCHEMA_VERSION))
+        # One fsync per checkpoint rather than per window; a crash loses at most
+        # the last windows, never the consistency of the database
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.execute('PRAGMA user_version = {0}'.format(SCHEMA_VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def add_summary(self, network_summary):
+        """Write a window and everything in it in one transaction; return its window_id.
+        """
+        with self.connection as connection:
+            cursor = connection.execute('INSERT INTO windows (start_ts, end_ts) VALUES (?, ?)',
+                                        (network_summary.start_ts, network_summary.end_ts))
+            window_id = cursor.lastrowid
+            connection.executemany('INSERT INTO endpoints VALUES (?, ?, ?, ?)',
+                                   self._endpoint_rows(window_id, network_summary))
+            connection.executemany('INSERT INTO nodes VALUES (?, ?, ?, ?)',
+                                   ((window_id, str(node_id), getattr(node, 'node_name', None),
+                                     _enum_name(getattr(node, 'node_type', None)))
+                                    for node_id, node in network_summary.nodes.items()))
+            self._add_edges(connection, window_id, network_summary)
+            connection.executemany('INSERT INTO flows VALUES ({0})'.format(
+                ', '.join('?' * (len(FLOW_COLUMNS) + 1))), self._flow_rows(window_id, network_summary))
+        return window_id
+
+    @staticmethod
+    def _endpoint_rows(window_id, network_summary):
+        seen = set()
+        for endpoint in list(network_summary.mac_to_endpoints.values()) + \
+                        list(network_summary.ip_to_endpoints.values()):
+            if id(endpoint) in seen:
+                continue
+            seen.add(id(endpoint))
+            mac = phymodel.mac_value(getattr(endpoint, 'phy_address', None))
+            node_id = getattr(endpoint, 'node_id', None)
+            node_id = str(node_id) if node_id is not None else None
+            ips = [ip for ip in getattr(endpoint, 'ip_infos', {}) if ip is not None]
+            for ip in ips if ips else [None]:
+                yield (window_id, mac, ip, node_id)
+
+    @staticmethod
+    def _add_edges(connection, window_id, network_summary):
+        metric_rows = []
+        for key, edge in network_summary.edges.items():
+            cursor = connection.execute('INSERT INTO edges (window_id, mac_a, mac_b, edge_type) '
+                                        'VALUES (?, ?, ?, ?)',
+                                        (window_id, phymodel.mac_value(edge.endpoint_a), phymodel.mac_value(edge.endpoint_b),
+                                         _enum_name(edge.edge_type)))
+            for direction, name in EDGE_DIRECTIONS:
+                edge_metrics = getattr(edge, name, None)
+                if edge_metrics is not None:
+                    metric_rows.append(_wireless_row(cursor.lastrowid, direction, edge_metrics))
+        connection.executemany('INSERT INTO wireless_metrics VALUES ({0})'.format(
+            ', '.join('?' * (len(WIRELESS_COLUMNS) + 2))), metric_rows)
+
+    @staticmethod
+    def _flow_rows(window_id, network_summary):
+        flow_table = getattr(network_summary, 'flow_table', None)
+        if flow_table is None:
+            return (_flow_row(window_id, key, tcp_flow) for key, tcp_flow in network_summary.ip_flows.items())
+        # Straight from the columns; NaN, an unset metric, is stored as NULL
+        columns = [flow_table.columns[column] for column in FLOW_COLUMNS]
+        return ((window_id,) + row for row in zip(*columns))
+
+    def _query(self, table, terms, params, start_ts, end_ts, order):
+        time_terms, time_params = _time_filter(start_ts, end_ts)
+        where = ' AND '.join(terms + time_terms)
+        sql = 'SELECT windows.start_ts AS window_start, windows.end_ts AS window_end, {0}.* FROM {0} ' \
+              'JOIN windows USING (window_id){1} ORDER BY {2}'.format(table, ' WHERE ' + where if where else '',
+                                                                    order)
+        return self.connection.execute(sql, params + time_params).fetchall()
+
+    def windows(self, start_ts=None, end_ts=None):
+        """Windows overlapping [start_ts, end_ts), in time order.
+        """
+        terms, params = _time_filter(start_ts, end_ts)
+        sql = 'SELECT * FROM windows{0} ORDER BY start_ts, window_id'.format(
+            ' WHERE ' + ' AND '.join(terms) if terms else '')
+        return self.connection.execute(sql, params).fetchall()
+
+    def endpoints(self, mac=None, ip=None, start_ts=None, end_ts=None):
+        """Endpoint rows with the given MAC and/or IPv4 address.
+        """
+        terms, params = [], []
+        if mac is not None:
+            terms.append('endpoints.mac = ?')
+            params.append(phymodel.mac_value(mac))
+        if ip is not None:
+            terms.append('endpoints.ip = ?')
+            params.append(_ip_value(ip))
+        return self._query('endpoints', terms, params, start_ts, end_ts, 'windows.start_ts')
+
+    def edges(self, mac, start_ts=None, end_ts=None):
+        """Edges from or to a MAC, with their wireless metrics (one row per
+        direction; edges without metrics are left out).
+        """
+        mac = phymodel.mac_value(mac)
+        time_terms, time_params = _time_filter(start_ts, end_ts)
+        columns = ', '.join('wireless_metrics.{0}'.format(column) for column in ('direction',) + WIRELESS_COLUMNS)
+        rows = []
+        # One query per indexed column rather than an OR, so both indexes are used
+        for column in ('mac_a', 'mac_b'):
+            where = ' AND '.join(['edges.{0} = ?'.format(column)] + time_terms)
+            if column == 'mac_b':
+                where += ' AND edges.mac_a IS NOT ?'
+            sql = 'SELECT windows.start_ts AS window_start, windows.end_ts AS window_end, edges.*, {0} ' \
+                  'FROM edges JOIN windows USING (window_id) ' \
+                  'JOIN wireless_metrics USING (edge_id) WHERE {1}'.format(columns, where)
+            params = [mac] + time_params + ([mac] if column == 'mac_b' else [])
+            rows.extend(self.connection.execute(sql, params).fetchall())
+        rows.sort(key=lambda row: (row['window_start'], row['edge_id']))
+        return rows
+
+    def flows(self, ip=None, peer_ip=None, flow_key=None, start_ts=None, end_ts=None):
+        """Flows of an IPv4 address (optionally only those with peer_ip), or
+        of a (src_ip, sport, dst_ip, dport) flow key.
+        """
+        if flow_key is not None:
+            src_ip, sport, dst_ip, dport = flow_key
+            return self._query('flows', ['src_ip = ?', 'sport = ?', 'dst_ip = ?', 'dport = ?'],
+                               [_ip_value(src_ip), sport, _ip_value(dst_ip), dport], start_ts, end_ts,
+                               'windows.start_ts')
+        if ip is None:
+            return self._query('flows', [], [], start_ts, end_ts, 'windows.start_ts')
+        ip = _ip_value(ip)
+        rows = []
+        for column, peer_column in (('src_ip', 'dst_ip'), ('dst_ip', 'src_ip')):
+            terms, params = ['{0} = ?'.format(column)], [ip]
+            if peer_ip is not None:
+                terms.append('{0} = ?'.format(peer_column))
+                params.append(_ip_value(peer_ip))
+            if column == 'dst_ip':
+                # Flows from ip to itself were returned as src_ip already
+                terms.append('src_ip != ?')
+                params.append(ip)
+            rows.extend(self._query('flows', terms, params, start_ts, end_ts, 'windows.start_ts'))
+        rows.sort(key=lambda row: row['window_start'])
+        return rows
+
+    def windows_with(self, ip=None, peer_ip=None, mac=None, start_ts=None, end_ts=None):
+        """Windows in which ip (with peer_ip, when given) had a flow or mac an
+        endpoint, in time order.
+        """
+        selects, params = [], []
+        if ip is not None:
+            for column, peer_column in (('src_ip', 'dst_ip'), ('dst_ip', 'src_ip')):
+                select = 'SELECT window_id FROM flows WHERE {0} = ?'.format(column)
+                params.append(_ip_value(ip))
+                if peer_ip is not None:
+                    select += ' AND {0} = ?'.format(peer_column)
+                    params.append(_ip_value(peer_ip))
+                selects.append(select)
+        if mac is not None:
+            selects.append('SELECT window_id FROM endpoints WHERE mac = ?')
+            params.append(phymodel.mac_value(mac))
+        if not selects:
+            return self.windows(start_ts, end_ts)
+        time_terms, time_params = _time_filter(start_ts, end_ts)
+        sql = 'SELECT * FROM windows WHERE {0} ORDER BY start_ts, window_id'.format(
+            ' AND '.join(['window_id IN ({0})'.format(' UNION '.join(selects))] + time_terms))
+        return self.connection.execute(sql, params + time_params).fetchall()
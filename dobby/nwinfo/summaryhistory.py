@@ -0,0 +1,207 @@
+"""Bounded, time indexed history of parsed network summaries.
+"""
+import bisect
+import collections
+import itertools
+import sys
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+# Rough per entry sizes of the summary dicts, measured with tracemalloc on
+# parsed captures (the model objects and their metrics included)
+ENDPOINT_BYTES = 700
+EDGE_BYTES = 900
+NODE_BYTES = 500
+FLOW_BYTES = 1200
+
+NO_TIMESTAMP = float('-inf')
+
+
+def estimate_summary_size(network_summary):
+    """Approximate memory held by a network summary, in bytes.
+    """
+    size = sys.getsizeof(network_summary)
+    for entries in (network_summary.mac_to_endpoints, network_summary.ip_to_endpoints,
+                    network_summary.nodes, network_summary.edges, network_summary.phy_models,
+                    network_summary.apps):
+        size += sys.getsizeof(entries)
+    size += ENDPOINT_BYTES * len(network_summary.mac_to_endpoints)
+    size += ENDPOINT_BYTES * len(network_summary.ip_to_endpoints)
+    size += NODE_BYTES * len(network_summary.nodes)
+    size += EDGE_BYTES * len(network_summary.edges)
+    flow_table = getattr(network_summary, 'flow_table', None)
+    if flow_table is not None:
+        size += flow_table.nbytes
+    else:
+        size += sys.getsizeof(network_summary.ip_flows) + FLOW_BYTES * len(network_summary.ip_flows)
+    return size
+
+def _timestamp(value):
+    return NO_TIMESTAMP if value is None else value
+
+def window_key(network_summary):
+    """(start_ts, end_ts) of a summary, for sorting; missing times sort first.
+    """
+    return _timestamp(network_summary.start_ts), _timestamp(network_summary.end_ts)
+
+
+class SummaryHistory(object):
+    """Network summaries ordered by start_ts, bounded by count, age and size.
+
+    Windows may arrive out of order and may overlap; they are kept sorted by
+    (start_ts, end_ts, arrival), so history[-1] is the latest window and
+    history.pop() removes it. Summaries without a start_ts sort first.
+
+    When a bound is exceeded the oldest windows are dropped:
+    max_summaries limits the number of windows, max_age (seconds) drops
+    windows starting more than max_age before the latest start_ts and
+    max_bytes limits the total of size_estimator(summary), which is computed
+    once when a summary is added. on_evict, if given, is called with every
+    summary dropped because of a bound (not with those popped or removed).
+
+    find(timestamp) and between(start_ts, end_ts) bisect the sorted start
+    times; only windows starting within the longest window length of the
+    query are looked at.
+    """
+    def __init__(self, max_summaries=None, max_age=None, max_bytes=None,
+                 size_estimator=estimate_summary_size, on_evict=None):
+        self.max_summaries = max_summaries
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.size_estimator = size_estimator
+        self.on_evict = on_evict
+        self._keys = []
+        self._summaries = []
+        self._sizes = []
+        self._arrivals = itertools.count()
+        # Window lengths currently stored and how often, to bound interval lookups
+        self._lengths = collections.Counter()
+        self._max_length = 0
+        self.nbytes = 0
+
+    @property
+    def maxlen(self):
+        return self.max_summaries
+
+    def __len__(self):
+        return len(self._summaries)
+
+    def __iter__(self):
+        return iter(self._summaries)
+
+    def __reversed__(self):
+        return reversed(self._summaries)
+
+    def __getitem__(self, index):
+        return self._summaries[index]
+
+    def __repr__(self):
+        return "SummaryHistory({0} summaries, {1} bytes)".format(len(self), self.nbytes)
+
+    @staticmethod
+    def _length(network_summary):
+        if network_summary.start_ts is None or network_summary.end_ts is None:
+            return 0
+        return max(network_summary.end_ts - network_summary.start_ts, 0)
+
+    def append(self, network_summary):
+        """Add a summary, then drop the oldest ones that exceed a bound.
+        """
+        key = window_key(network_summary) + (next(self._arrivals),)
+        index = bisect.bisect(self._keys, key)
+        size = self.size_estimator(network_summary)
+        self._keys.insert(index, key)
+        self._summaries.insert(index, network_summary)
+        self._sizes.insert(index, size)
+        self.nbytes += size
+        length = self._length(network_summary)
+        self._lengths[length] += 1
+        self._max_length = max(self._max_length, length)
+        self._evict()
+
+    add = append
+
+    def _remove(self, index):
+        network_summary = self._summaries.pop(index)
+        del self._keys[index]
+        self.nbytes -= self._sizes.pop(index)
+        length = self._length(network_summary)
+        self._lengths[length] -= 1
+        if not self._lengths[length]:
+            del self._lengths[length]
+            if length == self._max_length:
+                self._max_length = max(self._lengths) if self._lengths else 0
+        return network_summary
+
+    def _drop_oldest(self):
+        network_summary = self._remove(0)
+        if self.on_evict is not None:
+            self.on_evict(network_summary)
+
+    def _evict(self):
+        if self.max_summaries is not None:
+            while len(self._summaries) > self.max_summaries:
+                self._drop_oldest()
+        if self.max_age is not None and self._summaries:
+            oldest_start = self._keys[-1][0] - self.max_age
+            while self._keys[0][0] < oldest_start:
+                self._drop_oldest()
+        if self.max_bytes is not None:
+            # The latest window is kept even if it alone is over the limit
+            while len(self._summaries) > 1 and self.nbytes > self.max_bytes:
+                self._drop_oldest()
+
+    def pop(self):
+        """Remove and return the latest window.
+        """
+        if not self._summaries:
+            raise IndexError("pop from an empty SummaryHistory")
+        return self._remove(len(self._summaries) - 1)
+
+    def popleft(self):
+        """Remove and return the oldest window.
+        """
+        if not self._summaries:
+            raise IndexError("pop from an empty SummaryHistory")
+        return self._remove(0)
+
+    def remove(self, network_summary):
+        for index, summary in enumerate(self._summaries):
+            if summary is network_summary:
+                self._remove(index)
+                return
+        raise ValueError("summary is not in the history")
+
+    def clear(self):
+        self.__init__(max_summaries=self.max_summaries, max_age=self.max_age,
+                      max_bytes=self.max_bytes, size_estimator=self.size_estimator,
+                      on_evict=self.on_evict)
+
+    def _candidates(self, start_ts, end_ts):
+        """Indexes of windows that may overlap [start_ts, end_ts], latest first.
+        """
+        first = bisect.bisect_left(self._keys, (start_ts - self._max_length,))
+        last = bisect.bisect_right(self._keys, (end_ts, float('inf')))
+        return range(last - 1, first - 1, -1)
+
+    def find(self, timestamp):
+        """The latest window with start_ts <= timestamp < end_ts, or None.
+        """
+        for index in self._candidates(timestamp, timestamp):
+            network_summary = self._summaries[index]
+            if network_summary.end_ts is not None and \
+               network_summary.start_ts <= timestamp < network_summary.end_ts:
+                return network_summary
+        return None
+
+    def between(self, start_ts, end_ts):
+        """Windows overlapping [start_ts, end_ts), in start_ts order.
+        """
+        summaries = []
+        for index in self._candidates(start_ts, end_ts):
+            network_summary = self._summaries[index]
+            if network_summary.end_ts is not None and network_summary.start_ts < end_ts and \
+               network_summary.end_ts > start_ts:
+                summaries.append(network_summary)
+        summaries.reverse()
+        return summaries
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+import dobby.nwinfo.archive as archive
+import dobby.nwinfo.networksummary as networksummary
+import dobby.nwmodel.endpoint as endpoint
+import dobby.nwmodel.ipinfo as ipinfo
+import dobby.utils.keys as keys
+
+__author__ = """\\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+
+def window(start_ts, end_ts):
+    ip_endpoint = endpoint.EndPoint(ip_info=ipinfo.IPInfo(ipv4address='192.168.1.120'))
+    return networksummary.NetworkSummary(start_ts=start_ts, end_ts=end_ts,
+                                         ip_to_endpoints={keys.ip_key('192.168.1.120'): ip_endpoint})
+
+
+class TestWindowArchive(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.archive_dir = os.path.join(self.temp_dir.name, 'archive')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_find_and_between(self):
+        with archive.WindowArchive(self.archive_dir) as window_archive:
+            self.assertIsNone(window_archive.find(0))
+            for start_ts in [600, 0, 300, 900]:
+                window_archive.append(window(start_ts, start_ts + 300))
+            self.assertEqual(len(window_archive), 4)
+            self.assertEqual([start_ts for start_ts, end_ts in window_archive.entries()], [0, 300, 600, 900])
+            found = window_archive.find(450)
+            self.assertEqual((found.start_ts, found.end_ts), (300, 600))
+            self.assertTrue(found.frozen)
+            self.assertEqual(len(found.ip_to_endpoints), 1)
+            self.assertIsNone(window_archive.find(1200))
+            self.assertEqual([ns.start_ts for ns in window_archive.between(250, 650)], [0, 300, 600])
+            self.assertEqual([ns.start_ts for ns in window_archive.between(5000, 6000)], [])
+
+    def test_long_windows_are_found(self):
+        with archive.WindowArchive(self.archive_dir) as window_archive:
+            window_archive.append(window(0, 3600))
+            window_archive.append(window(300, 600))
+            self.assertEqual(window_archive.find(1000).start_ts, 0)
+            self.assertEqual(window_archive.find(400).start_ts, 300)
+
+    def test_archive_is_reopened(self):
+        with archive.WindowArchive(self.archive_dir) as window_archive:
+            window_archive.append(window(0, 3600))
+        with archive.WindowArchive(self.archive_dir) as window_archive:
+            window_archive.append(window(3600, 3900))
+            self.assertEqual(window_archive.max_length, 3600)
+            self.assertEqual(window_archive.find(1000).start_ts, 0)
+            self.assertEqual(window_archive.find(3700).start_ts, 3600)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestWindowArchive)
+    unittest.TextTestRunner(verbosity=2).run(suite)
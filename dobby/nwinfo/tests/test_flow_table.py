@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import dobby.nwinfo.flowtable as flowtable
+import dobby.nwinfo.networksummary as networksummary
+import dobby.nwmetrics.metrics as metrics
+import dobby.nwmodel.endpoint as endpoint
+import dobby.nwmodel.flow as flow
+import dobby.nwmodel.ipinfo as ipinfo
+import dobby.utils.keys as keys
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+
+class TestFlowTable(unittest.TestCase):
+    def setUp(self):
+        self.src_ip = keys.ip_key('192.168.1.120')
+        self.dst_ip = keys.ip_key('54.148.159.16')
+        self.flow_key = (self.src_ip, 34018, self.dst_ip, 443)
+        self.src_endpoint = endpoint.EndPoint(ip_info=ipinfo.IPInfo(ipv4address='192.168.1.120'))
+        self.dst_endpoint = endpoint.EndPoint(ip_info=ipinfo.IPInfo(ipv4address='54.148.159.16'))
+        self.rtt_stats = metrics.Stats(min_val=0.000667, max_val=0.2)
+        self.flow_table = flowtable.FlowTable()
+        self.ns = networksummary.NetworkSummary(flow_table=self.flow_table)
+        self.flow_table.update_flow(self.src_ip, 34018.0, self.dst_ip, 443.0,
+                                    src_endpoint=self.src_endpoint, dst_endpoint=self.dst_endpoint,
+                                    flow_metrics=dict(start_ts=1486757401.3, end_ts=1486757401.7,
+                                                      duration=0.4, rtt_stats=self.rtt_stats),
+                                    flow_metrics_src_to_dst=dict(start_ts=1486757401.3,
+                                                                 end_ts=1486757401.7, mtu=323.0,
+                                                                 total_acks=15.0, total_pkts=12.0,
+                                                                 total_bytes=674.0, rtt_stats=None))
+        self.flow_table.update_flow(self.src_ip, 34020.0, self.dst_ip, 443.0,
+                                    src_endpoint=self.src_endpoint, dst_endpoint=self.dst_endpoint,
+                                    flow_metrics_src_to_dst=dict(total_bytes=1000.0))
+
+    def tearDown(self):
+        self.flow_table = None
+
+    def test_update_flow_tells_new_flows(self):
+        self.assertFalse(self.flow_table.update_flow(self.src_ip, 34020, self.dst_ip, 443,
+                                                     flow_metrics=dict(total_loss=1.0)))
+        self.assertTrue(self.flow_table.update_flow(self.src_ip, 34022, self.dst_ip, 443))
+        self.assertEqual(len(self.flow_table), 3)
+
+    def test_flows_are_views_of_the_columns(self):
+        self.assertEqual(len(self.ns.ip_flows), 2)
+        self.assertEqual(sorted(keys.format_flow_key(key) for key in self.ns.ip_flows.keys()),
+                         ['192.168.1.120-34018-54.148.159.16-443', '192.168.1.120-34020-54.148.159.16-443'])
+        tcp_flow = self.ns.ip_flows[self.flow_key]
+        self.assertIsInstance(tcp_flow, flow.TCPFlow)
+        self.assertIs(tcp_flow.src_endpoint, self.src_endpoint)
+        self.assertEqual(tcp_flow.sport, 34018.0)
+        self.assertEqual(tcp_flow.flow_metrics,
+                         metrics.TCPMetrics(start_ts=1486757401.3, end_ts=1486757401.7,
+                                            duration=0.4, rtt_stats=self.rtt_stats))
+        self.assertEqual(tcp_flow.flow_metrics_src_to_dst.__dict__,
+                         metrics.TCPMetrics(start_ts=1486757401.3, end_ts=1486757401.7, mtu=323.0,
+                                            total_acks=15.0, total_pkts=12.0,
+                                            total_bytes=674.0).__dict__)
+        # Groups that were never given timestamps keep them unset
+        self.assertEqual(tcp_flow.flow_metrics_dst_to_src, metrics.TCPMetrics())
+        self.assertIsNone(self.ns.ip_flows.get(keys.parse_flow_key('10.0.0.1-1-10.0.0.2-2'), None))
+        self.assertNotIn('192.168.1.120-34018-54.148.159.16-443', self.ns.ip_flows)
+
+    def test_updating_a_view_updates_the_table(self):
+        tcp_flow = self.ns.ip_flows[self.flow_key]
+        tcp_flow.update_flow_metrics(total_loss=3.0)
+        self.assertEqual(self.ns.ip_flows[self.flow_key].flow_metrics.total_loss, 3.0)
+        self.assertRaises(ValueError, tcp_flow.update_flow_metrics, total_pkts=1.0)
+
+    def test_aggregates_ignore_missing_values(self):
+        self.assertAlmostEqual(self.flow_table.sum('src_to_dst_bytes'), 1674.0)
+        self.assertAlmostEqual(self.flow_table.mean('src_to_dst_bytes'), 837.0)
+        self.assertEqual(self.flow_table.max('src_to_dst_bytes'), 1000.0)
+        self.assertEqual(self.flow_table.min('sport'), 34018)
+        self.assertIsNone(self.flow_table.mean('dst_to_src_bytes'))
+        self.assertEqual(self.flow_table.group_sum('src_ip', 'src_to_dst_bytes'), {self.src_ip: 1674.0})
+        self.assertEqual(list(self.flow_table.column('dport')), [443, 443])
+
+    @unittest.skipIf(flowtable.numpy is None, "numpy is not installed")
+    def test_columns_are_numpy_arrays(self):
+        self.assertEqual(str(self.flow_table.column('src_ip').dtype), 'uint32')
+        # The table can still grow after a vectorized query
+        self.flow_table.sum('src_to_dst_bytes')
+        self.flow_table.add_row(self.src_ip, 1, self.dst_ip, 2)
+        self.assertEqual(len(self.flow_table), 3)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestFlowTable)
+    unittest.TextTestRunner(verbosity=2).run(suite)
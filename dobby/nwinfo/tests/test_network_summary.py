@@ -50,9 +50,9 @@ class TestNetworkSummary(unittest.TestCase):
     def test_network_summary_is_correctly_instantiated(self):
         self.assertEqual(self.ns.start_ts, 1)
         self.assertEqual(self.ns.end_ts, 2)
-        self.assertDictEqual(self.ns.mac_to_endpoints,
+        self.assertDictEqual(dict(self.ns.mac_to_endpoints),
                              {'aa:bb:cc:dd:ee:ff':self.endpoint, '11:22:33:44:55:66':self.endpoint2})
-        self.assertDictEqual(self.ns.ip_to_endpoints, {'192.168.1.1':self.endpoint})
+        self.assertDictEqual(dict(self.ns.ip_to_endpoints), {'192.168.1.1':self.endpoint})
         self.assertListEqual(list(self.ns.nodes.values()), [self.node])
         self.assertListEqual(list(self.ns.edges.values()), [self.edge])
         self.assertListEqual(list(self.ns.ip_flows.values()), [self.flow])
@@ -63,13 +63,70 @@ class TestNetworkSummary(unittest.TestCase):
         self.ns = networksummary.NetworkSummary()
         self.assertIsNone(self.ns.start_ts)
         self.assertIsNone(self.ns.end_ts)
-        self.assertDictEqual(self.ns.mac_to_endpoints, {})
-        self.assertDictEqual(self.ns.ip_to_endpoints, {})
-        self.assertDictEqual(self.ns.nodes, {})
-        self.assertDictEqual(self.ns.edges, {})
-        self.assertDictEqual(self.ns.ip_flows, {})
-        self.assertDictEqual(self.ns.apps, {})
-        self.assertDictEqual(self.ns.phy_models, {})
+        self.assertDictEqual(dict(self.ns.mac_to_endpoints), {})
+        self.assertDictEqual(dict(self.ns.ip_to_endpoints), {})
+        self.assertDictEqual(dict(self.ns.nodes), {})
+        self.assertDictEqual(dict(self.ns.edges), {})
+        self.assertDictEqual(dict(self.ns.ip_flows), {})
+        self.assertDictEqual(dict(self.ns.apps), {})
+        self.assertDictEqual(dict(self.ns.phy_models), {})
+
+    def test_derived_summary_shares_and_isolates(self):
+        self.ns.freeze()
+        self.assertRaises(TypeError, self.ns.edges.__setitem__, 'x', self.edge)
+        derived = self.ns.derive()
+        self.assertIs(derived.edges['b'], self.edge)
+        derived.edges['x'] = self.edge
+        del derived.nodes['a']
+        owned_model = derived.phy_models.owned('e')
+        owned_model.add_clients(clients=[self.mac2])
+        self.assertEqual(sorted(derived.edges), ['b', 'x'])
+        self.assertEqual(list(self.ns.edges), ['b'])
+        self.assertEqual(len(derived.nodes), 0)
+        self.assertIn('a', self.ns.nodes)
+        self.assertIsNot(owned_model, self.phy_model)
+        self.assertNotIn(self.mac2, self.phy_model.clients)
+        self.assertIs(derived.writable(), derived)
+
+    def test_adjacency_is_built_from_edges(self):
+        self.assertEqual(self.ns.neighbors(self.mac), set([self.mac2.value]))
+        self.assertEqual(self.ns.neighbors('11:22:33:44:55:66'), set([self.mac.value]))
+        self.assertEqual(self.ns.degree(self.mac.value), 1)
+        self.assertEqual(self.ns.incident_edges(self.mac2), [('b', self.edge)])
+        self.assertEqual(self.ns.degree(phymodel.PhysicalAddress(phy_address='00:00:00:00:00:01')), 0)
+        self.assertEqual(self.ns.node_edges('a'), [('b', self.edge)])
+        self.assertEqual(self.ns.node_degree('a'), 1)
+        self.assertEqual(self.ns.node_degree('missing'), 0)
+
+    def test_node_neighbors(self):
+        mac_endpoints = {self.mac.value: self.endpoint, self.mac2.value: self.endpoint2}
+        self.endpoint.node_id = 'a'
+        self.endpoint2.node_id = 'f'
+        network_summary = networksummary.NetworkSummary(mac_to_endpoints=mac_endpoints,
+                                                        nodes={'a': self.node},
+                                                        edges={'b': self.edge})
+        self.assertEqual(network_summary.node_neighbors('a'), set(['f']))
+
+    def test_adjacency_follows_added_and_removed_edges(self):
+        mac3 = phymodel.PhysicalAddress(phy_address='00:00:00:00:00:03')
+        edge3 = edge.Edge(endpoint_a=self.mac, endpoint_b=mac3, edge_type=edge.EdgeType.PHYSICAL)
+        self.ns.add_edge('g', edge3)
+        self.assertEqual(self.ns.neighbors(self.mac), set([self.mac2.value, mac3.value]))
+        self.assertEqual(self.ns.degree(self.mac), 2)
+        self.ns.remove_edge('b')
+        self.assertEqual(self.ns.neighbors(self.mac), set([mac3.value]))
+        self.assertEqual(self.ns.degree(self.mac2), 0)
+        self.assertNotIn(self.mac2.value, self.ns.adjacency)
+
+    def test_derived_adjacency_is_isolated(self):
+        self.ns.freeze()
+        derived = self.ns.derive()
+        mac3 = phymodel.PhysicalAddress(phy_address='00:00:00:00:00:03')
+        derived.add_edge('g', edge.Edge(endpoint_a=self.mac, endpoint_b=mac3, edge_type=edge.EdgeType.PHYSICAL))
+        derived.remove_edge('b')
+        self.assertEqual(derived.neighbors(self.mac), set([mac3.value]))
+        self.assertEqual(self.ns.neighbors(self.mac), set([self.mac2.value]))
+        self.assertEqual(self.ns.degree(self.mac2), 1)
 
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromTestCase(TestNetworkSummary)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import dobby.nwinfo.networksummary as networksummary
+import dobby.nwinfo.rollup as rollup
+import dobby.nwmetrics.metrics as metrics
+import dobby.nwmodel.edge as edge
+import dobby.nwmodel.endpoint as endpoint
+import dobby.nwmodel.flow as flow
+import dobby.nwmodel.ipinfo as ipinfo
+import dobby.nwmodel.phymodel as phymodel
+import dobby.utils.keys as keys
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+
+class TestRollup(unittest.TestCase):
+    def setUp(self):
+        self.ap = phymodel.PhysicalAddress('00:11:22:33:44:55')
+        self.client = phymodel.PhysicalAddress('66:77:88:99:aa:bb')
+        self.src_ip = keys.ip_key('192.168.1.120')
+        self.dst_ip = keys.ip_key('54.148.159.16')
+        self.flow_key = keys.flow_key(self.src_ip, 34018, self.dst_ip, 443)
+
+    def window(self, start_ts, total_loss, data_pkts, client=None):
+        client = client if client else self.client
+        ns = networksummary.NetworkSummary(start_ts=start_ts, end_ts=start_ts + 300)
+        ns.mac_to_endpoints[self.ap.value] = endpoint.EndPoint(phy_address=self.ap)
+        ns.mac_to_endpoints[client.value] = endpoint.EndPoint(phy_address=client)
+        ns.phy_models[(self.ap.value, 6)] = phymodel.WifiPhysicalModel(mac=self.ap, channel=6,
+                                                                        clients=[client])
+        ns.edges[(self.ap.value, client.value)] = edge.Edge(
+            endpoint_a=self.ap, endpoint_b=client,
+            edge_metrics_ab=metrics.WirelessMetrics(start_ts=start_ts, total_data_pkts=data_pkts,
+                                                    avg_data_pkt_duration_usec=float(data_pkts)))
+        src_endpoint = endpoint.EndPoint(ip_info=ipinfo.IPInfo(ipv4address='192.168.1.120'))
+        ns.ip_to_endpoints[self.src_ip] = src_endpoint
+        tcp_flow = flow.TCPFlow(src_endpoint=src_endpoint, sport=34018, dport=443)
+        tcp_flow.update_flow_metrics(total_loss=total_loss, duration=1.0)
+        ns.ip_flows[self.flow_key] = tcp_flow
+        return ns.freeze()
+
+    def test_windows_are_merged_into_their_periods(self):
+        rollups = rollup.RollupManager()
+        other_client = phymodel.PhysicalAddress('66:77:88:99:aa:cc')
+        windows = [self.window(7200, 1.0, 10), self.window(7500, 2.0, 30, client=other_client),
+                   self.window(3600, 4.0, 10)]
+        for ns in windows:
+            rollups.add_summary(ns)
+        hourly = rollups.between(rollup.HOUR, 0, rollup.DAY)
+        self.assertEqual([(ns.start_ts, ns.end_ts) for ns in hourly], [(3600, 7200), (7200, 10800)])
+        hour = rollups.find(rollup.HOUR, 7300)
+        self.assertEqual(hour.ip_flows[self.flow_key].flow_metrics.total_loss, 3.0)
+        self.assertEqual(hour.ip_flows[self.flow_key].flow_metrics.duration, 2.0)
+        self.assertEqual(len(hour.mac_to_endpoints), 3)
+        self.assertEqual(hour.phy_models[(self.ap.value, 6)].clients, set([self.client, other_client]))
+        self.assertEqual(len(hour.edges), 2)
+        day = rollups.find(rollup.DAY, 100)
+        self.assertEqual(day.ip_flows[self.flow_key].flow_metrics.total_loss, 7.0)
+        edge_metrics = day.edges[(self.ap.value, self.client.value)].edge_metrics_ab
+        self.assertEqual(edge_metrics.total_data_pkts, 20)
+        self.assertEqual(edge_metrics.start_ts, 3600)
+        # The windows themselves are not modified
+        self.assertEqual(windows[0].ip_flows[self.flow_key].flow_metrics.total_loss, 1.0)
+        self.assertEqual(windows[0].phy_models[(self.ap.value, 6)].clients, set([self.client]))
+        self.assertIsNone(rollups.find(rollup.HOUR, 0))
+
+    def test_days_are_derived_from_hours(self):
+        rollups = rollup.RollupManager()
+        self.assertEqual(rollups.sources, {rollup.HOUR: None, rollup.DAY: rollup.HOUR})
+        rollups.add_summary(self.window(3600, 1.0, 10))
+        rollups.add_summary(self.window(3900, 2.0, 10))
+        # The hour is still open, the day is not merged yet
+        self.assertEqual(len(rollups.rollups[rollup.DAY]), 0)
+        rollups.add_summary(self.window(7200, 4.0, 10))
+        day = rollups.rollups[rollup.DAY].find(0)
+        self.assertEqual(day.ip_flows[self.flow_key].flow_metrics.total_loss, 3.0)
+        # A late window of a merged hour goes to the day directly
+        rollups.add_summary(self.window(4200, 8.0, 10))
+        self.assertEqual(rollups.find(rollup.HOUR, 3600).ip_flows[self.flow_key].flow_metrics.total_loss, 11.0)
+        self.assertEqual(day.ip_flows[self.flow_key].flow_metrics.total_loss, 11.0)
+        # Reading the days merges the open hour
+        self.assertIs(rollups.find(rollup.DAY, 100), day)
+        self.assertEqual(day.ip_flows[self.flow_key].flow_metrics.total_loss, 15.0)
+        rollups.add_summary(self.window(7500, 16.0, 10))
+        self.assertEqual(day.ip_flows[self.flow_key].flow_metrics.total_loss, 31.0)
+        self.assertEqual(day.edges[(self.ap.value, self.client.value)].edge_metrics_ab.total_data_pkts, 50)
+        self.assertEqual(rollups.find(rollup.HOUR, 7200).ip_flows[self.flow_key].flow_metrics.total_loss, 20.0)
+
+    def test_evicted_rollups_are_not_recreated(self):
+        rollups = rollup.RollupManager(max_rollups=2)
+        for start_ts in (0, 3600, 7200):
+            rollups.add_summary(self.window(start_ts, 1.0, 10))
+        hours = list(rollups.rollups[rollup.HOUR])
+        self.assertEqual([ns.start_ts for ns in hours], [3600, 7200])
+        # A late window of the evicted hour would be all of a recreated rollup
+        rollups.add_summary(self.window(300, 2.0, 10))
+        self.assertIsNone(rollups.find(rollup.HOUR, 300))
+        self.assertEqual(list(rollups.rollups[rollup.HOUR]), hours)
+        # The day still gets every window
+        day = rollups.find(rollup.DAY, 0)
+        self.assertEqual(day.ip_flows[self.flow_key].flow_metrics.total_loss, 5.0)
+
+    def test_late_windows_of_evicted_coarse_rollups(self):
+        rollups = rollup.RollupManager(periods=(rollup.HOUR, 2 * rollup.HOUR), max_rollups=1)
+        rollups.add_summary(self.window(3600, 1.0, 10))
+        rollups.flush()
+        # The two hour rollup of the flushed hour is evicted by the next one
+        rollups.add_summary(self.window(7200, 2.0, 10))
+        rollups.flush()
+        self.assertEqual([ns.start_ts for ns in rollups.rollups[2 * rollup.HOUR]], [7200])
+        rollups.add_summary(self.window(3900, 4.0, 10))
+        rollups.add_summary(self.window(10800, 8.0, 10))
+        self.assertIsNone(rollups.rollups[2 * rollup.HOUR].find(3600))
+        self.assertEqual([ns.start_ts for ns in rollups.rollups[2 * rollup.HOUR]], [7200])
+        two_hours = rollups.find(2 * rollup.HOUR, 7200)
+        self.assertEqual(two_hours.ip_flows[self.flow_key].flow_metrics.total_loss, 10.0)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestRollup)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+import io
+import unittest
+
+import dobby.nwinfo.flowtable as flowtable
+import dobby.nwinfo.networksummary as networksummary
+import dobby.nwinfo.snapshot as snapshot
+import dobby.nwmetrics.metrics as metrics
+import dobby.nwmodel.edge as edge
+import dobby.nwmodel.endpoint as endpoint
+import dobby.nwmodel.flow as flow
+import dobby.nwmodel.ipinfo as ipinfo
+import dobby.nwmodel.node as node
+import dobby.nwmodel.phymodel as phymodel
+import dobby.utils.keys as keys
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+
+def round_trip(network_summary, sections=snapshot.ALL_SECTIONS):
+    stream = io.BytesIO()
+    snapshot.save_summary(network_summary, stream)
+    stream.seek(0)
+    return snapshot.load_summary(stream, sections=sections)
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.mac = phymodel.PhysicalAddress(phy_address='AA:BB:CC:DD:EE:FF')
+        self.mac2 = phymodel.PhysicalAddress(phy_address='11:22:33:44:55:66')
+        self.phy_model = phymodel.WifiPhysicalModel(mac=self.mac)
+        self.endpoint = endpoint.EndPoint(phy_address=self.mac, phy_model=self.phy_model,
+                                          ip_info=ipinfo.IPInfo(ipv4address='192.168.1.120'))
+        self.endpoint2 = endpoint.EndPoint(phy_address=self.mac2,
+                                           ip_info=ipinfo.IPInfo(ipv4address='54.148.159.16'))
+        self.edge = edge.Edge(endpoint_a=self.endpoint, endpoint_b=self.endpoint2,
+                              edge_type=edge.EdgeType.PHYSICAL)
+        self.edge.update_metrics_ab(metrics.WirelessMetrics(total_data_pkts=10, total_data_bytes=1500))
+        self.node = node.Node(endpoints=[self.endpoint], node_type=node.NodeType.WIRELESS_ROUTER,
+                              node_name='Node1')
+        self.src_ip = keys.ip_key('192.168.1.120')
+        self.dst_ip = keys.ip_key('54.148.159.16')
+        self.flow_key = (self.src_ip, 34018, self.dst_ip, 443)
+        self.tcp_flow = flow.TCPFlow(src_endpoint=self.endpoint, dst_endpoint=self.endpoint2,
+                                     sport=34018, dport=443)
+        self.tcp_flow.update_flow_metrics(duration=0.4, rtt_stats=metrics.Stats(min_val=0.1, max_val=0.2))
+        self.ns = networksummary.NetworkSummary(start_ts=0, end_ts=300,
+                                                mac_to_endpoints={self.mac.value: self.endpoint,
+                                                                  self.mac2.value: self.endpoint2},
+                                                ip_to_endpoints={self.src_ip: self.endpoint,
+                                                                 self.dst_ip: self.endpoint2},
+                                                nodes={'a': self.node},
+                                                edges={'b': self.edge},
+                                                ip_flows={self.flow_key: self.tcp_flow},
+                                                phy_models={self.mac.value: self.phy_model})
+
+    def tearDown(self):
+        self.ns = None
+
+    def test_round_trip(self):
+        loaded = round_trip(self.ns)
+        self.assertEqual((loaded.start_ts, loaded.end_ts), (0, 300))
+        self.assertEqual(sorted(loaded.mac_to_endpoints.keys()), sorted([self.mac.value, self.mac2.value]))
+        self.assertEqual(loaded.edges['b'].edge_metrics_ab, self.edge.edge_metrics_ab)
+        self.assertEqual(loaded.nodes['a'].node_name, 'Node1')
+        loaded_flow = loaded.ip_flows[self.flow_key]
+        self.assertEqual(loaded_flow.flow_metrics, self.tcp_flow.flow_metrics)
+        self.assertEqual(loaded_flow.sport, 34018)
+
+    def test_shared_objects_stay_shared(self):
+        loaded = round_trip(self.ns)
+        loaded_endpoint = loaded.mac_to_endpoints[self.mac.value]
+        self.assertIs(loaded.ip_to_endpoints[self.src_ip], loaded_endpoint)
+        self.assertIs(loaded.edges['b'].endpoint_a, loaded_endpoint)
+        self.assertIs(loaded.ip_flows[self.flow_key].src_endpoint, loaded_endpoint)
+        self.assertIs(loaded.nodes['a'].endpoints[0], loaded_endpoint)
+        self.assertIs(loaded_endpoint.phy_model, loaded.phy_models[self.mac.value])
+
+    def test_flow_table_round_trip(self):
+        flow_table = flowtable.FlowTable()
+        flow_table.update_flow(self.src_ip, 34018, self.dst_ip, 443,
+                               src_endpoint=self.endpoint, dst_endpoint=self.endpoint2,
+                               flow_metrics=dict(start_ts=1.0, end_ts=1.4, duration=0.4,
+                                                 rtt_stats=metrics.Stats(min_val=0.1, max_val=0.2)))
+        flow_table.add_row(self.src_ip, 34020, self.dst_ip, 443)
+        ns = networksummary.NetworkSummary(start_ts=0, end_ts=300, flow_table=flow_table,
+                                           ip_to_endpoints={self.src_ip: self.endpoint})
+        ns.freeze()
+        loaded = round_trip(ns)
+        self.assertTrue(loaded.frozen)
+        self.assertEqual(len(loaded.flow_table), 2)
+        # Compared as bytes, unset metrics are NaN
+        self.assertEqual(dict((name, values.tobytes()) for name, values in loaded.flow_table.columns.items()),
+                         dict((name, values.tobytes()) for name, values in flow_table.columns.items()))
+        loaded_flow = loaded.ip_flows[self.flow_key]
+        self.assertEqual(loaded_flow.flow_metrics, ns.ip_flows[self.flow_key].flow_metrics)
+        self.assertIs(loaded_flow.src_endpoint, loaded.ip_to_endpoints[self.src_ip])
+        self.assertIsNone(loaded.ip_flows[(self.src_ip, 34020, self.dst_ip, 443)].src_endpoint)
+
+    def test_partial_load(self):
+        loaded = round_trip(self.ns, sections=['edges'])
+        self.assertEqual(len(loaded.edges), 1)
+        self.assertEqual(len(loaded.mac_to_endpoints), 0)
+        self.assertEqual(len(loaded.ip_flows), 0)
+        with self.assertRaises(ValueError):
+            round_trip(self.ns, sections=['flows'])
+
+    def test_string_keys_and_timestamps(self):
+        ns = networksummary.NetworkSummary(mac_to_endpoints={str(self.mac): self.endpoint})
+        loaded = round_trip(ns)
+        self.assertIsNone(loaded.start_ts)
+        self.assertEqual(list(loaded.mac_to_endpoints.keys()), [str(self.mac)])
+
+    def test_newer_versions_are_rejected(self):
+        stream = io.BytesIO()
+        snapshot.save_summary(self.ns, stream)
+        data = bytearray(stream.getvalue())
+        data[:snapshot.HEADER.size] = snapshot.HEADER.pack(snapshot.MAGIC, snapshot.SNAPSHOT_VERSION + 1, 0)
+        with self.assertRaises(ValueError):
+            snapshot.load_summary(io.BytesIO(bytes(data)))
+        with self.assertRaises(ValueError):
+            snapshot.load_summary(io.BytesIO(b'not a snapshot'))
+
+    def test_crafted_payloads_are_rejected(self):
+        def global_payload(module, name):
+            payload = b'\x80\x04'
+            for text in (module, name):
+                encoded = text.encode('utf-8')
+                payload += b'\x8c' + bytes([len(encoded)]) + encoded
+            return payload + b'\x93.'
+        self.assertIs(snapshot.SnapshotUnpickler(io.BytesIO(global_payload('dobby.nwmodel.edge', 'Edge')),
+                                                 {}).load(), edge.Edge)
+        for module, name in [('dobby.nwinfo.snapshot', 'pickle.loads'), ('dobby.nwinfo.snapshot', 'pickle'),
+                             ('dobby.nwmodel.edge', 'Edge.__init__'), ('builtins', 'eval'),
+                             ('os', 'system')]:
+            with self.assertRaises(snapshot.pickle.UnpicklingError):
+                snapshot.SnapshotUnpickler(io.BytesIO(global_payload(module, name)), {}).load()
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestSnapshot)
+    unittest.TextTestRunner(verbosity=2).run(suite)
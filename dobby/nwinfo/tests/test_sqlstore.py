@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import dobby.nwinfo.flowtable as flowtable
+import dobby.nwinfo.networksummary as networksummary
+import dobby.nwinfo.sqlstore as sqlstore
+import dobby.nwmetrics.metrics as metrics
+import dobby.nwmodel.edge as edge
+import dobby.nwmodel.endpoint as endpoint
+import dobby.nwmodel.flow as flow
+import dobby.nwmodel.ipinfo as ipinfo
+import dobby.nwmodel.node as node
+import dobby.nwmodel.phymodel as phymodel
+import dobby.utils.keys as keys
+
+__author__ = """\\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+
+class TestSummaryStore(unittest.TestCase):
+    def setUp(self):
+        self.store = sqlstore.SummaryStore(':memory:')
+        self.ap_mac = phymodel.PhysicalAddress(phy_address='AA:BB:CC:DD:EE:FF')
+        self.client_mac = phymodel.PhysicalAddress(phy_address='11:22:33:44:55:66')
+        self.client = endpoint.EndPoint(phy_address=self.client_mac,
+                                        ip_info=ipinfo.IPInfo(ipv4address='192.168.1.120'))
+        self.client_node = node.Node(endpoints=[self.client], node_type=node.NodeType.WIRELESS_CLIENT)
+        self.client.node_id = self.client_node.node_id
+        self.server = endpoint.EndPoint(ip_info=ipinfo.IPInfo(ipv4address='54.148.159.16'))
+        self.src_ip = keys.ip_key('192.168.1.120')
+        self.dst_ip = keys.ip_key('54.148.159.16')
+
+    def tearDown(self):
+        self.store.close()
+
+    def window(self, start_ts, sport=34018):
+        wireless_edge = edge.Edge(endpoint_a=self.ap_mac, endpoint_b=self.client_mac,
+                                  edge_type=edge.EdgeType.PHYSICAL)
+        wireless_edge.update_metrics_ab(metrics.WirelessMetrics(total_data_pkts=10, total_data_bytes=1500,
+                                                                snr_stats=metrics.Stats(avg_val=30.0)))
+        tcp_flow = flow.TCPFlow(src_endpoint=self.client, dst_endpoint=self.server, sport=sport, dport=443)
+        tcp_flow.update_flow_metrics(start_ts=start_ts, end_ts=start_ts + 1, duration=1.0,
+                                     rtt_stats=metrics.Stats(min_val=0.1, max_val=0.2))
+        tcp_flow.update_flow_metrics_src_to_dst(total_bytes=674.0)
+        return networksummary.NetworkSummary(start_ts=start_ts, end_ts=start_ts + 300,
+                                             mac_to_endpoints={self.client_mac.value: self.client},
+                                             ip_to_endpoints={self.src_ip: self.client,
+                                                              self.dst_ip: self.server},
+                                             nodes={self.client_node.node_id: self.client_node},
+                                             edges={(self.ap_mac.value, self.client_mac.value): wireless_edge},
+                                             ip_flows={(self.src_ip, sport, self.dst_ip, 443): tcp_flow})
+
+    def test_windows_are_written_to_the_tables(self):
+        for start_ts in [0, 300, 600]:
+            self.store.add_summary(self.window(start_ts))
+        self.assertEqual([row['start_ts'] for row in self.store.windows(250, 650)], [0, 300, 600])
+        self.assertEqual([row['start_ts'] for row in self.store.windows(300, 600)], [300])
+        endpoints = self.store.endpoints(mac='11:22:33:44:55:66')
+        self.assertEqual(len(endpoints), 3)
+        self.assertEqual(endpoints[0]['ip'], self.src_ip)
+        self.assertEqual(endpoints[0]['node_id'], str(self.client_node.node_id))
+        self.assertEqual(len(self.store.endpoints(ip='54.148.159.16', start_ts=300)), 2)
+        nodes = self.store.connection.execute('SELECT * FROM nodes').fetchall()
+        self.assertEqual(nodes[0]['node_type'], 'WIRELESS_CLIENT')
+
+    def test_edges_of_a_mac(self):
+        self.store.add_summary(self.window(0))
+        self.store.add_summary(self.window(300))
+        for mac in (self.ap_mac, 'aa:bb:cc:dd:ee:ff', self.client_mac.value):
+            edges = self.store.edges(mac)
+            self.assertEqual(len(edges), 2)
+            self.assertEqual(edges[0]['direction'], 'ab')
+            self.assertEqual(edges[0]['total_data_bytes'], 1500)
+            self.assertEqual(edges[0]['snr_avg'], 30.0)
+        self.assertEqual(len(self.store.edges(self.ap_mac, start_ts=300)), 1)
+        self.assertEqual(self.store.edges('00:00:00:00:00:01'), [])
+
+    def test_flows_of_an_address(self):
+        self.store.add_summary(self.window(0))
+        self.store.add_summary(self.window(300, sport=34020))
+        flows = self.store.flows(ip='54.148.159.16')
+        self.assertEqual([row['sport'] for row in flows], [34018, 34020])
+        self.assertEqual(flows[0]['rtt_min'], 0.1)
+        self.assertEqual(flows[0]['src_to_dst_bytes'], 674.0)
+        self.assertIsNone(flows[0]['dst_to_src_bytes'])
+        self.assertEqual(len(self.store.flows(ip=self.src_ip, peer_ip='54.148.159.16', end_ts=300)), 1)
+        self.assertEqual(self.store.flows(ip=self.src_ip, peer_ip='10.0.0.1'), [])
+        flows = self.store.flows(flow_key=('192.168.1.120', 34020, '54.148.159.16', 443))
+        self.assertEqual([row['window_start'] for row in flows], [300])
+        self.assertEqual([row['start_ts'] for row in self.store.windows_with(ip='192.168.1.120',
+                                                                               peer_ip='54.148.159.16')],
+                         [0, 300])
+        self.assertEqual([row['start_ts'] for row in self.store.windows_with(mac=self.client_mac,
+                                                                               start_ts=300)], [300])
+
+    def test_flow_table_rows_match_object_rows(self):
+        object_window = self.window(0)
+        flow_table = flowtable.FlowTable()
+        tcp_flow = object_window.ip_flows[(self.src_ip, 34018, self.dst_ip, 443)]
+        flow_table.update_flow(self.src_ip, 34018, self.dst_ip, 443,
+                               flow_metrics=dict(start_ts=0, end_ts=1, duration=1.0,
+                                                 rtt_stats=tcp_flow.flow_metrics.rtt_stats),
+                               flow_metrics_src_to_dst=dict(total_bytes=674.0))
+        self.store.add_summary(object_window)
+        self.store.add_summary(networksummary.NetworkSummary(start_ts=0, end_ts=300, flow_table=flow_table))
+        object_row, table_row = [tuple(row)[3:] for row in self.store.flows(ip=self.src_ip)]
+        self.assertEqual(object_row, table_row)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestSummaryStore)
+    unittest.TextTestRunner(verbosity=2).run(suite)
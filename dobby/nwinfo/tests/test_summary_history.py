@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import dobby.nwinfo.networksummary as networksummary
+import dobby.nwinfo.summaryhistory as summaryhistory
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+
+def window(start_ts, end_ts):
+    return networksummary.NetworkSummary(start_ts=start_ts, end_ts=end_ts)
+
+
+class TestSummaryHistory(unittest.TestCase):
+    def test_windows_are_ordered_by_start_ts(self):
+        history = summaryhistory.SummaryHistory()
+        for start_ts in [600, 0, 300, 900]:
+            history.append(window(start_ts, start_ts + 300))
+        self.assertEqual([ns.start_ts for ns in history], [0, 300, 600, 900])
+        self.assertEqual(history[-1].start_ts, 900)
+        self.assertEqual(history.pop().start_ts, 900)
+        self.assertEqual(len(history), 3)
+
+    def test_find_and_between(self):
+        history = summaryhistory.SummaryHistory()
+        for start_ts in range(0, 3000, 300):
+            history.append(window(start_ts, start_ts + 300))
+        long_window = window(100, 1000)
+        history.append(long_window)
+        self.assertEqual(history.find(0).start_ts, 0)
+        self.assertEqual(history.find(99.5).start_ts, 0)
+        self.assertEqual(history.find(2999).start_ts, 2700)
+        self.assertIsNone(history.find(3000))
+        self.assertIsNone(history.find(-1))
+        # The overlapping window that started last wins
+        self.assertIs(history.find(150), long_window)
+        self.assertEqual(history.find(650).start_ts, 600)
+        self.assertEqual([ns.start_ts for ns in history.between(1000, 1500)], [900, 1200])
+        self.assertEqual([ns.start_ts for ns in history.between(950, 1000)], [100, 900])
+        self.assertEqual(history.between(5000, 6000), [])
+
+    def test_count_and_age_bounds(self):
+        history = summaryhistory.SummaryHistory(max_summaries=3)
+        for start_ts in [0, 300, 600, 900, 150]:
+            history.append(window(start_ts, start_ts + 300))
+        self.assertEqual([ns.start_ts for ns in history], [300, 600, 900])
+        history = summaryhistory.SummaryHistory(max_age=600)
+        for start_ts in [0, 300, 600, 900]:
+            history.append(window(start_ts, start_ts + 300))
+        self.assertEqual([ns.start_ts for ns in history], [300, 600, 900])
+
+    def test_size_bound_keeps_the_latest_window(self):
+        history = summaryhistory.SummaryHistory(max_bytes=250, size_estimator=lambda ns: 100)
+        for start_ts in [0, 300, 600]:
+            history.append(window(start_ts, start_ts + 300))
+        self.assertEqual([ns.start_ts for ns in history], [300, 600])
+        self.assertEqual(history.nbytes, 200)
+        history = summaryhistory.SummaryHistory(max_bytes=10, size_estimator=lambda ns: 100)
+        history.append(window(0, 300))
+        history.append(window(300, 600))
+        self.assertEqual([ns.start_ts for ns in history], [300])
+
+    def test_evicted_windows_are_passed_on(self):
+        evicted = []
+        history = summaryhistory.SummaryHistory(max_summaries=2, on_evict=evicted.append)
+        for start_ts in [0, 300, 600]:
+            history.append(window(start_ts, start_ts + 300))
+        history.pop()
+        self.assertEqual([ns.start_ts for ns in evicted], [0])
+
+    def test_lookups_after_eviction(self):
+        history = summaryhistory.SummaryHistory(max_summaries=2)
+        history.append(window(0, 3000))
+        history.append(window(3000, 3300))
+        history.append(window(3300, 3600))
+        self.assertIsNone(history.find(100))
+        self.assertEqual(history.find(3400).start_ts, 3300)
+        self.assertGreater(summaryhistory.estimate_summary_size(window(0, 1)), 0)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestSummaryHistory)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import dobby.nwinfo.flowtable as flowtable
+import dobby.nwinfo.networksummary as networksummary
+import dobby.nwinfo.topk as topk
+import dobby.nwmetrics.metrics as metrics
+import dobby.nwmodel.edge as edge
+import dobby.nwmodel.endpoint as endpoint
+import dobby.nwmodel.flow as flow
+import dobby.nwmodel.node as node
+import dobby.nwmodel.phymodel as phymodel
+
+__author__ = """\\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+LOSSES = [5.0, None, 40.0, 12.0, 40.0, 1.0]
+
+
+class TestTopK(unittest.TestCase):
+    def setUp(self):
+        self.server_node = node.Node(node_type=node.NodeType.SERVER)
+        self.server = endpoint.EndPoint(node_id=self.server_node.node_id)
+        self.ip_flows = {}
+        self.flow_table = flowtable.FlowTable()
+        for index, loss in enumerate(LOSSES):
+            key = (index, 1000 + index, 100, 443 if index % 2 else 80)
+            tcp_flow = flow.TCPFlow(dst_endpoint=self.server if index < 3 else None,
+                                    sport=key[1], dport=key[3])
+            tcp_flow.update_flow_metrics(total_loss=loss, rtt_stats=metrics.Stats(var_val=float(index)))
+            self.ip_flows[key] = tcp_flow
+            self.flow_table.update_flow(*key, dst_endpoint=self.server if index < 3 else None,
+                                        flow_metrics=dict(total_loss=loss,
+                                                          rtt_stats=metrics.Stats(var_val=float(index))))
+        nodes = {self.server_node.node_id: self.server_node}
+        self.ns = networksummary.NetworkSummary(ip_flows=self.ip_flows, nodes=nodes)
+        self.columnar_ns = networksummary.NetworkSummary(flow_table=self.flow_table, nodes=nodes)
+
+    def tearDown(self):
+        self.ns = None
+
+    def ranked_sources(self, ranked):
+        return [(result.value, result.key[0]) for result in ranked]
+
+    def test_top_flows(self):
+        for ns in (self.ns, self.columnar_ns):
+            # Ties keep flow order
+            self.assertEqual(self.ranked_sources(topk.top_flows(ns, 'total_loss', k=3)),
+                             [(40.0, 2), (40.0, 4), (12.0, 3)])
+            self.assertEqual(self.ranked_sources(topk.top_flows(ns, 'total_loss', k=2, lowest=True)),
+                             [(1.0, 5), (5.0, 0)])
+            self.assertEqual(self.ranked_sources(topk.top_flows(ns, 'rtt_stats.var_val', k=1)), [(5.0, 5)])
+            self.assertEqual(len(topk.top_flows(ns, 'total_loss', k=10)), 5)
+            self.assertEqual(topk.top_flows(ns, 'total_loss', k=0), [])
+
+    def test_flow_filters(self):
+        for ns in (self.ns, self.columnar_ns):
+            self.assertEqual(self.ranked_sources(topk.top_flows(ns, 'total_loss', port=443)),
+                             [(12.0, 3), (1.0, 5)])
+            self.assertEqual(self.ranked_sources(topk.top_flows(ns, 'total_loss',
+                                                                node_type=node.NodeType.SERVER)),
+                             [(40.0, 2), (5.0, 0)])
+            self.assertEqual(self.ranked_sources(topk.top_flows(ns, 'total_loss', port=80,
+                                                                where=lambda key, tcp_flow: key[0] > 2)),
+                             [(40.0, 4)])
+        ranked = topk.top_flows(self.columnar_ns, topk.ratio('total_loss', 'total_loss'), k=1)
+        self.assertEqual(ranked[0].value, 1.0)
+
+    def test_top_edges(self):
+        bssid = phymodel.PhysicalAddress(phy_address='AA:BB:CC:DD:EE:00')
+        wifi_model = phymodel.WifiPhysicalModel(mac=bssid)
+        ap_mac = phymodel.PhysicalAddress(phy_address='AA:BB:CC:DD:EE:01')
+        edges, mac_to_endpoints = {}, {}
+        for index, (retx, pkts, snr_p10) in enumerate([(10, 100, 20.0), (30, 100, 8.0), (5, 0, 3.0)]):
+            client_mac = phymodel.PhysicalAddress(phy_address='11:22:33:44:55:{0:02x}'.format(index))
+            mac_to_endpoints[client_mac.value] = endpoint.EndPoint(phy_address=client_mac,
+                                                                   phy_model=wifi_model if index else None)
+            wireless_edge = edge.Edge(endpoint_a=ap_mac, endpoint_b=client_mac)
+            wireless_edge.update_metrics_ab(metrics.WirelessMetrics(total_retx=retx, total_pkts=pkts,
+                                                                    snr_stats=metrics.Stats(percentile_10=snr_p10)))
+            edges[(ap_mac.value, client_mac.value)] = wireless_edge
+        ns = networksummary.NetworkSummary(edges=edges, mac_to_endpoints=mac_to_endpoints)
+        ranked = topk.top_edges(ns, topk.ratio('total_retx', 'total_pkts'), k=5)
+        self.assertEqual([result.value for result in ranked], [0.3, 0.1])
+        ranked = topk.top_edges(ns, 'snr_stats.percentile_10', k=2, lowest=True)
+        self.assertEqual([result.value for result in ranked], [3.0, 8.0])
+        ranked = topk.top_edges(ns, 'snr_stats.percentile_10', lowest=True, bssid=bssid)
+        self.assertEqual([result.value for result in ranked], [3.0, 8.0])
+        ranked = topk.top_edges(ns, 'snr_stats.percentile_10', lowest=True, bssid=ap_mac)
+        self.assertEqual(ranked, [])
+        self.assertEqual(topk.top_edges(ns, 'total_retx', direction='ba'), [])
+
+    def test_combined_summary(self):
+        later_ns = networksummary.NetworkSummary(start_ts=300, end_ts=600, ip_flows={
+            key: tcp_flow for key, tcp_flow in self.ip_flows.items() if key[0] == 3})
+        self.ns.start_ts, self.ns.end_ts = 0, 300
+        combined = topk.combined_summary([self.ns, later_ns])
+        self.assertEqual((combined.start_ts, combined.end_ts), (0, 600))
+        self.assertEqual(self.ranked_sources(topk.top_flows(combined, 'total_loss', k=1)), [(40.0, 2)])
+        self.assertEqual(self.ranked_sources(topk.top_flows(combined, 'total_loss', port=1003)), [(24.0, 3)])
+        self.assertIs(topk.combined_summary([self.ns]), self.ns)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestTopK)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,195 @@
+"""Top-K queries over the flows and edges of a network summary.
+
+top_flows(ns, 'total_loss') and top_edges(ns, 'snr_stats.percentile_10',
+lowest=True) return the k flows or edges with the largest (smallest) value
+of a metric, best first, as Ranked(value, key, item) tuples. A metric is a
+field of the TCPMetrics or WirelessMetrics of the flow group or edge
+direction asked for, a dotted path into one of their Stats
+('rtt_stats.var_val') or a callable taking the metrics, e.g.
+ratio('total_retx', 'total_pkts'). Flows or edges without a value are left
+out.
+
+Selection is a bounded heap, O(n log k). For a summary with a
+flowtable.FlowTable, column metrics are selected with FlowTable.top_rows,
+vectorized with numpy when it is installed, and only the k winning rows are
+turned into TCPFlowView objects.
+
+Queries over several windows (ParseManager.top_flows/top_edges) run over
+their merge, see combined_summary; with rollups the merge is already done.
+"""
+import collections
+import heapq
+
+import dobby.nwinfo.flowtable as flowtable
+import dobby.nwinfo.networksummary as networksummary
+import dobby.nwinfo.rollup as rollup
+import dobby.nwmodel.models as modelset
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+DEFAULT_K = 10
+
+# Edge directions and the edge attributes holding their metrics
+EDGE_DIRECTIONS = {'ab': 'edge_metrics_ab', 'ba': 'edge_metrics_ba', 'undirected': 'edge_metrics'}
+# Flow groups and the flow attributes holding their metrics
+FLOW_GROUPS = {flowtable.FLOW: 'flow_metrics', flowtable.SRC_TO_DST: 'flow_metrics_src_to_dst',
+               flowtable.DST_TO_SRC: 'flow_metrics_dst_to_src'}
+
+Ranked = collections.namedtuple('Ranked', ['value', 'key', 'item'])
+
+
+def ratio(numerator, denominator):
+    """Metric numerator / denominator of two fields, None when either is
+    missing or the denominator is 0.
+    """
+    def metric(metrics):
+        numerator_value = getattr(metrics, numerator, None)
+        denominator_value = getattr(metrics, denominator, None)
+        if numerator_value is None or not denominator_value:
+            return None
+        return numerator_value / denominator_value
+    metric.__name__ = '{0}/{1}'.format(numerator, denominator)
+    return metric
+
+def metric_value(metrics, metric):
+    """Value of a metric (field, dotted path or callable) of a Metrics, or None.
+    """
+    if metrics is None:
+        return None
+    if callable(metric):
+        return metric(metrics)
+    value = metrics
+    for name in metric.split('.'):
+        value = getattr(value, name, None)
+        if value is None:
+            return None
+    # NaN is a missing value like None
+    return value if value == value else None
+
+def _select(candidates, k, lowest):
+    """The k best (value, order, key, item) candidates as Ranked, best first.
+    Ties are broken by order.
+    """
+    if lowest:
+        selected = heapq.nsmallest(k, candidates, key=lambda candidate: candidate[:2])
+    else:
+        selected = heapq.nlargest(k, candidates, key=lambda candidate: (candidate[0], -candidate[1]))
+    return [Ranked(value, key, item) for value, order, key, item in selected]
+
+def _node_type(network_summary, endpoint):
+    node = network_summary.nodes.get(getattr(endpoint, 'node_id', None), None) if endpoint is not None else None
+    return getattr(node, 'node_type', None)
+
+def _flow_column(metric, group):
+    """Flow table column holding a metric of a group, None if there is none.
+    """
+    if callable(metric):
+        return None
+    names = metric.split('.')
+    fields = dict((field, column) for column, field in flowtable.group_columns(group))
+    if len(names) == 2 and names[0] == 'rtt_stats' and names[1] in flowtable.RTT_FIELDS:
+        return fields[names[1]]
+    if len(names) == 1 and names[0] not in flowtable.RTT_FIELDS:
+        return fields.get(names[0], None)
+    return None
+
+def top_flows(network_summary, metric, k=DEFAULT_K, group=flowtable.FLOW, lowest=False,
+              port=None, node_type=None, where=None):
+    """The k TCP flows with the largest (smallest) metric of a flow group.
+
+    port keeps the flows with that source or destination port, node_type
+    those with an endpoint on a node of that nodemodel.NodeType and
+    where(key, tcp_flow) those for which it is true.
+    """
+    def keep(key, tcp_flow):
+        if port is not None and port not in (key[1], key[3]):
+            return False
+        if node_type is not None and node_type not in (_node_type(network_summary, tcp_flow.src_endpoint),
+                                                       _node_type(network_summary, tcp_flow.dst_endpoint)):
+            return False
+        return where is None or where(key, tcp_flow)
+
+    flow_table = getattr(network_summary, 'flow_table', None)
+    column = _flow_column(metric, group) if flow_table is not None else None
+    if column is not None:
+        return _top_flow_rows(flow_table, column, k, lowest, port,
+                              keep if node_type is not None or where is not None else None)
+    attribute = FLOW_GROUPS[group]
+    candidates = ((value, order, key, tcp_flow)
+                  for order, (key, tcp_flow) in enumerate(network_summary.ip_flows.items())
+                  if keep(key, tcp_flow)
+                  for value in [metric_value(getattr(tcp_flow, attribute, None), metric)] if value is not None)
+    return _select(candidates, k, lowest)
+
+def _top_flow_rows(flow_table, column, k, lowest, port, keep):
+    rows = None
+    if port is not None:
+        sports, dports = flow_table.columns['sport'], flow_table.columns['dport']
+        rows = [row for row in range(len(flow_table)) if sports[row] == port or dports[row] == port]
+    if keep is not None:
+        rows = [row for row in (range(len(flow_table)) if rows is None else rows)
+                if keep(flow_table.flow_key(row), flow_table.view(row))]
+    values = flow_table.columns[column]
+    return [Ranked(values[row], flow_table.flow_key(row), flow_table.view(row))
+            for row in flow_table.top_rows(column, k, lowest=lowest, rows=rows)]
+
+def _edge_endpoints(network_summary, edge):
+    """Endpoints of an edge; the wireless parser gives edges the
+    PhysicalAddress of their endpoints rather than the endpoints.
+    """
+    return [address if hasattr(address, 'phy_model') else
+            network_summary.mac_to_endpoints.get(getattr(address, 'value', None), None)
+            for address in (edge.endpoint_a, edge.endpoint_b)]
+
+def _edge_bssids(network_summary, edge):
+    """MACs of the BSSIDs the endpoints of an edge are associated with.
+    """
+    bssids = set()
+    for endpoint in _edge_endpoints(network_summary, edge):
+        phy_model = getattr(endpoint, 'phy_model', None)
+        mac = getattr(phy_model, 'mac', None)
+        if mac is not None:
+            bssids.add(mac.value)
+    return bssids
+
+def top_edges(network_summary, metric, k=DEFAULT_K, direction='ab', lowest=False,
+              bssid=None, node_type=None, where=None):
+    """The k edges with the largest (smallest) metric in a direction ('ab',
+    'ba' or 'undirected').
+
+    bssid (a PhysicalAddress or its value) keeps the edges of clients of that
+    BSSID, node_type those with an endpoint on a node of that type and
+    where(key, edge) those for which it is true.
+    """
+    attribute = EDGE_DIRECTIONS[direction]
+    bssid = getattr(bssid, 'value', bssid)
+
+    def keep(key, edge):
+        if bssid is not None and bssid not in _edge_bssids(network_summary, edge):
+            return False
+        if node_type is not None:
+            node_types = [_node_type(network_summary, endpoint)
+                          for endpoint in _edge_endpoints(network_summary, edge)]
+            if node_type not in node_types:
+                return False
+        return where is None or where(key, edge)
+
+    candidates = ((value, order, key, edge)
+                  for order, (key, edge) in enumerate(network_summary.edges.items())
+                  for value in [metric_value(getattr(edge, attribute, None), metric)]
+                  if value is not None and keep(key, edge))
+    return _select(candidates, k, lowest)
+
+def combined_summary(summaries, models=modelset.DEFAULT_MODELS):
+    """One summary holding the flows and edges of summaries, merged with
+    rollup.merge_summary; a single summary is returned as is.
+    """
+    summaries = list(summaries)
+    if len(summaries) == 1:
+        return summaries[0]
+    end_times = [network_summary.end_ts for network_summary in summaries if network_summary.end_ts is not None]
+    combined = networksummary.NetworkSummary(start_ts=summaries[0].start_ts if summaries else None,
+                                             end_ts=max(end_times) if end_times else None)
+    for network_summary in summaries:
+        rollup.merge_summary(combined, network_summary, models=models)
+    return combined
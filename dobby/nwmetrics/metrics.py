@@ -1,19 +1,79 @@
 #!/usr/bin/env python3
 """Utility class for network metrics.
 """
+import functools
+
+import dobby.nwmetrics.sketch as quantilesketch
+import dobby.utils.compact as compact
 import dobby.utils.util as util
 __author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
 
+def _sum_values(value, other_value):
+    if value is None:
+        return other_value
+    if other_value is None:
+        return value
+    return value + other_value
+
+def _min_value(value, other_value):
+    if value is None:
+        return other_value
+    if other_value is None:
+        return value
+    return min(value, other_value)
+
+def _max_value(value, other_value):
+    if value is None:
+        return other_value
+    if other_value is None:
+        return value
+    return max(value, other_value)
+
+# Sketches rebuilt from the percentiles of a Stats, shared by all the stats
+# with the same percentiles (e.g. a window's merged into several rollups)
+MAX_REBUILT_SKETCHES = 4096
+
+@functools.lru_cache(maxsize=MAX_REBUILT_SKETCHES)
+def _rebuilt_sketch(percentile_10, percentile_50, percentile_90, num_samples, min_val, max_val):
+    return quantilesketch.from_percentiles(percentile_10, percentile_50, percentile_90,
+                                           num_samples=num_samples, min_val=min_val, max_val=max_val)
+
+def _weighted_mean(value, weight, other_value, other_weight):
+    if value is None:
+        return other_value
+    if other_value is None:
+        return value
+    weight = weight if weight else 0.0
+    other_weight = other_weight if other_weight else 0.0
+    if not weight + other_weight:
+        return (value + other_value) / 2.0
+    return (value * weight + other_value * other_weight) / (weight + other_weight)
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def merge_metrics(value, other_value):
+    """Stats.merge or Metrics.merge that accepts None for either side.
+    """
+    if value is None:
+        return other_value
+    return value.merge(other_value)
+
 class Stats(object):
     """ Utility class for stats
      Stats {
         Float min, max, avg, variance;
         int num_pkts
+        QuantileSketch sketch (optional)
     }
     """
+    # Attributes set by the constructor, the __slots__ of the compact variant
+    INSTANCE_FIELDS = ('min_val', 'max_val', 'avg_val', 'var_val', 'percentile_50', 'percentile_10',
+                       'percentile_90', 'num_samples', 'sketch')
+
     def __init__(self, min_val=None, max_val=None, avg_val=None, percentile_50=None,
                  percentile_10=None, percentile_90=None, var_val=None, num_samples=None,
-                 **kwargs):
+                 sketch=None, **kwargs):
         self.min_val = min_val
         self.max_val = max_val
         self.avg_val = avg_val
@@ -22,12 +82,13 @@ class Stats(object):
         self.percentile_10 = percentile_10
         self.percentile_90 = percentile_90
         self.num_samples = num_samples
-        self.__dict__.update(kwargs)
+        self.sketch = sketch
+        compact.update_attributes(self, kwargs)
 
     def __eq__(self, other):
         """Override the default Equals behavior"""
-        if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
+        if compact.is_model_instance(other, self.__class__):
+            return compact.attributes(self) == compact.attributes(other)
         return False
 
     def __ne__(self, other):
@@ -52,16 +113,148 @@ class Stats(object):
             return cls(**params)
 
     @classmethod
-    def from_rtt_json(cls, rtt_json):
+    def from_rtt_json(cls, rtt_json, failures=None):
         if not rtt_json:
             return None
         rtt_dict = {}
         # Generate the metrics for RTT/Semirtt/Loss
-        for rtt in rtt_json:
+        for rtt in util.as_list(rtt_json):
             if rtt.get('@source', None) and rtt['@source'] in ['min', 'max', 'avg', 'var']:
-                rtt_dict[str(rtt['@source']) + "_val"] = util.get_float_value(rtt, '@value')
+                rtt_dict[str(rtt['@source']) + "_val"] = util.get_float_value(rtt, '@value', failures)
         return cls(**rtt_dict)
 
+    def to_sketch(self):
+        """The quantile sketch of these stats: self.sketch, or one rebuilt from
+        the percentiles (sketch.from_percentiles). None without either.
+        Rebuilt sketches are cached by their percentiles (_rebuilt_sketch)
+        rather than stored on the stats, which may belong to a published
+        summary; do not modify the returned sketch.
+        """
+        if self.sketch is not None:
+            return self.sketch
+        return _rebuilt_sketch(self.percentile_10, self.percentile_50, self.percentile_90,
+                               self.num_samples, self.min_val, self.max_val)
+
+    def quantile(self, q):
+        """Value at quantile q (0 <= q <= 1) from the sketch, None without one.
+        """
+        stats_sketch = self.to_sketch()
+        return stats_sketch.quantile(q) if stats_sketch is not None else None
+
+    def merge(self, other):
+        """Stats of the samples summarized by both self and other.
+        min, max, avg and var are exact when num_samples is known (samples are
+        weighted equally otherwise). Percentiles come from the merged quantile
+        sketches of both sides (see to_sketch); the merged stats keep the
+        sketch so later merges stay O(sketch).
+        """
+        if other is None:
+            return self
+        weight = self.num_samples if self.num_samples is not None else 1.0
+        other_weight = other.num_samples if other.num_samples is not None else 1.0
+        avg_val = _weighted_mean(self.avg_val, weight, other.avg_val, other_weight)
+        var_val = None
+        if self.var_val is not None and other.var_val is not None and \
+           self.avg_val is not None and other.avg_val is not None:
+            var_val = (weight * (self.var_val + (self.avg_val - avg_val) ** 2) +
+                       other_weight * (other.var_val + (other.avg_val - avg_val) ** 2)) / \
+                      (weight + other_weight)
+        num_samples = None
+        if self.num_samples is not None and other.num_samples is not None:
+            num_samples = self.num_samples + other.num_samples
+        merged = type(self)(min_val=_min_value(self.min_val, other.min_val),
+                            max_val=_max_value(self.max_val, other.max_val),
+                            avg_val=avg_val, var_val=var_val, num_samples=num_samples)
+        stats_sketch = self.to_sketch()
+        other_sketch = other.to_sketch()
+        if stats_sketch is None or other_sketch is None:
+            stats_sketch = stats_sketch if stats_sketch is not None else other_sketch
+            if stats_sketch is not None:
+                # Only one side has a distribution, keep its percentiles
+                merged.sketch = stats_sketch.copy()
+        else:
+            merged.sketch = stats_sketch.copy().merge(other_sketch)
+        if merged.sketch is not None:
+            merged.percentile_10, merged.percentile_50, merged.percentile_90 = \
+                merged.sketch.quantiles((0.1, 0.5, 0.9))
+        return merged
+
+class RunningStats(object):
+    """Running count, mean, variance, min and max of a series of values
+    (Welford's algorithm), in constant memory.
+    """
+    __slots__ = ('count', 'mean', 'm2', 'min_val', 'max_val')
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, min_val=None, max_val=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min_val = min_val
+        self.max_val = max_val
+
+    def __eq__(self, other):
+        if isinstance(other, RunningStats):
+            return self.count == other.count and self.mean == other.mean and \
+                   self.m2 == other.m2 and self.min_val == other.min_val and \
+                   self.max_val == other.max_val
+        return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __getstate__(self):
+        return (self.count, self.mean, self.m2, self.min_val, self.max_val)
+
+    def __setstate__(self, state):
+        self.count, self.mean, self.m2, self.min_val, self.max_val = state
+
+    def __repr__(self):
+        return "RunningStats(count={0}, mean={1}, var={2}, min={3}, max={4})".format(
+            self.count, self.mean, self.var_val, self.min_val, self.max_val)
+
+    def copy(self):
+        return RunningStats(self.count, self.mean, self.m2, self.min_val, self.max_val)
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min_val = value if self.min_val is None else min(self.min_val, value)
+        self.max_val = value if self.max_val is None else max(self.max_val, value)
+
+    def merge(self, other):
+        """RunningStats of the values of both self and other (Chan et al.).
+        """
+        if other is None or not other.count:
+            return self
+        if not self.count:
+            return other
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        return RunningStats(count=count,
+                            mean=self.mean + delta * other.count / count,
+                            m2=self.m2 + other.m2 + delta * delta * self.count * other.count / count,
+                            min_val=min(self.min_val, other.min_val),
+                            max_val=max(self.max_val, other.max_val))
+
+    @property
+    def total(self):
+        return self.mean * self.count
+
+    @property
+    def var_val(self):
+        """Population variance.
+        """
+        return self.m2 / self.count if self.count else None
+
+    def to_stats(self, stats_class=None):
+        stats_class = stats_class if stats_class else Stats
+        if not self.count:
+            return stats_class()
+        return stats_class(min_val=self.min_val, max_val=self.max_val, avg_val=self.mean,
+                           var_val=self.var_val, num_samples=self.count)
+
 class Metrics(object):
     """ Class representing network metrics
     Metrics {
@@ -69,21 +262,89 @@ class Metrics(object):
         int totals_*
     }
     """
+    # How merge() combines the fields of two metrics: counters are summed,
+    # Stats merged, maxima kept and means weighted by another field
+    SUMMED_FIELDS = ('total_pkts', 'total_bytes')
+    STATS_FIELDS = ()
+    MAX_FIELDS = ()
+    WEIGHTED_FIELDS = ()
+    # Attributes set by the constructor, the __slots__ of the compact variant
+    INSTANCE_FIELDS = ('start_ts', 'end_ts', 'total_pkts', 'total_bytes', 'running_stats')
+
     def __init__(self, start_ts=None, end_ts=None, total_pkts=None, total_bytes=None):
         self.start_ts = start_ts
         self.end_ts = end_ts
         self.total_pkts = total_pkts
         self.total_bytes = total_bytes
+        # Field name -> RunningStats (numbers) or merged Stats, kept by accumulate_stats
+        self.running_stats = None
 
     def __eq__(self, other):
         """Override the default Equals behavior"""
-        if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
+        if compact.is_model_instance(other, self.__class__):
+            return compact.attributes(self) == compact.attributes(other)
         return False
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
+    def accumulate_stats(self, **updated_stats):
+        """Like update_stats, but also folds every new value into the running
+        aggregates of its field (running()): a RunningStats for numbers, the
+        merged Stats for Stats. O(1) per field and constant memory.
+
+        The aggregates are replaced rather than updated in place, since a
+        copy of the metrics (cowmap.copy_entry) shares them with the metrics
+        of a published summary.
+        """
+        running_stats = dict(self.running_stats) if self.running_stats else {}
+        for name, value in updated_stats.items():
+            if _is_number(value):
+                accumulator = running_stats.get(name, None)
+                accumulator = running_stats[name] = (RunningStats() if accumulator is None
+                                                         else accumulator.copy())
+                accumulator.add(value)
+            elif compact.is_model_instance(value, Stats):
+                running_stats[name] = merge_metrics(running_stats.get(name, None), value)
+        self.running_stats = running_stats
+        compact.update_attributes(self, updated_stats)
+
+    def accumulate(self, other):
+        """accumulate_stats with the fields of another metrics object.
+        """
+        self.accumulate_stats(**dict((name, value) for name, value in compact.attributes(other).items()
+                                     if value is not None and name != 'running_stats'))
+
+    def running(self, name):
+        """Running aggregate of a field, None if it was never accumulated.
+        """
+        return self.running_stats.get(name, None) if self.running_stats else None
+
+    def merge(self, other):
+        """Metrics covering both self and other, e.g. the same edge or flow
+        in two consecutive windows. Neither side is modified.
+        """
+        if other is None:
+            return self
+        merged = dict(start_ts=_min_value(self.start_ts, other.start_ts),
+                      end_ts=_max_value(self.end_ts, other.end_ts))
+        for name in self.SUMMED_FIELDS:
+            merged[name] = _sum_values(getattr(self, name), getattr(other, name))
+        for name in self.STATS_FIELDS:
+            merged[name] = merge_metrics(getattr(self, name), getattr(other, name))
+        for name in self.MAX_FIELDS:
+            merged[name] = _max_value(getattr(self, name), getattr(other, name))
+        for name, weight_name in self.WEIGHTED_FIELDS:
+            merged[name] = _weighted_mean(getattr(self, name), getattr(self, weight_name),
+                                          getattr(other, name), getattr(other, weight_name))
+        merged_metrics = type(self)(**merged)
+        if self.running_stats or other.running_stats:
+            running_stats = dict(self.running_stats) if self.running_stats else {}
+            for name, accumulator in (other.running_stats or {}).items():
+                running_stats[name] = merge_metrics(running_stats.get(name, None), accumulator)
+            merged_metrics.running_stats = running_stats
+        return merged_metrics
+
 class WirelessMetrics(Metrics):
     """ Class representing wireless metrics
     WirelessMetrics {
@@ -91,6 +352,14 @@ class WirelessMetrics(Metrics):
         int totals_*
     }
     """
+    SUMMED_FIELDS = Metrics.SUMMED_FIELDS + ('total_data_pkts', 'total_data_bytes', 'total_retx',
+                                             'total_trans_time_usec')
+    STATS_FIELDS = ('noise_stats', 'snr_stats', 'rate_stats', 'size_stats')
+    WEIGHTED_FIELDS = (('avg_data_pkt_duration_usec', 'total_data_pkts'),)
+    INSTANCE_FIELDS = Metrics.INSTANCE_FIELDS + ('total_data_pkts', 'total_data_bytes', 'total_retx',
+                                                 'noise_stats', 'snr_stats', 'rate_stats', 'size_stats',
+                                                 'total_trans_time_usec', 'avg_data_pkt_duration_usec')
+
     def __init__(self, start_ts=None, end_ts=None, total_pkts=None, total_bytes=None,
                  total_data_pkts=None, total_data_bytes=None, total_retx=None,
                  noise_stats=None, snr_stats=None, rate_stats=None, size_stats=None,
@@ -109,11 +378,11 @@ class WirelessMetrics(Metrics):
         #self.__dict__.update((k,v) for k,v in locals().iteritems() if k != "self")
 
     def update_stats(self, **updated_stats):
-        self.__dict__.update(updated_stats)
+        compact.update_attributes(self, updated_stats)
 
     def __eq__(self, other):
         """Override the default Equals behavior"""
-        if isinstance(other, self.__class__):
+        if compact.is_model_instance(other, self.__class__):
             return Metrics.__eq__(self, other) and \
                    self.total_data_pkts == other.total_data_pkts and \
                    self.total_data_bytes == other.total_data_bytes and \
@@ -137,6 +406,12 @@ class TCPMetrics(Metrics):
         int totals_*
     }
     """
+    # duration adds up to the time the flow was active in the merged windows
+    SUMMED_FIELDS = Metrics.SUMMED_FIELDS + ('duration', 'total_loss', 'total_acks')
+    STATS_FIELDS = ('rtt_stats',)
+    MAX_FIELDS = ('mtu',)
+    INSTANCE_FIELDS = Metrics.INSTANCE_FIELDS + ('duration', 'rtt_stats', 'mtu', 'total_loss', 'total_acks')
+
     def __init__(self, start_ts=None, end_ts=None, total_pkts=None, total_bytes=None,
                  duration=None, rtt_stats=None, mtu=None, total_loss=None,
                  total_acks=None, **kwargs):
@@ -149,11 +424,11 @@ class TCPMetrics(Metrics):
         self.total_acks = total_acks
 
     def update_stats(self, **updated_stats):
-        self.__dict__.update(updated_stats)
+        compact.update_attributes(self, updated_stats)
 
     def __eq__(self, other):
         """Override the default Equals behavior"""
-        if isinstance(other, self.__class__):
+        if compact.is_model_instance(other, self.__class__):
             return Metrics.__eq__(self, other) and \
                    self.duration == other.duration and \
                    self.total_acks == other.total_acks and \
@@ -163,3 +438,9 @@ class TCPMetrics(Metrics):
 
     def __ne__(self, other):
         return not self.__eq__(other)
+
+# __slots__ variants, see dobby.utils.compact
+CompactStats = compact.compact_class(Stats)
+CompactMetrics = compact.compact_class(Metrics)
+CompactWirelessMetrics = compact.compact_class(WirelessMetrics)
+CompactTCPMetrics = compact.compact_class(TCPMetrics)
@@ -0,0 +1,213 @@
+"""Mergeable quantile sketch (DDSketch style) for metrics.Stats.
+
+Values are counted in logarithmically sized bins, so every quantile is
+returned within relative_accuracy of the true value and two sketches merge
+by adding their bin counts. The number of bins is capped at max_bins by
+collapsing the bins of the smallest magnitudes, which keeps the sketch a few
+KB whatever the number of samples.
+
+Click only reports the 10th, 50th and 90th percentiles of a stream;
+from_percentiles() builds an approximate sketch from them so streams without
+a sketch can still be merged.
+"""
+import math
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_MAX_BINS = 512
+# Values closer to zero than this are counted as zero
+MIN_VALUE = 1e-9
+# Points sampled from the distribution reconstructed from click's percentiles
+RECONSTRUCTION_POINTS = 32
+
+
+class QuantileSketch(object):
+    """Counts of values in bins of relative width 2 * relative_accuracy.
+    Counts may be fractional (weighted samples).
+    """
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, max_bins=DEFAULT_MAX_BINS):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        # Bin index -> count, for positive values and for the magnitude of negative ones
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0.0
+        self.count = 0.0
+        self.sum_val = 0.0
+        self.min_val = None
+        self.max_val = None
+
+    def __len__(self):
+        return len(self.positive) + len(self.negative)
+
+    def __eq__(self, other):
+        if isinstance(other, QuantileSketch):
+            return self.relative_accuracy == other.relative_accuracy and \
+                   self.positive == other.positive and self.negative == other.negative and \
+                   self.zero_count == other.zero_count and self.min_val == other.min_val and \
+                   self.max_val == other.max_val
+        return False
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return "QuantileSketch(count={0}, bins={1}, min={2}, max={3})".format(
+            self.count, len(self), self.min_val, self.max_val)
+
+    def _index(self, magnitude):
+        return int(math.ceil(math.log(magnitude) / self._log_gamma))
+
+    def _bin_value(self, index):
+        # The value within relative_accuracy of every value of the bin
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value, count=1.0):
+        """Count value (count times).
+        """
+        if count <= 0:
+            return
+        if value > MIN_VALUE:
+            index = self._index(value)
+            self.positive[index] = self.positive.get(index, 0.0) + count
+        elif value < -MIN_VALUE:
+            index = self._index(-value)
+            self.negative[index] = self.negative.get(index, 0.0) + count
+        else:
+            self.zero_count += count
+        self.count += count
+        self.sum_val += value * count
+        self.min_val = value if self.min_val is None else min(self.min_val, value)
+        self.max_val = value if self.max_val is None else max(self.max_val, value)
+        if len(self.positive) + len(self.negative) > self.max_bins:
+            self._collapse()
+
+    def _collapse(self):
+        """Merge the bins of the smallest magnitudes until max_bins are left.
+        """
+        while len(self.positive) + len(self.negative) > self.max_bins:
+            bins = self.positive if len(self.positive) >= len(self.negative) else self.negative
+            lowest, next_lowest = sorted(bins)[:2]
+            bins[next_lowest] += bins.pop(lowest)
+
+    def copy(self):
+        sketch = QuantileSketch(relative_accuracy=self.relative_accuracy, max_bins=self.max_bins)
+        sketch.positive = dict(self.positive)
+        sketch.negative = dict(self.negative)
+        sketch.zero_count = self.zero_count
+        sketch.count = self.count
+        sketch.sum_val = self.sum_val
+        sketch.min_val = self.min_val
+        sketch.max_val = self.max_val
+        return sketch
+
+    def merge(self, other):
+        """Add the counts of other to this sketch and return it.
+        """
+        if other is None or not other.count:
+            return self
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Can not merge sketches of different relative accuracies")
+        for index, count in other.positive.items():
+            self.positive[index] = self.positive.get(index, 0.0) + count
+        for index, count in other.negative.items():
+            self.negative[index] = self.negative.get(index, 0.0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum_val += other.sum_val
+        self.min_val = other.min_val if self.min_val is None else min(self.min_val, other.min_val)
+        self.max_val = other.max_val if self.max_val is None else max(self.max_val, other.max_val)
+        if len(self.positive) + len(self.negative) > self.max_bins:
+            self._collapse()
+        return self
+
+    def quantile(self, q):
+        """The value at quantile q (0 <= q <= 1), None for an empty sketch.
+        """
+        return self.quantiles([q])[0]
+
+    def quantiles(self, qs):
+        """The values at the quantiles qs (0 <= q <= 1), in one pass over the
+        bins. [None, ...] for an empty sketch.
+        """
+        if not self.count:
+            return [None] * len(qs)
+        values = [None] * len(qs)
+        # Ranks left to find, in ascending order
+        pending = sorted((q * self.count, position) for position, q in enumerate(qs) if 0 < q < 1)
+        for position, q in enumerate(qs):
+            if q <= 0:
+                values[position] = self.min_val
+            elif q >= 1:
+                values[position] = self.max_val
+
+        def take(cumulative, value):
+            while pending and cumulative >= pending[0][0]:
+                values[pending.pop(0)[1]] = value
+
+        cumulative = 0.0
+        # Ascending values: negative bins by decreasing magnitude, zero, positive bins
+        for index in sorted(self.negative, reverse=True):
+            cumulative += self.negative[index]
+            take(cumulative, self._clamp(-self._bin_value(index)))
+        cumulative += self.zero_count
+        take(cumulative, 0.0)
+        for index in sorted(self.positive):
+            if not pending:
+                break
+            cumulative += self.positive[index]
+            take(cumulative, self._clamp(self._bin_value(index)))
+        for rank, position in pending:
+            values[position] = self.max_val
+        return values
+
+    def _clamp(self, value):
+        return min(max(value, self.min_val), self.max_val)
+
+    @property
+    def mean(self):
+        return self.sum_val / self.count if self.count else None
+
+
+def from_percentiles(percentile_10, percentile_50, percentile_90, num_samples=None,
+                     min_val=None, max_val=None, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+    """Approximate sketch of a distribution known only by its percentiles.
+
+    The inverse CDF is taken as piecewise linear through the three
+    percentiles (and min_val/max_val when known, otherwise the tails are
+    extended with the slope of the neighbouring segment) and sampled at
+    RECONSTRUCTION_POINTS evenly spaced quantiles, each weighing an equal
+    share of num_samples (1 when unknown).
+    """
+    points = [(0.1, percentile_10), (0.5, percentile_50), (0.9, percentile_90)]
+    points = [(q, value) for q, value in points if value is not None]
+    if not points:
+        return None
+    if min_val is None:
+        min_val = points[0][1]
+        if len(points) > 1:
+            min_val -= (points[1][1] - points[0][1]) * points[0][0] / (points[1][0] - points[0][0])
+        if points[0][1] >= 0:
+            min_val = max(min_val, 0.0)
+    if max_val is None:
+        max_val = points[-1][1]
+        if len(points) > 1:
+            max_val += (points[-1][1] - points[-2][1]) * (1 - points[-1][0]) / (points[-1][0] - points[-2][0])
+    points = [(0.0, min(min_val, points[0][1]))] + points + [(1.0, max(max_val, points[-1][1]))]
+    sketch = QuantileSketch(relative_accuracy=relative_accuracy)
+    weight = float(num_samples if num_samples else 1) / RECONSTRUCTION_POINTS
+    segment = 0
+    for point in range(RECONSTRUCTION_POINTS):
+        q = (point + 0.5) / RECONSTRUCTION_POINTS
+        while q > points[segment + 1][0]:
+            segment += 1
+        (q0, value0), (q1, value1) = points[segment], points[segment + 1]
+        sketch.add(value0 + (value1 - value0) * (q - q0) / (q1 - q0), weight)
+    sketch.min_val = points[0][1]
+    sketch.max_val = points[-1][1]
+    return sketch
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import pickle
+import random
+import statistics
+import unittest
+
+import dobby.nwinfo.networksummary as networksummary
+import dobby.nwmetrics.metrics as metrics
+import dobby.nwmodel.edge as edge
+import dobby.nwmodel.flow as flow
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+
+class TestRunningStats(unittest.TestCase):
+    def setUp(self):
+        generator = random.Random(3)
+        self.values = [generator.uniform(0, 100) for _ in range(1000)]
+
+    def test_welford_matches_two_pass(self):
+        running = metrics.RunningStats()
+        for value in self.values:
+            running.add(value)
+        self.assertEqual(running.count, 1000)
+        self.assertAlmostEqual(running.mean, statistics.mean(self.values))
+        self.assertAlmostEqual(running.var_val, statistics.pvariance(self.values))
+        self.assertAlmostEqual(running.total, sum(self.values))
+        self.assertEqual(running.min_val, min(self.values))
+        stats = running.to_stats()
+        self.assertEqual(stats.num_samples, 1000)
+        self.assertAlmostEqual(stats.avg_val, running.mean)
+        self.assertEqual(pickle.loads(pickle.dumps(running)), running)
+
+    def test_merge_matches_a_single_accumulator(self):
+        first, second = metrics.RunningStats(), metrics.RunningStats()
+        for value in self.values[:300]:
+            first.add(value)
+        for value in self.values[300:]:
+            second.add(value)
+        merged = first.merge(second)
+        self.assertEqual(merged.count, 1000)
+        self.assertAlmostEqual(merged.mean, statistics.mean(self.values))
+        self.assertAlmostEqual(merged.var_val, statistics.pvariance(self.values))
+        self.assertIs(first.merge(metrics.RunningStats()), first)
+
+    def test_accumulated_metrics_keep_their_history(self):
+        tcp_flow = flow.TCPFlow()
+        rtt_stats = metrics.Stats(min_val=0.1, max_val=0.3, num_samples=2)
+        for total_loss in [1.0, 4.0, 7.0]:
+            tcp_flow.accumulate_flow_metrics(total_loss=total_loss, rtt_stats=rtt_stats)
+        self.assertEqual(tcp_flow.flow_metrics.total_loss, 7.0)
+        running = tcp_flow.flow_metrics.running('total_loss')
+        self.assertEqual((running.count, running.mean, running.min_val), (3, 4.0, 1.0))
+        self.assertEqual(running.var_val, 6.0)
+        self.assertEqual(tcp_flow.flow_metrics.running('rtt_stats').num_samples, 6)
+        self.assertIsNone(tcp_flow.flow_metrics.running('total_acks'))
+        # Merging metrics merges their accumulators
+        merged = tcp_flow.flow_metrics.merge(tcp_flow.flow_metrics)
+        self.assertEqual(merged.running('total_loss').count, 6)
+
+    def test_compact_metrics_accumulate_stats(self):
+        tcp_flow = flow.CompactTCPFlow()
+        rtt_stats = metrics.CompactStats(min_val=0.1, max_val=0.3, num_samples=2)
+        for total_loss in [1.0, 4.0]:
+            tcp_flow.accumulate_flow_metrics(total_loss=total_loss, rtt_stats=rtt_stats)
+        self.assertEqual(tcp_flow.flow_metrics.running('total_loss').count, 2)
+        self.assertEqual(tcp_flow.flow_metrics.running('rtt_stats').num_samples, 4)
+
+    def test_edges_accumulate_metrics(self):
+        wireless_edge = edge.Edge(endpoint_a=None, endpoint_b=None)
+        for data_pkts in [10, 20]:
+            wireless_edge.accumulate_metrics_ab(metrics.WirelessMetrics(total_data_pkts=data_pkts))
+        self.assertEqual(wireless_edge.edge_metrics_ab.total_data_pkts, 20)
+        self.assertEqual(wireless_edge.edge_metrics_ab.running('total_data_pkts').mean, 15.0)
+        self.assertIsNone(wireless_edge.edge_metrics_ba)
+
+    def test_accumulating_a_derived_summary_keeps_the_published_one(self):
+        ns = networksummary.NetworkSummary()
+        ns.add_edge('edge', edge.Edge(endpoint_a=None, endpoint_b=None))
+        ns.edges['edge'].accumulate_metrics_ab(metrics.WirelessMetrics(total_data_pkts=10))
+        tcp_flow = flow.TCPFlow()
+        tcp_flow.accumulate_flow_metrics(total_loss=1.0)
+        ns.ip_flows['flow'] = tcp_flow
+        derived = ns.derive()
+        derived.edges.owned('edge').accumulate_metrics_ab(metrics.WirelessMetrics(total_data_pkts=20))
+        derived.ip_flows.owned('flow').accumulate_flow_metrics(total_loss=3.0)
+        self.assertEqual(derived.edges['edge'].edge_metrics_ab.running('total_data_pkts').count, 2)
+        self.assertEqual(derived.ip_flows['flow'].flow_metrics.running('total_loss').mean, 2.0)
+        self.assertEqual(ns.edges['edge'].edge_metrics_ab.running('total_data_pkts').count, 1)
+        self.assertEqual(ns.ip_flows['flow'].flow_metrics.running('total_loss').count, 1)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestRunningStats)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import pickle
+import random
+import unittest
+
+import dobby.nwmetrics.metrics as metrics
+import dobby.nwmetrics.sketch as sketch
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+
+def exact_quantile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+class TestQuantileSketch(unittest.TestCase):
+    def setUp(self):
+        generator = random.Random(7)
+        self.rtts = [generator.lognormvariate(-4, 1) for _ in range(5000)]
+        self.snrs = [generator.gauss(-20, 8) for _ in range(5000)]
+
+    def assert_quantiles(self, quantile_sketch, values):
+        for q in [0.01, 0.1, 0.5, 0.9, 0.99]:
+            expected = exact_quantile(values, q)
+            self.assertAlmostEqual(quantile_sketch.quantile(q), expected,
+                                   delta=abs(expected) * 2 * sketch.DEFAULT_RELATIVE_ACCURACY)
+
+    def test_quantiles_are_within_relative_accuracy(self):
+        quantile_sketch = sketch.QuantileSketch()
+        for value in self.rtts:
+            quantile_sketch.add(value)
+        self.assert_quantiles(quantile_sketch, self.rtts)
+        self.assertEqual(quantile_sketch.quantile(0), min(self.rtts))
+        self.assertEqual(quantile_sketch.quantile(1), max(self.rtts))
+        self.assertIsNone(sketch.QuantileSketch().quantile(0.5))
+        qs = [0.99, 0, 0.1, 0.5, 1, 0.9]
+        self.assertEqual(quantile_sketch.quantiles(qs), [quantile_sketch.quantile(q) for q in qs])
+        snr_sketch = sketch.QuantileSketch()
+        for value in self.snrs:
+            snr_sketch.add(value)
+        self.assertEqual(snr_sketch.quantiles(qs), [snr_sketch.quantile(q) for q in qs])
+
+    def test_merged_sketches_match_a_single_sketch(self):
+        first, second, combined = sketch.QuantileSketch(), sketch.QuantileSketch(), sketch.QuantileSketch()
+        for value in self.snrs[:1000]:
+            first.add(value)
+            combined.add(value)
+        for value in self.snrs[1000:] + [0.0]:
+            second.add(value)
+            combined.add(value)
+        self.assertEqual(first.copy().merge(second), combined)
+        self.assert_quantiles(first.merge(second), self.snrs + [0.0])
+        other_accuracy = sketch.QuantileSketch(relative_accuracy=0.05)
+        other_accuracy.add(1.0)
+        self.assertRaises(ValueError, first.merge, other_accuracy)
+
+    def test_bins_are_capped(self):
+        quantile_sketch = sketch.QuantileSketch(max_bins=64)
+        for value in self.rtts:
+            quantile_sketch.add(value)
+        self.assertLessEqual(len(quantile_sketch), 64)
+        self.assertAlmostEqual(quantile_sketch.quantile(0.99), exact_quantile(self.rtts, 0.99),
+                               delta=exact_quantile(self.rtts, 0.99) * 0.02)
+
+    def test_percentile_reconstruction(self):
+        quantile_sketch = sketch.from_percentiles(10.0, 20.0, 40.0, num_samples=100)
+        self.assertAlmostEqual(quantile_sketch.count, 100)
+        # Within the spacing of the reconstructed points
+        self.assertAlmostEqual(quantile_sketch.quantile(0.5), 20.0, delta=0.8)
+        self.assertAlmostEqual(quantile_sketch.quantile(0.9), 40.0, delta=1.6)
+        self.assertEqual(quantile_sketch.min_val, 7.5)
+        self.assertIsNone(sketch.from_percentiles(None, None, None))
+
+    def test_stats_with_sketches_merge_exactly(self):
+        stats = []
+        for values in [self.rtts[:2500], self.rtts[2500:]]:
+            quantile_sketch = sketch.QuantileSketch()
+            for value in values:
+                quantile_sketch.add(value)
+            stats.append(metrics.Stats(min_val=min(values), max_val=max(values), num_samples=len(values),
+                                       sketch=quantile_sketch))
+        merged = stats[0].merge(stats[1])
+        self.assertAlmostEqual(merged.percentile_90, exact_quantile(self.rtts, 0.9),
+                               delta=exact_quantile(self.rtts, 0.9) * 0.02)
+        self.assertEqual(merged.quantile(0.5), merged.percentile_50)
+        self.assertEqual(stats[0].sketch.count, 2500)
+
+    def test_rebuilt_sketch_is_cached_outside_the_stats(self):
+        stats = metrics.CompactStats(percentile_10=10.0, percentile_50=20.0, percentile_90=40.0, num_samples=100)
+        same = metrics.Stats(percentile_10=10.0, percentile_50=20.0, percentile_90=40.0, num_samples=100)
+        other = metrics.Stats(percentile_10=5.0, percentile_50=15.0, percentile_90=30.0, num_samples=100)
+        stats_sketch = stats.to_sketch()
+        self.assertIs(stats.to_sketch(), stats_sketch)
+        self.assertIs(same.to_sketch(), stats_sketch)
+        merged = stats.merge(other)
+        self.assertEqual(stats_sketch.count, 100)
+        self.assertEqual(merged.sketch.count, 200)
+        # Reading or merging the stats does not change them
+        self.assertIsNone(stats.sketch)
+        self.assertIsNone(other.sketch)
+        self.assertEqual(stats, same)
+        self.assertIsNotNone(pickle.loads(pickle.dumps(merged)).sketch)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestQuantileSketch)
+    unittest.TextTestRunner(verbosity=2).run(suite)
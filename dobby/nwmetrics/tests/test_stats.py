@@ -34,6 +34,24 @@ class TestStats(unittest.TestCase):
     def test_stats_returns_none_on_none_string(self):
         self.assertIsNone(metrics.Stats.from_string(value_string=None))
 
+    def test_stats_merge(self):
+        stats1 = metrics.Stats(min_val=1.0, max_val=3.0, avg_val=2.0, var_val=1.0, num_samples=10)
+        stats2 = metrics.Stats(min_val=2.0, max_val=8.0, avg_val=5.0, var_val=4.0, num_samples=30)
+        merged = stats1.merge(stats2)
+        self.assertEqual(merged.min_val, 1.0)
+        self.assertEqual(merged.max_val, 8.0)
+        self.assertEqual(merged.num_samples, 40)
+        self.assertAlmostEqual(merged.avg_val, 4.25)
+        # Pooled variance: (10 * (1 + 2.25**2) + 30 * (4 + 0.75**2)) / 40
+        self.assertAlmostEqual(merged.var_val, 4.9375)
+        self.assertIs(stats1.merge(None), stats1)
+        self.assertIs(metrics.merge_metrics(None, stats2), stats2)
+        # Percentiles of the mixture of both distributions, within the sketch accuracy
+        percentiles = metrics.Stats.from_string('1/2/3', 1).merge(metrics.Stats.from_string('3/4/5', 3))
+        self.assertAlmostEqual(percentiles.percentile_10, 1.75, delta=0.05)
+        self.assertAlmostEqual(percentiles.percentile_50, 3.58, delta=0.05)
+        self.assertIsNotNone(percentiles.sketch)
+
 
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromTestCase(TestStats)
@@ -71,6 +71,19 @@ class TestTCPMetrics(unittest.TestCase):
     def test_ne_works(self):
         self.assertNotEqual(metrics.Metrics(start_ts=1, end_ts=2), metrics.Metrics(start_ts=1, end_ts=3))
         self.assertNotEqual(metrics.Metrics(start_ts=1, end_ts=2), dict(start_ts=1, end_ts=2))
+    def test_merge_sums_counters(self):
+        tcp_metric1 = metrics.TCPMetrics(start_ts=1, end_ts=2, total_pkts=10, duration=1, mtu=1200,
+                                         total_loss=5, rtt_stats=self.rtt_stats)
+        tcp_metric2 = metrics.TCPMetrics(start_ts=2, end_ts=3, total_pkts=5, duration=0.5, mtu=1500)
+        merged = tcp_metric1.merge(tcp_metric2)
+        self.assertEqual((merged.start_ts, merged.end_ts), (1, 3))
+        self.assertEqual(merged.total_pkts, 15)
+        self.assertEqual(merged.duration, 1.5)
+        self.assertEqual(merged.mtu, 1500)
+        self.assertEqual(merged.total_loss, 5)
+        self.assertIsNone(merged.total_bytes)
+        self.assertEqual(merged.rtt_stats, self.rtt_stats)
+        self.assertEqual(tcp_metric1.total_pkts, 10)
 
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromTestCase(TestTCPMetrics)
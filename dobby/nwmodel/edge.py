@@ -1,4 +1,5 @@
 import enum
+import dobby.utils.compact as compact
 __author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
 
 
@@ -33,6 +34,10 @@ class Edge(object):
     attr : keyword arguments, optional (default= no attributes)
         Attributes to add to graph as key=value pairs.
     """
+    # Attributes set by the constructor, the __slots__ of the compact variant
+    INSTANCE_FIELDS = ('endpoint_a', 'endpoint_b', 'edge_type', 'edge_metrics', 'edge_metrics_ab',
+                       'edge_metrics_ba')
+
     def __init__(self, endpoint_a, endpoint_b, edge_type=EdgeType.UNKNOWN,
                  edge_metrics=None, edge_metrics_ab=None, edge_metrics_ba=None, **kwargs):
         self.endpoint_a = endpoint_a
@@ -41,7 +46,7 @@ class Edge(object):
         self.edge_metrics = edge_metrics
         self.edge_metrics_ab = edge_metrics_ab
         self.edge_metrics_ba = edge_metrics_ba
-        self.__dict__.update(kwargs)
+        compact.update_attributes(self, kwargs)
 
 
     def update_undirected_metrics(self, metrics):
@@ -52,3 +57,24 @@ class Edge(object):
 
     def update_metrics_ba(self, metrics_ba):
         self.edge_metrics_ba = metrics_ba
+
+    @staticmethod
+    def _accumulated(edge_metrics, metrics):
+        if edge_metrics is None:
+            edge_metrics = type(metrics)()
+        edge_metrics.accumulate(metrics)
+        return edge_metrics
+
+    # The accumulate_* variants keep the latest metrics like update_* but fold
+    # them into the running aggregates of the edge's metrics (Metrics.accumulate)
+    def accumulate_undirected_metrics(self, metrics):
+        self.edge_metrics = self._accumulated(self.edge_metrics, metrics)
+
+    def accumulate_metrics_ab(self, metrics_ab):
+        self.edge_metrics_ab = self._accumulated(self.edge_metrics_ab, metrics_ab)
+
+    def accumulate_metrics_ba(self, metrics_ba):
+        self.edge_metrics_ba = self._accumulated(self.edge_metrics_ba, metrics_ba)
+
+# __slots__ variant, see dobby.utils.compact
+CompactEdge = compact.compact_class(Edge)
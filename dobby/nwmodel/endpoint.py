@@ -8,10 +8,16 @@ In a graph, this represents a vertex capable of having edges to other endpoints.
 
 """
 import dobby.nwmodel.phymodel as phymodel
+import dobby.utils.compact as compact
 
 __author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
 
 
+def ip_info_key(ip_info):
+    """ip_infos are keyed by the IPv4 address as an integer.
+    """
+    return int(ip_info.ipv4address) if ip_info.ipv4address is not None else None
+
 class EndPoint(object):
     """
     Base class for network endpoints.
@@ -30,24 +36,29 @@ class EndPoint(object):
 
     phyModel : input model for the physical layer
     ipAddress : ipAddress of the device if present
+    vendor : vendor of the interface
     attr : keyword arguments, optional (default= no attributes)
         Attributes to add to graph as key=value pairs.
     """
-    def __init__(self, phy_address=None, phy_model=None, ip_info=None, node_id=None, **kwargs):
+    # Attributes set by the constructor, the __slots__ of the compact variant
+    INSTANCE_FIELDS = ('phy_address', 'vendor', 'phy_model', 'ip_infos', 'node_id', 'edges')
+
+    def __init__(self, phy_address=None, phy_model=None, ip_info=None, node_id=None, vendor=None, **kwargs):
         self.phy_address = phy_address
+        self.vendor = vendor if vendor is not None else phymodel.address_vendor(phy_address)
         self.phy_model = phy_model
         self.ip_infos = {}
         if ip_info:
-            self.ip_infos[str(ip_info.ipv4address)] = ip_info
+            self.ip_infos[ip_info_key(ip_info)] = ip_info
         self.node_id = node_id
         self.edges = []
-        self.__dict__.update(kwargs)
+        compact.update_attributes(self, kwargs)
 
     def add_edge(self, edge):
         self.edges.append(edge)
 
     def add_or_update_ip_info(self, ip_info):
-        self.ip_infos[str(ip_info.ipv4address)] = ip_info
+        self.ip_infos[ip_info_key(ip_info)] = ip_info
 
     def update_node_info(self, node_id):
         self.node_id = node_id
@@ -57,3 +68,9 @@ class EndPoint(object):
 
     def update_phy_address(self, phy_address):
         self.phy_address = phy_address
+
+    def update_vendor(self, vendor):
+        self.vendor = vendor
+
+# __slots__ variant, see dobby.utils.compact
+CompactEndPoint = compact.compact_class(EndPoint)
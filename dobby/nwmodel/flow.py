@@ -4,6 +4,7 @@ endpoint to another such as a HTTP connection, an RTP streaming connection, etc.
 """
 import enum
 import dobby.nwmetrics.metrics as metrics
+import dobby.utils.compact as compact
 
 __author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
 
@@ -34,6 +35,10 @@ class Flow(object):
     }
 
     """
+    # Attributes set by the constructor, the __slots__ of the compact variant
+    INSTANCE_FIELDS = ('src_endpoint', 'dst_endpoint', 'edge_list', 'flow_type', 'sport', 'dport',
+                       'flow_metrics', 'flow_metrics_src_to_dst', 'flow_metrics_dst_to_src')
+
     def __init__(self, edge_list=[], flow_type=FlowType.UNKNOWN,
                  src_endpoint=None, dst_endpoint=None, sport=None,
                  dport=None, flow_metrics=None, flow_metrics_src_to_dst=None,
@@ -47,11 +52,15 @@ class Flow(object):
         self.flow_metrics = flow_metrics
         self.flow_metrics_src_to_dst = flow_metrics_src_to_dst
         self.flow_metrics_dst_to_src = flow_metrics_dst_to_src
-        self.__dict__.update(kwargs)
+        compact.update_attributes(self, kwargs)
 
 class TCPFlow(object):
     """TCP Flow.
     """
+    # Class of the three metrics created for a new flow
+    metrics_class = metrics.TCPMetrics
+    INSTANCE_FIELDS = Flow.INSTANCE_FIELDS
+
     def __init__(self, edge_list=[], flow_type=FlowType.TCP,
                  src_endpoint=None, dst_endpoint=None, sport=None,
                  dport=None, flow_metrics=None, flow_metrics_src_to_dst=None,
@@ -67,11 +76,11 @@ class TCPFlow(object):
                       flow_metrics_src_to_dst=flow_metrics_src_to_dst,
                       flow_metrics_dst_to_src=flow_metrics_dst_to_src)
         if not flow_metrics:
-            self.flow_metrics = metrics.TCPMetrics()
+            self.flow_metrics = self.metrics_class()
         if not flow_metrics_src_to_dst:
-            self.flow_metrics_src_to_dst = metrics.TCPMetrics()
+            self.flow_metrics_src_to_dst = self.metrics_class()
         if not flow_metrics_dst_to_src:
-            self.flow_metrics_dst_to_src = metrics.TCPMetrics()
+            self.flow_metrics_dst_to_src = self.metrics_class()
 
     def update_flow_metrics(self, **metrics):
         self.flow_metrics.update_stats(**metrics)
@@ -82,3 +91,15 @@ class TCPFlow(object):
     def update_flow_metrics_dst_to_src(self, **metrics):
         self.flow_metrics_dst_to_src.update_stats(**metrics)
 
+    def accumulate_flow_metrics(self, **metrics):
+        self.flow_metrics.accumulate_stats(**metrics)
+
+    def accumulate_flow_metrics_src_to_dst(self, **metrics):
+        self.flow_metrics_src_to_dst.accumulate_stats(**metrics)
+
+    def accumulate_flow_metrics_dst_to_src(self, **metrics):
+        self.flow_metrics_dst_to_src.accumulate_stats(**metrics)
+
+# __slots__ variants, see dobby.utils.compact
+CompactFlow = compact.compact_class(Flow)
+CompactTCPFlow = compact.compact_class(TCPFlow, metrics_class=metrics.CompactTCPMetrics)
@@ -9,6 +9,7 @@ In a graph, this represents a vertex capable of having edges to other endpoints.
 
 """
 import ipaddress
+import dobby.utils.compact as compact
 
 __author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
 
@@ -26,6 +27,8 @@ class IPInfo(object):
     }
 
     """
+    # Attributes set by the constructor, the __slots__ of the compact variant
+    INSTANCE_FIELDS = ('ipv4address', 'ipv6address', 'gwv4address', 'gwv6address', 'netmask', 'hostname')
 
     def __init__(self, ipv4address=None, ipv6address=None,
                  gwv4address=None, gwv6address=None, netmask=0,
@@ -49,7 +52,7 @@ class IPInfo(object):
         self.gwv6address = ipaddress.IPv6Address(gwv6address) if gwv6address else None
         self.netmask = netmask
         self.hostname = hostname
-        self.__dict__.update(kwargs)
+        compact.update_attributes(self, kwargs)
 
 
     def update_hostname(self, hostname):
@@ -57,4 +60,5 @@ class IPInfo(object):
         """
         self.hostname = hostname
 
-
+# __slots__ variant, see dobby.utils.compact
+CompactIPInfo = compact.compact_class(IPInfo)
@@ -0,0 +1,33 @@
+"""The model classes the parsers build summaries from.
+
+DEFAULT_MODELS are the regular classes; COMPACT_MODELS their __slots__
+variants (see dobby.utils.compact), which use much less memory per object
+for large summaries but keep ad-hoc attributes in an extras dict.
+"""
+import collections
+
+import dobby.nwmetrics.metrics as metrics
+import dobby.nwmodel.edge as edge
+import dobby.nwmodel.endpoint as endpoint
+import dobby.nwmodel.flow as flow
+import dobby.nwmodel.ipinfo as ipinfo
+import dobby.nwmodel.node as node
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+Models = collections.namedtuple('Models', ['EndPoint', 'Node', 'Edge', 'TCPFlow', 'IPInfo',
+                                           'Stats', 'WirelessMetrics', 'TCPMetrics'])
+
+DEFAULT_MODELS = Models(EndPoint=endpoint.EndPoint, Node=node.Node, Edge=edge.Edge,
+                        TCPFlow=flow.TCPFlow, IPInfo=ipinfo.IPInfo, Stats=metrics.Stats,
+                        WirelessMetrics=metrics.WirelessMetrics, TCPMetrics=metrics.TCPMetrics)
+
+COMPACT_MODELS = Models(EndPoint=endpoint.CompactEndPoint, Node=node.CompactNode,
+                        Edge=edge.CompactEdge, TCPFlow=flow.CompactTCPFlow,
+                        IPInfo=ipinfo.CompactIPInfo, Stats=metrics.CompactStats,
+                        WirelessMetrics=metrics.CompactWirelessMetrics,
+                        TCPMetrics=metrics.CompactTCPMetrics)
+
+
+def get_models(compact=False):
+    return COMPACT_MODELS if compact else DEFAULT_MODELS
@@ -2,9 +2,21 @@
 Node: A device that has multiple endpoints, such as a smartphone, laptop, a 
 network router, gateway, cable modem etc. A node can either route or bridge packets 
 or generate/consume them (via applications) or both.
+
+node_ids are handed out by a node ID allocator, a callable taking the new
+node and returning its ID. The default CounterAllocator numbers nodes from a
+random per-allocator base, so IDs from different processes do not collide;
+StableAllocator derives the ID from the primary MAC or IP of the node, so the
+same device has the same node_id in every window and summaries can be joined
+on it. Parsers pass their own allocator to Node (id_allocator);
+set_id_allocator() switches the default used by other nodes.
 """
 import enum
-import uuid
+import itertools
+import random
+
+import dobby.nwmodel.phymodel as phymodel
+import dobby.utils.compact as compact
 
 __author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
 
@@ -27,12 +39,97 @@ class NodeType(enum.Enum):
   CLOUD_IP = 14
   ALL_GENERIC = 15
 
+# CounterAllocator IDs: a random prefix of PREFIX_BITS above a counter of COUNTER_BITS
+PREFIX_BITS = 31
+COUNTER_BITS = 32
+
+class CounterAllocator(object):
+    """Monotonic integer node IDs. next() of an itertools.count is atomic, so
+    it can be shared between threads.
+
+    The IDs are prefix + start, prefix + start + 1, ...; by default prefix is
+    a random multiple of 2**32, so the IDs of allocators in different
+    processes (or managers) do not collide.
+    """
+    def __init__(self, start=1, prefix=None):
+        if prefix is None:
+            prefix = random.SystemRandom().getrandbits(PREFIX_BITS) << COUNTER_BITS
+        self.prefix = prefix
+        self._counter = itertools.count(prefix + start)
+
+    def __call__(self, node):
+        return next(self._counter)
+
+
+class StableAllocator(object):
+    """node IDs derived from the first MAC of the endpoints of a node, or
+    failing that their first IP: 'mac:aa:bb:cc:dd:ee:ff' or 'ip:10.0.0.1'.
+    Nodes with neither get an ID from fallback ('node:<n>' by default).
+
+    The IDs of MACs are cached, as the same devices come back every window.
+    """
+    def __init__(self, fallback=None):
+        self.fallback = fallback if fallback is not None else CounterAllocator()
+        self._mac_ids = {}
+
+    def __call__(self, node):
+        endpoints = node.endpoints
+        mac = phymodel.mac_value(endpoints[0]) if endpoints else None
+        if mac is not None:
+            node_id = self._mac_ids.get(mac, None)
+            if node_id is None:
+                node_id = self._mac_ids[mac] = stable_node_id(endpoints[:1])
+            return node_id
+        node_id = stable_node_id(endpoints)
+        return node_id if node_id is not None else 'node:{0}'.format(self.fallback(node))
+
+
+def stable_node_id(endpoints):
+    """Stable ID of a node with endpoints, None if none has a MAC or an IP.
+    """
+    for endpoint in endpoints:
+        mac = phymodel.mac_value(endpoint)
+        if mac is not None:
+            return 'mac:{0}'.format(phymodel.format_mac(mac))
+    for endpoint in endpoints:
+        for ip_info in endpoint.ip_infos.values():
+            address = ip_info.ipv4address if ip_info.ipv4address is not None else ip_info.ipv6address
+            if address is not None:
+                return 'ip:{0}'.format(address)
+    return None
+
+ALLOCATORS = {'counter': CounterAllocator, 'stable': StableAllocator}
+
+def make_id_allocator(allocator=None):
+    """A node ID allocator: a new one for a name in ALLOCATORS or None (a
+    CounterAllocator), allocator itself for a callable.
+    """
+    if allocator is None:
+        return CounterAllocator()
+    if isinstance(allocator, str):
+        return ALLOCATORS[allocator]()
+    return allocator
+
+_id_allocator = CounterAllocator()
+
+def get_id_allocator():
+    return _id_allocator
+
+def set_id_allocator(allocator):
+    """Use allocator (a callable or a name in ALLOCATORS) for the IDs of new
+    nodes; returns the previous allocator.
+    """
+    global _id_allocator
+    previous, _id_allocator = _id_allocator, make_id_allocator(allocator)
+    return previous
+
+
 class Node(object):
     """
     Base class for a network node.
 
     Node: {
-      Uint64 nodeId // Primary key: an ID for this node. Can be a random UUID.
+      Uint64 nodeId // Primary key: an ID for this node, from the node ID allocator.
         Endpoint endpoints[]  // a list of endpoints.
         InternalEdge internalEdges[] // list of internal edges bet endpoints above.
         // used to represent routing, bridging, firewalling,
@@ -45,19 +142,27 @@ class Node(object):
 
     }
     """
+    # Attributes set by the constructor, the __slots__ of the compact variant
+    INSTANCE_FIELDS = ('node_type', 'node_name', 'endpoints', 'node_id', 'apps', 'flows')
+
     def __init__(self, endpoints=None, node_type=NodeType.UNKNOWN, node_name=None,
-                 apps=None, flows=None, **kwargs):
-        #Generate a random uuid
-        self.node_id = uuid.uuid4()
+                 apps=None, flows=None, node_id=None, id_allocator=None, **kwargs):
         self.node_type = node_type
         self.node_name = node_name
         self.endpoints = endpoints if endpoints else []
+        if node_id is None:
+            # id_allocator: the allocator of the parser creating the node
+            node_id = (id_allocator if id_allocator is not None else _id_allocator)(self)
+        self.node_id = node_id
         self.apps = apps if apps else []
         self.flows = flows if flows else []
-        self.__dict__.update(kwargs)
+        compact.update_attributes(self, kwargs)
 
     def add_endpoints(self, endpoints):
         self.endpoints.extend(endpoints)
 
     def add_flows(self, flows):
         self.flows.extend(flows)
+
+# __slots__ variant, see dobby.utils.compact
+CompactNode = compact.compact_class(Node)
@@ -0,0 +1,215 @@
+"""Vendor of a MAC address from the IEEE registries.
+
+The IEEE assigns MAC blocks of three sizes, each in its own registry: MA-L
+(the OUI, a 24-bit prefix, oui.csv), MA-M (28 bits, mam.csv) and MA-S (36
+bits, oui36.csv). OUIResolver loads any of them, as the IEEE CSV files
+(Registry,Assignment,Organization Name,Organization Address), the IEEE
+oui.txt listing ('00-22-72   (hex)    Vendor') or a Wireshark manuf file
+('00:1B:C5:00:00/36<TAB>Short<TAB>Vendor').
+
+The prefixes of each length are kept in a sorted array('Q') with a parallel
+array of vendor numbers, about 12 bytes per assignment, and a MAC is
+resolved by bisecting them longest prefix first, so a MA-M or MA-S block
+wins over the OUI it was carved from. resolve_many() also remembers the
+OUIs without smaller blocks, so a batch of MACs costs one dict lookup per
+MAC whose OUI was already seen.
+"""
+import array
+import bisect
+import csv
+import io
+import itertools
+import re
+
+import dobby.nwmodel.phymodel as phymodel
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+# Prefix lengths of the MA-S, MA-M and MA-L registries, longest first
+PREFIX_BITS = (36, 28, 24)
+OUI_BITS = 24
+MAC_BITS = 48
+
+HEX_LINE_RE = re.compile(r'^\s*([0-9A-Fa-f]{2}(?:-[0-9A-Fa-f]{2}){2})\s+\(hex\)\s+(.*?)\s*$')
+MANUF_PREFIX_RE = re.compile(r'^([0-9A-Fa-f]{2}(?:[:.-]?[0-9A-Fa-f]{2}){2,5})(?:/(\d+))?$')
+
+
+def _prefix(digits, bits=None):
+    """(bits, prefix) of the hex digits of an assignment, None if bits is
+    not a registry prefix length.
+    """
+    if bits is None:
+        bits = len(digits) * 4
+    if bits not in PREFIX_BITS or len(digits) * 4 < bits:
+        return None
+    return bits, int(digits, 16) >> (len(digits) * 4 - bits)
+
+def _digits(assignment):
+    return re.sub('[^0-9A-Fa-f]', '', assignment)
+
+def iter_registry(stream):
+    """(bits, prefix, vendor) of the assignments in a registry stream.
+    """
+    lines = iter(stream)
+    first_line = next(lines, '')
+    if first_line.startswith('Registry,'):
+        for row in csv.reader(lines):
+            if len(row) >= 3 and re.match('^[0-9A-Fa-f]+$', row[1]):
+                prefix = _prefix(row[1])
+                if prefix is not None:
+                    yield prefix + (row[2].strip(),)
+        return
+    for line in itertools.chain([first_line], lines):
+        match = HEX_LINE_RE.match(line)
+        if match:
+            yield _prefix(_digits(match.group(1))) + (match.group(2),)
+            continue
+        fields = line.split('#', 1)[0].rstrip().split('\t')
+        match = MANUF_PREFIX_RE.match(fields[0].strip())
+        if len(fields) < 2 or not match:
+            continue
+        bits = int(match.group(2)) if match.group(2) else OUI_BITS
+        prefix = _prefix(_digits(match.group(1)), bits)
+        if prefix is not None:
+            # manuf files have a short name and usually the full one
+            yield prefix + ((fields[2] if len(fields) > 2 and fields[2] else fields[1]).strip(),)
+
+
+class OUIResolver(object):
+    """Vendors of MAC addresses from one or more registry files (paths or
+    text streams), see the module docstring.
+    """
+    def __init__(self, registries=()):
+        if isinstance(registries, str) or hasattr(registries, 'read'):
+            registries = [registries]
+        self.vendors = []
+        self._vendor_ids = {}
+        self._assignments = dict((bits, {}) for bits in PREFIX_BITS)
+        self._tables = []
+        self._oui_tables = []
+        self._split_ouis = frozenset()
+        self._oui_vendors = {}
+        self._misses = set()
+        for registry in registries:
+            self.load(registry)
+
+    def __len__(self):
+        return sum(len(prefixes) for bits, shift, prefixes, vendor_ids in self._tables)
+
+    def load(self, registry):
+        """Add the assignments of a registry file (path or text stream).
+        """
+        if isinstance(registry, str):
+            with io.open(registry, encoding='utf-8', errors='replace', newline='') as stream:
+                self.add_assignments(iter_registry(stream))
+        else:
+            self.add_assignments(iter_registry(registry))
+
+    def add_assignments(self, assignments):
+        """Add (bits, prefix, vendor) assignments and rebuild the index.
+        """
+        for bits, prefix, vendor in assignments:
+            vendor_id = self._vendor_ids.get(vendor, None)
+            if vendor_id is None:
+                vendor_id = self._vendor_ids[vendor] = len(self.vendors)
+                self.vendors.append(vendor)
+            self._assignments[bits][prefix] = vendor_id
+        self._build()
+
+    def _build(self):
+        self._tables = []
+        for bits in PREFIX_BITS:
+            assignments = self._assignments[bits]
+            if not assignments:
+                continue
+            prefixes = sorted(assignments)
+            self._tables.append((bits, MAC_BITS - bits, array.array('Q', prefixes),
+                                 array.array('I', [assignments[prefix] for prefix in prefixes])))
+        self._oui_tables = [table for table in self._tables if table[0] == OUI_BITS]
+        # Only the OUIs with MA-M or MA-S blocks need the longer prefixes looked up
+        self._split_ouis = frozenset(prefix >> (bits - OUI_BITS)
+                                     for bits in PREFIX_BITS if bits != OUI_BITS
+                                     for prefix in self._assignments[bits])
+        self._oui_vendors = {}
+        self._misses = set()
+
+    def resolve(self, mac):
+        """Vendor of a MAC (integer, string or PhysicalAddress), None if it
+        is not assigned in the loaded registries.
+        """
+        value = phymodel.mac_value(mac)
+        if value is None:
+            return None
+        tables = self._tables if value >> (MAC_BITS - OUI_BITS) in self._split_ouis else self._oui_tables
+        for bits, shift, prefixes, vendor_ids in tables:
+            prefix = value >> shift
+            position = bisect.bisect_left(prefixes, prefix)
+            if position < len(prefixes) and prefixes[position] == prefix:
+                return self.vendors[vendor_ids[position]]
+        return None
+
+    def resolve_many(self, macs):
+        """Vendors of macs, in order (None where unknown).
+        """
+        oui_vendors = self._oui_vendors
+        split_ouis = self._split_ouis
+        vendors = []
+        for mac in macs:
+            value = phymodel.mac_value(mac)
+            if value is None:
+                vendors.append(None)
+                continue
+            oui = value >> (MAC_BITS - OUI_BITS)
+            if oui in split_ouis:
+                vendors.append(self.resolve(value))
+                continue
+            try:
+                vendors.append(oui_vendors[oui])
+            except KeyError:
+                vendor = oui_vendors[oui] = self.resolve(value)
+                vendors.append(vendor)
+        return vendors
+
+    def _vendors(self, entries):
+        # (position, vendor) of the entries without a vendor whose MAC resolves
+        misses = self._misses
+        unlabelled = []
+        for position, entry in enumerate(entries):
+            if entry is None or getattr(entry, 'vendor', None) is not None:
+                continue
+            value = phymodel.mac_value(entry.mac if isinstance(entry, phymodel.WifiPhysicalModel) else entry)
+            if value is not None and value not in misses:
+                unlabelled.append((position, value))
+        vendors = []
+        for (position, value), vendor in zip(unlabelled, self.resolve_many([value for position, value in unlabelled])):
+            if vendor is None:
+                misses.add(value)
+            else:
+                vendors.append((position, vendor))
+        return vendors
+
+    def label(self, entries):
+        """Set the vendor of the endpoints (by phy_address) and wifi models
+        (by mac) without one; returns the number labelled. MACs already
+        looked up in vain are skipped.
+        """
+        entries = list(entries)
+        vendors = self._vendors(entries)
+        for position, vendor in vendors:
+            entries[position].vendor = vendor
+        return len(vendors)
+
+    def label_summary(self, network_summary):
+        """Label the endpoint MACs and BSSIDs of a network summary. Endpoints
+        and wifi models inherited from a frozen summary are copied first.
+        """
+        endpoints = list(network_summary.mac_to_endpoints.values())
+        endpoint_vendors = self._vendors(endpoints)
+        for position, vendor in endpoint_vendors:
+            network_summary.owned_endpoint(endpoints[position]).update_vendor(vendor)
+        model_keys = [key for key, phy_model in network_summary.phy_models.items()
+                      if isinstance(phy_model, phymodel.WifiPhysicalModel)]
+        model_vendors = self._vendors([network_summary.phy_models[key] for key in model_keys])
+        for position, vendor in model_vendors:
+            network_summary.phy_models.owned(model_keys[position]).vendor = vendor
+        return len(endpoint_vendors) + len(model_vendors)
@@ -4,16 +4,83 @@ PhyModel:  A data structure that captures a physical layer and the networking as
 """
 import re
 import time
+import warnings
+import weakref
 from collections import Counter
 import enum
 
 __author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
 
 
+MAC_RE = re.compile("[0-9a-f]{2}([-:])[0-9a-f]{2}(\\1[0-9a-f]{2}){4}$", re.IGNORECASE)
+MAX_MAC = (1 << 48) - 1
+
+# Process wide tables: MAC strings already parsed (cleared when it holds
+# MAX_PARSED_MACS of them) and the single PhysicalAddress instance of every
+# MAC in use, dropped with its last reference
+MAX_PARSED_MACS = 1 << 16
+_parsed_macs = {}
+_interned_addresses = weakref.WeakValueDictionary()
+# Vendors given to addresses with the deprecated vendor argument or
+# update_vendor(), see address_vendor
+_address_vendors = weakref.WeakKeyDictionary()
+
+
 def check_mac(mac_to_check):
     if not mac_to_check:
         return False
-    return re.match("[0-9a-f]{2}([-:])[0-9a-f]{2}(\\1[0-9a-f]{2}){4}$", mac_to_check.lower())
+    return MAC_RE.match(mac_to_check)
+
+def parse_mac(mac):
+    """Return a MAC string (AA:BB:CC:DD:EE:FF or AA-BB-...) as a 48-bit
+    integer, None if it is not a MAC.
+    """
+    value = _parsed_macs.get(mac, None)
+    if value is None:
+        if not isinstance(mac, str) or not check_mac(mac):
+            return None
+        value = int(mac.replace(mac[2], ''), 16)
+        if len(_parsed_macs) >= MAX_PARSED_MACS:
+            _parsed_macs.clear()
+        _parsed_macs[mac] = value
+    return value
+
+def format_mac(value):
+    """Inverse of parse_mac: lower case, colon separated.
+    """
+    hex_mac = '{0:012x}'.format(value)
+    return ':'.join(hex_mac[i:i + 2] for i in range(0, 12, 2))
+
+def mac_value(address):
+    """48-bit integer of a MAC given as an integer, a string, a
+    PhysicalAddress or an endpoint with a phy_address; None otherwise.
+    """
+    if address is None or isinstance(address, int):
+        return address
+    if isinstance(address, str):
+        return parse_mac(address)
+    if isinstance(address, PhysicalAddress):
+        return address.value
+    return getattr(getattr(address, 'phy_address', None), 'value', None)
+
+def address_vendor(address):
+    """Vendor set on a PhysicalAddress with the deprecated vendor argument or
+    update_vendor(), None otherwise. EndPoint and WifiPhysicalModel start
+    with it when they are not given a vendor.
+    """
+    if not _address_vendors or not isinstance(address, PhysicalAddress):
+        return None
+    return _address_vendors.get(address, None)
+
+def _warn_address_vendor():
+    warnings.warn("the vendor of a PhysicalAddress is deprecated, set the vendor of its "
+                  "EndPoint or WifiPhysicalModel instead", DeprecationWarning, stacklevel=3)
+
+def _unpickle_address(value, vendor=None):
+    # vendor: snapshots written when addresses carried one
+    if value is None:
+        return PhysicalAddress.__new__(PhysicalAddress, _invalid=True)
+    return PhysicalAddress(value)
 
 class PhysicalAddress(object):
     """
@@ -23,29 +90,82 @@ class PhysicalAddress(object):
       UInt48 phy_address;
     }
 
+    Addresses are held as 48-bit integers (value) and interned: constructing
+    the same MAC twice returns the same object, so its string is parsed once
+    per process. The string form (phy_address, str()) is built on demand.
+    Interned addresses are shared by every summary and are immutable; the
+    vendor of an interface is kept by its EndPoint (or WifiPhysicalModel).
+    The vendor argument, vendor and update_vendor() of an address are
+    deprecated: they record a default vendor for the endpoints and wifi
+    models created with the address later on (address_vendor).
     """
+    __slots__ = ('value', '__weakref__')
 
-    def __init__(self, phy_address=None, vendor=None):
+    def __new__(cls, phy_address=None, vendor=None, _invalid=False):
         """Initialize an address and its attributes.
         Parameters
         ----------
-        phy_address : input Ethernet Address
-        attr : keyword arguments, optional (default= no attributes)
-          Attributes to add to graph as key=value pairs.
+        phy_address : input Ethernet Address, or the address as an integer
+        vendor : deprecated, see update_vendor
         """
-        if not check_mac(phy_address):
-          print('Incorrect format of input mac, should be (AA:BB:CC:DD:EE:FF). Input={0}'.format(phy_address))
-          self.phy_address = None
+        value = None
+        if not _invalid:
+            if isinstance(phy_address, int) and not isinstance(phy_address, bool):
+                value = phy_address if 0 <= phy_address <= MAX_MAC else None
+            else:
+                value = parse_mac(phy_address)
+            if value is None:
+                print('Incorrect format of input mac, should be (AA:BB:CC:DD:EE:FF). Input={0}'.format(phy_address))
+        if value is None:
+            address = object.__new__(cls)
+            object.__setattr__(address, 'value', None)
         else:
-            self.phy_address = phy_address.lower().replace("-",":")
-        self.vendor = vendor
-        #self.__dict__.update((k,v) for k,v in locals().iteritems() if k != 'self')
+            address = _interned_addresses.get(value, None)
+            if address is None:
+                address = object.__new__(cls)
+                object.__setattr__(address, 'value', value)
+                address = _interned_addresses.setdefault(value, address)
+        if vendor is not None:
+            _warn_address_vendor()
+            _address_vendors[address] = vendor
+        return address
+
+    @property
+    def vendor(self):
+        return address_vendor(self)
+
+    def update_vendor(self, vendor):
+        """Deprecated: set the vendor of the EndPoint or WifiPhysicalModel
+        of the interface instead. The vendor is only used as the default of
+        the endpoints and wifi models created with this address afterwards.
+        """
+        _warn_address_vendor()
+        _address_vendors[self] = vendor
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PhysicalAddress is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("PhysicalAddress is immutable")
+
+    def __reduce__(self):
+        # Re-intern when unpickled, e.g. in a process pool's parent
+        return _unpickle_address, (self.value,)
+
+    @property
+    def phy_address(self):
+        return format_mac(self.value) if self.value is not None else None
+
+    def __int__(self):
+        return self.value
 
     def __hash__(self):
-        return hash(self.phy_address)
+        return hash(self.value)
 
     def __eq__(self, other):
-        return (self.phy_address) == (other.phy_address)
+        if isinstance(other, PhysicalAddress):
+            return self.value == other.value
+        return NotImplemented
 
     def __ne__(self, other):
         # Not strictly necessary, but to avoid having both x==y and x!=y
@@ -58,11 +178,8 @@ class PhysicalAddress(object):
     def __repr__(self):
         return self.__str__()
 
-    def update_vendor(self, vendor):
-        self.vendor = vendor
-
     def __gt__(self, other):
-        return self.phy_address > other.phy_address
+        return self.value > other.value
 
 @enum.unique
 class PhysicalModelTypes(enum.Enum):
@@ -112,11 +229,12 @@ class WifiPhysicalModel(PhysicalModel):
       .. any other metrics ..
     }
     """
-    def __init__(self, mac, ssid=None, channel=0, clients=[], interferers=[], **kwargs):
+    def __init__(self, mac, ssid=None, channel=0, clients=[], interferers=[], vendor=None, **kwargs):
         """Initialize a wireless model and its related attributes.
         Parameters
         ----------
         mac: AP's MAC Address
+        vendor: vendor of the AP's interface
         attr : keyword arguments, optional (default= no attributes)
           Attributes to add to graph as key=value pairs.
         """
@@ -128,6 +246,7 @@ class WifiPhysicalModel(PhysicalModel):
         self.channel = channel
         self.last_seen = time.time()
         self.mac = mac
+        self.vendor = vendor if vendor is not None else address_vendor(mac)
         self.clients.update(clients)
         self.interferers.update(interferers)
         self.__dict__.update(kwargs)
@@ -5,6 +5,7 @@ import dobby.nwmodel.edge as edgemodel
 import dobby.nwmodel.phymodel as phymodel
 import dobby.nwmodel.node as node
 import dobby.nwmodel.ipinfo as ipinfo
+import dobby.utils.keys as keys
 import unittest
 
 __author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
@@ -15,7 +16,7 @@ class TestEndPoint(unittest.TestCase):
         self.mac = phymodel.PhysicalAddress(phy_address='AA:BB:CC:DD:EE:FF')
         self.phy_model = phymodel.WifiPhysicalModel(mac=self.mac)
         self.ip_info = ipinfo.IPInfo(ipv4address='192.168.1.1')
-        self.ip_infos = {'192.168.1.1':self.ip_info}
+        self.ip_infos = {keys.ip_key('192.168.1.1'):self.ip_info}
         self.node_id = '123456'
         self.endpoint = endpoint.EndPoint()
 
@@ -5,6 +5,7 @@ import dobby.nwmodel.endpoint as endpoint
 import dobby.nwmodel.node as node
 import dobby.nwmodel.flow as flow
 import dobby.nwmodel.ipinfo as ipinfo
+import dobby.utils.keys as keys
 import unittest
 
 __author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
@@ -15,7 +16,7 @@ class TestNode(unittest.TestCase):
         self.mac = phymodel.PhysicalAddress(phy_address='AA:BB:CC:DD:EE:FF')
         self.phy_model = phymodel.WifiPhysicalModel(mac=self.mac)
         self.ip_info = ipinfo.IPInfo(ipv4address='192.168.1.1')
-        self.ip_infos = {'192.168.1.1':self.ip_info}
+        self.ip_infos = {keys.ip_key('192.168.1.1'):self.ip_info}
         self.node_id = '123456'
         self.endpoint = endpoint.EndPoint(phy_address=self.mac, ip_info=self.ip_info)
         self.node = node.Node(endpoints=[self.endpoint],
@@ -49,6 +50,41 @@ class TestNode(unittest.TestCase):
         self.node.add_flows(flows=[flow.Flow(), flow.Flow()])
         self.assertEqual(len(self.node.flows), 2)
 
+    def test_counter_ids_are_unique(self):
+        node_ids = set(node.Node().node_id for _ in range(100))
+        self.assertEqual(len(node_ids), 100)
+        allocator = node.CounterAllocator(start=7, prefix=0)
+        self.assertEqual([allocator(self.node), allocator(self.node)], [7, 8])
+        # Every allocator starts from its own random prefix
+        first, second = node.CounterAllocator(), node.CounterAllocator()
+        self.assertNotEqual(first.prefix, second.prefix)
+        self.assertEqual(first(self.node), first.prefix + 1)
+        self.assertEqual(node.Node(id_allocator=second).node_id, second.prefix + 1)
+
+    def test_explicit_node_id(self):
+        self.assertEqual(node.Node(node_id=self.node_id).node_id, self.node_id)
+
+    def test_stable_ids_follow_the_primary_address(self):
+        allocator = node.StableAllocator()
+        self.assertEqual(allocator(self.node), 'mac:aa:bb:cc:dd:ee:ff')
+        same_device = node.Node(endpoints=[endpoint.EndPoint(phy_address=self.mac)], node_id=0)
+        self.assertEqual(allocator(same_device), allocator(self.node))
+        ip_node = node.Node(endpoints=[endpoint.EndPoint(ip_info=self.ip_info)], node_id=0)
+        self.assertEqual(allocator(ip_node), 'ip:192.168.1.1')
+        mixed_node = node.Node(endpoints=[endpoint.EndPoint(ip_info=self.ip_info),
+                                          endpoint.EndPoint(phy_address=self.mac)], node_id=0)
+        self.assertEqual(allocator(mixed_node), 'mac:aa:bb:cc:dd:ee:ff')
+        self.assertTrue(allocator(node.Node(node_id=0)).startswith('node:'))
+
+    def test_set_id_allocator(self):
+        previous = node.set_id_allocator('stable')
+        try:
+            self.assertEqual(node.Node(endpoints=[self.endpoint]).node_id, 'mac:aa:bb:cc:dd:ee:ff')
+            self.assertEqual(node.CompactNode(endpoints=[self.endpoint]).node_id, 'mac:aa:bb:cc:dd:ee:ff')
+        finally:
+            self.assertIsInstance(node.set_id_allocator(previous), node.StableAllocator)
+        self.assertIs(node.get_id_allocator(), previous)
+
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromTestCase(TestNode)
     unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import tempfile
+import unittest
+
+import dobby.nwinfo.networksummary as networksummary
+import dobby.nwmodel.endpoint as endpoint
+import dobby.nwmodel.oui as oui
+import dobby.nwmodel.phymodel as phymodel
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+IEEE_CSV = '''Registry,Assignment,Organization Name,Organization Address
+MA-L,002272,American Micro-Fuel Device Corp.,"2181 Buchanan Loop Ferndale WA US 98248"
+MA-L,8C1F64,IEEE Registration Authority,"445 Hoes Lane Piscataway NJ US 08554"
+MA-S,8C1F64ABC,"Small Devices, Inc.",Somewhere
+MA-M,1C8259D,Medium Inc,Somewhere
+'''
+
+IEEE_TXT = '''OUI/MA-L\t\t\t\t\t\t\tOrganization
+company_id\t\t\t\t\t\t\tOrganization
+\t\t\t\t\t\t\t\tAddress
+
+1C-82-59   (hex)\t\tBig Co
+1C8259     (base 16)\t\tBig Co
+\t\t\t\t2181 Buchanan Loop
+'''
+
+MANUF = '''# Wireshark manuf file
+00:00:0C\tCisco\tCisco Systems, Inc
+00:1B:C5:00:00/36\tConverg\tConverging Systems Inc.
+00:55:DA:00/28\tShort
+'''
+
+
+class TestOUIResolver(unittest.TestCase):
+    def setUp(self):
+        self.resolver = oui.OUIResolver([io.StringIO(IEEE_CSV), io.StringIO(IEEE_TXT)])
+
+    def test_registry_formats_are_loaded(self):
+        self.assertEqual(len(self.resolver), 5)
+        self.assertEqual(self.resolver.resolve('00:22:72:00:00:01'), 'American Micro-Fuel Device Corp.')
+        self.assertEqual(self.resolver.resolve(0x1c8259000001), 'Big Co')
+        manuf = oui.OUIResolver(io.StringIO(MANUF))
+        self.assertEqual(len(manuf), 3)
+        self.assertEqual(manuf.resolve('00:00:0c:11:22:33'), 'Cisco Systems, Inc')
+        self.assertEqual(manuf.resolve('00:1b:c5:00:00:05'), 'Converging Systems Inc.')
+        self.assertIsNone(manuf.resolve('00:1b:c5:00:10:05'))
+        self.assertEqual(manuf.resolve('00:55:da:01:00:00'), 'Short')
+
+    def test_longest_prefix_wins(self):
+        self.assertEqual(self.resolver.resolve('8c:1f:64:ab:c1:23'), 'Small Devices, Inc.')
+        self.assertEqual(self.resolver.resolve('8c:1f:64:ab:d1:23'), 'IEEE Registration Authority')
+        self.assertEqual(self.resolver.resolve('1c:82:59:d0:00:00'), 'Medium Inc')
+        self.assertEqual(self.resolver.resolve('1c:82:59:e0:00:00'), 'Big Co')
+        self.assertIsNone(self.resolver.resolve('ff:ff:ff:00:00:00'))
+        self.assertIsNone(self.resolver.resolve(None))
+
+    def test_resolve_many_matches_resolve(self):
+        macs = ['8c:1f:64:ab:c1:23', '8c:1f:64:00:00:01', None, '00:22:72:00:00:01',
+                '00:22:72:00:00:02', 'ff:ff:ff:00:00:00', 0x1c8259d00000, 0x1c8259e00000]
+        expected = [self.resolver.resolve(mac) for mac in macs]
+        self.assertEqual(self.resolver.resolve_many(macs), expected)
+        self.assertEqual(self.resolver.resolve_many(macs), expected)
+
+    def test_registry_file_is_loaded(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'oui.csv')
+            with open(path, 'w') as registry:
+                registry.write(IEEE_CSV)
+            resolver = oui.OUIResolver(path)
+        self.assertEqual(resolver.resolve('00:22:72:00:00:01'), 'American Micro-Fuel Device Corp.')
+
+    def test_summary_addresses_are_labelled(self):
+        known = phymodel.PhysicalAddress('00:22:72:0a:0b:0c')
+        unknown = phymodel.PhysicalAddress('ff:ff:ff:0a:0b:0c')
+        bssid = phymodel.PhysicalAddress('1c:82:59:d0:0b:0c')
+        labelled = phymodel.PhysicalAddress('00:22:72:0a:0b:0d')
+        endpoints = dict((address.value, endpoint.EndPoint(phy_address=address))
+                         for address in [known, unknown, labelled])
+        endpoints[labelled.value].update_vendor('From click')
+        wifi_model = phymodel.WifiPhysicalModel(mac=bssid, channel=1)
+        network_summary = networksummary.NetworkSummary(mac_to_endpoints=endpoints,
+                                                        phy_models={(bssid.value, 1): wifi_model})
+        self.assertEqual(self.resolver.label_summary(network_summary), 2)
+        self.assertEqual(endpoints[known.value].vendor, 'American Micro-Fuel Device Corp.')
+        self.assertEqual(wifi_model.vendor, 'Medium Inc')
+        self.assertEqual(endpoints[labelled.value].vendor, 'From click')
+        self.assertIsNone(endpoints[unknown.value].vendor)
+        self.assertEqual(self.resolver.label_summary(network_summary), 0)
+        # The interned addresses are not labelled
+        self.assertIsNone(known.vendor)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestOUIResolver)
+    unittest.TextTestRunner(verbosity=2).run(suite)
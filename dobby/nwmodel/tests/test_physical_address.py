@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 
-import dobby.nwmodel.phymodel as phymodel
+import gc
+import pickle
 import unittest
 
+import dobby.nwmodel.endpoint as endpoint
+import dobby.nwmodel.phymodel as phymodel
+
 __author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
 
 
@@ -33,8 +37,42 @@ class TestPhysicalAddress(unittest.TestCase):
 
     def test_updating_vendor_works(self):
         new_vendor = 'foo'
-        self.phy_address.update_vendor(new_vendor)
-        self.assertEqual(self.phy_address.vendor, new_vendor)
+        phy_address = phymodel.PhysicalAddress(phy_address='AA:BB:CC:00:00:0F')
+        self.addCleanup(phymodel._address_vendors.pop, phy_address, None)
+        with self.assertWarns(DeprecationWarning):
+            phy_address.update_vendor(new_vendor)
+        self.assertEqual(phy_address.vendor, new_vendor)
+        # The endpoints and wifi models of the address start with its vendor
+        self.assertEqual(endpoint.EndPoint(phy_address=phy_address).vendor, new_vendor)
+        self.assertEqual(phymodel.WifiPhysicalModel(mac=phy_address).vendor, new_vendor)
+        self.assertEqual(endpoint.EndPoint(phy_address=phy_address, vendor='bar').vendor, 'bar')
+        with self.assertWarns(DeprecationWarning):
+            self.assertIs(phymodel.PhysicalAddress('aa:bb:cc:00:00:0f', vendor='baz'), phy_address)
+        self.assertEqual(phy_address.vendor, 'baz')
+        self.assertIsNone(self.phy_address.vendor)
+
+    def test_interned_addresses_are_immutable(self):
+        self.assertRaises(AttributeError, setattr, self.phy_address, 'vendor', 'foo')
+        self.assertRaises(AttributeError, setattr, self.phy_address, 'value', 1)
+        self.assertEqual(self.phy_address.value, 0xaabbccddeeff)
+
+    def test_physical_addresses_are_interned(self):
+        self.assertIs(self.phy_address, phymodel.PhysicalAddress(phy_address='aa-bb-cc-dd-ee-ff'))
+        self.assertIs(self.phy_address, phymodel.PhysicalAddress(0xaabbccddeeff))
+        self.assertIs(self.phy_address, pickle.loads(pickle.dumps(self.phy_address)))
+        # Addresses no longer in use are dropped from the table
+        value = phymodel.PhysicalAddress('aa:bb:cc:00:00:01').value
+        gc.collect()
+        self.assertNotIn(value, phymodel._interned_addresses)
+        self.assertIn(self.phy_address.value, phymodel._interned_addresses)
+
+    def test_physical_address_is_an_integer(self):
+        self.assertEqual(self.phy_address.value, 0xaabbccddeeff)
+        self.assertEqual(int(self.phy_address), 0xaabbccddeeff)
+        self.assertEqual(phymodel.parse_mac('00:00:00:00:00:01'), 1)
+        self.assertEqual(phymodel.format_mac(1), '00:00:00:00:00:01')
+        self.assertIsNone(phymodel.parse_mac('00:00:00:00:00'))
+        self.assertIsNone(phymodel.PhysicalAddress(1 << 48).value)
 
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromTestCase(TestPhysicalAddress)
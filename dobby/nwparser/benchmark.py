@@ -0,0 +1,256 @@
+"""Throughput benchmarks of the summary parsers.
+
+run() writes a synthetic window (synthetic.SummaryGenerator) of a given
+scale to a directory and parses it with each benchmarked case:
+
+    wireless, node, tcpmystery, tcploss   the parser of that summary alone
+    parse_manager                         ParseManager.parse_summary of all four
+
+Every case is timed repeat times (the best and mean time are kept) and then
+run once more under tracemalloc for its peak memory. objects is the number
+of gc tracked objects still alive after that run, i.e. the size of the
+summary built. The results are a JSON document that can be saved as a
+baseline and compared with a later run:
+
+    results = benchmark.run('medium')
+    benchmark.save_results(results, 'baseline.json')
+    regressions = benchmark.compare(benchmark.run('medium'), benchmark.load_results('baseline.json'))
+
+or from the command line, 'dobby bench --scale medium --baseline
+baseline.json --save latest.json', which exits with 1 on a regression.
+
+import_seconds() measures, with python -X importtime, how long a fresh
+interpreter takes to import a dobby module, and check_import_budgets()
+compares the entry points with IMPORT_BUDGETS ('dobby bench --imports').
+"""
+import collections
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import dobby.nwparser.parsemanager as parsemanager
+import dobby.nwparser.parsenodesummary as parsenodesummary
+import dobby.nwparser.parsetcploss as parsetcploss
+import dobby.nwparser.parsetcpmystery as parsetcpmystery
+import dobby.nwparser.parsewirelesssummary as parsewirelesssummary
+import dobby.nwparser.synthetic as synthetic
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+RESULTS_VERSION = 1
+
+# links and flows of the named scales
+SCALES = collections.OrderedDict([
+    ('tiny', {'links': 10, 'flows': 100}),
+    ('small', {'links': 100, 'flows': 2000}),
+    ('medium', {'links': 1000, 'flows': 20000}),
+    ('large', {'links': 10000, 'flows': 200000}),
+    ('huge', {'links': 100000, 'flows': 2000000}),
+])
+
+PARSER_CASES = collections.OrderedDict([
+    (synthetic.WIRELESS_STREAM, parsewirelesssummary.ParseWirelessSummary),
+    (synthetic.NODE_STREAM, parsenodesummary.ParseNodeSummary),
+    (synthetic.TCPMYSTERY_STREAM, parsetcpmystery.ParseTCPMysterySummary),
+    (synthetic.TCPLOSS_STREAM, parsetcploss.ParseTCPLossSummary),
+])
+PARSE_MANAGER_CASE = 'parse_manager'
+CASES = tuple(PARSER_CASES) + (PARSE_MANAGER_CASE,)
+
+# Metrics compared with a baseline; more is worse for all of them
+COMPARED_METRICS = ('seconds', 'peak_bytes')
+DEFAULT_TOLERANCE = 0.25
+
+Regression = collections.namedtuple('Regression', ['case', 'metric', 'baseline', 'value'])
+ImportTime = collections.namedtuple('ImportTime', ['module', 'depth', 'self_micros', 'cumulative_micros'])
+
+# Import time budgets (seconds) of the modules a short lived process starts
+# from: 'import dobby', the command line and a decoding worker. Measured at
+# 0.5ms, 15ms and 40ms on a single core VM.
+IMPORT_BUDGETS = collections.OrderedDict([
+    ('dobby', 0.005),
+    ('dobby.cli', 0.030),
+    ('dobby.nwparser.parsemanager', 0.060),
+])
+
+
+def case_function(case, paths, summary_format):
+    """Callable parsing the window at paths for a case.
+    """
+    if case == PARSE_MANAGER_CASE:
+        return lambda: parsemanager.ParseManager().parse_summary(summary_format=summary_format, **paths)
+    parser_class = PARSER_CASES[case]
+    path = paths['{0}_stream'.format(case)]
+
+    def parse():
+        parser = parser_class()
+        with io.open(path, encoding='utf-8') as stream:
+            if summary_format == parsemanager.XML_FORMAT:
+                return parser.parse_xml(stream)
+            return parser.parse_json_stream(stream)
+    return parse
+
+def measure(function, repeat=3):
+    """Time, peak memory and retained objects of function().
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    objects_before = len(gc.get_objects())
+    tracemalloc.start()
+    try:
+        result = function()
+        current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    objects = len(gc.get_objects()) - objects_before
+    del result
+    return {'seconds': min(times), 'mean_seconds': sum(times) / len(times),
+            'peak_bytes': peak_bytes, 'retained_bytes': current_bytes, 'objects': objects}
+
+def run(scale='small', summary_format=parsemanager.JSON_FORMAT, cases=CASES, repeat=3, seed=0,
+        links=None, flows=None, directory=None):
+    """Benchmark cases on a synthetic window of a named scale (links and flows
+    override it). The window is written to directory, or to a temporary
+    directory removed afterwards.
+    """
+    scale_counts = dict(SCALES[scale])
+    if links is not None:
+        scale_counts['links'] = links
+    if flows is not None:
+        scale_counts['flows'] = flows
+    generator = synthetic.SummaryGenerator(seed=seed, **scale_counts)
+    counts = generator.counts()
+    work_dir = directory if directory is not None else tempfile.mkdtemp(prefix='dobby_bench_')
+    try:
+        start = time.perf_counter()
+        paths = generator.write_window(work_dir, summary_format=summary_format)
+        generate_seconds = time.perf_counter() - start
+        results = collections.OrderedDict()
+        for case in cases:
+            case_results = measure(case_function(case, paths, summary_format), repeat=repeat)
+            items = sum(counts.values()) if case == PARSE_MANAGER_CASE else counts[case]
+            case_results['items'] = items
+            case_results['items_per_sec'] = items / case_results['seconds'] if case_results['seconds'] else None
+            results[case] = case_results
+    finally:
+        if directory is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return {'version': RESULTS_VERSION,
+            'created': time.time(),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'scale': scale, 'links': scale_counts['links'], 'flows': scale_counts['flows'],
+            'format': summary_format, 'seed': seed, 'repeat': repeat,
+            'generate_seconds': generate_seconds,
+            'cases': results}
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Regressions of results against a baseline: the metrics of a case that
+    grew by more than tolerance (a fraction). Runs of different scales or
+    formats are not comparable and raise ValueError.
+    """
+    for key in ('links', 'flows', 'format'):
+        if results.get(key) != baseline.get(key):
+            raise ValueError("Results and baseline differ in {0}: {1} != {2}".format(
+                key, results.get(key), baseline.get(key)))
+    regressions = []
+    for case, case_results in results['cases'].items():
+        baseline_results = baseline['cases'].get(case, None)
+        if baseline_results is None:
+            continue
+        for metric in COMPARED_METRICS:
+            value, baseline_value = case_results.get(metric), baseline_results.get(metric)
+            if value is not None and baseline_value and value > baseline_value * (1 + tolerance):
+                regressions.append(Regression(case=case, metric=metric, baseline=baseline_value, value=value))
+    return regressions
+
+def import_times(module):
+    """ImportTimes of every module imported by a fresh interpreter running
+    'import module', in the order python -X importtime reports them.
+    """
+    env = dict(os.environ)
+    package_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env['PYTHONPATH'] = os.pathsep.join([package_root] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module], env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if process.returncode:
+        raise RuntimeError("Importing {0} failed:\n{1}".format(module, process.stderr))
+    times = []
+    for line in process.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) != 3 or not line.startswith('import time:'):
+            continue
+        try:
+            self_micros, cumulative_micros = int(fields[0].split(':')[1]), int(fields[1])
+        except ValueError:
+            # The header line
+            continue
+        name = fields[2].lstrip()
+        # Nested imports are indented by two spaces per level
+        depth = (len(fields[2]) - len(name) - 1) // 2
+        times.append(ImportTime(module=name.rstrip(), depth=depth,
+                                self_micros=self_micros, cumulative_micros=cumulative_micros))
+    return times
+
+def import_seconds(module, repeat=5):
+    """Median time, over repeat fresh interpreters, spent importing the
+    dobby modules (and everything they import) for 'import module'.
+    """
+    samples = []
+    for _ in range(repeat):
+        samples.append(sum(entry.cumulative_micros for entry in import_times(module)
+                           if entry.depth == 0 and entry.module.split('.')[0] == 'dobby') / 1e6)
+    return statistics.median(samples)
+
+def check_import_budgets(budgets=IMPORT_BUDGETS, repeat=5):
+    """(import seconds of every module of budgets, Regressions of those over budget).
+    """
+    measured = collections.OrderedDict((module, import_seconds(module, repeat=repeat)) for module in budgets)
+    regressions = [Regression(case=module, metric='import_seconds', baseline=budgets[module], value=seconds)
+                   for module, seconds in measured.items() if seconds > budgets[module]]
+    return measured, regressions
+
+def save_results(results, path):
+    with open(path, 'w') as results_file:
+        json.dump(results, results_file, indent=2)
+
+def load_results(path):
+    with open(path) as results_file:
+        results = json.load(results_file)
+    if results.get('version', 0) > RESULTS_VERSION:
+        raise ValueError("Benchmark results version {0} is newer than the supported version {1}".format(
+            results.get('version'), RESULTS_VERSION))
+    return results
+
+def format_results(results, baseline=None):
+    """Text table of results, with the change from baseline when given.
+    """
+    lines = ['{0} links, {1} flows, {2}, best of {3}'.format(results['links'], results['flows'],
+                                                             results['format'], results['repeat']),
+             '{0:<14} {1:>10} {2:>12} {3:>10} {4:>10}'.format('case', 'seconds', 'items/s', 'peak MB', 'objects')]
+    for case, case_results in results['cases'].items():
+        line = '{0:<14} {1:>10.3f} {2:>12.0f} {3:>10.1f} {4:>10d}'.format(
+            case, case_results['seconds'], case_results['items_per_sec'] or 0,
+            case_results['peak_bytes'] / float(1 << 20), case_results['objects'])
+        baseline_results = baseline['cases'].get(case, None) if baseline else None
+        if baseline_results and baseline_results.get('seconds'):
+            line += '  {0:+.1%} time, {1:+.1%} memory'.format(
+                case_results['seconds'] / baseline_results['seconds'] - 1,
+                case_results['peak_bytes'] / float(baseline_results['peak_bytes'] or 1) - 1)
+        lines.append(line)
+    return '\n'.join(lines)
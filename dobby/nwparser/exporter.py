@@ -0,0 +1,256 @@
+"""Prometheus metrics of a running ParseManager.
+
+MetricsExporter serves the Prometheus text format on http://127.0.0.1:<port>/metrics
+from a background thread (http.server, no dependencies):
+
+    exporter = exporter.MetricsExporter(parse_manager, port=9464)
+    exporter.start()
+    ...
+    exporter.stop()
+
+or 'dobby watch --metrics-port 9464 <summary_dir>'. The metrics are
+
+    dobby_windows_parsed_total              windows published
+    dobby_window_parse_seconds              histogram of the parse time of a window
+    dobby_stream_parse_seconds{stream}      histogram of the time spent on each stream of a window
+    dobby_last_window_end_timestamp         end_ts of the latest window
+    dobby_summary_entries{kind}             endpoints, nodes, edges and flows of the latest window
+    dobby_history_summaries                 windows held in summary_queue
+    dobby_history_bytes                     their estimated size (SummaryHistory.nbytes)
+    dobby_parse_errors_total{error}         windows that failed to parse, by exception
+    dobby_decode_failures_total{format}     streams that were not valid JSON or XML
+    dobby_conversion_failures_total{key}    values util.get_float_value could not convert
+
+The values are updated by a summary listener and a report listener when a
+window is published, and by an error listener when one fails to parse,
+from counts the summary keeps anyway (len() of its maps), so a scrape only
+formats numbers and never walks a summary or reads a counter the parsing
+thread updates. Stream times come
+from the instrumentation reports, so the exporter turns instrumentation of
+the ParseManager on.
+"""
+import bisect
+import http.server
+import threading
+
+import dobby.utils.util as util
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 9464
+# Upper bounds (seconds) of the parse time histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('{0}="{1}"'.format(name, escape_label(value)) for name, value in labels) + '}'
+
+def format_value(value):
+    if value is None:
+        return 'NaN'
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram(object):
+    """Prometheus histogram: observation counts per bucket upper bound.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # The last count is the +Inf bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def copy(self):
+        histogram = Histogram(self.buckets)
+        histogram.counts = list(self.counts)
+        histogram.count = self.count
+        histogram.sum = self.sum
+        return histogram
+
+    def lines(self, name, labels=()):
+        """Text format lines of the _bucket, _sum and _count series.
+        """
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            lines.append('{0}_bucket{1} {2}'.format(name, format_labels(tuple(labels) + (('le', format_value(bound)),)),
+                                                    cumulative))
+        lines.append('{0}_sum{1} {2}'.format(name, format_labels(labels), format_value(self.sum)))
+        lines.append('{0}_count{1} {2}'.format(name, format_labels(labels), self.count))
+        return lines
+
+
+class MetricsExporter(object):
+    """Serves the metrics of a ParseManager, see the module docstring.
+    port=0 picks a free port, which is self.port once started.
+    """
+    def __init__(self, parse_manager, host=DEFAULT_HOST, port=DEFAULT_PORT, buckets=DEFAULT_BUCKETS):
+        self.parse_manager = parse_manager
+        self.host = host
+        self.port = port
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.windows_parsed = 0
+        self.last_window_end_ts = None
+        self.entries = {}
+        self.history_summaries = 0
+        self.history_bytes = 0
+        self.window_seconds = Histogram(buckets)
+        self.stream_seconds = {}
+        self.parse_errors, self.decode_failures, self.conversion_failures = self._failures()
+        self.server = None
+        self.thread = None
+        parse_manager.instrument = True
+        parse_manager.add_summary_listener(self.add_summary)
+        parse_manager.add_report_listener(self.add_report)
+        parse_manager.add_error_listener(self.add_parse_error)
+
+    def _failures(self):
+        # Copied in the listeners, on the thread that parses, not on the HTTP thread
+        return (dict(self.parse_manager.parse_errors), dict(util.decode_failures),
+                dict(util.conversion_failures))
+
+    def add_summary(self, network_summary):
+        """Summary listener: record the sizes of a published window.
+        """
+        entries = {'mac_endpoints': len(network_summary.mac_to_endpoints),
+                   'ip_endpoints': len(network_summary.ip_to_endpoints),
+                   'nodes': len(network_summary.nodes),
+                   'edges': len(network_summary.edges),
+                   'flows': len(network_summary.ip_flows)}
+        summary_queue = self.parse_manager.summary_queue
+        failures = self._failures()
+        with self.lock:
+            self.windows_parsed += 1
+            self.last_window_end_ts = network_summary.end_ts
+            self.entries = entries
+            self.history_summaries = len(summary_queue)
+            self.history_bytes = summary_queue.nbytes
+            self.parse_errors, self.decode_failures, self.conversion_failures = failures
+
+    def add_parse_error(self, error):
+        """Error listener: record the error counters after a window failed.
+        """
+        failures = self._failures()
+        with self.lock:
+            self.parse_errors, self.decode_failures, self.conversion_failures = failures
+
+    def add_report(self, report):
+        """Report listener: record the stage times of a window.
+        """
+        stream_seconds = {}
+        for name, stats in report.stages.items():
+            stream = name.rpartition('.')[0]
+            if stream:
+                stream_seconds[stream] = stream_seconds.get(stream, 0.0) + stats.wall
+        with self.lock:
+            self.window_seconds.observe(report.wall)
+            for stream, seconds in stream_seconds.items():
+                if stream not in self.stream_seconds:
+                    self.stream_seconds[stream] = Histogram(self.buckets)
+                self.stream_seconds[stream].observe(seconds)
+
+    def render(self):
+        """The metrics in the Prometheus text format.
+        """
+        with self.lock:
+            windows_parsed = self.windows_parsed
+            last_window_end_ts = self.last_window_end_ts
+            entries = dict(self.entries)
+            history_summaries, history_bytes = self.history_summaries, self.history_bytes
+            window_seconds = self.window_seconds.copy()
+            stream_seconds = dict((stream, histogram.copy()) for stream, histogram in self.stream_seconds.items())
+            parse_errors, decode_failures = self.parse_errors, self.decode_failures
+            conversion_failures = self.conversion_failures
+
+        lines = []
+
+        def metric(name, metric_type, help_text, samples):
+            lines.append('# HELP {0} {1}'.format(name, help_text))
+            lines.append('# TYPE {0} {1}'.format(name, metric_type))
+            for labels, value in samples:
+                lines.append('{0}{1} {2}'.format(name, format_labels(labels), format_value(value)))
+
+        metric('dobby_windows_parsed_total', 'counter', 'Windows parsed and published.',
+               [((), windows_parsed)])
+        lines.append('# HELP dobby_window_parse_seconds Time to parse a window.')
+        lines.append('# TYPE dobby_window_parse_seconds histogram')
+        lines.extend(window_seconds.lines('dobby_window_parse_seconds'))
+        lines.append('# HELP dobby_stream_parse_seconds Time spent on one stream of a window.')
+        lines.append('# TYPE dobby_stream_parse_seconds histogram')
+        for stream in sorted(stream_seconds):
+            lines.extend(stream_seconds[stream].lines('dobby_stream_parse_seconds', (('stream', stream),)))
+        if last_window_end_ts is not None:
+            metric('dobby_last_window_end_timestamp', 'gauge', 'End of the latest window parsed.',
+                   [((), last_window_end_ts)])
+        metric('dobby_summary_entries', 'gauge', 'Entries of the latest window.',
+               [((('kind', kind),), count) for kind, count in sorted(entries.items())])
+        metric('dobby_history_summaries', 'gauge', 'Windows kept in memory.', [((), history_summaries)])
+        metric('dobby_history_bytes', 'gauge', 'Estimated size of the windows kept in memory.',
+               [((), history_bytes)])
+        metric('dobby_parse_errors_total', 'counter', 'Windows that failed to parse.',
+               [((('error', error),), count) for error, count in sorted(parse_errors.items())])
+        metric('dobby_decode_failures_total', 'counter', 'Summaries that were not valid JSON or XML.',
+               [((('format', summary_format),), count) for summary_format, count in sorted(decode_failures.items())])
+        metric('dobby_conversion_failures_total', 'counter', 'Values that could not be converted to numbers.',
+               [((('key', key),), count) for key, count in sorted(conversion_failures.items())])
+        return '\n'.join(lines) + '\n'
+
+    def _handler(self):
+        exporter = self
+
+        class MetricsHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+        return MetricsHandler
+
+    def start(self):
+        """Start serving on a daemon thread.
+        """
+        self.server = http.server.ThreadingHTTPServer((self.host, self.port), self._handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name='dobby-metrics', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server is None:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.server = self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,194 @@
+"""Per-window instrumentation of ParseManager.
+
+With ParseManager(instrument=True) every parsed window gets a WindowReport:
+the wall and CPU time of each stage, the records it handled, counters of
+the endpoints, nodes, edges and flows the parsers created or found already
+in the summary, the values util.get_float_value could not convert and the
+streams that were not valid JSON or XML. The stages of a stream are
+
+    <stream>.decode     reading the JSON or XML records
+    <stream>.prepare    building the metrics of every record (prepare_*)
+    <stream>.merge      resolving endpoints, creating nodes, edges and flows
+    <stream>.wait       with an executor: waiting for decode and prepare
+    <stream>.parse      with streaming=True: decode, prepare and merge in one pass
+    publish             vendor labelling, freezing and the summary listeners
+
+The report of the last window is ParseManager.last_report and report
+listeners are called with every report. Profiler is a context manager that
+turns instrumentation on for a block and collects its reports:
+
+    with instrumentation.Profiler(parse_manager) as profiler:
+        parse_manager.ingest_directory(summary_dir)
+    print(profiler.summary())
+
+Instrumentation is off by default. The parsers then skip their counters
+with one 'is None' test per created or reused object, and the windows are
+parsed one record at a time as before; instrumented windows decode a whole
+stream before preparing it so that the stages can be timed separately,
+unless the ParseManager is streaming.
+watcher.SummaryWatcher reports its windows the same way, with wait, merge
+and publish stages. A report counts only the failures of its own window's
+streams: it is passed as the failures argument of the decode and prepare
+steps, and the streams decoded on an executor return theirs
+(util.Failures) with their prepared records.
+"""
+import collections
+import contextlib
+import time
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+# Counter names used by the parsers
+ENDPOINTS_NEW = 'endpoints.new'
+ENDPOINTS_REUSED = 'endpoints.reused'
+NODES_NEW = 'nodes.new'
+NODES_REUSED = 'nodes.reused'
+EDGES_NEW = 'edges.new'
+EDGES_REUSED = 'edges.reused'
+FLOWS_NEW = 'flows.new'
+FLOWS_REUSED = 'flows.reused'
+
+
+class StageStats(object):
+    """Time spent in one stage of a window, summed over its calls.
+    """
+    __slots__ = ('wall', 'cpu', 'records', 'calls')
+
+    def __init__(self, wall=0.0, cpu=0.0, records=0, calls=0):
+        self.wall = wall
+        self.cpu = cpu
+        self.records = records
+        self.calls = calls
+
+    def add(self, other):
+        self.wall += other.wall
+        self.cpu += other.cpu
+        self.records += other.records
+        self.calls += other.calls
+
+    def as_dict(self):
+        return {'wall': self.wall, 'cpu': self.cpu, 'records': self.records, 'calls': self.calls}
+
+    def __repr__(self):
+        return "StageStats(wall={0:.6f}, cpu={1:.6f}, records={2}, calls={3})".format(
+            self.wall, self.cpu, self.records, self.calls)
+
+
+class WindowReport(object):
+    """Instrumentation of one parsed window, see the module docstring.
+    """
+    def __init__(self, start_ts=None, end_ts=None):
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.stages = collections.OrderedDict()
+        self.counters = collections.Counter()
+        self.conversion_failures = collections.Counter()
+        self.decode_failures = collections.Counter()
+        self.wall = 0.0
+        self.cpu = 0.0
+        self._wall_start = self._cpu_start = None
+
+    @contextlib.contextmanager
+    def stage(self, name, records=0):
+        """Time a block as stage name; the yielded StageStats' records can
+        be set inside the block.
+        """
+        timing = StageStats(records=records, calls=1)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield timing
+        finally:
+            timing.wall = time.perf_counter() - wall
+            timing.cpu = time.process_time() - cpu
+            self.stages.setdefault(name, StageStats()).add(timing)
+
+    def add_failures(self, failures):
+        """Count the util.Failures of a stream decoded outside the report.
+        """
+        self.conversion_failures.update(failures.conversion_failures)
+        self.decode_failures.update(failures.decode_failures)
+
+    def start(self):
+        self._wall_start, self._cpu_start = time.perf_counter(), time.process_time()
+
+    def finish(self):
+        self.wall = time.perf_counter() - self._wall_start
+        self.cpu = time.process_time() - self._cpu_start
+
+    @property
+    def records(self):
+        """Records decoded, over all streams.
+        """
+        return sum(stats.records for name, stats in self.stages.items()
+                   if name.endswith(('.prepare', '.wait', '.parse')))
+
+    def as_dict(self):
+        return {'start_ts': self.start_ts, 'end_ts': self.end_ts, 'wall': self.wall, 'cpu': self.cpu,
+                'stages': collections.OrderedDict((name, stats.as_dict()) for name, stats in self.stages.items()),
+                'counters': dict(self.counters),
+                'conversion_failures': dict(self.conversion_failures),
+                'decode_failures': dict(self.decode_failures)}
+
+    def __str__(self):
+        lines = ["Window {0} - {1}: {2:.3f}s wall, {3:.3f}s cpu".format(self.start_ts, self.end_ts,
+                                                                          self.wall, self.cpu)]
+        for name, stats in self.stages.items():
+            lines.append("  {0:<20} {1:>9.4f}s wall {2:>9.4f}s cpu {3:>9d} records".format(
+                name, stats.wall, stats.cpu, stats.records))
+        if self.counters:
+            lines.append("  " + ", ".join("{0}={1}".format(name, count)
+                                          for name, count in sorted(self.counters.items())))
+        if self.conversion_failures:
+            lines.append("  conversion failures: " + ", ".join(
+                "{0}={1}".format(key, count) for key, count in sorted(self.conversion_failures.items())))
+        if self.decode_failures:
+            lines.append("  decode failures: " + ", ".join(
+                "{0}={1}".format(key, count) for key, count in sorted(self.decode_failures.items())))
+        return "\n".join(lines)
+
+
+class Profiler(object):
+    """Context manager instrumenting a ParseManager for the duration of a
+    block; reports holds the WindowReport of every window parsed in it.
+    """
+    def __init__(self, parse_manager):
+        self.parse_manager = parse_manager
+        self.reports = []
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = self.parse_manager.instrument
+        self.parse_manager.instrument = True
+        self.parse_manager.add_report_listener(self.reports.append)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.parse_manager.remove_report_listener(self.reports.append)
+        self.parse_manager.instrument = self._previous
+
+    def stages(self):
+        """StageStats of every stage, summed over the reports.
+        """
+        stages = collections.OrderedDict()
+        for report in self.reports:
+            for name, stats in report.stages.items():
+                stages.setdefault(name, StageStats()).add(stats)
+        return stages
+
+    def counters(self):
+        counters = collections.Counter()
+        for report in self.reports:
+            counters.update(report.counters)
+        return counters
+
+    def summary(self):
+        lines = ["{0} windows, {1:.3f}s wall, {2:.3f}s cpu".format(
+            len(self.reports), sum(report.wall for report in self.reports),
+            sum(report.cpu for report in self.reports))]
+        for name, stats in self.stages().items():
+            lines.append("  {0:<20} {1:>9.4f}s wall {2:>9.4f}s cpu {3:>9d} records".format(
+                name, stats.wall, stats.cpu, stats.records))
+        counters = self.counters()
+        if counters:
+            lines.append("  " + ", ".join("{0}={1}".format(name, count) for name, count in sorted(counters.items())))
+        return "\n".join(lines)
@@ -1,69 +1,589 @@
 #!/usr/bin/env python3
 """Base class for parsing summaries generated by click.
 """
+import collections
+import contextlib
 import json
+import os
+import time
 from collections import deque
 
+import dobby.nwinfo.flowtable as flowtable
 import dobby.nwinfo.networksummary as networksummary
+import dobby.nwinfo.rollup as rollup
+import dobby.nwinfo.topk as topk
+import dobby.nwinfo.summaryhistory as summaryhistory
+import dobby.nwmodel.models as modelset
+import dobby.nwmodel.node as nodemodel
+import dobby.nwparser.instrumentation as instrumentation
 import dobby.nwparser.parsewirelesssummary as parsewirelesssummary
 import dobby.nwparser.parsetcpmystery as parsetcpmystery
 import dobby.nwparser.parsetcploss as parsetcploss
 import dobby.nwparser.parsenodesummary as parsenodesummary
+import dobby.nwparser.summarydir as summarydir
+import dobby.utils.jsonstream as jsonstream
 import dobby.utils.util as util
+import dobby.utils.xmlstream as xmlstream
 
 __author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
 
+JSON_FORMAT = 'json'
+XML_FORMAT = 'xml'
+
+WIRELESS_STREAM = 'wireless'
+NODE_STREAM = 'node'
+TCPMYSTERY_STREAM = 'tcpmystery'
+TCPLOSS_STREAM = 'tcploss'
+# Streams of a window are always merged in this order
+STREAM_ORDER = (WIRELESS_STREAM, NODE_STREAM, TCPMYSTERY_STREAM, TCPLOSS_STREAM)
+
+# Name of the file recording which windows ingest_directory has already parsed
+INGEST_STATE_FILE = '.dobby_ingested'
+
+# Record path and decode step of every stream type
+STREAM_DECODERS = {
+    WIRELESS_STREAM: (parsewirelesssummary.ParseWirelessSummary.ITEM_PATH,
+                      parsewirelesssummary.prepare_link),
+    NODE_STREAM: (parsenodesummary.ParseNodeSummary.ITEM_PATH,
+                  parsenodesummary.prepare_node),
+    TCPMYSTERY_STREAM: (parsetcpmystery.ParseTCPMysterySummary.ITEM_PATH,
+                        parsetcpmystery.prepare_flow),
+    TCPLOSS_STREAM: (parsetcploss.ParseTCPLossSummary.ITEM_PATH,
+                     parsetcploss.prepare_flow),
+}
+
+
+@contextlib.contextmanager
+def open_stream(stream):
+    """Streams can be file like objects or paths to summary files.
+    """
+    if isinstance(stream, str):
+        with open(stream) as file_stream:
+            yield file_stream
+    else:
+        yield stream
+
+def read_summary_json(stream, failures=None):
+    """json.load a summary stream. Raises util.DecodeError if it is not
+    valid JSON, after counting it in failures (a util.Failures).
+    """
+    summary = util.read_json(stream, failures)
+    if summary is None:
+        raise util.DecodeError("Invalid JSON summary")
+    return summary
+
+def iter_stream_items(stream, item_path, summary_format=JSON_FORMAT, streaming=False, failures=None):
+    """Iterate over the records (links, nodes or flows) of a summary stream.
+    A stream that is not valid JSON or XML raises util.DecodeError and is
+    also counted in failures (a util.Failures).
+    """
+    if summary_format == XML_FORMAT:
+        return xmlstream.iter_xml_items(stream, item_path, failures=failures)
+    if streaming:
+        return jsonstream.iter_json_items(stream, item_path, failures=failures)
+    items = read_summary_json(stream, failures)
+    for key in item_path:
+        items = items.get(key, None) if items else None
+    return util.as_list(items)
+
+def iter_prepared(stream_type, file_stream, summary_format=JSON_FORMAT, streaming=False, models=None,
+                  failures=None):
+    """Iterate over the prepared records of an open stream, decoding one
+    record at a time.
+    """
+    item_path, prepare_item = STREAM_DECODERS[stream_type]
+    models = models if models is not None else modelset.get_models(False)
+    for item in iter_stream_items(file_stream, item_path, summary_format, streaming, failures):
+        yield prepare_item(item, models, failures)
+
+def prepare_stream(stream_type, stream, summary_format=JSON_FORMAT, streaming=False,
+                   compact_models=False):
+    """Decode a whole stream into the list of prepared records of its parser.
+    This is the part of parsing that is independent of the other streams; it is
+    a module level function so it can be shipped to a thread or process pool.
+    """
+    with open_stream(stream) as file_stream:
+        return list(iter_prepared(stream_type, file_stream, summary_format, streaming,
+                                  modelset.get_models(compact_models)))
+
+def prepare_counted_stream(stream_type, stream, summary_format=JSON_FORMAT, streaming=False,
+                           compact_models=False):
+    """prepare_stream returning the prepared records and the util.Failures
+    of the stream, so that the report of a window decoded on a worker
+    counts the failures of its own streams.
+    """
+    failures = util.Failures()
+    with open_stream(stream) as file_stream:
+        records = list(iter_prepared(stream_type, file_stream, summary_format, streaming,
+                                     modelset.get_models(compact_models), failures))
+    return records, failures
+
+def _counted(records, timing):
+    # Count the records of a stage as they are consumed
+    for record in records:
+        timing.records += 1
+        yield record
+
+
+class IngestReport(object):
+    """Throughput of a bulk ingestion run. incomplete counts the windows
+    parsed without one of their streams, which are not recorded as ingested.
+    """
+    def __init__(self, windows=0, flows=0, skipped=0, elapsed=0.0, incomplete=0):
+        self.windows = windows
+        self.flows = flows
+        self.skipped = skipped
+        self.elapsed = elapsed
+        self.incomplete = incomplete
+
+    def add_window(self, network_summary):
+        self.windows += 1
+        self.flows += len(network_summary.ip_flows)
+
+    @property
+    def windows_per_sec(self):
+        return self.windows / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def flows_per_sec(self):
+        return self.flows / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return "Ingested {0} windows ({1} skipped, {2} incomplete), {3} flows in {4:.2f}s: " \
+               "{5:.2f} windows/s, {6:.1f} flows/s".format(self.windows, self.skipped, self.incomplete,
+                                                          self.flows, self.elapsed, self.windows_per_sec,
+                                                          self.flows_per_sec)
+
+
 class ParseManager(object):
     """Parsing manager which coordinates all the parsing
+
+    Streams are click summaries either converted to JSON (xml_to_json.py) or,
+    with summary_format=XML_FORMAT, the XML files written by click itself.
+    They can be file like objects or paths. XML is always read incrementally.
+    With streaming=True JSON streams are not json.load-ed either; their
+    records are decoded and parsed one at a time and never collected, so
+    a streaming ParseManager can not be given an executor.
+
+    With an executor (a concurrent.futures thread or process pool) the four
+    streams are decoded concurrently and the prepared records are then merged
+    into the summary in the fixed wireless, node, tcpmystery, tcploss order,
+    so the result is the same as a sequential parse. Pass paths rather than
+    open files when using a process pool.
+
+    With columnar_flows=True the TCP flows of every summary are stored in a
+    flowtable.FlowTable instead of one TCPFlow object per flow. With
+    compact_models=True summaries are built from the __slots__ variants of
+    the model classes (models.COMPACT_MODELS).
+
+    Parsed summaries are kept in summary_queue, a summaryhistory.SummaryHistory
+    ordered by start_ts and bounded by max_summaries, max_summary_age (seconds)
+    and max_summary_bytes (estimated). With an archive (an archive.WindowArchive
+    or the directory of one) the windows dropped from summary_queue are written
+    to disk instead of discarded, and find_summary/find_summaries load them
+    back from there when they are no longer in memory. With a sql_store (a
+    sqlstore.SummaryStore or the path of its database) every published
+    summary is also written to its indexed tables.
+
+    Listeners added with add_summary_listener are called with every published
+    summary. With rollup_periods (seconds, e.g. rollup.DEFAULT_PERIODS) the
+    published summaries are also merged into the rollups of self.rollups.
+    With accumulate_metrics=True an edge or flow seen again in a summary
+    keeps running aggregates of its metrics (Metrics.accumulate_stats); it
+    can not be combined with columnar_flows.
+
+    With oui_registry (an oui.OUIResolver or the path(s) of IEEE OUI
+    registry files) the MACs and BSSIDs of every summary that have no vendor
+    are labelled with the vendor of their prefix before it is published.
+
+    node_ids ('counter', 'stable' or an allocator, see dobby.nwmodel.node)
+    is the node ID allocator of this manager's parsers (id_allocator), a new
+    CounterAllocator by default; with 'stable' a device keeps its node_id
+    from one window to the next.
+
+    With instrument=True every parsed window gets an
+    instrumentation.WindowReport of the time spent in each stage and the
+    objects the parsers created; the last one is last_report and listeners
+    added with add_report_listener are called with each of them.
+
+    parse_errors counts the windows that failed to parse, by exception type;
+    listeners added with add_error_listener are called with the exception
+    of each of them.
     """
-    def __init__(self, max_summaries=None):
-        self.summary_queue = deque([], None)
-        self.wireless_parser = parsewirelesssummary.ParseWirelessSummary()
-        self.tcpmystery_parser = parsetcpmystery.ParseTCPMysterySummary()
-        self.tcploss_parser = parsetcploss.ParseTCPLossSummary()
-        self.nodesummary_parser = parsenodesummary.ParseNodeSummary()
+    def __init__(self, max_summaries=None, streaming=False, executor=None, columnar_flows=False,
+                 compact_models=False, max_summary_age=None, max_summary_bytes=None,
+                 rollup_periods=None, max_rollups=None, accumulate_metrics=False, archive=None,
+                 sql_store=None, node_ids=None, oui_registry=None, instrument=False):
+        if streaming and executor:
+            raise ValueError("streaming windows are parsed one record at a time, "
+                             "they can not be decoded on an executor")
+        if columnar_flows and accumulate_metrics:
+            raise ValueError("columnar_flows only keeps the latest metrics of a flow, "
+                             "it can not be combined with accumulate_metrics")
+        # The archive, SQL store and OUI modules (pickle, sqlite3, csv) are
+        # only imported when used, to keep 'import dobby' and workers fast
+        if isinstance(archive, str):
+            import dobby.nwinfo.archive as archive_module
+            archive = archive_module.WindowArchive(archive)
+        self.archive = archive
+        self.summary_queue = summaryhistory.SummaryHistory(max_summaries=max_summaries,
+                                                           max_age=max_summary_age,
+                                                           max_bytes=max_summary_bytes,
+                                                           on_evict=archive.append if archive is not None else None)
+        self.streaming = streaming
+        self.executor = executor
+        self.columnar_flows = columnar_flows
+        self.compact_models = compact_models
+        models = modelset.get_models(compact_models)
+        self.summary_listeners = []
+        self.rollups = None
+        if rollup_periods:
+            self.rollups = rollup.RollupManager(periods=rollup_periods, max_rollups=max_rollups,
+                                                models=models)
+            self.add_summary_listener(self.rollups.add_summary)
+        if isinstance(sql_store, str):
+            import dobby.nwinfo.sqlstore as sqlstore
+            sql_store = sqlstore.SummaryStore(sql_store)
+        self.sql_store = sql_store
+        if sql_store is not None:
+            self.add_summary_listener(sql_store.add_summary)
+        self.id_allocator = nodemodel.make_id_allocator(node_ids)
+        self.wireless_parser = parsewirelesssummary.ParseWirelessSummary(models=models,
+                                                                         accumulate=accumulate_metrics,
+                                                                         id_allocator=self.id_allocator)
+        self.tcpmystery_parser = parsetcpmystery.ParseTCPMysterySummary(models=models,
+                                                                        accumulate=accumulate_metrics,
+                                                                        id_allocator=self.id_allocator)
+        self.tcploss_parser = parsetcploss.ParseTCPLossSummary(models=models,
+                                                               accumulate=accumulate_metrics,
+                                                               id_allocator=self.id_allocator)
+        self.nodesummary_parser = parsenodesummary.ParseNodeSummary(models=models,
+                                                                   id_allocator=self.id_allocator)
+        self.models = models
+        if oui_registry is not None:
+            import dobby.nwmodel.oui as oui
+            if not isinstance(oui_registry, oui.OUIResolver):
+                oui_registry = oui.OUIResolver(oui_registry)
+        self.oui_resolver = oui_registry
+        self.instrument = instrument
+        self.report_listeners = []
+        self.last_report = None
+        self.parse_errors = collections.Counter()
+        self.error_listeners = []
 
     def find_summary(self, timestamp):
-        for summary in list(reversed(self.summary_queue)):
-            #TODO -- handle summary.start_ts/end_ts being none
-            if timestamp >= summary.start_ts and timestamp < summary.end_ts:
-                return summary
-        return None
+        """The latest summary whose window contains timestamp, or None.
+        """
+        network_summary = self.summary_queue.find(timestamp)
+        if network_summary is None and self.archive is not None:
+            return self.archive.find(timestamp)
+        return network_summary
 
+    def add_summary_listener(self, listener):
+        """Call listener(network_summary) for every summary published from now on.
+        """
+        self.summary_listeners.append(listener)
 
-    def parse_summary(self, start_ts=None, end_ts=None,
-                      wireless_stream=None, node_stream=None,
-                      tcploss_stream=None, tcpmystery_stream=None):
-        ns = networksummary.NetworkSummary()
+    def add_report_listener(self, listener):
+        """Call listener(window_report) for every window parsed with instrument on.
+        """
+        self.report_listeners.append(listener)
+
+    def remove_report_listener(self, listener):
+        self.report_listeners.remove(listener)
+
+    def add_error_listener(self, listener):
+        """Call listener(exception) for every window that fails to parse from now on.
+        """
+        self.error_listeners.append(listener)
+
+    def record_parse_error(self, error):
+        """Count a window that failed to parse with error.
+        """
+        self.parse_errors[type(error).__name__] += 1
+        for listener in self.error_listeners:
+            listener(error)
+
+    def find_summaries(self, start_ts, end_ts):
+        """Summaries whose windows overlap [start_ts, end_ts), in time order.
+        """
+        summaries = self.summary_queue.between(start_ts, end_ts)
+        if self.archive is not None:
+            # Archived windows were evicted, so none of them is also in memory
+            summaries = sorted(self.archive.between(start_ts, end_ts) + summaries,
+                               key=summaryhistory.window_key)
+        return summaries
+
+    def _ranked_summary(self, start_ts, end_ts, period):
+        """The summaries of [start_ts, end_ts) merged into one: the rollups of
+        period when given, else the windows.
+        """
+        if period is not None:
+            if self.rollups is None:
+                raise ValueError("No rollups are kept, pass rollup_periods to ParseManager")
+            summaries = self.rollups.between(period, start_ts, end_ts)
+        else:
+            summaries = self.find_summaries(start_ts, end_ts)
+        return topk.combined_summary(summaries, models=self.models) if summaries else None
+
+    def top_flows(self, start_ts, end_ts, metric, k=topk.DEFAULT_K, period=None, **options):
+        """topk.top_flows over the windows overlapping [start_ts, end_ts), whose
+        flow metrics are merged first; with period, over the pre-merged rollups
+        of that period instead.
+        """
+        network_summary = self._ranked_summary(start_ts, end_ts, period)
+        return topk.top_flows(network_summary, metric, k=k, **options) if network_summary else []
+
+    def top_edges(self, start_ts, end_ts, metric, k=topk.DEFAULT_K, period=None, **options):
+        """topk.top_edges over a time range, see top_flows.
+        """
+        network_summary = self._ranked_summary(start_ts, end_ts, period)
+        return topk.top_edges(network_summary, metric, k=k, **options) if network_summary else []
+
+    def _parse_stream(self, parser, stream, network_summary, summary_format):
+        with open_stream(stream) as file_stream:
+            if summary_format == XML_FORMAT:
+                return parser.parse_xml(file_stream, network_summary=network_summary)
+            if self.streaming:
+                return parser.parse_json_stream(file_stream, network_summary=network_summary)
+            return parser.parse_summary(read_summary_json(file_stream), network_summary=network_summary)
+
+    def merge_stream(self, network_summary, stream_type, stream, summary_format=JSON_FORMAT, report=None):
+        """Decode, prepare and merge a stream into network_summary one record
+        at a time (streaming mode); the whole pass is the <stream>.parse
+        stage of report.
+        """
+        with open_stream(stream) as file_stream:
+            prepared_records = iter_prepared(stream_type, file_stream, summary_format, self.streaming,
+                                             self.models, report)
+            if report is None:
+                return self.merge_prepared(network_summary, stream_type, prepared_records)
+            with report.stage(stream_type + '.parse') as timing:
+                return self.merge_prepared(network_summary, stream_type, _counted(prepared_records, timing),
+                                           stats=report.counters)
+
+    def _submit_streams(self, executor, streams, summary_format):
+        """Start decoding (stream_type, stream) pairs on the executor with
+        prepare_counted_stream.
+        """
+        return [(stream_type, executor.submit(prepare_counted_stream, stream_type, stream,
+                                              summary_format, self.streaming, self.compact_models))
+                for stream_type, stream in streams]
+
+    def _merge_streams(self, start_ts, end_ts, futures):
+        if self.instrument:
+            return self._parse_instrumented(start_ts, end_ts, futures=futures)
+        ns = self.new_summary(start_ts=start_ts, end_ts=end_ts)
+        # Merge in submission order, starting as soon as the first stream is decoded
+        for stream_type, future in futures:
+            prepared_records, failures = future.result()
+            ns = self.merge_prepared(ns, stream_type, prepared_records)
+        return self.publish_summary(ns)
+
+    def new_summary(self, start_ts=None, end_ts=None):
+        ns = networksummary.NetworkSummary(flow_table=flowtable.FlowTable() if self.columnar_flows else None)
         ns.start_ts = start_ts
         ns.end_ts = end_ts
+        return ns
+
+    def merge_prepared(self, network_summary, stream_type, prepared_records, stats=None):
+        """Fold records decoded by prepare_stream into network_summary,
+        counting the objects created or reused in stats (the counters of
+        a WindowReport) when given.
+        Streams of a window must be merged in STREAM_ORDER.
+        """
+        if stream_type == WIRELESS_STREAM:
+            return self.wireless_parser.merge_links(prepared_records, network_summary=network_summary,
+                                                    stats=stats)
+        if stream_type == NODE_STREAM:
+            return self.nodesummary_parser.merge_nodes(prepared_records, network_summary=network_summary,
+                                                       stats=stats)
+        if stream_type == TCPMYSTERY_STREAM:
+            return self.tcpmystery_parser.merge_flows(prepared_records, network_summary=network_summary,
+                                                      stats=stats)
+        if stream_type == TCPLOSS_STREAM:
+            return self.tcploss_parser.merge_flows(prepared_records, network_summary=network_summary,
+                                                   stats=stats)
+        raise ValueError("Unknown stream type: {0}".format(stream_type))
+
+    def publish_summary(self, network_summary):
+        """Record a fully parsed window; published summaries are frozen.
+        """
+        if self.oui_resolver is not None:
+            self.oui_resolver.label_summary(network_summary)
+        network_summary.freeze()
+        self.summary_queue.append(network_summary)
+        for listener in self.summary_listeners:
+            listener(network_summary)
+        return network_summary
+
+    def parse_summary(self, start_ts=None, end_ts=None,
+                      wireless_stream=None, node_stream=None,
+                      tcploss_stream=None, tcpmystery_stream=None,
+                      summary_format=JSON_FORMAT):
+        try:
+            return self._parse_summary(start_ts, end_ts, wireless_stream, node_stream,
+                                       tcploss_stream, tcpmystery_stream, summary_format)
+        except Exception as e:
+            self.record_parse_error(e)
+            raise
+
+    def _parse_summary(self, start_ts, end_ts, wireless_stream, node_stream,
+                       tcploss_stream, tcpmystery_stream, summary_format):
+        if self.instrument and (self.streaming or not self.executor):
+            streams = [(stream_type, stream) for stream_type, stream in
+                       zip(STREAM_ORDER, [wireless_stream, node_stream, tcpmystery_stream, tcploss_stream])
+                       if stream]
+            return self._parse_instrumented(start_ts, end_ts, streams=streams, summary_format=summary_format)
+        if self.executor and not self.streaming:
+            streams = [(stream_type, stream) for stream_type, stream in
+                       zip(STREAM_ORDER, [wireless_stream, node_stream, tcpmystery_stream, tcploss_stream])
+                       if stream]
+            futures = self._submit_streams(self.executor, streams, summary_format)
+            return self._merge_streams(start_ts, end_ts, futures)
+
+        ns = self.new_summary(start_ts=start_ts, end_ts=end_ts)
         #Parse wireless
         if wireless_stream:
-            wireless_json = util.read_json(wireless_stream)
-            ns = self.wireless_parser.parse_summary(wireless_json=wireless_json,
-                                                    network_summary=ns)
+            ns = self._parse_stream(self.wireless_parser, wireless_stream, ns, summary_format)
 
         #Parse Node summary
         if node_stream:
-            node_json = util.read_json(node_stream)
-            ns = self.nodesummary_parser.parse_summary(node_json=node_json,
-                                                       network_summary=ns)
+            ns = self._parse_stream(self.nodesummary_parser, node_stream, ns, summary_format)
 
         #Parse TCP Mystery
         if tcpmystery_stream:
-            tcpmystery_json = util.read_json(tcpmystery_stream)
-            ns = self.tcpmystery_parser.parse_summary(tcpmystery_json=tcpmystery_json,
-                                                      network_summary=ns)
+            ns = self._parse_stream(self.tcpmystery_parser, tcpmystery_stream, ns, summary_format)
 
         #Parse TCP Loss
         if tcploss_stream:
-            tcploss_json = util.read_json(tcploss_stream)
-            ns = self.tcploss_parser.parse_summary(tcploss_json=tcploss_json,
-                                                   network_summary=ns)
+            ns = self._parse_stream(self.tcploss_parser, tcploss_stream, ns, summary_format)
+
+        return self.publish_summary(ns)
 
-        self.summary_queue.append(ns)
+    def _parse_instrumented(self, start_ts, end_ts, streams=(), summary_format=JSON_FORMAT, futures=None):
+        """Parse a window with every stage timed into a WindowReport: the
+        (stream_type, stream) pairs of streams, or the (stream_type, future)
+        pairs of _submit_streams.
+        """
+        report = self.begin_report(start_ts=start_ts, end_ts=end_ts)
+        try:
+            ns = self.new_summary(start_ts=start_ts, end_ts=end_ts)
+            if futures is not None:
+                for stream_type, future in futures:
+                    with report.stage(stream_type + '.wait') as timing:
+                        prepared_records, failures = future.result()
+                        timing.records = len(prepared_records)
+                    report.add_failures(failures)
+                    with report.stage(stream_type + '.merge', records=len(prepared_records)):
+                        ns = self.merge_prepared(ns, stream_type, prepared_records, stats=report.counters)
+            elif self.streaming:
+                for stream_type, stream in streams:
+                    ns = self.merge_stream(ns, stream_type, stream, summary_format, report)
+            else:
+                for stream_type, stream in streams:
+                    item_path, prepare_item = STREAM_DECODERS[stream_type]
+                    with report.stage(stream_type + '.decode') as timing:
+                        with open_stream(stream) as file_stream:
+                            items = list(iter_stream_items(file_stream, item_path, summary_format,
+                                                           self.streaming, report))
+                        timing.records = len(items)
+                    with report.stage(stream_type + '.prepare', records=len(items)):
+                        prepared_records = [prepare_item(item, self.models, report) for item in items]
+                    del items
+                    with report.stage(stream_type + '.merge', records=len(prepared_records)):
+                        ns = self.merge_prepared(ns, stream_type, prepared_records, stats=report.counters)
+            with report.stage('publish'):
+                ns = self.publish_summary(ns)
+        except Exception:
+            self.end_report(report, published=False)
+            raise
+        self.end_report(report)
         return ns
 
+    def begin_report(self, start_ts=None, end_ts=None):
+        """Start the WindowReport of a window. Used by parse_summary and by
+        the callers that merge prepared streams themselves
+        (watcher.SummaryWatcher); they add the failures returned by
+        prepare_counted_stream to it and pass its counters as the stats of
+        merge_prepared.
+        """
+        report = instrumentation.WindowReport(start_ts=start_ts, end_ts=end_ts)
+        report.start()
+        return report
+
+    def end_report(self, report, published=True):
+        """Close report. The report of a published window becomes
+        last_report and is passed to the report listeners.
+        """
+        if not published:
+            return
+        report.finish()
+        self.last_report = report
+        for listener in self.report_listeners:
+            listener(report)
+
+    def parse_window(self, window):
+        """Parse a summarydir.SummaryWindow.
+        """
+        streams = dict((stream_type + '_stream', path) for stream_type, path in window.streams.items())
+        return self.parse_summary(start_ts=window.start_ts, end_ts=window.end_ts,
+                                  summary_format=window.summary_format, **streams)
+
+    def _iter_parsed_windows(self, windows, executor, max_pending):
+        """Parse windows in order, decoding up to max_pending windows ahead on the executor.
+        """
+        if not executor or self.streaming:
+            for window in windows:
+                yield window, self.parse_window(window)
+            return
+        pending = deque()
+        windows = iter(windows)
+        while True:
+            while len(pending) < max_pending:
+                window = next(windows, None)
+                if window is None:
+                    break
+                streams = [(stream_type, window.streams[stream_type])
+                           for stream_type in STREAM_ORDER if stream_type in window.streams]
+                pending.append((window, self._submit_streams(executor, streams, window.summary_format)))
+            if not pending:
+                return
+            window, futures = pending.popleft()
+            yield window, self._merge_streams(window.start_ts, window.end_ts, futures)
+
+    def ingest_directory(self, summary_dir, executor=None, resume=True, state_file=None,
+                         window_length=summarydir.DEFAULT_WINDOW_LENGTH, max_pending=4):
+        """Parse every window of a start_dobby.sh summary directory in time order.
+
+        Windows are decoded on the executor (or self.executor), up to max_pending
+        windows ahead of the one being merged; streaming windows are parsed one
+        after another without it. Every window is recorded in state_file
+        (INGEST_STATE_FILE in summary_dir by default) once it is published;
+        with resume=True windows recorded there by a previous run are skipped.
+        A window that fails to parse stops the run, and a window missing one
+        of its streams is published but not recorded, so both are parsed
+        again by the next run.
+        Returns an IngestReport.
+        """
+        executor = executor if executor else self.executor
+        state_path = state_file if state_file else os.path.join(summary_dir, INGEST_STATE_FILE)
+        windows = summarydir.find_windows(summary_dir, window_length=window_length)
+        done = summarydir.read_ingest_state(state_path) if resume else set()
+        windows_to_parse = [window for window in windows if window.base not in done]
+        report = IngestReport(skipped=len(windows) - len(windows_to_parse))
+        start_time = time.time()
+        with open(state_path, 'a' if resume else 'w') as state_stream:
+            for window, ns in self._iter_parsed_windows(windows_to_parse, executor, max_pending):
+                report.add_window(ns)
+                if len(window.streams) < len(STREAM_ORDER):
+                    report.incomplete += 1
+                    continue
+                state_stream.write(window.base + '\n')
+                state_stream.flush()
+        report.elapsed = time.time() - start_time
+        return report
+
 def main():
     parse_manager = ParseManager()
 
@@ -1,66 +1,119 @@
 """Base class for parsing summaries generated by click.
 """
-import copy
+import collections
 
 import dobby.nwinfo.networksummary as networksummary
 import dobby.nwmodel.endpoint as endpointmodel
+import dobby.nwmodel.models as modelset
 import dobby.nwmodel.node as nodemodel
+import dobby.nwparser.instrumentation as instrumentation
 import dobby.nwmodel.ipinfo as ipinfo
 import dobby.nwmodel.phymodel as phymodel
 import dobby.nwmetrics.metrics as metrics
+import dobby.utils.jsonstream as jsonstream
 import dobby.utils.util as util
+import dobby.utils.xmlstream as xmlstream
 
 __author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
 
 class ParseNodeSummary(object):
     """Parses node summary generated by click
     """
+    ITEM_PATH = ('nodes', 'node')
+
+    def __init__(self, models=None, id_allocator=None):
+        self.models = models if models else modelset.DEFAULT_MODELS
+        # Node ID allocator of the nodes created by this parser, None for the
+        # process default (see dobby.nwmodel.node)
+        self.id_allocator = id_allocator
+
     def parse_summary(self, node_json, network_summary=None):
+        return self.parse_nodes(node_json['nodes']['node'], network_summary=network_summary)
+
+    def parse_json_stream(self, json_stream, network_summary=None):
+        """Parse a node summary JSON stream without loading the whole document.
+        """
+        items = jsonstream.iter_json_items(json_stream, self.ITEM_PATH)
+        return self.parse_nodes(items, network_summary=network_summary)
+
+    def parse_xml(self, xml_stream, network_summary=None):
+        """Parse the node summary XML written by click directly.
+        """
+        nodes = xmlstream.iter_xml_items(xml_stream, self.ITEM_PATH)
+        return self.parse_nodes(nodes, network_summary=network_summary)
+
+    def parse_nodes(self, nodes, network_summary=None):
+        """Parse an iterable of node elements (nodes.node).
+        """
+        return self.merge_nodes((prepare_node(json_node, self.models) for json_node in nodes),
+                                network_summary=network_summary)
+
+    def merge_nodes(self, prepared_nodes, network_summary=None, stats=None):
+        """Fold nodes returned by prepare_node into the network summary.
+        """
         # Create an empty summary if none was provided
         if not network_summary:
             network_summary = networksummary.NetworkSummary()
         else:
-            network_summary = copy.copy(network_summary)
+            network_summary = network_summary.writable()
         #Iterate and update the endpoint stats
-        for json_node in node_json['nodes']['node']:
-            mac = json_node.get('@ether', None)
-            vendor = json_node.get('@vendor', None)
-            phy_addr = phymodel.PhysicalAddress(phy_address=mac, vendor=vendor)
+        for prepared in prepared_nodes:
+            phy_addr = prepared.phy_addr
+            vendor = prepared.vendor
             # See if this endpoint exists
-            endpoint = network_summary.mac_to_endpoints.get(str(phy_addr), None)
+            endpoint = network_summary.mac_to_endpoints.get(phy_addr.value, None)
+            if stats is not None:
+                stats[instrumentation.ENDPOINTS_REUSED if endpoint else instrumentation.ENDPOINTS_NEW] += 1
             if endpoint:
                 #Endpoint exists. Just update the vendor
-                endpoint.phy_address.update_vendor(vendor)
+                endpoint = network_summary.owned_endpoint(endpoint)
+                endpoint.update_vendor(vendor)
             else:
-                endpoint = endpointmodel.EndPoint(phy_addr)
-                network_summary.mac_to_endpoints[str(phy_addr)] = endpoint
+                endpoint = self.models.EndPoint(phy_addr, vendor=vendor)
+                network_summary.mac_to_endpoints[phy_addr.value] = endpoint
             # Check if a corresponding node exists
+            if stats is not None:
+                stats[instrumentation.NODES_REUSED if endpoint.node_id else instrumentation.NODES_NEW] += 1
             if endpoint.node_id:
                 node = network_summary.nodes.get(endpoint.node_id, None)
             else:
                 # Create a node
-                node = nodemodel.Node(endpoints=[endpoint], node_type=nodemodel.NodeType.UNKNOWN)
+                node = self.models.Node(endpoints=[endpoint], node_type=nodemodel.NodeType.UNKNOWN,
+                                        id_allocator=self.id_allocator)
                 endpoint.node_id = node.node_id
                 network_summary.nodes[node.node_id] = node
 
-            if json_node.get('ip', None):
-                if (type(json_node['ip']) == dict):
-                    ips_to_process = [json_node['ip']]
+            for ip_info in prepared.ip_infos:
+                if node.node_type == nodemodel.NodeType.WIRELESS_ROUTER:
+                    # Create an endpoint with ip_info -- assign it to the endpoint above if not AP
+                    # TODO remove this hack -- IP-->MAC should be derived from ARP requests
+                    ip_endpoint = self.models.EndPoint(ip_info=ip_info)
+                    ip_node = self.models.Node(endpoints=[ip_endpoint], node_type=nodemodel.NodeType.CLOUD_IP,
+                                               id_allocator=self.id_allocator)
+                    ip_endpoint.node_id = ip_node.node_id
+                    network_summary.ip_to_endpoints[int(ip_info.ipv4address)] = ip_endpoint
+                    network_summary.nodes[ip_node.node_id] = ip_node
+                    if stats is not None:
+                        stats[instrumentation.ENDPOINTS_NEW] += 1
+                        stats[instrumentation.NODES_NEW] += 1
                 else:
-                    ips_to_process = json_node['ip']
-                assert(type(ips_to_process) == list)
-                for ip in ips_to_process:
-                    ip_info = ipinfo.IPInfo(ipv4address=ip['@addr'], hostname=ip.get('hostname', None))
-                    if node.node_type == nodemodel.NodeType.WIRELESS_ROUTER:
-                        # Create an endpoint with ip_info -- assign it to the endpoint above if not AP
-                        # TODO remove this hack -- IP-->MAC should be derived from ARP requests
-                        ip_endpoint = endpointmodel.EndPoint(ip_info=ip_info)
-                        ip_node = nodemodel.Node(endpoints=[ip_endpoint], node_type=nodemodel.NodeType.CLOUD_IP)
-                        ip_endpoint.node_id = ip_node.node_id
-                        network_summary.ip_to_endpoints[str(ip_info.ipv4address)] = ip_endpoint
-                        network_summary.nodes[ip_node.node_id] = ip_node
-                    else:
-                        # Add to the MAC endpoint above
-                        endpoint.add_or_update_ip_info(ip_info=ip_info)
-                        network_summary.ip_to_endpoints[str(ip_info.ipv4address)] = endpoint
+                    # Add to the MAC endpoint above
+                    endpoint.add_or_update_ip_info(ip_info=ip_info)
+                    network_summary.ip_to_endpoints[int(ip_info.ipv4address)] = endpoint
         return network_summary
+
+
+PreparedNode = collections.namedtuple('PreparedNode', ['phy_addr', 'vendor', 'ip_infos'])
+
+def prepare_node(json_node, models=modelset.DEFAULT_MODELS, failures=None):
+    """Decode one node element into a PreparedNode.
+    This step does not touch any network summary, so it can run on a worker.
+    """
+    mac = json_node.get('@ether', None)
+    vendor = json_node.get('@vendor', None)
+    phy_addr = phymodel.PhysicalAddress(phy_address=mac)
+    ip_infos = []
+    if json_node.get('ip', None):
+        for ip in util.as_list(json_node['ip']):
+            ip_infos.append(models.IPInfo(ipv4address=ip['@addr'], hostname=ip.get('hostname', None)))
+    return PreparedNode(phy_addr=phy_addr, vendor=vendor, ip_infos=ip_infos)
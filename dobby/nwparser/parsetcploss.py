@@ -1,89 +1,157 @@
 """Base class for parsing summaries generated by click.
 """
-import copy
+import collections
+import ipaddress
 
 import dobby.nwinfo.networksummary as networksummary
-import dobby.nwmodel.endpoint as endpointmodel
+import dobby.nwmodel.models as modelset
 import dobby.nwmodel.node as nodemodel
-import dobby.nwmodel.flow as flowmodel
-import dobby.nwmodel.ipinfo as ipinfo
-import dobby.nwmetrics.metrics as metrics
+import dobby.nwparser.instrumentation as instrumentation
+import dobby.utils.jsonstream as jsonstream
+import dobby.utils.keys as keys
 import dobby.utils.util as util
+import dobby.utils.xmlstream as xmlstream
 
 __author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
 
 class ParseTCPLossSummary(object):
     """Parses tcploss summary generated by CalculateTCPLoss click element
     """
+    ITEM_PATH = ('trace', 'flow')
+
+    def __init__(self, models=None, accumulate=False, id_allocator=None):
+        self.models = models if models else modelset.DEFAULT_MODELS
+        # Node ID allocator of the nodes created by this parser, None for the
+        # process default (see dobby.nwmodel.node)
+        self.id_allocator = id_allocator
+        # Accumulate the metrics of a flow seen again instead of replacing them
+        self.accumulate = accumulate
+
     def parse_summary(self, tcploss_json, network_summary=None):
+        return self.parse_flows(tcploss_json['trace']['flow'], network_summary=network_summary)
+
+    def parse_json_stream(self, json_stream, network_summary=None):
+        """Parse a tcploss summary JSON stream without loading the whole document.
+        """
+        items = jsonstream.iter_json_items(json_stream, self.ITEM_PATH)
+        return self.parse_flows(items, network_summary=network_summary)
+
+    def parse_xml(self, xml_stream, network_summary=None):
+        """Parse the TRACEINFO XML written by click directly, one flow at a time.
+        """
+        flows = xmlstream.iter_xml_items(xml_stream, self.ITEM_PATH)
+        return self.parse_flows(flows, network_summary=network_summary)
+
+    def parse_flows(self, flows, network_summary=None):
+        """Parse an iterable of flow elements (trace.flow), one flow at a time.
+        """
+        return self.merge_flows((prepare_flow(flow, self.models) for flow in flows),
+                                network_summary=network_summary)
+
+    def merge_flows(self, prepared_flows, network_summary=None, stats=None):
+        """Fold flows returned by prepare_flow into the network summary.
+        """
         # Create an empty summary if none was provided
         if not network_summary:
             network_summary = networksummary.NetworkSummary()
         else:
-            network_summary = copy.copy(network_summary)
+            network_summary = network_summary.writable()
+        if self.accumulate and network_summary.flow_table is not None:
+            raise ValueError("a flow table only keeps the latest metrics of a flow, it can not accumulate them")
         # Parse tcploss.json
-        for flow in tcploss_json['trace']['flow']:
-            tcp_flow_info = {}
-            src_ip = ipinfo.IPInfo(ipv4address=flow['@src'])
-            src_ip_endpoint = network_summary.ip_to_endpoints.get(str(src_ip.ipv4address), None)
+        for prepared in prepared_flows:
+            src_ip = prepared.src_ip
+            src_ip_endpoint = network_summary.ip_to_endpoints.get(src_ip, None)
+            if stats is not None:
+                stats[instrumentation.ENDPOINTS_REUSED if src_ip_endpoint else instrumentation.ENDPOINTS_NEW] += 1
             if not src_ip_endpoint:
-                src_ip_endpoint = endpointmodel.EndPoint(ip_info=src_ip)
+                src_ip_endpoint = self.models.EndPoint(ip_info=self.models.IPInfo(ipv4address=ipaddress.IPv4Address(src_ip)))
+                network_summary.ip_to_endpoints[src_ip] = src_ip_endpoint
+            if stats is not None:
+                stats[instrumentation.NODES_REUSED if src_ip_endpoint.node_id else instrumentation.NODES_NEW] += 1
             if not src_ip_endpoint.node_id:
-                src_ip_node = nodemodel.Node(endpoints=[src_ip_endpoint], node_type=nodemodel.NodeType.UNKNOWN)
+                src_ip_endpoint = network_summary.owned_endpoint(src_ip_endpoint)
+                src_ip_node = self.models.Node(endpoints=[src_ip_endpoint], node_type=nodemodel.NodeType.UNKNOWN,
+                                               id_allocator=self.id_allocator)
                 src_ip_endpoint.node_id = src_ip_node.node_id
                 network_summary.nodes[src_ip_node.node_id] = src_ip_node
-            else:
-                src_ip_node = network_summary.nodes[src_ip_endpoint.node_id]
-            network_summary.ip_to_endpoints[str(src_ip.ipv4address)] = src_ip_endpoint
 
-            dst_ip = ipinfo.IPInfo(ipv4address=flow['@dst'])
-            dst_ip_endpoint = network_summary.ip_to_endpoints.get(str(dst_ip.ipv4address), None)
+            dst_ip = prepared.dst_ip
+            dst_ip_endpoint = network_summary.ip_to_endpoints.get(dst_ip, None)
+            if stats is not None:
+                stats[instrumentation.ENDPOINTS_REUSED if dst_ip_endpoint else instrumentation.ENDPOINTS_NEW] += 1
             if not dst_ip_endpoint:
-                dst_ip_endpoint = endpointmodel.EndPoint(ip_info=dst_ip)
+                dst_ip_endpoint = self.models.EndPoint(ip_info=self.models.IPInfo(ipv4address=ipaddress.IPv4Address(dst_ip)))
+                network_summary.ip_to_endpoints[dst_ip] = dst_ip_endpoint
+            if stats is not None:
+                stats[instrumentation.NODES_REUSED if dst_ip_endpoint.node_id else instrumentation.NODES_NEW] += 1
             if not dst_ip_endpoint.node_id:
-                dst_ip_node = nodemodel.Node(endpoints=[dst_ip_endpoint], node_type=nodemodel.NodeType.UNKNOWN)
+                dst_ip_endpoint = network_summary.owned_endpoint(dst_ip_endpoint)
+                dst_ip_node = self.models.Node(endpoints=[dst_ip_endpoint], node_type=nodemodel.NodeType.UNKNOWN,
+                                               id_allocator=self.id_allocator)
                 dst_ip_endpoint.node_id = dst_ip_node.node_id
                 network_summary.nodes[dst_ip_node.node_id] = dst_ip_node
-            else:
-                dst_ip_node = network_summary.nodes[dst_ip_endpoint.node_id]
-            network_summary.ip_to_endpoints[str(dst_ip.ipv4address)] = dst_ip_endpoint
-
-            sport = util.get_float_value(flow, '@sport')
-            dport = util.get_float_value(flow, '@dport')
-            begin = util.get_float_value(flow, '@begin')
-            duration = util.get_float_value(flow, '@duration')
-            flow_key = str(src_ip.ipv4address) + "-" + str(int(sport)) + "-" +\
-                       str(dst_ip.ipv4address) + "-" + str(int(dport))
-
-            tcp_flow_info.update(src_endpoint=src_ip_endpoint,
-                                 dst_endpoint=dst_ip_endpoint,
-                                 sport=sport,
-                                 dport=dport)
-            # Generate the metrics for each direction
-            total_losses_both_dir = 0.0
-            total_losses_dir_0 = 0.0
-            total_losses_dir_1 = 0.0
-            for stream in flow['stream']:
-                mtu = util.get_float_value(stream, '@mtu')
-                nack = util.get_float_value(stream, '@nack')
-                data = util.get_float_value(stream, '@ndata')
-                nbytes = util.get_float_value(stream, '@seqlen')
-                nfloss = util.get_float_value(stream, '@nfloss')
-                nloss = util.get_float_value(stream, '@nloss')
-                total_loss = nfloss + nloss
-                total_losses_both_dir += total_loss
-                if int(stream['@dir']) == 0:
-                    total_losses_dir_0 = total_loss
-                else:
-                    total_losses_dir_1 = total_loss
 
+            if network_summary.flow_table is not None:
+                added = network_summary.flow_table.update_flow(
+                    src_ip, prepared.sport, dst_ip, prepared.dport,
+                    src_endpoint=src_ip_endpoint, dst_endpoint=dst_ip_endpoint,
+                    flow_metrics=dict(total_loss=prepared.total_loss),
+                    flow_metrics_src_to_dst=dict(total_loss=prepared.total_loss_src_to_dst),
+                    flow_metrics_dst_to_src=dict(total_loss=prepared.total_loss_dst_to_src))
+                if stats is not None:
+                    stats[instrumentation.FLOWS_NEW if added else instrumentation.FLOWS_REUSED] += 1
+                continue
             #Get the tcp flow and insert it into the IP_FLOWS dict
-            tcp_flow = network_summary.ip_flows.get(flow_key, None)
+            tcp_flow = network_summary.ip_flows.owned(prepared.flow_key)
+            if stats is not None:
+                stats[instrumentation.FLOWS_REUSED if tcp_flow else instrumentation.FLOWS_NEW] += 1
             if not tcp_flow:
-                tcp_flow = flowmodel.TCPFlow(**tcp_flow_info)
-                network_summary.ip_flows[flow_key] = tcp_flow
-            tcp_flow.flow_metrics.update_stats(**dict(total_loss=total_losses_both_dir))
-            tcp_flow.flow_metrics_src_to_dst.update_stats(**dict(total_loss=total_losses_dir_0))
-            tcp_flow.flow_metrics_dst_to_src.update_stats(**dict(total_loss=total_losses_dir_1))
+                tcp_flow = self.models.TCPFlow(src_endpoint=src_ip_endpoint,
+                                               dst_endpoint=dst_ip_endpoint,
+                                               sport=prepared.sport,
+                                               dport=prepared.dport)
+                network_summary.ip_flows[prepared.flow_key] = tcp_flow
+            if self.accumulate:
+                tcp_flow.accumulate_flow_metrics(total_loss=prepared.total_loss)
+                tcp_flow.accumulate_flow_metrics_src_to_dst(total_loss=prepared.total_loss_src_to_dst)
+                tcp_flow.accumulate_flow_metrics_dst_to_src(total_loss=prepared.total_loss_dst_to_src)
+                continue
+            tcp_flow.flow_metrics.update_stats(**dict(total_loss=prepared.total_loss))
+            tcp_flow.flow_metrics_src_to_dst.update_stats(**dict(total_loss=prepared.total_loss_src_to_dst))
+            tcp_flow.flow_metrics_dst_to_src.update_stats(**dict(total_loss=prepared.total_loss_dst_to_src))
             #End of parsing TCP. Maybe print some stats.
         return network_summary
+
+
+PreparedLoss = collections.namedtuple('PreparedLoss', ['src_ip', 'dst_ip', 'sport', 'dport', 'flow_key',
+                                                       'total_loss', 'total_loss_src_to_dst',
+                                                       'total_loss_dst_to_src'])
+
+def prepare_flow(flow, models=modelset.DEFAULT_MODELS, failures=None):
+    """Decode one tcploss flow element into a PreparedLoss.
+    This step does not touch any network summary, so it can run on a worker.
+    """
+    src_ip = keys.ip_key(flow['@src'])
+    dst_ip = keys.ip_key(flow['@dst'])
+    sport = util.get_float_value(flow, '@sport', failures)
+    dport = util.get_float_value(flow, '@dport', failures)
+    flow_key = keys.flow_key(src_ip, sport, dst_ip, dport)
+    # Generate the metrics for each direction
+    total_losses_both_dir = 0.0
+    total_losses_dir_0 = 0.0
+    total_losses_dir_1 = 0.0
+    for stream in util.as_list(flow['stream']):
+        nfloss = util.get_float_value(stream, '@nfloss', failures)
+        nloss = util.get_float_value(stream, '@nloss', failures)
+        total_loss = nfloss + nloss
+        total_losses_both_dir += total_loss
+        if int(stream['@dir']) == 0:
+            total_losses_dir_0 = total_loss
+        else:
+            total_losses_dir_1 = total_loss
+    return PreparedLoss(src_ip=src_ip, dst_ip=dst_ip, sport=sport, dport=dport,
+                        flow_key=flow_key,
+                        total_loss=total_losses_both_dir,
+                        total_loss_src_to_dst=total_losses_dir_0,
+                        total_loss_dst_to_src=total_losses_dir_1)
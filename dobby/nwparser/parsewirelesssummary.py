@@ -1,44 +1,83 @@
 """Base class for parsing summaries generated by click.
 """
-import copy
+import collections
 
 import dobby.nwinfo.networksummary as networksummary
 import dobby.nwmetrics.metrics as metrics
 import dobby.nwmodel.edge as edgemodel
 import dobby.nwmodel.endpoint as endpoint
 import dobby.nwmodel.flow as flow
+import dobby.nwmodel.models as modelset
 import dobby.nwmodel.node as nodemodel
 import dobby.nwmodel.phymodel as phymodel
+import dobby.nwparser.instrumentation as instrumentation
+import dobby.utils.jsonstream as jsonstream
 import dobby.utils.util as util
+import dobby.utils.xmlstream as xmlstream
 
 __author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
 
 class ParseWirelessSummary(object):
     """Parses wireless summary generated by click
     """
+    ITEM_PATH = ('links', 'link')
+
+    def __init__(self, models=None, accumulate=False, id_allocator=None):
+        self.models = models if models else modelset.DEFAULT_MODELS
+        # Node ID allocator of the nodes created by this parser, None for the
+        # process default (see dobby.nwmodel.node)
+        self.id_allocator = id_allocator
+        # Accumulate the metrics of an edge seen again instead of replacing them
+        self.accumulate = accumulate
+
     def parse_summary(self, wireless_json, network_summary=None):
+        return self.parse_links(wireless_json['links']['link'], network_summary=network_summary)
+
+    def parse_json_stream(self, json_stream, network_summary=None):
+        """Parse a wireless summary JSON stream without loading the whole document.
+        """
+        items = jsonstream.iter_json_items(json_stream, self.ITEM_PATH)
+        return self.parse_links(items, network_summary=network_summary)
+
+    def parse_xml(self, xml_stream, network_summary=None):
+        """Parse the wireless summary XML written by click directly.
+        """
+        links = xmlstream.iter_xml_items(xml_stream, self.ITEM_PATH)
+        return self.parse_links(links, network_summary=network_summary)
+
+    def parse_links(self, links, network_summary=None):
+        """Parse an iterable of link elements (links.link).
+        """
+        return self.merge_links((prepare_link(link, self.models) for link in links),
+                                network_summary=network_summary)
+
+    def merge_links(self, prepared_links, network_summary=None, stats=None):
+        """Fold links returned by prepare_link into the network summary.
+        """
         # Create an empty summary if none was provided
         if not network_summary:
             network_summary = networksummary.NetworkSummary()
         else:
-            network_summary = copy.copy(network_summary)
+            network_summary = network_summary.writable()
+
+        if self.accumulate:
+            update_ab, update_ba, update_undirected = (edgemodel.Edge.accumulate_metrics_ab,
+                                                       edgemodel.Edge.accumulate_metrics_ba,
+                                                       edgemodel.Edge.accumulate_undirected_metrics)
+        else:
+            update_ab, update_ba, update_undirected = (edgemodel.Edge.update_metrics_ab,
+                                                       edgemodel.Edge.update_metrics_ba,
+                                                       edgemodel.Edge.update_undirected_metrics)
 
         #Iterate and update the endpoint stats
-        for link in wireless_json['links']['link']:
-            ap = link['@ap']
-            client = link['@client']
-            bssid = link['@bssid']
-            #TODO -- flow the channel information click
-            channel = link.get('@channel', 0)
-            #TODO -- flow the SSID information from click
-
-            #Create physical addresses
-            ap_addr = phymodel.PhysicalAddress(ap)
-            client_addr = phymodel.PhysicalAddress(client)
-            bssid_addr = phymodel.PhysicalAddress(bssid)
+        for prepared in prepared_links:
+            ap_addr = prepared.ap_addr
+            client_addr = prepared.client_addr
+            bssid_addr = prepared.bssid_addr
+            channel = prepared.channel
 
             # Create a phyModel for bssid
-            wifi_model = network_summary.phy_models.get((str(bssid_addr), channel) , None)
+            wifi_model = network_summary.phy_models.owned((bssid_addr.value, channel))
             if wifi_model is None:
                 # Create wifi model
                 wifi_model = phymodel.WifiPhysicalModel(mac=bssid_addr, channel=channel)
@@ -46,89 +85,127 @@ class ParseWirelessSummary(object):
                 wifi_model.add_clients(clients=[client_addr])
 
             # Create an endpoint entry for ap/client
-            ap_endpoint = network_summary.mac_to_endpoints.get(str(ap_addr), None)
+            ap_endpoint = network_summary.mac_to_endpoints.get(ap_addr.value, None)
+            if stats is not None:
+                if ap_endpoint:
+                    stats[instrumentation.ENDPOINTS_REUSED] += 1
+                else:
+                    stats[instrumentation.ENDPOINTS_NEW] += 1
+                    stats[instrumentation.NODES_NEW] += 1
             if not ap_endpoint:
-                ap_endpoint = endpoint.EndPoint(phy_address=ap_addr,
-                                                phy_model=wifi_model)
+                ap_endpoint = self.models.EndPoint(phy_address=ap_addr,
+                                                   phy_model=wifi_model)
                 #TODO: It should be one AP node per ssid -- right now it is one AP node per mac
                 #Create a new node for the AP
-                ap_node = nodemodel.Node(endpoints=[ap_endpoint], node_type=nodemodel.NodeType.WIRELESS_ROUTER)
+                ap_node = self.models.Node(endpoints=[ap_endpoint], node_type=nodemodel.NodeType.WIRELESS_ROUTER,
+                                           id_allocator=self.id_allocator)
                 ap_endpoint.node_id = ap_node.node_id
-                network_summary.mac_to_endpoints[str(ap_addr)] = ap_endpoint
+                network_summary.mac_to_endpoints[ap_addr.value] = ap_endpoint
                 network_summary.nodes[ap_node.node_id] = ap_node
 
-            client_endpoint = network_summary.mac_to_endpoints.get(str(client_addr), None)
+            client_endpoint = network_summary.mac_to_endpoints.get(client_addr.value, None)
+            if stats is not None:
+                if client_endpoint:
+                    stats[instrumentation.ENDPOINTS_REUSED] += 1
+                else:
+                    stats[instrumentation.ENDPOINTS_NEW] += 1
+                    stats[instrumentation.NODES_NEW] += 1
             if not client_endpoint:
-                client_endpoint = endpoint.EndPoint(phy_address=client_addr,
-                                                    phy_model=wifi_model)
-                client_node = nodemodel.Node(endpoints=[client_endpoint],
-                                             node_type=nodemodel.NodeType.WIRELESS_CLIENT)
+                client_endpoint = self.models.EndPoint(phy_address=client_addr,
+                                                       phy_model=wifi_model)
+                client_node = self.models.Node(endpoints=[client_endpoint],
+                                               node_type=nodemodel.NodeType.WIRELESS_CLIENT,
+                                               id_allocator=self.id_allocator)
                 client_endpoint.node_id = client_node.node_id
-                network_summary.mac_to_endpoints[str(client_addr)] = client_endpoint
+                network_summary.mac_to_endpoints[client_addr.value] = client_endpoint
                 network_summary.nodes[client_node.node_id] = client_node
 
             # Create an edge for this
-            edge = network_summary.edges.get((str(ap_addr), str(client_addr)), None)
+            edge = network_summary.edges.owned((ap_addr.value, client_addr.value))
+            if stats is not None:
+                stats[instrumentation.EDGES_REUSED if edge else instrumentation.EDGES_NEW] += 1
             if not edge:
-                edge = edgemodel.Edge(endpoint_a=ap_addr,
-                                      endpoint_b=client_addr,
-                                      edge_type=edgemodel.EdgeType.PHYSICAL)
+                edge = self.models.Edge(endpoint_a=ap_addr,
+                                        endpoint_b=client_addr,
+                                        edge_type=edgemodel.EdgeType.PHYSICAL)
+                network_summary.owned_endpoint(ap_endpoint).add_edge(edge)
+                network_summary.owned_endpoint(client_endpoint).add_edge(edge)
 
-            if type(link['stream']) != list:
-                stream_list = [link['stream']]
-            else:
-                stream_list = link['stream']
-            for stream in stream_list:
-                if (type(stream) != dict):
-                    print ("Invalid input stream:{0}, needed a dict, got:{1}".format(stream, type(stream)))
-                    continue
-                start_ts = util.get_float_value(stream, '@start_ts')
-                end_ts = util.get_float_value(stream, '@end_ts')
-                total_data_bytes = util.get_float_value(stream, '@total_data_bytes')
-                total_data_pkts = util.get_float_value(stream, '@total_data_pkts')
-                total_pkts = util.get_float_value(stream, '@total_pkts')
-                total_retx = util.get_float_value(stream, '@total_retx')
-                total_trans_time_usec = util.get_float_value(stream, '@total_trans_time_usec')
-                avg_data_pkt_duration_usec = util.get_float_value(stream, '@avg_data_pkt_duration_usec')
-                rate_stats = metrics.Stats.from_string(stream.get('@rate', None), total_pkts)
-                size_stats = metrics.Stats.from_string(stream.get('@size', None), total_pkts)
-                snr_stats = metrics.Stats.from_string(stream.get('@snr', None), total_pkts)
-                metrics_to_add = metrics.WirelessMetrics(start_ts=start_ts, end_ts=end_ts,
-                                                 total_pkts=total_pkts,
-                                                 total_data_pkts=total_data_pkts,
-                                                 total_data_bytes=total_data_bytes,
-                                                 total_retx=total_retx, snr_stats=snr_stats,
-                                                 rate_stats=rate_stats, size_stats=size_stats,
-                                                 total_trans_time_usec=total_trans_time_usec,
-                                                 avg_data_pkt_duration_usec=avg_data_pkt_duration_usec)
-                #if stream['@dir'] == "TODS":
+            for direction, metrics_to_add in prepared.stream_metrics:
+                #if direction == "TODS":
                 #TODO--switch this back to TODS in click
-                if stream['@dir'] == "CLIENT-AP":
+                if direction == "CLIENT-AP":
                     #AP - a, client - b, this metric is for b->a
                     #print ("TODS: Adding edge metrics for:", str(ap_addr), str(client_addr))
-                    edge.update_metrics_ba(metrics_to_add)
-                #if stream['@dir'] == "FROMDS":
+                    update_ba(edge, metrics_to_add)
+                #if direction == "FROMDS":
                 #TODO--switch this back to FROMDS in click
-                if stream['@dir'] == "AP-CLIENT":
+                if direction == "AP-CLIENT":
                     #AP - a, client - b, this metric is for a->b
                     #print ("FROMDS: Adding edge metrics for:", str(ap_addr), str(client_addr))
-                    edge.update_metrics_ab(metrics_to_add)
-                if stream['@dir'] == "NODS":
+                    update_ab(edge, metrics_to_add)
+                if direction == "NODS":
                     #TODO -- fix this
                     #Not clear which is a and b here
-                    edge.update_undirected_metrics(metrics_to_add)
-                #if stream['@dir'] == "DSTODS":
+                    update_undirected(edge, metrics_to_add)
+                #if direction == "DSTODS":
                 #TODO--switch this back to DSTODS in click
-                if stream['@dir'] == "AP-AP":
+                if direction == "AP-AP":
                     #TODO -- fix this
                     #Not clear which is a and b here
-                    edge.update_undirected_metrics(metrics_to_add)
+                    update_undirected(edge, metrics_to_add)
 
             #Inserting the physical model into the global dict
-            network_summary.phy_models[(str(bssid_addr), channel)] = wifi_model
-            #Inserting the edge into the global edges table
-            network_summary.edges[(str(ap_addr), str(client_addr))] = edge
+            network_summary.phy_models[(bssid_addr.value, channel)] = wifi_model
+            #Inserting the edge into the global edges table and the adjacency index
+            network_summary.add_edge((ap_addr.value, client_addr.value), edge)
             #TODO -- update the interferers by checking for other bssids on the same channel
             #TODO -- Add nodes for physical endpoints and ips
 
         return network_summary
+
+
+PreparedLink = collections.namedtuple('PreparedLink', ['ap_addr', 'client_addr', 'bssid_addr',
+                                                       'channel', 'stream_metrics'])
+
+def prepare_link(link, models=modelset.DEFAULT_MODELS, failures=None):
+    """Decode one link element into a PreparedLink holding its addresses and a
+    (direction, WirelessMetrics) pair per stream.
+    This step does not touch any network summary, so it can run on a worker.
+    """
+    #TODO -- flow the channel information click
+    channel = link.get('@channel', 0)
+    #TODO -- flow the SSID information from click
+
+    #Create physical addresses
+    ap_addr = phymodel.PhysicalAddress(link['@ap'])
+    client_addr = phymodel.PhysicalAddress(link['@client'])
+    bssid_addr = phymodel.PhysicalAddress(link['@bssid'])
+
+    stream_metrics = []
+    for stream in util.as_list(link['stream']):
+        if (type(stream) != dict):
+            print ("Invalid input stream:{0}, needed a dict, got:{1}".format(stream, type(stream)))
+            continue
+        start_ts = util.get_float_value(stream, '@start_ts', failures)
+        end_ts = util.get_float_value(stream, '@end_ts', failures)
+        total_data_bytes = util.get_float_value(stream, '@total_data_bytes', failures)
+        total_data_pkts = util.get_float_value(stream, '@total_data_pkts', failures)
+        total_pkts = util.get_float_value(stream, '@total_pkts', failures)
+        total_retx = util.get_float_value(stream, '@total_retx', failures)
+        total_trans_time_usec = util.get_float_value(stream, '@total_trans_time_usec', failures)
+        avg_data_pkt_duration_usec = util.get_float_value(stream, '@avg_data_pkt_duration_usec', failures)
+        rate_stats = models.Stats.from_string(stream.get('@rate', None), total_pkts)
+        size_stats = models.Stats.from_string(stream.get('@size', None), total_pkts)
+        snr_stats = models.Stats.from_string(stream.get('@snr', None), total_pkts)
+        metrics_to_add = models.WirelessMetrics(start_ts=start_ts, end_ts=end_ts,
+                                         total_pkts=total_pkts,
+                                         total_data_pkts=total_data_pkts,
+                                         total_data_bytes=total_data_bytes,
+                                         total_retx=total_retx, snr_stats=snr_stats,
+                                         rate_stats=rate_stats, size_stats=size_stats,
+                                         total_trans_time_usec=total_trans_time_usec,
+                                         avg_data_pkt_duration_usec=avg_data_pkt_duration_usec)
+        stream_metrics.append((stream['@dir'], metrics_to_add))
+    return PreparedLink(ap_addr=ap_addr, client_addr=client_addr, bssid_addr=bssid_addr,
+                        channel=channel, stream_metrics=stream_metrics)
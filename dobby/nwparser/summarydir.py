@@ -0,0 +1,76 @@
+"""Discovery of the summary files written by scripts/start_dobby.sh.
+
+For every capture start_dobby.sh writes ${base}_wireless, ${base}_node,
+${base}_tcpmystery and ${base}_tcploss summaries (.xml, and .json when
+generate_json is set) into its summary directory. This module groups those
+files into one SummaryWindow per base name and orders the windows by time.
+"""
+import collections
+import os
+import re
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+# The captures are rotated every 300 seconds (dot11decrypt -t 300)
+DEFAULT_WINDOW_LENGTH = 300
+STREAM_TYPES = ('wireless', 'node', 'tcpmystery', 'tcploss')
+SUMMARY_FORMATS = ('json', 'xml')
+
+SUMMARY_FILE_RE = re.compile(r'^(?P<base>.+)_(?P<stream_type>{0})\.(?P<summary_format>{1})$'.format(
+    '|'.join(STREAM_TYPES), '|'.join(SUMMARY_FORMATS)))
+EPOCH_RE = re.compile(r'(?<!\d)(\d{10})(?:\.(\d+))?(?!\d)')
+
+SummaryWindow = collections.namedtuple('SummaryWindow', ['base', 'start_ts', 'end_ts',
+                                                         'summary_format', 'streams'])
+
+
+def parse_summary_file_name(file_name):
+    """Split a summary file name into (base, stream_type, summary_format).
+    Returns None for files that are not summaries.
+    """
+    match = SUMMARY_FILE_RE.match(file_name)
+    if not match:
+        return None
+    return match.group('base'), match.group('stream_type'), match.group('summary_format')
+
+def window_start_ts(base, paths):
+    """Start of a window: the epoch timestamp in its base name if there is one,
+    otherwise the modification time of its oldest summary file.
+    """
+    match = EPOCH_RE.search(base)
+    if match:
+        return float(match.group(1) + '.' + (match.group(2) or '0'))
+    return min(os.path.getmtime(path) for path in paths)
+
+def make_window(base, summary_format, streams, window_length=DEFAULT_WINDOW_LENGTH):
+    start_ts = window_start_ts(base, list(streams.values()))
+    return SummaryWindow(base=base, start_ts=start_ts, end_ts=start_ts + window_length,
+                         summary_format=summary_format, streams=streams)
+
+def find_windows(summary_dir, window_length=DEFAULT_WINDOW_LENGTH):
+    """Group the summary files of a directory into windows ordered by start time.
+    When both are present for a base, the XML written by click is preferred
+    over its JSON conversion.
+    """
+    grouped = {}
+    for file_name in os.listdir(summary_dir):
+        parsed = parse_summary_file_name(file_name)
+        if not parsed:
+            continue
+        base, stream_type, summary_format = parsed
+        grouped.setdefault(base, {}).setdefault(summary_format, {})[stream_type] = \
+            os.path.join(summary_dir, file_name)
+    windows = []
+    for base, by_format in grouped.items():
+        summary_format = 'xml' if 'xml' in by_format else 'json'
+        windows.append(make_window(base, summary_format, by_format[summary_format],
+                                   window_length=window_length))
+    return sorted(windows, key=lambda window: (window.start_ts, window.base))
+
+def read_ingest_state(state_path):
+    """Return the set of window base names already ingested.
+    """
+    if not os.path.exists(state_path):
+        return set()
+    with open(state_path) as state_stream:
+        return set(line.strip() for line in state_stream if line.strip())
@@ -0,0 +1,308 @@
+"""Synthetic click summaries for tests and benchmarks.
+
+SummaryGenerator builds the four summaries of a window (wireless, node,
+tcpmystery and tcploss) in the shape click writes them and xmltodict (or
+utils.xmlstream) reads them, from a seed and a scale: the number of
+AP-client links and of TCP flows. Generation is lazy, so a window of 100k
+links and 2M flows is written to disk one record at a time:
+
+    generator = SummaryGenerator(links=1000, flows=100000, seed=7)
+    paths = generator.write_window(summary_dir, summary_format='xml')
+    ParseManager().parse_summary(summary_format='xml', **paths)
+
+Every AP serves links_per_ap clients. The clients (and the APs) have a LAN
+IP in the node summary, the first AP also lists the cloud IPs like a
+gateway does, and the flows go from the clients to the cloud IPs. The
+tcpmystery and tcploss summaries describe the same flows, which are
+distinct as long as no client has more than 64000 of them.
+"""
+import io
+import ipaddress
+import json
+import os
+import random
+import xml.sax.saxutils as saxutils
+
+import dobby.nwmodel.phymodel as phymodel
+import dobby.nwparser.parsemanager as parsemanager
+import dobby.nwparser.summarydir as summarydir
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+# The stream names are the ones ParseManager parses
+WIRELESS_STREAM = parsemanager.WIRELESS_STREAM
+NODE_STREAM = parsemanager.NODE_STREAM
+TCPMYSTERY_STREAM = parsemanager.TCPMYSTERY_STREAM
+TCPLOSS_STREAM = parsemanager.TCPLOSS_STREAM
+STREAM_TYPES = parsemanager.STREAM_ORDER
+
+# Root element, its attributes and the record element of every summary
+DOCUMENT_LAYOUT = {
+    WIRELESS_STREAM: ('links', {}, 'link'),
+    NODE_STREAM: ('nodes', {}, 'node'),
+    TCPMYSTERY_STREAM: ('trace', {'@file': '/tmp/dobby.pcap'}, 'flow'),
+    TCPLOSS_STREAM: ('trace', {'@file': '/tmp/dobby.pcap'}, 'flow'),
+}
+
+AP_OUI = 0x98fc11
+CLIENT_OUIS = (0x587f57, 0xc01ada, 0x3c2eff, 0xf0d5bf)
+LAN_NETWORK = int(ipaddress.IPv4Address('10.0.0.0'))
+CLOUD_FIRST_OCTETS = (13, 23, 34, 52, 54, 104, 142, 151, 157, 172)
+SERVER_PORTS = (443, 443, 443, 80, 5001, 8080, 993, 5228)
+MAX_CLIENT_PORTS = 64000
+FIRST_CLIENT_PORT = 1024
+XML_ATTRIBUTE_ENTITIES = {'"': '&quot;'}
+
+
+def format_ip(value):
+    return str(ipaddress.IPv4Address(value))
+
+def xml_element(tag, value):
+    """XML of an xmltodict style value: '@' keys are attributes, lists are
+    repeated elements.
+    """
+    if type(value) == list:
+        return ''.join([xml_element(tag, item) for item in value])
+    attributes = []
+    children = []
+    for key, item in value.items():
+        if key[0] == '@':
+            attributes.append(' {0}="{1}"'.format(key[1:], saxutils.escape(item, XML_ATTRIBUTE_ENTITIES)))
+        else:
+            children.append(xml_element(key, item))
+    if not children:
+        return '<{0}{1}/>'.format(tag, ''.join(attributes))
+    return '<{0}{1}>{2}</{0}>'.format(tag, ''.join(attributes), ''.join(children))
+
+
+class SummaryGenerator(object):
+    """Seeded generator of the summaries of one window, see the module
+    docstring. The same seed and scale always give the same summaries.
+    """
+    def __init__(self, links=10, flows=100, seed=0, links_per_ap=16, cloud_ips=None,
+                 start_ts=1486757294.0, window_length=summarydir.DEFAULT_WINDOW_LENGTH):
+        self.links = links
+        self.flows = flows
+        self.seed = seed
+        self.start_ts = start_ts
+        self.window_length = window_length
+        rng = random.Random(seed)
+        self.ap_count = max(1, -(-links // links_per_ap)) if links else 0
+        self.cloud_ip_count = cloud_ips if cloud_ips is not None else max(10, flows // 50)
+        self._mac_base = rng.getrandbits(24)
+        self._cloud_ips = [(rng.choice(CLOUD_FIRST_OCTETS) << 24) | rng.getrandbits(24)
+                           for _ in range(self.cloud_ip_count)]
+
+    def _rng(self, stream_type):
+        # One generator per summary, so they can be produced in any order
+        return random.Random('{0}-{1}'.format(self.seed, stream_type))
+
+    def _mac(self, oui, index):
+        return phymodel.format_mac((oui << 24) | ((self._mac_base + index) & 0xffffff)).upper()
+
+    def ap_mac(self, index):
+        return self._mac(AP_OUI, index * 4)
+
+    def bssid(self, index):
+        # The BSSID of an AP is one of its other MACs
+        return self._mac(AP_OUI, index * 4 + 2)
+
+    def client_mac(self, index):
+        return self._mac(CLIENT_OUIS[index % len(CLIENT_OUIS)], index)
+
+    def ap_ip(self, index):
+        return format_ip(LAN_NETWORK + 1 + index)
+
+    def client_ip(self, index):
+        return format_ip(LAN_NETWORK + 1 + self.ap_count + index)
+
+    @property
+    def client_count(self):
+        return self.links
+
+    def cloud_ip(self, index):
+        return format_ip(self._cloud_ips[index % self.cloud_ip_count])
+
+    def counts(self):
+        """Number of records of every summary.
+        """
+        return {WIRELESS_STREAM: self.links, NODE_STREAM: self.ap_count + self.client_count,
+                TCPMYSTERY_STREAM: self.flows, TCPLOSS_STREAM: self.flows}
+
+    def _wireless_stream(self, rng, direction):
+        total_pkts = rng.randint(1, 5000)
+        total_data_pkts = max(1, total_pkts - rng.randint(0, total_pkts // 10))
+        avg_size = rng.randint(60, 1500)
+        signal = rng.randint(-90, -30)
+        rate = rng.choice((1, 6, 11, 24, 54, 65, 130, 300))
+        snr = [signal - rng.randint(0, 10), signal, signal + rng.randint(0, 10)]
+        return {'@dir': direction,
+                '@total_pkts': str(total_pkts),
+                '@total_data_pkts': str(total_data_pkts),
+                '@total_data_bytes': str(total_data_pkts * avg_size),
+                '@avg_data_pkt_size': str(avg_size),
+                '@total_retx': str(rng.randint(0, total_pkts // 4)),
+                '@total_trans_time_usec': str(total_pkts * rng.randint(100, 2000)),
+                '@avg_data_pkt_duration_usec': str(rng.randint(100, 2000)),
+                '@avg_signal': str(signal),
+                '@avg_noise': '0',
+                '@snr': '{0}/{1}/{2}'.format(*snr),
+                '@rate': '{0}/{1}/{2}'.format(rate // 2 or 1, rate, rate),
+                '@size': '60/{0}/1500'.format(avg_size)}
+
+    def iter_links(self):
+        rng = self._rng(WIRELESS_STREAM)
+        for index in range(self.links):
+            ap_index = index % self.ap_count
+            streams = [self._wireless_stream(rng, 'AP-CLIENT')]
+            if rng.random() < 0.9:
+                streams.append(self._wireless_stream(rng, 'CLIENT-AP'))
+            yield {'@ap': self.ap_mac(ap_index), '@client': self.client_mac(index),
+                   '@bssid': self.bssid(ap_index), 'stream': streams if len(streams) > 1 else streams[0]}
+
+    def iter_nodes(self):
+        rng = self._rng(NODE_STREAM)
+        for index in range(self.ap_count):
+            ips = [self.ap_ip(index)]
+            if index == 0:
+                # The gateway sees the cloud side of every flow
+                ips.extend(self.cloud_ip(cloud_index) for cloud_index in range(self.cloud_ip_count))
+            yield self._node(rng, self.ap_mac(index), ips)
+        for index in range(self.client_count):
+            yield self._node(rng, self.client_mac(index), [self.client_ip(index)])
+
+    def _node(self, rng, mac, ips):
+        count = rng.randint(1, 10000)
+        return {'@ether': mac, '@count': str(count), '@count_eth_src': str(count // 2),
+                '@count_eth_dst': str(count - count // 2),
+                'ip': [{'@addr': ip, '@hostname': '',
+                        'port': {'@number': '0', '@servicename': ''}} for ip in ips]}
+
+    def _flow_keys(self):
+        """(src, sport, dst, dport, begin, duration) of every flow.
+        """
+        rng = self._rng('flows')
+        sources = self.client_count or 254
+        for index in range(self.flows):
+            client_index, client_flow = index % sources, index // sources
+            src = self.client_ip(client_index) if self.client_count else format_ip(LAN_NETWORK + 1 + client_index)
+            begin = self.start_ts + rng.random() * self.window_length
+            duration = rng.random() * (self.start_ts + self.window_length - begin)
+            yield (src, str(FIRST_CLIENT_PORT + client_flow % MAX_CLIENT_PORTS),
+                   self.cloud_ip(rng.randrange(self.cloud_ip_count)), str(rng.choice(SERVER_PORTS)),
+                   '{0:.9f}'.format(begin), '{0:.9f}'.format(duration))
+
+    def _flow(self, position, src, sport, dst, dport, begin, duration):
+        return {'@aggregate': '1', '@src': src, '@sport': sport, '@dst': dst, '@dport': dport,
+                '@begin': begin, '@duration': duration, '@filepos': str(position * 1024)}
+
+    def iter_tcpmystery_flows(self):
+        rng = self._rng(TCPMYSTERY_STREAM)
+        for position, flow_key in enumerate(self._flow_keys()):
+            flow = self._flow(position, *flow_key)
+            rtt = rng.uniform(0.001, 0.2)
+            flow['rtt'] = [{'@source': 'syn', '@value': '{0:.6g}'.format(rtt)},
+                           {'@source': 'min', '@value': '{0:.6g}'.format(rtt * 0.8)},
+                           {'@source': 'avg', '@value': '{0:.6g}'.format(rtt * 1.2)},
+                           {'@source': 'max', '@value': '{0:.6g}'.format(rtt * 3)}]
+            streams = []
+            for direction, ndata in (('0', rng.randint(1, 20000)), ('1', rng.randint(1, 200))):
+                semirtt = rtt / 2 * rng.uniform(0.8, 1.2)
+                streams.append({'@dir': direction, '@beginseq': str(rng.getrandbits(32)),
+                                '@mtu': '1500' if direction == '0' else '72',
+                                '@nack': str(rng.randint(0, ndata)), '@ndata': str(ndata),
+                                '@sentsackok': 'yes', '@seqlen': str(ndata * rng.randint(60, 1448)),
+                                'semirtt': [{'@source': 'syn', '@value': '{0:.6g}'.format(semirtt)},
+                                            {'@source': 'min', '@value': '{0:.6g}'.format(semirtt * 0.8)},
+                                            {'@n': str(ndata), '@source': 'avg',
+                                             '@value': '{0:.6g}'.format(semirtt * 1.1)},
+                                            {'@source': 'max', '@value': '{0:.6g}'.format(semirtt * 3)},
+                                            {'@n': str(ndata), '@source': 'var',
+                                             '@value': '{0:.6g}'.format(semirtt * semirtt / 10)}]})
+            flow['stream'] = streams
+            yield flow
+
+    def iter_tcploss_flows(self):
+        rng = self._rng(TCPLOSS_STREAM)
+        for position, flow_key in enumerate(self._flow_keys()):
+            flow = self._flow(position, *flow_key)
+            flow['rtt'] = {'@source': 'minacklatency', '@value': '{0:.9f}'.format(rng.uniform(0.001, 0.1))}
+            streams = []
+            for direction, ndata in (('0', rng.randint(1, 20000)), ('1', rng.randint(1, 200))):
+                nloss = rng.randint(0, ndata // 20)
+                stream = {'@dir': direction, '@beginseq': str(rng.getrandbits(32)),
+                          '@minacklatency': '{0:.9f}'.format(rng.uniform(0.0005, 0.05)),
+                          '@nack': str(rng.randint(0, ndata)), '@ndata': str(ndata),
+                          '@nfloss': str(rng.randint(0, nloss)), '@nloss': str(nloss),
+                          '@sentsackok': 'yes', '@seqlen': str(ndata * rng.randint(60, 1448))}
+                if nloss:
+                    stream['undelivered'] = {'@n': str(nloss)}
+                streams.append(stream)
+            flow['stream'] = streams
+            yield flow
+
+    def iter_items(self, stream_type):
+        """Records of a summary, one at a time.
+        """
+        if stream_type == WIRELESS_STREAM:
+            return self.iter_links()
+        if stream_type == NODE_STREAM:
+            return self.iter_nodes()
+        if stream_type == TCPMYSTERY_STREAM:
+            return self.iter_tcpmystery_flows()
+        if stream_type == TCPLOSS_STREAM:
+            return self.iter_tcploss_flows()
+        raise ValueError("Unknown stream type: {0}".format(stream_type))
+
+    def document(self, stream_type):
+        """A whole summary as the dict json.load (or xmltodict) would return.
+        """
+        root, attributes, item_tag = DOCUMENT_LAYOUT[stream_type]
+        content = dict(attributes)
+        content[item_tag] = list(self.iter_items(stream_type))
+        return {root: content}
+
+    def write(self, stream_type, stream, summary_format='json'):
+        """Write a summary to a text stream, one record at a time.
+        """
+        root, attributes, item_tag = DOCUMENT_LAYOUT[stream_type]
+        if summary_format == 'json':
+            stream.write('{{{0}: {{'.format(json.dumps(root)))
+            for key, value in attributes.items():
+                stream.write('{0}: {1}, '.format(json.dumps(key), json.dumps(value)))
+            stream.write('{0}: ['.format(json.dumps(item_tag)))
+            for position, item in enumerate(self.iter_items(stream_type)):
+                if position:
+                    stream.write(',\n')
+                stream.write(json.dumps(item))
+            stream.write(']}}\n')
+        elif summary_format == 'xml':
+            stream.write('<?xml version="1.0" encoding="UTF-8"?>\n<{0}{1}>\n'.format(
+                root, ''.join(' {0}="{1}"'.format(key[1:], saxutils.escape(value, XML_ATTRIBUTE_ENTITIES))
+                              for key, value in attributes.items())))
+            for item in self.iter_items(stream_type):
+                stream.write(xml_element(item_tag, item))
+                stream.write('\n')
+            stream.write('</{0}>\n'.format(root))
+        else:
+            raise ValueError("Unknown summary format: {0}".format(summary_format))
+
+    def text(self, stream_type, summary_format='json'):
+        stream = io.StringIO()
+        self.write(stream_type, stream, summary_format=summary_format)
+        return stream.getvalue()
+
+    def write_window(self, directory, summary_format='json', base=None):
+        """Write the four summaries into directory, named like start_dobby.sh
+        names them (summarydir.find_windows picks them up). Returns the
+        parse_summary stream arguments: {'wireless_stream': path, ...}.
+        """
+        if base is None:
+            base = 'dobby_{0:d}'.format(int(self.start_ts))
+        paths = {}
+        for stream_type in STREAM_TYPES:
+            path = os.path.join(directory, '{0}_{1}.{2}'.format(base, stream_type, summary_format))
+            with io.open(path, 'w', encoding='utf-8') as stream:
+                self.write(stream_type, stream, summary_format=summary_format)
+            paths['{0}_stream'.format(stream_type)] = path
+        return paths
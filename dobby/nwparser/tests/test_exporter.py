@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+import io
+import unittest
+import urllib.error
+import urllib.request
+
+import dobby.nwparser.exporter as exporter
+import dobby.nwparser.parsemanager as parsemanager
+import dobby.nwparser.synthetic as synthetic
+import dobby.utils.util as util
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+
+def parse_metrics(text):
+    """{(name, labels): value} of the samples of a text format page.
+    """
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        series, value = line.rsplit(' ', 1)
+        samples[series] = float(value)
+    return samples
+
+
+class TestHistogram(unittest.TestCase):
+    def test_buckets_are_cumulative(self):
+        histogram = exporter.Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        samples = parse_metrics('\n'.join(histogram.lines('t', (('stream', 'node'),))))
+        self.assertEqual(samples['t_bucket{stream="node",le="0.1"}'], 2)
+        self.assertEqual(samples['t_bucket{stream="node",le="1.0"}'], 3)
+        self.assertEqual(samples['t_bucket{stream="node",le="+Inf"}'], 4)
+        self.assertEqual(samples['t_count{stream="node"}'], 4)
+        self.assertAlmostEqual(samples['t_sum{stream="node"}'], 3.65)
+
+    def test_labels_are_escaped(self):
+        self.assertEqual(exporter.format_labels((('key', 'a"b\\c\n'),)), '{key="a\\"b\\\\c\\n"}')
+
+
+class TestMetricsExporter(unittest.TestCase):
+    def setUp(self):
+        self.parse_manager = parsemanager.ParseManager(max_summaries=2)
+        self.exporter = exporter.MetricsExporter(self.parse_manager, port=0)
+        self.generator = synthetic.SummaryGenerator(links=10, flows=30, seed=1)
+
+    def parse_window(self, start_ts):
+        streams = dict((stream_type + '_stream', io.StringIO(self.generator.text(stream_type)))
+                       for stream_type in synthetic.STREAM_TYPES)
+        return self.parse_manager.parse_summary(start_ts=start_ts, end_ts=start_ts + 300, **streams)
+
+    def test_metrics_of_parsed_windows(self):
+        self.assertTrue(self.parse_manager.instrument)
+        for start_ts in (0, 300, 600):
+            ns = self.parse_window(start_ts)
+        samples = parse_metrics(self.exporter.render())
+        self.assertEqual(samples['dobby_windows_parsed_total'], 3)
+        self.assertEqual(samples['dobby_window_parse_seconds_count'], 3)
+        self.assertEqual(samples['dobby_stream_parse_seconds_bucket{stream="tcploss",le="+Inf"}'], 3)
+        self.assertEqual(samples['dobby_stream_parse_seconds_count{stream="wireless"}'], 3)
+        self.assertEqual(samples['dobby_last_window_end_timestamp'], 900)
+        self.assertEqual(samples['dobby_summary_entries{kind="flows"}'], len(ns.ip_flows))
+        self.assertEqual(samples['dobby_summary_entries{kind="edges"}'], 10)
+        self.assertEqual(samples['dobby_history_summaries'], 2)
+        self.assertEqual(samples['dobby_history_bytes'], self.parse_manager.summary_queue.nbytes)
+
+    def test_error_counters(self):
+        json_failures = util.decode_failures['json']
+        self.parse_window(0)
+        self.assertRaises(util.DecodeError, self.parse_manager.parse_summary,
+                          tcploss_stream=io.StringIO('{"trace": '))
+        self.assertRaises(OSError, self.parse_manager.parse_summary, tcploss_stream='/nonexistent/tcploss.json')
+        samples = parse_metrics(self.exporter.render())
+        self.assertEqual(samples['dobby_parse_errors_total{error="FileNotFoundError"}'], 1)
+        self.assertEqual(samples['dobby_parse_errors_total{error="DecodeError"}'], 1)
+        self.assertEqual(samples['dobby_decode_failures_total{format="json"}'], json_failures + 1)
+        self.assertEqual(samples['dobby_windows_parsed_total'], 1)
+
+    def test_failure_counters_are_copied_by_the_listeners(self):
+        self.parse_window(0)
+        # A failure counted after the last window is not read by a scrape
+        util.conversion_failures['@exporter_test'] += 1
+        self.addCleanup(util.conversion_failures.pop, '@exporter_test')
+        self.assertNotIn('dobby_conversion_failures_total{key="@exporter_test"}',
+                         parse_metrics(self.exporter.render()))
+        self.parse_window(300)
+        samples = parse_metrics(self.exporter.render())
+        self.assertEqual(samples['dobby_conversion_failures_total{key="@exporter_test"}'], 1)
+
+    def test_http_endpoint(self):
+        self.parse_window(0)
+        with self.exporter:
+            self.assertNotEqual(self.exporter.port, 0)
+            url = 'http://127.0.0.1:{0}'.format(self.exporter.port)
+            with urllib.request.urlopen(url + '/metrics', timeout=5) as response:
+                self.assertTrue(response.headers['Content-Type'].startswith('text/plain; version=0.0.4'))
+                samples = parse_metrics(response.read().decode('utf-8'))
+            self.assertEqual(samples['dobby_windows_parsed_total'], 1)
+            with self.assertRaises(urllib.error.HTTPError) as context:
+                urllib.request.urlopen(url + '/other', timeout=5)
+            self.assertEqual(context.exception.code, 404)
+            context.exception.close()
+        self.assertIsNone(self.exporter.server)
+
+if __name__ == '__main__':
+    for test_case in (TestHistogram, TestMetricsExporter):
+        suite = unittest.TestLoader().loadTestsFromTestCase(test_case)
+        unittest.TextTestRunner(verbosity=2).run(suite)
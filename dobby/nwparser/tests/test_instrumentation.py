@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+import concurrent.futures
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import dobby.nwparser.instrumentation as instrumentation
+import dobby.nwparser.parsemanager as parsemanager
+import dobby.nwparser.synthetic as synthetic
+import dobby.utils.util as util
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.generator = synthetic.SummaryGenerator(links=20, flows=50, seed=5)
+        self.counts = self.generator.counts()
+
+    def streams(self):
+        return dict((stream_type + '_stream', io.StringIO(self.generator.text(stream_type)))
+                    for stream_type in synthetic.STREAM_TYPES)
+
+    def test_report_of_a_window(self):
+        parse_manager = parsemanager.ParseManager(instrument=True)
+        reports = []
+        parse_manager.add_report_listener(reports.append)
+        ns = parse_manager.parse_summary(start_ts=0, end_ts=300, **self.streams())
+        report = parse_manager.last_report
+        self.assertEqual(reports, [report])
+        self.assertEqual((report.start_ts, report.end_ts), (0, 300))
+        expected_stages = [stream_type + stage for stream_type in parsemanager.STREAM_ORDER
+                           for stage in ('.decode', '.prepare', '.merge')] + ['publish']
+        self.assertEqual(list(report.stages), expected_stages)
+        for stream_type in parsemanager.STREAM_ORDER:
+            self.assertEqual(report.stages[stream_type + '.decode'].records, self.counts[stream_type])
+        self.assertEqual(report.records, sum(self.counts.values()))
+        self.assertGreaterEqual(report.wall, sum(stats.wall for stats in report.stages.values()))
+        # Every node and edge of the summary was created once
+        self.assertEqual(report.counters[instrumentation.NODES_NEW], len(ns.nodes))
+        self.assertEqual(report.counters[instrumentation.EDGES_NEW], len(ns.edges))
+        self.assertEqual(report.counters[instrumentation.FLOWS_NEW], len(ns.ip_flows))
+        self.assertGreater(report.counters[instrumentation.ENDPOINTS_REUSED], 0)
+        self.assertEqual(report.conversion_failures, {})
+        self.assertIn('tcploss.merge', str(report))
+        self.assertEqual(json.loads(json.dumps(report.as_dict()))['counters'], dict(report.counters))
+        # The next window counts into its own report
+        counters = dict(report.counters)
+        parse_manager.parse_summary(start_ts=300, end_ts=600, **self.streams())
+        self.assertEqual(dict(report.counters), counters)
+
+    def test_instrumented_summary_matches(self):
+        plain = parsemanager.ParseManager().parse_summary(start_ts=0, end_ts=300, **self.streams())
+        parse_manager = parsemanager.ParseManager()
+        self.assertIsNone(parse_manager.last_report)
+        with instrumentation.Profiler(parse_manager) as profiler:
+            instrumented = parse_manager.parse_summary(start_ts=0, end_ts=300, **self.streams())
+            parse_manager.parse_summary(start_ts=300, end_ts=600, **self.streams())
+        self.assertFalse(parse_manager.instrument)
+        self.assertEqual(parse_manager.report_listeners, [])
+        self.assertEqual(len(profiler.reports), 2)
+        self.assertEqual(profiler.stages()['wireless.merge'].calls, 2)
+        self.assertEqual(profiler.counters()[instrumentation.EDGES_NEW], 2 * len(plain.edges))
+        self.assertIn('2 windows', profiler.summary())
+        self.assertEqual(len(instrumented.nodes), len(plain.nodes))
+        self.assertEqual(sorted(instrumented.ip_flows), sorted(plain.ip_flows))
+        parse_manager.parse_summary(start_ts=600, end_ts=900, **self.streams())
+        self.assertEqual(len(profiler.reports), 2)
+
+    def test_executor_stages(self):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            parse_manager = parsemanager.ParseManager(executor=executor, instrument=True)
+            parse_manager.parse_summary(start_ts=0, end_ts=300, **self.streams())
+        report = parse_manager.last_report
+        self.assertEqual(report.stages['tcpmystery.wait'].records, self.counts['tcpmystery'])
+        self.assertIn('tcpmystery.merge', report.stages)
+        self.assertNotIn('tcpmystery.decode', report.stages)
+        self.assertEqual(report.records, sum(self.counts.values()))
+
+    def test_streaming_stages(self):
+        parse_manager = parsemanager.ParseManager(streaming=True, instrument=True)
+        ns = parse_manager.parse_summary(start_ts=0, end_ts=300, **self.streams())
+        report = parse_manager.last_report
+        self.assertEqual(list(report.stages),
+                         [stream_type + '.parse' for stream_type in parsemanager.STREAM_ORDER] + ['publish'])
+        self.assertEqual(report.stages['tcpmystery.parse'].records, self.counts['tcpmystery'])
+        self.assertEqual(report.records, sum(self.counts.values()))
+        self.assertEqual(report.counters[instrumentation.FLOWS_NEW], len(ns.ip_flows))
+
+    def test_conversion_failures(self):
+        document = self.generator.document('tcpmystery')
+        flow = document['trace']['flow'][0]
+        stream = flow['stream'][0] if isinstance(flow['stream'], list) else flow['stream']
+        stream['@mtu'] = 'abc'
+        failures_before = util.conversion_failures['@mtu']
+        parse_manager = parsemanager.ParseManager(instrument=True)
+        parse_manager.parse_summary(tcpmystery_stream=io.StringIO(json.dumps(document)))
+        self.assertEqual(parse_manager.last_report.conversion_failures, {'@mtu': 1})
+        self.assertEqual(util.conversion_failures['@mtu'], failures_before + 1)
+        # A window with an invalid stream is not reported
+        report = parse_manager.last_report
+        json_failures = util.decode_failures['json']
+        self.assertRaises(util.DecodeError, parse_manager.parse_summary,
+                          tcploss_stream=io.StringIO('{"trace": '))
+        self.assertIs(parse_manager.last_report, report)
+        self.assertEqual(util.decode_failures['json'], json_failures + 1)
+
+    def test_failures_of_windows_decoded_ahead(self):
+        document = self.generator.document('tcpmystery')
+        flow = document['trace']['flow'][0]
+        stream = flow['stream'][0] if isinstance(flow['stream'], list) else flow['stream']
+        stream['@mtu'] = 'abc'
+        with tempfile.TemporaryDirectory() as summary_dir:
+            paths = self.generator.write_window(summary_dir, base='dobby_1486757300')
+            with open(paths['tcpmystery_stream'], 'w') as tcpmystery_stream:
+                json.dump(document, tcpmystery_stream)
+            self.generator.write_window(summary_dir, base='dobby_1486757600')
+            parse_manager = parsemanager.ParseManager(instrument=True)
+            reports = []
+            parse_manager.add_report_listener(reports.append)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+                parse_manager.ingest_directory(summary_dir, executor=executor, max_pending=2,
+                                               state_file=os.path.join(summary_dir, 'state'))
+        # Both windows were decoding while the first was merged
+        self.assertEqual([report.start_ts for report in reports], [1486757300.0, 1486757600.0])
+        self.assertEqual(reports[0].conversion_failures, {'@mtu': 1})
+        self.assertEqual(reports[1].conversion_failures, {})
+
+if __name__ == '__main__':
+    for test_case in (TestInstrumentation,):
+        suite = unittest.TestLoader().loadTestsFromTestCase(test_case)
+        unittest.TextTestRunner(verbosity=2).run(suite)
@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 
+import concurrent.futures
 import ipaddress
+import os
+import tempfile
 import unittest
 import io
 import json
+import xml.sax.saxutils as saxutils
 
 import dobby.nwinfo.networksummary as networksummary
 import dobby.nwmodel.endpoint as endpoint
@@ -14,10 +18,22 @@ import dobby.nwmodel.phymodel as phymodel
 import dobby.nwmetrics.metrics as metrics
 import dobby.nwparser.parsemanager as parsemanager
 import dobby.nwparser.parsenodesummary as nodesummaryparser
+import dobby.nwparser.summarydir as summarydir
+import dobby.utils.keys as keys
 import dobby.utils.util as util
 
 __author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
 
+def to_xml(tag, value):
+    """Inverse of xmltodict.parse for the summaries used below.
+    """
+    if type(value) == list:
+        return ''.join(to_xml(tag, item) for item in value)
+    attrs = ''.join(' {0}={1}'.format(key[1:], saxutils.quoteattr(val))
+                    for key, val in value.items() if key.startswith('@'))
+    children = ''.join(to_xml(key, val) for key, val in value.items() if not key.startswith('@'))
+    return '<{0}{1}>{2}</{0}>'.format(tag, attrs, children)
+
 
 class TestParseManager(unittest.TestCase):
     def setUp(self):
@@ -62,13 +78,13 @@ class TestParseManager(unittest.TestCase):
         for flow in self.tcpmystery_json['trace']['flow']:
             self.ips.update([flow['@dst'], flow['@src']])
             self.tcp_info.add((flow['@src'], flow['@dst'], flow['@sport'], flow['@dport']))
-            self.tcp_keys.add(str(flow['@src'] + "-" + flow['@sport'] + "-" + flow['@dst'] + "-" + flow['@dport']))
+            self.tcp_keys.add(keys.flow_key(keys.ip_key(flow['@src']), flow['@sport'], keys.ip_key(flow['@dst']), flow['@dport']))
 
         #TCP loss
         for flow in self.tcploss_json['trace']['flow']:
             self.ips.update([flow['@dst'], flow['@src']])
             self.tcp_info.add((flow['@src'], flow['@dst'], flow['@sport'], flow['@dport']))
-            self.tcp_keys.add(str(flow['@src'] + "-" + flow['@sport'] + "-" + flow['@dst'] + "-" + flow['@dport']))
+            self.tcp_keys.add(keys.flow_key(keys.ip_key(flow['@src']), flow['@sport'], keys.ip_key(flow['@dst']), flow['@dport']))
 
         #Wireless Summary
         self.aps = set()
@@ -106,16 +122,16 @@ class TestParseManager(unittest.TestCase):
 
         #Check ip to endpoints mapping
         self.assertEqual(len(ns.ip_to_endpoints), len(self.ips))
-        self.assertListEqual(sorted(list(ns.ip_to_endpoints.keys())), sorted(self.ips))
+        self.assertListEqual(sorted(keys.format_ip(ip) for ip in ns.ip_to_endpoints.keys()), sorted(self.ips))
         ips_from_endpoints = set()
         for endpoint in ns.ip_to_endpoints.values():
-            ips_from_endpoints.update(list(endpoint.ip_infos.keys()))
+            ips_from_endpoints.update(keys.format_ip(ip) for ip in endpoint.ip_infos.keys())
         self.assertEqual(sorted(ips_from_endpoints),
                          sorted(self.ips))
 
         #Check mac to endpoints mapping
         self.assertEqual(len(ns.mac_to_endpoints), len(self.ethers))
-        self.assertListEqual(sorted([x.lower() for x in ns.mac_to_endpoints.keys()]),
+        self.assertListEqual(sorted([phymodel.format_mac(x) for x in ns.mac_to_endpoints.keys()]),
                              sorted(self.ethers))
 
         #Check cloud ips are correctly mapped
@@ -131,17 +147,255 @@ class TestParseManager(unittest.TestCase):
             node_endpoints.extend(value.endpoints)
         ips_from_node_endpoints = set()
         for endpoint in node_endpoints:
-            ips_from_node_endpoints.update(list(endpoint.ip_infos.keys()))
+            ips_from_node_endpoints.update(keys.format_ip(ip) for ip in endpoint.ip_infos.keys())
         self.assertEqual(sorted(ips_from_node_endpoints),
                          sorted(self.ips))
 
         #Check wireless summary
-        self.assertListEqual(sorted(ns.mac_to_endpoints.keys()), sorted(self.ethers))
+        self.assertListEqual(sorted(phymodel.format_mac(x) for x in ns.mac_to_endpoints.keys()), sorted(self.ethers))
         self.assertEqual(sorted([str(endpoint.phy_address) for endpoint in ns.mac_to_endpoints.values()]),
                          sorted(self.ethers))
-        self.assertEqual(sorted(ns.phy_models.keys()), sorted([(str(self.bssid), self.channel)]))
+        self.assertEqual(sorted(ns.phy_models.keys()), sorted([(self.bssid.value, self.channel)]))
         self.assertEqual(sorted(ns.edges.keys()),
-                         sorted([(str(self.addr1), str(self.addr2)), (str(self.addr3), str(self.addr4))]))
+                         sorted([(self.addr1.value, self.addr2.value), (self.addr3.value, self.addr4.value)]))
+
+    def test_streaming_parse_matches_full_parse(self):
+        ns = self.parse_manager.summary_queue[-1]
+        streaming_manager = parsemanager.ParseManager(streaming=True)
+        streaming_ns = streaming_manager.parse_summary(start_ts=1, end_ts=2,
+                           wireless_stream=io.StringIO(json.dumps(self.wireless_json)),
+                           node_stream=io.StringIO(json.dumps(self.node_json)),
+                           tcploss_stream=io.StringIO(json.dumps(self.tcploss_json)),
+                           tcpmystery_stream=io.StringIO(json.dumps(self.tcpmystery_json)))
+        self.assertEqual(sorted(streaming_ns.ip_flows.keys()), sorted(ns.ip_flows.keys()))
+        self.assertEqual(sorted(streaming_ns.ip_to_endpoints.keys()), sorted(ns.ip_to_endpoints.keys()))
+        self.assertEqual(len(streaming_ns.nodes), len(ns.nodes))
+        for key, tcp_flow in ns.ip_flows.items():
+            streaming_flow = streaming_ns.ip_flows[key]
+            self.assertEqual(streaming_flow.flow_metrics, tcp_flow.flow_metrics)
+            self.assertEqual(streaming_flow.flow_metrics_src_to_dst, tcp_flow.flow_metrics_src_to_dst)
+            self.assertEqual(streaming_flow.flow_metrics_dst_to_src, tcp_flow.flow_metrics_dst_to_src)
+
+    def test_truncated_stream_is_not_published(self):
+        streaming_manager = parsemanager.ParseManager(streaming=True)
+        truncated = json.dumps(self.tcpmystery_json)[:-20]
+        self.assertRaises(util.DecodeError, streaming_manager.parse_summary, start_ts=1, end_ts=2,
+                          wireless_stream=io.StringIO(json.dumps(self.wireless_json)),
+                          tcpmystery_stream=io.StringIO(truncated))
+        self.assertEqual(streaming_manager.parse_errors['DecodeError'], 1)
+        self.assertEqual(len(streaming_manager.summary_queue), 0)
+
+    def test_xml_parse_matches_json_parse(self):
+        ns = self.parse_manager.summary_queue[-1]
+        xml_streams = [io.StringIO(to_xml(*list(doc.items())[0])) for doc in
+                       [self.wireless_json, self.node_json, self.tcploss_json, self.tcpmystery_json]]
+        xml_ns = parsemanager.ParseManager().parse_summary(start_ts=1, end_ts=2,
+                           wireless_stream=xml_streams[0],
+                           node_stream=xml_streams[1],
+                           tcploss_stream=xml_streams[2],
+                           tcpmystery_stream=xml_streams[3],
+                           summary_format=parsemanager.XML_FORMAT)
+        self.assertEqual(sorted(xml_ns.mac_to_endpoints.keys()), sorted(ns.mac_to_endpoints.keys()))
+        self.assertEqual(sorted(xml_ns.ip_to_endpoints.keys()), sorted(ns.ip_to_endpoints.keys()))
+        self.assertEqual(sorted(xml_ns.edges.keys()), sorted(ns.edges.keys()))
+        self.assertEqual(sorted(xml_ns.ip_flows.keys()), sorted(ns.ip_flows.keys()))
+        self.assertEqual(len(xml_ns.nodes), len(ns.nodes))
+        for key, edge in ns.edges.items():
+            self.assertEqual(xml_ns.edges[key].edge_metrics_ab, edge.edge_metrics_ab)
+            self.assertEqual(xml_ns.edges[key].edge_metrics_ba, edge.edge_metrics_ba)
+        for key, tcp_flow in ns.ip_flows.items():
+            self.assertEqual(xml_ns.ip_flows[key].flow_metrics, tcp_flow.flow_metrics)
+            self.assertEqual(xml_ns.ip_flows[key].flow_metrics_src_to_dst, tcp_flow.flow_metrics_src_to_dst)
+            self.assertEqual(xml_ns.ip_flows[key].flow_metrics_dst_to_src, tcp_flow.flow_metrics_dst_to_src)
+
+    def assert_same_summary(self, ns, other_ns):
+        self.assertEqual(sorted(other_ns.mac_to_endpoints.keys()), sorted(ns.mac_to_endpoints.keys()))
+        self.assertEqual(sorted(other_ns.ip_to_endpoints.keys()), sorted(ns.ip_to_endpoints.keys()))
+        self.assertEqual(sorted(other_ns.edges.keys()), sorted(ns.edges.keys()))
+        self.assertEqual(sorted(other_ns.ip_flows.keys()), sorted(ns.ip_flows.keys()))
+        self.assertEqual(sorted(node.node_type.value for node in other_ns.nodes.values()),
+                         sorted(node.node_type.value for node in ns.nodes.values()))
+        for key, edge in ns.edges.items():
+            self.assertEqual(other_ns.edges[key].edge_metrics_ab, edge.edge_metrics_ab)
+            self.assertEqual(other_ns.edges[key].edge_metrics_ba, edge.edge_metrics_ba)
+        for key, tcp_flow in ns.ip_flows.items():
+            self.assertEqual(other_ns.ip_flows[key].flow_metrics, tcp_flow.flow_metrics)
+            self.assertEqual(other_ns.ip_flows[key].flow_metrics_src_to_dst, tcp_flow.flow_metrics_src_to_dst)
+            self.assertEqual(other_ns.ip_flows[key].flow_metrics_dst_to_src, tcp_flow.flow_metrics_dst_to_src)
+        # Endpoint identity: an IP known from the node summary maps to its MAC endpoint
+        for key, endpoint in ns.ip_to_endpoints.items():
+            self.assertEqual(str(other_ns.ip_to_endpoints[key].phy_address), str(endpoint.phy_address))
+
+    def test_parallel_parse_with_threads_matches_sequential_parse(self):
+        ns = self.parse_manager.summary_queue[-1]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            parallel_manager = parsemanager.ParseManager(executor=executor)
+            parallel_ns = parallel_manager.parse_summary(start_ts=1, end_ts=2,
+                               wireless_stream=io.StringIO(json.dumps(self.wireless_json)),
+                               node_stream=io.StringIO(json.dumps(self.node_json)),
+                               tcploss_stream=io.StringIO(json.dumps(self.tcploss_json)),
+                               tcpmystery_stream=io.StringIO(json.dumps(self.tcpmystery_json)))
+        self.assertEqual(len(parallel_ns.nodes), len(ns.nodes))
+        self.assert_same_summary(ns, parallel_ns)
+        self.assertIs(parallel_manager.find_summary(1.5), parallel_ns)
+
+    def test_streaming_parse_does_not_collect_records(self):
+        ns = self.parse_manager.summary_queue[-1]
+        merged = []
+        streaming_manager = parsemanager.ParseManager(streaming=True)
+        for parser, name in [(streaming_manager.wireless_parser, 'merge_links'),
+                             (streaming_manager.nodesummary_parser, 'merge_nodes'),
+                             (streaming_manager.tcpmystery_parser, 'merge_flows'),
+                             (streaming_manager.tcploss_parser, 'merge_flows')]:
+            def record_merge(prepared_records, network_summary=None, merge=getattr(parser, name)):
+                merged.append(type(prepared_records))
+                return merge(prepared_records, network_summary=network_summary)
+            setattr(parser, name, record_merge)
+        streaming_ns = streaming_manager.parse_summary(start_ts=1, end_ts=2,
+                           wireless_stream=io.StringIO(json.dumps(self.wireless_json)),
+                           node_stream=io.StringIO(json.dumps(self.node_json)),
+                           tcploss_stream=io.StringIO(json.dumps(self.tcploss_json)),
+                           tcpmystery_stream=io.StringIO(json.dumps(self.tcpmystery_json)))
+        self.assertEqual(len(merged), 4)
+        self.assertNotIn(list, merged)
+        self.assertEqual(len(streaming_ns.nodes), len(ns.nodes))
+        self.assert_same_summary(ns, streaming_ns)
+
+    def test_streaming_can_not_use_an_executor(self):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            self.assertRaises(ValueError, parsemanager.ParseManager, streaming=True, executor=executor)
+
+    def test_parallel_parse_with_processes_matches_sequential_parse(self):
+        ns = self.parse_manager.summary_queue[-1]
+        with tempfile.TemporaryDirectory() as summary_dir:
+            paths = []
+            for name, doc in [('wireless', self.wireless_json), ('node', self.node_json),
+                              ('tcploss', self.tcploss_json), ('tcpmystery', self.tcpmystery_json)]:
+                paths.append(os.path.join(summary_dir, 'base_{0}.json'.format(name)))
+                with open(paths[-1], 'w') as f:
+                    json.dump(doc, f)
+            with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+                parallel_ns = parsemanager.ParseManager(executor=executor).parse_summary(
+                    start_ts=1, end_ts=2, wireless_stream=paths[0], node_stream=paths[1],
+                    tcploss_stream=paths[2], tcpmystery_stream=paths[3])
+            path_ns = parsemanager.ParseManager().parse_summary(
+                start_ts=1, end_ts=2, wireless_stream=paths[0], node_stream=paths[1],
+                tcploss_stream=paths[2], tcpmystery_stream=paths[3])
+        self.assert_same_summary(ns, parallel_ns)
+        self.assert_same_summary(ns, path_ns)
+
+    def test_columnar_parse_matches_object_parse(self):
+        ns = self.parse_manager.summary_queue[-1]
+        columnar_ns = parsemanager.ParseManager(columnar_flows=True).parse_summary(start_ts=1, end_ts=2,
+                           wireless_stream=io.StringIO(json.dumps(self.wireless_json)),
+                           node_stream=io.StringIO(json.dumps(self.node_json)),
+                           tcploss_stream=io.StringIO(json.dumps(self.tcploss_json)),
+                           tcpmystery_stream=io.StringIO(json.dumps(self.tcpmystery_json)))
+        self.assertEqual(len(columnar_ns.flow_table), len(ns.ip_flows))
+        self.assert_same_summary(ns, columnar_ns)
+        for key, tcp_flow in ns.ip_flows.items():
+            columnar_flow = columnar_ns.ip_flows[key]
+            self.assertEqual(columnar_flow.flow_metrics.__dict__, tcp_flow.flow_metrics.__dict__)
+            self.assertEqual(sorted(columnar_flow.src_endpoint.ip_infos),
+                             sorted(tcp_flow.src_endpoint.ip_infos))
+            self.assertEqual(columnar_flow.sport, tcp_flow.sport)
+
+    def test_columnar_flows_can_not_accumulate(self):
+        self.assertRaises(ValueError, parsemanager.ParseManager, columnar_flows=True, accumulate_metrics=True)
+        parse_manager = parsemanager.ParseManager(columnar_flows=True)
+        parse_manager.tcploss_parser.accumulate = True
+        self.assertRaises(ValueError, parse_manager.parse_summary, start_ts=1, end_ts=2,
+                          tcploss_stream=io.StringIO(json.dumps(self.tcploss_json)))
+
+    def test_compact_parse_matches_object_parse(self):
+        ns = self.parse_manager.summary_queue[-1]
+        compact_ns = parsemanager.ParseManager(compact_models=True).parse_summary(start_ts=1, end_ts=2,
+                           wireless_stream=io.StringIO(json.dumps(self.wireless_json)),
+                           node_stream=io.StringIO(json.dumps(self.node_json)),
+                           tcploss_stream=io.StringIO(json.dumps(self.tcploss_json)),
+                           tcpmystery_stream=io.StringIO(json.dumps(self.tcpmystery_json)))
+        self.assert_same_summary(ns, compact_ns)
+        for tcp_flow in compact_ns.ip_flows.values():
+            self.assertIsInstance(tcp_flow, flow.CompactTCPFlow)
+            self.assertFalse(hasattr(tcp_flow.flow_metrics, '__dict__'))
+
+    def test_compact_columnar_parse_matches_object_parse(self):
+        ns = self.parse_manager.summary_queue[-1]
+        compact_ns = parsemanager.ParseManager(compact_models=True, columnar_flows=True).parse_summary(
+                           start_ts=1, end_ts=2,
+                           wireless_stream=io.StringIO(json.dumps(self.wireless_json)),
+                           node_stream=io.StringIO(json.dumps(self.node_json)),
+                           tcploss_stream=io.StringIO(json.dumps(self.tcploss_json)),
+                           tcpmystery_stream=io.StringIO(json.dumps(self.tcpmystery_json)))
+        self.assertEqual(len(compact_ns.flow_table), len(ns.ip_flows))
+        self.assert_same_summary(ns, compact_ns)
+        for key, tcp_flow in ns.ip_flows.items():
+            columnar_flow = compact_ns.ip_flows[key]
+            self.assertEqual(columnar_flow.flow_metrics.rtt_stats, tcp_flow.flow_metrics.rtt_stats)
+
+    def write_window(self, summary_dir, base, summary_format='json'):
+        for name, doc in [('wireless', self.wireless_json), ('node', self.node_json),
+                          ('tcploss', self.tcploss_json), ('tcpmystery', self.tcpmystery_json)]:
+            path = os.path.join(summary_dir, '{0}_{1}.{2}'.format(base, name, summary_format))
+            with open(path, 'w') as f:
+                if summary_format == 'json':
+                    json.dump(doc, f)
+                else:
+                    f.write(to_xml(*list(doc.items())[0]))
+
+    def test_ingest_directory_parses_windows_in_time_order(self):
+        with tempfile.TemporaryDirectory() as summary_dir:
+            self.write_window(summary_dir, 'dobby_1486757600')
+            self.write_window(summary_dir, 'dobby_1486757300', summary_format='xml')
+            self.write_window(summary_dir, 'dobby_1486757900')
+            parse_manager = parsemanager.ParseManager()
+            report = parse_manager.ingest_directory(summary_dir)
+            self.assertEqual(report.windows, 3)
+            self.assertEqual(report.flows, 3 * len(self.tcp_keys))
+            self.assertEqual(report.skipped, 0)
+            self.assertGreater(report.flows_per_sec, 0)
+            self.assertEqual([ns.start_ts for ns in parse_manager.summary_queue],
+                             [1486757300.0, 1486757600.0, 1486757900.0])
+            self.assertEqual([ns.end_ts for ns in parse_manager.summary_queue],
+                             [1486757600.0, 1486757900.0, 1486758200.0])
+            self.assert_same_summary(self.parse_manager.summary_queue[-1], parse_manager.summary_queue[0])
+
+    def test_ingest_directory_resumes(self):
+        with tempfile.TemporaryDirectory() as summary_dir:
+            self.write_window(summary_dir, 'dobby_1486757300')
+            self.write_window(summary_dir, 'dobby_1486757600')
+            report = parsemanager.ParseManager().ingest_directory(summary_dir)
+            self.assertEqual(report.windows, 2)
+            self.write_window(summary_dir, 'dobby_1486757900')
+            parse_manager = parsemanager.ParseManager()
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                report = parse_manager.ingest_directory(summary_dir, executor=executor)
+            self.assertEqual(report.windows, 1)
+            self.assertEqual(report.skipped, 2)
+            self.assertEqual([ns.start_ts for ns in parse_manager.summary_queue], [1486757900.0])
+            report = parsemanager.ParseManager().ingest_directory(summary_dir, resume=False)
+            self.assertEqual(report.windows, 3)
+
+    def test_ingest_directory_records_only_complete_published_windows(self):
+        with tempfile.TemporaryDirectory() as summary_dir:
+            self.write_window(summary_dir, 'dobby_1486757300')
+            self.write_window(summary_dir, 'dobby_1486757600')
+            os.remove(os.path.join(summary_dir, 'dobby_1486757600_tcploss.json'))
+            self.write_window(summary_dir, 'dobby_1486757900')
+            with open(os.path.join(summary_dir, 'dobby_1486757900_tcploss.json'), 'w') as f:
+                f.write('{"trace": ')
+            state_path = os.path.join(summary_dir, parsemanager.INGEST_STATE_FILE)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                self.assertRaises(util.DecodeError, parsemanager.ParseManager().ingest_directory,
+                                  summary_dir, executor=executor)
+            self.assertEqual(summarydir.read_ingest_state(state_path), {'dobby_1486757300'})
+            # Once complete, both windows are parsed by the next run
+            self.write_window(summary_dir, 'dobby_1486757600')
+            self.write_window(summary_dir, 'dobby_1486757900')
+            report = parsemanager.ParseManager().ingest_directory(summary_dir)
+            self.assertEqual((report.windows, report.skipped, report.incomplete), (2, 1, 0))
+            self.assertEqual(summarydir.read_ingest_state(state_path),
+                             {'dobby_1486757300', 'dobby_1486757600', 'dobby_1486757900'})
 
     def test_find_summary_works(self):
         ns1 = self.parse_manager.find_summary(1)
@@ -153,6 +407,174 @@ class TestParseManager(unittest.TestCase):
         self.assertEqual(ns2.end_ts, 2)
         self.assertIsNone(ns3)
 
+    def test_published_summaries_are_not_modified(self):
+        ns = self.parse_manager.summary_queue[-1]
+        self.assertTrue(ns.frozen)
+        tcp_key = next(iter(ns.ip_flows))
+        total_loss = ns.ip_flows[tcp_key].flow_metrics.total_loss
+        tcploss_json = json.loads(json.dumps(self.tcploss_json))
+        for tcp_flow in tcploss_json['trace']['flow']:
+            for stream in tcp_flow['stream']:
+                stream['@nloss'], stream['@nfloss'] = '617', '0'
+        derived_ns = self.parse_manager.tcploss_parser.parse_summary(tcploss_json, network_summary=ns)
+        self.assertIsNot(derived_ns, ns)
+        self.assertEqual(derived_ns.ip_flows[tcp_key].flow_metrics.total_loss, 1234.0)
+        self.assertEqual(ns.ip_flows[tcp_key].flow_metrics.total_loss, total_loss)
+        self.assertEqual(sorted(derived_ns.ip_flows), sorted(ns.ip_flows))
+
+    def test_published_endpoints_and_nodes_are_not_modified(self):
+        ns = self.parse_manager.summary_queue[-1]
+
+        def endpoint_state(network_summary):
+            return dict((mac, (endpoint.vendor, sorted(endpoint.ip_infos), len(endpoint.edges), endpoint.node_id))
+                        for mac, endpoint in network_summary.mac_to_endpoints.items())
+        state = endpoint_state(ns)
+        node_endpoints = dict((node_id, list(node.endpoints)) for node_id, node in ns.nodes.items())
+        node_json = json.loads(json.dumps(self.node_json))
+        for json_node in node_json['nodes']['node']:
+            json_node['@vendor'] = 'Next window'
+            json_node['ip'] = util.as_list(json_node['ip']) + [{'@addr': '10.9.9.9', '@hostname': ''}]
+        wireless_json = json.loads(json.dumps(self.wireless_json))
+        wireless_json['links']['link'][0]['@client'] = '66:77:88:99:AA:BB'
+        derived_ns = self.parse_manager.nodesummary_parser.parse_summary(node_json, network_summary=ns)
+        derived_ns = self.parse_manager.wireless_parser.parse_summary(wireless_json, network_summary=derived_ns)
+        self.assertEqual(endpoint_state(ns), state)
+        self.assertEqual(dict((node_id, list(node.endpoints)) for node_id, node in ns.nodes.items()),
+                         node_endpoints)
+        ap_endpoint = derived_ns.mac_to_endpoints[self.addr1.value]
+        self.assertEqual(ap_endpoint.vendor, None)
+        self.assertEqual(len(ap_endpoint.edges), 2)
+        mac = phymodel.parse_mac('74:DF:BF:66:7C:69')
+        endpoint = derived_ns.mac_to_endpoints[mac]
+        self.assertEqual(endpoint.vendor, 'Next window')
+        self.assertIn(keys.ip_key('10.9.9.9'), endpoint.ip_infos)
+        # The copy replaces the published endpoint in the maps and its node
+        self.assertIs(derived_ns.ip_to_endpoints[keys.ip_key('192.168.1.120')], endpoint)
+        self.assertIs(ns.ip_to_endpoints[keys.ip_key('192.168.1.120')], ns.mac_to_endpoints[mac])
+        self.assertEqual([node_endpoint is endpoint for node_endpoint in derived_ns.nodes[endpoint.node_id].endpoints],
+                         [True])
+
+    def test_published_summaries_are_rolled_up(self):
+        parse_manager = parsemanager.ParseManager(rollup_periods=[3600])
+        published = []
+        parse_manager.add_summary_listener(published.append)
+        for start_ts in [0, 300]:
+            parse_manager.parse_summary(start_ts=start_ts, end_ts=start_ts + 300,
+                                        tcploss_stream=io.StringIO(json.dumps(self.tcploss_json)))
+        self.assertEqual(published, list(parse_manager.summary_queue))
+        hour = parse_manager.rollups.find(3600, 0)
+        self.assertEqual(sorted(hour.ip_flows), sorted(published[0].ip_flows))
+        for key, tcp_flow in published[0].ip_flows.items():
+            self.assertEqual(hour.ip_flows[key].flow_metrics.total_loss, 2 * tcp_flow.flow_metrics.total_loss)
+
+    def test_top_flows_over_a_time_range(self):
+        parse_manager = parsemanager.ParseManager(rollup_periods=[3600])
+        for start_ts in [0, 300]:
+            parse_manager.parse_summary(start_ts=start_ts, end_ts=start_ts + 300,
+                                        tcploss_stream=io.StringIO(json.dumps(self.tcploss_json)))
+        window = parse_manager.summary_queue[0]
+        worst_key, worst_flow = max(window.ip_flows.items(),
+                                    key=lambda item: item[1].flow_metrics.total_loss)
+        for period in (None, 3600):
+            ranked = parse_manager.top_flows(0, 600, 'total_loss', k=1, period=period)
+            self.assertEqual(ranked[0].key, worst_key)
+            self.assertEqual(ranked[0].value, 2 * worst_flow.flow_metrics.total_loss)
+        self.assertEqual(parse_manager.top_flows(0, 300, 'total_loss', k=1)[0].value,
+                         worst_flow.flow_metrics.total_loss)
+        self.assertEqual(parse_manager.top_edges(5000, 6000, 'total_retx'), [])
+        with self.assertRaises(ValueError):
+            parsemanager.ParseManager().top_flows(0, 600, 'total_loss', period=3600)
+
+    def test_accumulating_parsers_keep_running_metrics(self):
+        parse_manager = parsemanager.ParseManager(accumulate_metrics=True)
+        ns = None
+        for _ in range(2):
+            ns = parse_manager.tcploss_parser.parse_summary(self.tcploss_json, network_summary=ns)
+        for tcp_flow in ns.ip_flows.values():
+            running = tcp_flow.flow_metrics.running('total_loss')
+            self.assertEqual(running.count, 2)
+            self.assertEqual(running.mean, tcp_flow.flow_metrics.total_loss)
+            self.assertEqual(running.var_val, 0.0)
+
+    def test_summary_history_is_bounded(self):
+        parse_manager = parsemanager.ParseManager(max_summaries=2)
+        for start_ts in [600, 0, 300]:
+            parse_manager.parse_summary(start_ts=start_ts, end_ts=start_ts + 300,
+                                        tcploss_stream=io.StringIO(json.dumps(self.tcploss_json)))
+        self.assertEqual([ns.start_ts for ns in parse_manager.summary_queue], [300, 600])
+        self.assertIsNone(parse_manager.find_summary(100))
+        self.assertEqual(parse_manager.find_summary(450).start_ts, 300)
+        self.assertEqual([ns.start_ts for ns in parse_manager.find_summaries(0, 650)], [300, 600])
+
+    def test_evicted_summaries_are_archived(self):
+        with tempfile.TemporaryDirectory() as archive_dir:
+            parse_manager = parsemanager.ParseManager(max_summaries=1, archive=archive_dir)
+            for start_ts in [0, 300, 600]:
+                parse_manager.parse_summary(start_ts=start_ts, end_ts=start_ts + 300,
+                                            tcploss_stream=io.StringIO(json.dumps(self.tcploss_json)))
+            self.assertEqual([ns.start_ts for ns in parse_manager.summary_queue], [600])
+            self.assertEqual(len(parse_manager.archive), 2)
+            archived = parse_manager.find_summary(100)
+            self.assertEqual(archived.start_ts, 0)
+            self.assertEqual(sorted(archived.ip_flows), sorted(parse_manager.summary_queue[-1].ip_flows))
+            self.assertEqual([ns.start_ts for ns in parse_manager.find_summaries(0, 650)], [0, 300, 600])
+            parse_manager.archive.close()
+
+    def test_published_summaries_are_stored(self):
+        parse_manager = parsemanager.ParseManager(sql_store=':memory:')
+        for start_ts in [0, 300]:
+            parse_manager.parse_summary(start_ts=start_ts, end_ts=start_ts + 300,
+                                        tcploss_stream=io.StringIO(json.dumps(self.tcploss_json)))
+        src_ip, sport, dst_ip, dport = next(iter(parse_manager.summary_queue[-1].ip_flows))
+        windows = parse_manager.sql_store.windows_with(ip=src_ip, peer_ip=dst_ip)
+        self.assertEqual([row['start_ts'] for row in windows], [0, 300])
+        parse_manager.sql_store.close()
+
+    def test_stable_node_ids_match_across_windows(self):
+        previous = nodemodel.get_id_allocator()
+        parse_manager = parsemanager.ParseManager(node_ids='stable')
+        for start_ts in [0, 300]:
+            parse_manager.parse_summary(start_ts=start_ts, end_ts=start_ts + 300,
+                                        wireless_stream=io.StringIO(json.dumps(self.wireless_json)),
+                                        tcploss_stream=io.StringIO(json.dumps(self.tcploss_json)))
+        # The allocator belongs to the manager, the process default is unchanged
+        self.assertIs(nodemodel.get_id_allocator(), previous)
+        self.assertIsInstance(parse_manager.id_allocator, nodemodel.StableAllocator)
+        first, second = parse_manager.summary_queue
+        self.assertEqual(sorted(first.nodes), sorted(second.nodes))
+        for mac, endpoint in first.mac_to_endpoints.items():
+            self.assertEqual(endpoint.node_id, 'mac:{0}'.format(phymodel.format_mac(mac)))
+            self.assertEqual(second.mac_to_endpoints[mac].node_id, endpoint.node_id)
+        # The default allocator numbers the nodes of every window anew
+        first_ids = set(self.parse_manager.summary_queue[-1].nodes)
+        self.parse_manager.parse_summary(start_ts=2, end_ts=3,
+                                         wireless_stream=io.StringIO(json.dumps(self.wireless_json)))
+        self.assertFalse(first_ids & set(self.parse_manager.summary_queue[-1].nodes))
+        # Managers number their nodes from different prefixes
+        other_ids = set(parsemanager.ParseManager().parse_summary(
+            start_ts=2, end_ts=3, wireless_stream=io.StringIO(json.dumps(self.wireless_json))).nodes)
+        self.assertFalse(other_ids & set(self.parse_manager.summary_queue[-1].nodes))
+        self.assertEqual(len(other_ids), len(self.parse_manager.summary_queue[-1].nodes))
+
+    def test_published_summaries_are_labelled_with_vendors(self):
+        registry = io.StringIO('Registry,Assignment,Organization Name,Organization Address\n'
+                               'MA-L,587F57,Apple Inc,Cupertino\n'
+                               'MA-M,98FC11D,Small Co,Somewhere\n'
+                               'MA-L,98FC11,Cisco-Linksys LLC,Irvine\n')
+        parse_manager = parsemanager.ParseManager(oui_registry=registry)
+        parse_manager.parse_summary(start_ts=0, end_ts=300,
+                                    wireless_stream=io.StringIO(json.dumps(self.wireless_json)))
+        ns = parse_manager.summary_queue[-1]
+        client = ns.mac_to_endpoints[phymodel.parse_mac('58:7F:57:EE:E0:9E')]
+        wifi_model = next(iter(ns.phy_models.values()))
+        self.assertEqual(client.vendor, 'Apple Inc')
+        self.assertEqual(wifi_model.vendor, 'Cisco-Linksys LLC')
+        self.assertIsNone(ns.mac_to_endpoints[phymodel.parse_mac('33:33:00:00:00:16')].vendor)
+        # Vendors belong to the summary, not to the process wide addresses
+        unlabelled = parsemanager.ParseManager().parse_summary(
+            start_ts=0, end_ts=300, wireless_stream=io.StringIO(json.dumps(self.wireless_json)))
+        self.assertIsNone(unlabelled.mac_to_endpoints[phymodel.parse_mac('58:7F:57:EE:E0:9E')].vendor)
+
 if __name__ == '__main__':
     suite = unittest.TestLoader().loadTestsFromTestCase(TestParseManager)
     unittest.TextTestRunner(verbosity=2).run(suite)
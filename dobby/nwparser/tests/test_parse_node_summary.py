@@ -11,6 +11,7 @@ import dobby.nwmodel.ipinfo as ipinfo
 import dobby.nwmodel.phymodel as phymodel
 import dobby.nwmetrics.metrics as metrics
 import dobby.nwparser.parsenodesummary as nodesummaryparser
+import dobby.utils.keys as keys
 import dobby.utils.util as util
 __author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
 
@@ -47,8 +48,8 @@ class TestParseNodeSummary(unittest.TestCase):
     def test_validate_parsing(self):
         self.nodesummary_parser.parse_summary(node_json=self.node_json, network_summary=self.ns)
         self.assertEqual(len(self.ns.ip_to_endpoints), len(self.ips))
-        self.assertListEqual(sorted(self.ns.ip_to_endpoints.keys()), sorted(self.ips))
-        self.assertListEqual(sorted([x.lower() for x in self.ns.mac_to_endpoints.keys()]), sorted(self.ethers))
+        self.assertListEqual(sorted(keys.format_ip(ip) for ip in self.ns.ip_to_endpoints.keys()), sorted(self.ips))
+        self.assertListEqual(sorted([phymodel.format_mac(x) for x in self.ns.mac_to_endpoints.keys()]), sorted(self.ethers))
         #No cloud IPs, since all are tagged to AP -- albeit incorrectly
         cloud_ip_nodes = [node for node in self.ns.nodes.values() if node.node_type.value == nodemodel.NodeType.CLOUD_IP.value]
         self.assertEqual(len(cloud_ip_nodes), 0)
@@ -59,7 +60,7 @@ class TestParseNodeSummary(unittest.TestCase):
         ap_endpoint = endpoint.EndPoint(phy_address=phy_addr)
         ap_node = nodemodel.Node(endpoints=[ap_endpoint], node_type=nodemodel.NodeType.WIRELESS_ROUTER)
         ap_endpoint.node_id = ap_node.node_id
-        self.ns.mac_to_endpoints[str(phy_addr)] = ap_endpoint
+        self.ns.mac_to_endpoints[phy_addr.value] = ap_endpoint
         self.ns.nodes[ap_node.node_id] = ap_node
         self.nodesummary_parser.parse_summary(node_json=self.node_json, network_summary=self.ns)
         cloud_ip_nodes = [node for node in self.ns.nodes.values() if node.node_type.value == nodemodel.NodeType.CLOUD_IP.value]
@@ -68,8 +69,8 @@ class TestParseNodeSummary(unittest.TestCase):
     def test_passing_empty_summary_works(self):
         ns = self.nodesummary_parser.parse_summary(node_json=self.node_json)
         self.assertEqual(len(ns.ip_to_endpoints), len(self.ips))
-        self.assertListEqual(sorted(ns.ip_to_endpoints.keys()), sorted(self.ips))
-        self.assertListEqual(sorted([x.lower() for x in ns.mac_to_endpoints.keys()]), sorted(self.ethers))
+        self.assertListEqual(sorted(keys.format_ip(ip) for ip in ns.ip_to_endpoints.keys()), sorted(self.ips))
+        self.assertListEqual(sorted([phymodel.format_mac(x) for x in ns.mac_to_endpoints.keys()]), sorted(self.ethers))
         #No cloud IPs, since all are tagged to AP -- albeit incorrectly
         cloud_ip_nodes = [node for node in ns.nodes.values() if node.node_type.value == nodemodel.NodeType.CLOUD_IP.value]
         self.assertEqual(len(cloud_ip_nodes), 0)
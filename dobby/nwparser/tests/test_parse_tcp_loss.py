@@ -11,6 +11,7 @@ import dobby.nwmodel.flow as flow
 import dobby.nwmodel.ipinfo as ipinfo
 import dobby.nwmetrics.metrics as metrics
 import dobby.nwparser.parsetcploss as tcplossparser
+import dobby.utils.keys as keys
 import dobby.utils.util as util
 __author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
 
@@ -27,7 +28,7 @@ class TestParseTCPLossSummary(unittest.TestCase):
         for flow in self.tcploss_json['trace']['flow']:
             self.ips.update([flow['@dst'], flow['@src']])
             self.tcp_info.append((flow['@src'], flow['@dst'], flow['@sport'], flow['@dport']))
-            self.tcp_keys.append(str(flow['@src'] + "-" + flow['@sport'] + "-" + flow['@dst'] + "-" + flow['@dport']))
+            self.tcp_keys.append(keys.flow_key(keys.ip_key(flow['@src']), flow['@sport'], keys.ip_key(flow['@dst']), flow['@dport']))
         self.ns = networksummary.NetworkSummary()
         self.tcploss_parser = tcplossparser.ParseTCPLossSummary()
 
@@ -39,11 +40,11 @@ class TestParseTCPLossSummary(unittest.TestCase):
         self.assertEqual(len(self.ns.ip_to_endpoints), len(self.ips))
         self.assertEqual(len(self.ns.ip_flows), len(self.tcp_info))
         self.assertEqual(len(self.ns.nodes), len(self.ips))
-        self.assertListEqual(sorted(self.ns.ip_to_endpoints.keys()), sorted(self.ips))
+        self.assertListEqual(sorted(keys.format_ip(ip) for ip in self.ns.ip_to_endpoints.keys()), sorted(self.ips))
 
         ips_to_compare = set()
         for endpoint in self.ns.ip_to_endpoints.values():
-            ips_to_compare.update(list(endpoint.ip_infos.keys()))
+            ips_to_compare.update(keys.format_ip(ip) for ip in endpoint.ip_infos.keys())
         self.assertEqual(sorted(ips_to_compare), sorted(self.ips))
 
         ips_to_compare = set()
@@ -66,7 +67,7 @@ class TestParseTCPLossSummary(unittest.TestCase):
         metric1 = {'total_loss': 7728}
         metric1_src_to_dst = {'total_loss': 7728}
         metric1_dst_to_src = {'total_loss': 0}
-        flow1 = self.ns.ip_flows["192.168.1.120-60194-192.168.1.113-5001"]
+        flow1 = self.ns.ip_flows[keys.parse_flow_key("192.168.1.120-60194-192.168.1.113-5001")]
         self.assertIsNotNone(flow1)
         self.assertTrue(isinstance(flow1, flow.TCPFlow))
         self.assertEqual(flow1.flow_type.value, flow.FlowType.TCP.value)
@@ -81,10 +82,10 @@ class TestParseTCPLossSummary(unittest.TestCase):
         self.assertEqual(len(ns.ip_to_endpoints), len(self.ips))
         self.assertEqual(len(ns.ip_flows), len(self.tcp_info))
         self.assertEqual(len(ns.nodes), len(self.ips))
-        self.assertListEqual(sorted(ns.ip_to_endpoints.keys()), sorted(self.ips))
+        self.assertListEqual(sorted(keys.format_ip(ip) for ip in ns.ip_to_endpoints.keys()), sorted(self.ips))
         ips_to_compare = set()
         for endpoint in ns.ip_to_endpoints.values():
-            ips_to_compare.update(list(endpoint.ip_infos.keys()))
+            ips_to_compare.update(keys.format_ip(ip) for ip in endpoint.ip_infos.keys())
         self.assertEqual(sorted(ips_to_compare), sorted(self.ips))
 
         ips_to_compare = set()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+import dobby.nwparser.summarydir as summarydir
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+
+class TestSummaryDir(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.summary_dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def touch(self, file_name, mtime=None):
+        path = os.path.join(self.summary_dir, file_name)
+        open(path, 'w').close()
+        if mtime:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def test_parse_summary_file_name(self):
+        self.assertEqual(summarydir.parse_summary_file_name('cap_01_tcploss.json'),
+                         ('cap_01', 'tcploss', 'json'))
+        self.assertEqual(summarydir.parse_summary_file_name('cap_node.xml'), ('cap', 'node', 'xml'))
+        self.assertIsNone(summarydir.parse_summary_file_name('cap_node.txt'))
+        self.assertIsNone(summarydir.parse_summary_file_name('cap.pcap'))
+
+    def test_find_windows_groups_and_orders_windows(self):
+        for base in ['home_1486757600', 'home_1486757300']:
+            for stream_type in summarydir.STREAM_TYPES:
+                self.touch('{0}_{1}.xml'.format(base, stream_type))
+                self.touch('{0}_{1}.json'.format(base, stream_type))
+        self.touch('notes.txt')
+        windows = summarydir.find_windows(self.summary_dir)
+        self.assertEqual([window.base for window in windows], ['home_1486757300', 'home_1486757600'])
+        self.assertEqual(windows[0].start_ts, 1486757300.0)
+        self.assertEqual(windows[0].end_ts, 1486757300.0 + summarydir.DEFAULT_WINDOW_LENGTH)
+        self.assertEqual(windows[0].summary_format, 'xml')
+        self.assertEqual(sorted(windows[0].streams.keys()), sorted(summarydir.STREAM_TYPES))
+
+    def test_find_windows_falls_back_to_mtime(self):
+        self.touch('b_wireless.json', mtime=2000)
+        self.touch('a_wireless.json', mtime=3000)
+        self.touch('a_node.json', mtime=1000)
+        windows = summarydir.find_windows(self.summary_dir, window_length=60)
+        self.assertEqual([window.base for window in windows], ['a', 'b'])
+        self.assertEqual(windows[0].start_ts, 1000)
+        self.assertEqual(windows[0].end_ts, 1060)
+        self.assertEqual(windows[0].summary_format, 'json')
+
+    def test_read_ingest_state(self):
+        state_path = os.path.join(self.summary_dir, 'state')
+        self.assertEqual(summarydir.read_ingest_state(state_path), set())
+        with open(state_path, 'w') as f:
+            f.write('a\nb\n\n')
+        self.assertEqual(summarydir.read_ingest_state(state_path), set(['a', 'b']))
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestSummaryDir)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import dobby.nwparser.benchmark as benchmark
+import dobby.nwparser.parsemanager as parsemanager
+import dobby.nwparser.parsetcploss as parsetcploss
+import dobby.nwparser.parsewirelesssummary as parsewirelesssummary
+import dobby.nwparser.summarydir as summarydir
+import dobby.nwparser.synthetic as synthetic
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+
+class TestSummaryGenerator(unittest.TestCase):
+    def setUp(self):
+        self.generator = synthetic.SummaryGenerator(links=40, flows=300, seed=3)
+
+    def test_same_seed_gives_same_summaries(self):
+        other = synthetic.SummaryGenerator(links=40, flows=300, seed=3)
+        for stream_type in synthetic.STREAM_TYPES:
+            self.assertEqual(self.generator.text(stream_type), other.text(stream_type))
+        self.assertNotEqual(synthetic.SummaryGenerator(links=40, flows=300, seed=4).text('tcploss'),
+                            self.generator.text('tcploss'))
+
+    def test_documents_have_the_requested_scale(self):
+        counts = self.generator.counts()
+        for stream_type, (root, attributes, item_tag) in synthetic.DOCUMENT_LAYOUT.items():
+            document = self.generator.document(stream_type)
+            self.assertEqual(len(document[root][item_tag]), counts[stream_type])
+            self.assertEqual(json.loads(self.generator.text(stream_type)), document)
+        ns = parsewirelesssummary.ParseWirelessSummary().parse_summary(self.generator.document('wireless'))
+        self.assertEqual(len(ns.edges), 40)
+        self.assertEqual(len(ns.phy_models), self.generator.ap_count)
+        ns = parsetcploss.ParseTCPLossSummary().parse_summary(self.generator.document('tcploss'))
+        self.assertEqual(len(ns.ip_flows), 300)
+
+    def test_json_and_xml_windows_parse_the_same(self):
+        with tempfile.TemporaryDirectory() as summary_dir:
+            summaries = []
+            for summary_format in ['json', 'xml']:
+                paths = self.generator.write_window(summary_dir, summary_format=summary_format)
+                summaries.append(parsemanager.ParseManager().parse_summary(
+                    start_ts=0, end_ts=300, summary_format=summary_format, **paths))
+            windows = summarydir.find_windows(summary_dir)
+        self.assertEqual(len(windows), 1)
+        self.assertEqual(windows[0].start_ts, self.generator.start_ts)
+        json_ns, xml_ns = summaries
+        self.assertEqual(len(json_ns.ip_flows), 300)
+        self.assertEqual(len(json_ns.edges), 40)
+        self.assertEqual(len(json_ns.ip_to_endpoints),
+                         self.generator.ap_count + self.generator.client_count + self.generator.cloud_ip_count)
+        self.assertEqual(sorted(json_ns.ip_flows), sorted(xml_ns.ip_flows))
+        self.assertEqual(sorted(json_ns.edges), sorted(xml_ns.edges))
+        self.assertEqual(sorted(json_ns.mac_to_endpoints), sorted(xml_ns.mac_to_endpoints))
+        for key, tcp_flow in json_ns.ip_flows.items():
+            self.assertEqual(xml_ns.ip_flows[key].flow_metrics, tcp_flow.flow_metrics)
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_run_and_compare(self):
+        results = benchmark.run('tiny', cases=['tcploss', benchmark.PARSE_MANAGER_CASE], repeat=1)
+        self.assertEqual(list(results['cases']), ['tcploss', benchmark.PARSE_MANAGER_CASE])
+        tcploss_results = results['cases']['tcploss']
+        self.assertEqual(tcploss_results['items'], 100)
+        self.assertGreater(tcploss_results['seconds'], 0)
+        self.assertGreater(tcploss_results['peak_bytes'], 0)
+        self.assertGreater(tcploss_results['objects'], 0)
+        self.assertEqual(results['cases'][benchmark.PARSE_MANAGER_CASE]['items'], 10 + 11 + 200)
+
+        with tempfile.TemporaryDirectory() as results_dir:
+            path = os.path.join(results_dir, 'baseline.json')
+            benchmark.save_results(results, path)
+            baseline = benchmark.load_results(path)
+        self.assertEqual(benchmark.compare(results, baseline), [])
+        baseline['cases']['tcploss']['seconds'] = tcploss_results['seconds'] / 2
+        regressions = benchmark.compare(results, baseline)
+        self.assertEqual([(regression.case, regression.metric) for regression in regressions],
+                         [('tcploss', 'seconds')])
+        baseline['flows'] = 1000
+        self.assertRaises(ValueError, benchmark.compare, results, baseline)
+        self.assertIn('tcploss', benchmark.format_results(results, baseline=baseline))
+
+    def test_heavy_imports_are_deferred(self):
+        modules = set(entry.module for entry in benchmark.import_times('dobby'))
+        self.assertNotIn('dobby.nwparser.parsemanager', modules)
+        modules = set(entry.module for entry in benchmark.import_times('dobby.cli'))
+        self.assertFalse(modules & {'asyncio', 'concurrent.futures', 'dobby.nwparser.parsemanager'})
+        modules = set(entry.module for entry in benchmark.import_times('dobby.nwparser.parsemanager'))
+        self.assertIn('dobby.nwparser.parsetcploss', modules)
+        self.assertFalse(modules & {'numpy', 'inspect', 'pickle', 'sqlite3', 'csv', 'asyncio',
+                                    'dobby.nwinfo.archive', 'dobby.nwinfo.sqlstore', 'dobby.nwmodel.oui'})
+        self.assertGreater(benchmark.import_seconds('dobby', repeat=1), 0)
+
+    def test_lazy_package_attributes(self):
+        import dobby
+        self.assertIs(dobby.ParseManager, parsemanager.ParseManager)
+        self.assertIn('NetworkSummary', dir(dobby))
+        self.assertRaises(AttributeError, getattr, dobby, 'NoSuchThing')
+
+if __name__ == '__main__':
+    for test_case in (TestSummaryGenerator, TestBenchmark):
+        suite = unittest.TestLoader().loadTestsFromTestCase(test_case)
+        unittest.TextTestRunner(verbosity=2).run(suite)
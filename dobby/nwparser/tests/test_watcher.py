@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import tempfile
+import unittest
+
+import dobby.nwparser.parsemanager as parsemanager
+import dobby.nwparser.watcher as watcher
+import dobby.utils.util as util
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+SUMMARIES = {
+    'wireless': """<links><link ap='C0:1A:DA:99:6B:76' client='33:33:00:00:00:16' bssid='98:FC:11:50:AF:A6'>
+<stream dir='AP-CLIENT' total_pkts='4' total_data_pkts='4' total_data_bytes='496' total_retx='0' snr='-80/-80/-80' rate='1/1/1' size='124/124/124' />
+</link></links>""",
+    'node': """<nodes><node ether='74:DF:BF:66:7C:69'><ip addr='192.168.1.120' hostname='' /></node></nodes>""",
+    'tcpmystery': """<trace file='/tmp/dobby.pcap'>
+<flow src='192.168.1.120' sport='34018' dst='54.148.159.16' dport='443' begin='1486757401.300496999' duration='0.414764001'>
+<rtt source='min' value='0.000667' />
+<stream dir='0' mtu='323' nack='15' ndata='12' seqlen='674' />
+<stream dir='1' mtu='1500' nack='5' ndata='10' seqlen='6359' />
+</flow></trace>""",
+    'tcploss': """<trace file='/tmp/dobby.pcap'>
+<flow src='192.168.1.120' sport='34018' dst='54.148.159.16' dport='443'>
+<stream dir='0' nfloss='0' nloss='2' />
+<stream dir='1' nfloss='1' nloss='0' />
+</flow></trace>""",
+}
+
+
+class TestSummaryWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.summary_dir = self.tmp_dir.name
+        self.parse_manager = parsemanager.ParseManager()
+        self.parsed = []
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_window(self, base, stream_types=None):
+        for stream_type in (stream_types if stream_types else SUMMARIES.keys()):
+            with open(os.path.join(self.summary_dir, '{0}_{1}.xml'.format(base, stream_type)), 'w') as f:
+                f.write(SUMMARIES[stream_type])
+
+    def on_summary(self, window, network_summary, latency):
+        self.parsed.append((window.base, network_summary))
+        if len(self.parsed) == self.expected:
+            self.summary_watcher.stop()
+
+    def run_watcher(self, expected, writer=None, **kwargs):
+        self.expected = expected
+        self.summary_watcher = watcher.SummaryWatcher(self.parse_manager, self.summary_dir,
+                                                      poll_interval=0.01, settle_time=0,
+                                                      on_summary=self.on_summary, **kwargs)
+
+        async def run():
+            task = asyncio.ensure_future(self.summary_watcher.run())
+            if writer:
+                await asyncio.sleep(0.05)
+                writer()
+            await asyncio.wait_for(task, timeout=10)
+        asyncio.run(run())
+
+    def test_existing_windows_are_skipped_by_default(self):
+        self.write_window('cap_1486757300')
+        summary_watcher = watcher.SummaryWatcher(self.parse_manager, self.summary_dir, settle_time=0)
+        self.assertEqual(summary_watcher.poll(), [])
+        summary_watcher = watcher.SummaryWatcher(self.parse_manager, self.summary_dir, settle_time=0,
+                                                 process_existing=True)
+        self.assertEqual([window.base for window in summary_watcher.poll()], ['cap_1486757300'])
+
+    def test_incomplete_windows_are_not_parsed(self):
+        summary_watcher = watcher.SummaryWatcher(self.parse_manager, self.summary_dir, settle_time=0)
+        self.write_window('cap_1486757300', stream_types=['wireless', 'node'])
+        self.assertEqual(summary_watcher.poll(), [])
+        self.write_window('cap_1486757300', stream_types=['tcpmystery', 'tcploss'])
+        self.assertEqual(len(summary_watcher.poll()), 1)
+
+    def test_removed_windows_are_forgotten(self):
+        summary_watcher = watcher.SummaryWatcher(self.parse_manager, self.summary_dir, settle_time=0)
+        self.write_window('cap_1486757300')
+        self.write_window('cap_1486757600')
+        summary_watcher.seen_bases.update(window.base for window in summary_watcher.poll())
+        for stream_type in SUMMARIES:
+            os.remove(os.path.join(self.summary_dir, 'cap_1486757300_{0}.xml'.format(stream_type)))
+        self.assertEqual(summary_watcher.poll(), [])
+        self.assertEqual(summary_watcher.seen_bases, set(['cap_1486757600']))
+
+    def test_failed_window_cancels_its_decoding(self):
+        summary_watcher = watcher.SummaryWatcher(self.parse_manager, self.summary_dir, settle_time=0)
+        self.write_window('cap_1486757300')
+        window = summary_watcher.poll()[0]
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            failed, waiting = loop.create_future(), loop.create_future()
+            failed.set_exception(ValueError('bad window'))
+            summary_watcher.pending = asyncio.Queue()
+            await summary_watcher.pending.put((window, 0, [('wireless', failed), ('node', waiting)]))
+            await summary_watcher.pending.put(None)
+            await summary_watcher._merge_windows()
+            return waiting
+        self.assertTrue(asyncio.run(run()).cancelled())
+        self.assertEqual(self.parse_manager.parse_errors['ValueError'], 1)
+
+    def test_failing_listener_does_not_stop_the_watcher(self):
+        published = []
+
+        def listener(network_summary):
+            published.append(network_summary)
+            if len(published) == 1:
+                raise RuntimeError('listener failed')
+        self.parse_manager.add_summary_listener(listener)
+
+        def writer():
+            self.write_window('cap_1486757300')
+            self.write_window('cap_1486757600')
+        self.run_watcher(expected=1, writer=writer)
+        self.assertEqual(len(published), 2)
+        self.assertEqual([base for base, ns in self.parsed], ['cap_1486757600'])
+        self.assertEqual(self.parse_manager.parse_errors['RuntimeError'], 1)
+
+    def test_new_windows_are_parsed_in_order(self):
+        def writer():
+            self.write_window('cap_1486757600')
+            self.write_window('cap_1486757300')
+        self.run_watcher(expected=2, writer=writer)
+        self.assertEqual([base for base, ns in self.parsed], ['cap_1486757300', 'cap_1486757600'])
+        ns = self.parsed[0][1]
+        self.assertEqual(ns.start_ts, 1486757300.0)
+        self.assertEqual(len(ns.edges), 1)
+        self.assertEqual(len(ns.ip_flows), 1)
+        tcp_flow = list(ns.ip_flows.values())[0]
+        self.assertEqual(tcp_flow.flow_metrics.total_loss, 3.0)
+        self.assertEqual(tcp_flow.flow_metrics_src_to_dst.total_pkts, 12.0)
+        self.assertIs(self.parse_manager.find_summary(1486757310), ns)
+
+    def test_streaming_windows(self):
+        self.parse_manager = parsemanager.ParseManager(streaming=True, instrument=True)
+        self.run_watcher(expected=1, writer=lambda: self.write_window('cap_1486757300'))
+        ns = self.parsed[0][1]
+        self.assertEqual(len(ns.edges), 1)
+        self.assertEqual(list(ns.ip_flows.values())[0].flow_metrics.total_loss, 3.0)
+        report = self.parse_manager.last_report
+        self.assertEqual(report.stages['tcploss.parse'].records, 1)
+        self.assertNotIn('tcploss.wait', report.stages)
+
+    def test_instrumented_windows(self):
+        self.parse_manager.instrument = True
+        reports = []
+        self.parse_manager.add_report_listener(reports.append)
+        xml_failures = util.decode_failures['xml']
+
+        def writer():
+            self.write_window('cap_1486757300')
+            with open(os.path.join(self.summary_dir, 'cap_1486757300_tcploss.xml'), 'w') as f:
+                f.write("<trace><flow src=")
+            self.write_window('cap_1486757600')
+        self.run_watcher(expected=1, writer=writer)
+        # The window with a truncated stream is not published
+        self.assertEqual([base for base, ns in self.parsed], ['cap_1486757600'])
+        self.assertEqual(self.parse_manager.parse_errors['DecodeError'], 1)
+        self.assertIsNone(self.parse_manager.find_summary(1486757310))
+        self.assertEqual([report.start_ts for report in reports], [1486757600.0])
+        self.assertEqual(util.decode_failures['xml'], xml_failures + 1)
+        # The failure belongs to the window that was not published
+        self.assertEqual(reports[0].decode_failures, {})
+        self.assertEqual(list(reports[0].stages)[:2], ['wireless.wait', 'wireless.merge'])
+        self.assertIn('publish', reports[0].stages)
+        self.assertEqual(reports[0].stages['tcploss.wait'].records, 1)
+        self.assertEqual(reports[0].counters['edges.new'], 1)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestSummaryWatcher)
+    unittest.TextTestRunner(verbosity=2).run(suite)
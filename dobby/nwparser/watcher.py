@@ -0,0 +1,186 @@
+"""Long running watcher that feeds new summaries into a resident ParseManager.
+
+This replaces the inotifywait loop of scripts/start_dobby.sh on the Python
+side: click's summaries are picked up from the summary directory as soon as
+all streams of a window have been written, decoded on an executor and merged
+in window order. Decoding of the next window overlaps with merging and
+publishing the previous one.
+"""
+import asyncio
+import os
+import time
+
+import dobby.nwparser.parsemanager as parsemanager
+import dobby.nwparser.summarydir as summarydir
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+DEFAULT_POLL_INTERVAL = 1.0
+# Files must be unchanged for this long before they are considered complete
+DEFAULT_SETTLE_TIME = 1.0
+
+
+class SummaryWatcher(object):
+    """Watches a summary directory and parses every new, complete window.
+
+    Parameters
+    ----------
+    parse_manager : resident ParseManager the windows are parsed into
+    summary_dir : directory start_dobby.sh copies the summaries to
+    summary_format : 'xml' (click's own output) or 'json' (xml_to_json.py output)
+    executor : concurrent.futures executor used for decoding (default: the
+        event loop's default thread pool)
+    process_existing : also parse the windows already present at startup
+    on_summary : callable(window, network_summary, latency) run after each window
+
+    With a streaming parse_manager the streams are not decoded ahead on the
+    executor but parsed one record at a time while the window is merged.
+
+    seen_bases holds the windows already handled, so they are not parsed
+    twice; a window is forgotten once its files are gone from summary_dir.
+    """
+    def __init__(self, parse_manager, summary_dir, summary_format=parsemanager.XML_FORMAT,
+                 executor=None, poll_interval=DEFAULT_POLL_INTERVAL,
+                 settle_time=DEFAULT_SETTLE_TIME, window_length=summarydir.DEFAULT_WINDOW_LENGTH,
+                 stream_types=parsemanager.STREAM_ORDER, process_existing=False,
+                 on_summary=None):
+        self.parse_manager = parse_manager
+        self.summary_dir = summary_dir
+        self.summary_format = summary_format
+        self.executor = executor
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.window_length = window_length
+        self.stream_types = tuple(stream_types)
+        self.on_summary = on_summary
+        self.seen_bases = set()
+        self.pending = None
+        self.stopped = False
+        if not process_existing:
+            self.seen_bases.update(window.base for window in self.poll(now=float('inf')))
+
+    def poll(self, now=None):
+        """Return the windows that are complete and settled but not handled yet.
+        """
+        now = time.time() if now is None else now
+        grouped = {}
+        present_bases = set()
+        for dir_entry in os.scandir(self.summary_dir):
+            parsed = summarydir.parse_summary_file_name(dir_entry.name)
+            if not parsed:
+                continue
+            base, stream_type, summary_format = parsed
+            if summary_format != self.summary_format:
+                continue
+            present_bases.add(base)
+            if base in self.seen_bases:
+                continue
+            grouped.setdefault(base, {})[stream_type] = (dir_entry.path, dir_entry.stat().st_mtime)
+        # Windows whose files were removed can not come back
+        self.seen_bases.intersection_update(present_bases)
+        windows = []
+        for base, streams in grouped.items():
+            if any(stream_type not in streams for stream_type in self.stream_types):
+                continue
+            if now - max(mtime for path, mtime in streams.values()) < self.settle_time:
+                continue
+            paths = dict((stream_type, path) for stream_type, (path, mtime) in streams.items())
+            windows.append(summarydir.make_window(base, self.summary_format, paths,
+                                                  window_length=self.window_length))
+        return sorted(windows, key=lambda window: (window.start_ts, window.base))
+
+    def stop(self):
+        self.stopped = True
+
+    async def run(self):
+        """Watch until stop() is called.
+        """
+        self.stopped = False
+        self.pending = asyncio.Queue()
+        merger = asyncio.ensure_future(self._merge_windows())
+        try:
+            while not self.stopped:
+                await self.scan()
+                await asyncio.sleep(self.poll_interval)
+            # Let the windows already being decoded finish
+            await self.pending.put(None)
+            await merger
+        finally:
+            if not merger.done():
+                merger.cancel()
+            # Windows still queued when the watcher is cancelled
+            while not self.pending.empty():
+                item = self.pending.get_nowait()
+                if item is not None:
+                    await self._cancel_decoding(item[2])
+
+    async def scan(self):
+        """Start decoding every new window found in the summary directory.
+        """
+        loop = asyncio.get_running_loop()
+        for window in self.poll():
+            self.seen_bases.add(window.base)
+            if self.parse_manager.streaming:
+                await self.pending.put((window, time.time(), []))
+                continue
+            decoding = [(stream_type, loop.run_in_executor(self.executor, parsemanager.prepare_counted_stream,
+                                                           stream_type, window.streams[stream_type],
+                                                           window.summary_format,
+                                                           self.parse_manager.streaming,
+                                                           self.parse_manager.compact_models))
+                        for stream_type in parsemanager.STREAM_ORDER if stream_type in window.streams]
+            await self.pending.put((window, time.time(), decoding))
+
+    @staticmethod
+    async def _cancel_decoding(decoding):
+        # Cancel the decoding futures of a window that will not be merged and
+        # wait for them, so none is left running or with an unretrieved error
+        futures = [future for stream_type, future in decoding]
+        for future in futures:
+            future.cancel()
+        await asyncio.gather(*futures, return_exceptions=True)
+
+    async def _merge_windows(self):
+        while True:
+            item = await self.pending.get()
+            if item is None:
+                return
+            window, queued_at, decoding = item
+            ns = self.parse_manager.new_summary(start_ts=window.start_ts, end_ts=window.end_ts)
+            report = None
+            if self.parse_manager.instrument:
+                report = self.parse_manager.begin_report(start_ts=window.start_ts, end_ts=window.end_ts)
+            try:
+                if self.parse_manager.streaming:
+                    for stream_type in parsemanager.STREAM_ORDER:
+                        if stream_type in window.streams:
+                            ns = self.parse_manager.merge_stream(ns, stream_type, window.streams[stream_type],
+                                                                 window.summary_format, report)
+                for stream_type, future in decoding:
+                    if report is None:
+                        prepared_records, failures = await future
+                        ns = self.parse_manager.merge_prepared(ns, stream_type, prepared_records)
+                        continue
+                    with report.stage(stream_type + '.wait') as timing:
+                        prepared_records, failures = await future
+                        timing.records = len(prepared_records)
+                    report.add_failures(failures)
+                    with report.stage(stream_type + '.merge', records=len(prepared_records)):
+                        ns = self.parse_manager.merge_prepared(ns, stream_type, prepared_records,
+                                                               stats=report.counters)
+                # A failing summary listener or callback only costs this window
+                if report is None:
+                    self.parse_manager.publish_summary(ns)
+                else:
+                    with report.stage('publish'):
+                        self.parse_manager.publish_summary(ns)
+                    self.parse_manager.end_report(report)
+                    report = None
+                if self.on_summary:
+                    self.on_summary(window, ns, time.time() - queued_at)
+            except Exception as e:
+                await self._cancel_decoding(decoding)
+                self.parse_manager.record_parse_error(e)
+                if report is not None:
+                    self.parse_manager.end_report(report, published=False)
+                print ("Failed to parse window {0}: {1}".format(window.base, e))
@@ -0,0 +1,117 @@
+"""Compact, __slots__ based variants of the model classes.
+
+The model classes take **kwargs and keep every attribute in a per instance
+__dict__. compact_class() builds a variant of such a class with the same
+methods whose known attributes live in __slots__; ad-hoc keyword arguments
+are kept in a separate extras dict that is only allocated when used.
+
+Model code must set keyword arguments with update_attributes() and read all
+attributes with attributes() rather than touching __dict__, so the same
+methods work for both variants. Model classes list the attributes their
+constructor sets in INSTANCE_FIELDS.
+"""
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+
+def update_attributes(obj, updated_attributes):
+    """Set attributes of a model object; unknown attributes of a compact
+    object go to its extras.
+    """
+    obj_dict = getattr(obj, '__dict__', None)
+    if obj_dict is not None:
+        obj_dict.update(updated_attributes)
+        return
+    fields = obj._fields
+    for name, value in updated_attributes.items():
+        if name in fields:
+            object.__setattr__(obj, name, value)
+        else:
+            obj.extras[name] = value
+
+def attributes(obj):
+    """All attributes of a model object as a dict (a copy for compact objects).
+    """
+    obj_dict = getattr(obj, '__dict__', None)
+    if obj_dict is not None:
+        return obj_dict
+    values = dict((name, getattr(obj, name)) for name in obj._fields if hasattr(obj, name))
+    extras = getattr(obj, '_extras', None)
+    if extras:
+        values.update(extras)
+    return values
+
+def model_class(cls):
+    """The regular model class of cls; cls itself unless it is compact.
+    """
+    return getattr(cls, '_model_class', cls)
+
+def is_model_instance(obj, cls):
+    """isinstance() that treats compact classes as their model classes, so a
+    compact object compares equal to the regular object with the same values.
+    """
+    return issubclass(model_class(type(obj)), model_class(cls))
+
+def instance_fields(cls):
+    """Names of the attributes set by the constructor of cls, declared by
+    the model class as INSTANCE_FIELDS. They are not found by building an
+    instance, whose constructor can have side effects such as allocating a
+    node ID.
+    """
+    return tuple(cls.INSTANCE_FIELDS)
+
+
+class CompactModel(object):
+    """Base class of the classes built by compact_class.
+    """
+    __slots__ = ('_extras',)
+    _fields = frozenset()
+
+    @property
+    def extras(self):
+        """Ad-hoc attributes, allocated on first use.
+        """
+        try:
+            return self._extras
+        except AttributeError:
+            self._extras = {}
+            return self._extras
+
+    def __getattr__(self, name):
+        # Only reached for names that are not slots
+        try:
+            extras = object.__getattribute__(self, '_extras')
+        except AttributeError:
+            extras = None
+        if extras is not None and name in extras:
+            return extras[name]
+        raise AttributeError("'{0}' object has no attribute '{1}'".format(type(self).__name__, name))
+
+    def __getstate__(self):
+        return attributes(self)
+
+    def __setstate__(self, state):
+        update_attributes(self, state)
+
+
+def compact_class(cls, name=None, **class_attributes):
+    """Build the compact variant of a model class.
+
+    The methods of cls and its bases are copied onto a CompactModel subclass
+    whose __slots__ are the attributes set by cls's constructor
+    (instance_fields).
+    class_attributes override class level attributes of the copy, e.g. the
+    class used to build nested metrics.
+    """
+    fields = instance_fields(cls)
+    namespace = {}
+    for klass in reversed(cls.__mro__[:-1]):
+        namespace.update((key, value) for key, value in vars(klass).items()
+                         if key not in ('__dict__', '__weakref__', '__slots__'))
+    namespace.update(class_attributes)
+    namespace['__slots__'] = fields
+    namespace['_fields'] = frozenset(fields)
+    namespace['_model_class'] = cls
+    namespace['__module__'] = cls.__module__
+    name = name if name else 'Compact' + cls.__name__
+    namespace['__qualname__'] = name
+    return type(name, (CompactModel,), namespace)
@@ -0,0 +1,207 @@
+"""Copy-on-write mappings for network summaries.
+
+A CowMap is a stack of dict layers. derive() freezes a map and returns a new
+one whose only layer holds its own changes on top of the frozen map, so
+deriving costs O(1) and every later write O(1), instead of copying the whole
+dict. Lookups walk the layers from the top; the layers are merged back into a
+single dict once the stack gets deep or the layers hold many entries compared
+to the bottom one, which keeps lookups cheap and the merging amortized
+O(changes).
+
+Values are shared between a map and the maps derived from it. Code updating
+a value in place gets it with owned(key), which stores a copy of a value
+inherited from a frozen layer in the top layer first. Merged layers keep
+track of the keys whose values still belong to the frozen maps, so those
+are copied by owned() as well.
+"""
+import collections.abc
+import copy
+
+import dobby.utils.compact as compact
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+# Layers a derived map may stack on before they are merged
+MAX_DEPTH = 8
+
+_MISSING = object()
+# Marks a key deleted from a lower layer
+_DELETED = object()
+
+
+def copy_entry(value):
+    """Copy of a model object that can be updated without changing value:
+    its containers and metrics (anything with update_stats) are copied too.
+    """
+    value_copy = copy.copy(value)
+    try:
+        value_attributes = compact.attributes(value)
+    except AttributeError:
+        return value_copy
+    copied = {}
+    for name, attribute in value_attributes.items():
+        if isinstance(attribute, (dict, list, set)) or hasattr(attribute, 'update_stats'):
+            copied[name] = copy.copy(attribute)
+    compact.update_attributes(value_copy, copied)
+    return value_copy
+
+
+class FrozenMapError(TypeError):
+    """Raised when a frozen CowMap is modified.
+    """
+
+
+class CowMap(collections.abc.MutableMapping):
+    """Mapping with O(1) frozen snapshots, see the module docstring.
+
+    CowMap(data) takes ownership of the dict data rather than copying it.
+    """
+    def __init__(self, data=None):
+        self._data = data if data is not None else {}
+        self._parent = None
+        self._depth = 0
+        self._len = None
+        # Keys of _data whose values are shared with a frozen map
+        self._inherited = None
+        self.frozen = False
+
+    @classmethod
+    def wrap(cls, data):
+        """data if it is already a CowMap, else a CowMap owning it.
+        """
+        if isinstance(data, cls):
+            return data
+        return cls(data if data else None)
+
+    def freeze(self):
+        self.frozen = True
+        return self
+
+    def derive(self):
+        """Freeze this map and return a writable map starting with its contents.
+        """
+        self.frozen = True
+        child = CowMap()
+        layered = 0
+        layer = self
+        while layer._parent is not None:
+            layered += len(layer._data)
+            layer = layer._parent
+        if self._depth + 1 > MAX_DEPTH or 2 * layered > len(layer._data):
+            child._data = dict(self._layered_items())
+            child._inherited = set(child._data)
+            return child
+        child._parent = self
+        child._depth = self._depth + 1
+        child._len = len(self)
+        return child
+
+    def _check_writable(self):
+        if self.frozen:
+            raise FrozenMapError("frozen map can not be modified, derive() a new one")
+
+    def _layered_items(self):
+        seen = set()
+        layer = self
+        while layer is not None:
+            for key, value in layer._data.items():
+                if key in seen:
+                    continue
+                seen.add(key)
+                if value is not _DELETED:
+                    yield key, value
+            layer = layer._parent
+
+    def get(self, key, default=None):
+        value = self._data.get(key, _MISSING)
+        if value is _MISSING:
+            if self._parent is None:
+                return default
+            return self._parent.get(key, default)
+        return default if value is _DELETED else value
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __setitem__(self, key, value):
+        self._check_writable()
+        if self._parent is not None and key not in self:
+            self._len += 1
+        self._data[key] = value
+        if self._inherited:
+            self._inherited.discard(key)
+
+    def __delitem__(self, key):
+        self._check_writable()
+        if self._parent is None:
+            del self._data[key]
+            if self._inherited:
+                self._inherited.discard(key)
+            return
+        if key not in self:
+            raise KeyError(key)
+        self._data[key] = _DELETED
+        self._len -= 1
+
+    def owned(self, key, default=None):
+        """The value of key, safe to update in place; a value inherited from a
+        frozen layer is replaced by a copy (copy_entry) first.
+        """
+        value = self._data.get(key, _MISSING)
+        if value is not _MISSING:
+            if value is _DELETED:
+                return default
+            if self._inherited and key in self._inherited:
+                self._check_writable()
+                self._inherited.discard(key)
+                value = copy_entry(value)
+                self._data[key] = value
+            return value
+        if self._parent is None:
+            return default
+        value = self._parent.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        self._check_writable()
+        value = copy_entry(value)
+        self._data[key] = value
+        return value
+
+    def __len__(self):
+        if self._parent is None:
+            return len(self._data)
+        return self._len
+
+    def __iter__(self):
+        if self._parent is None:
+            return iter(self._data)
+        return (key for key, value in self._layered_items())
+
+    def items(self):
+        if self._parent is None:
+            return self._data.items()
+        return collections.abc.ItemsView(self)
+
+    def values(self):
+        if self._parent is None:
+            return self._data.values()
+        return collections.abc.ValuesView(self)
+
+    def copy(self):
+        """A writable, unlayered copy; its values are copied by owned().
+        """
+        map_copy = CowMap(dict(self._layered_items()))
+        map_copy._inherited = set(map_copy._data)
+        return map_copy
+
+    def __reduce__(self):
+        return (CowMap, (dict(self._layered_items()),))
+
+    def __repr__(self):
+        return "CowMap({0!r})".format(dict(self._layered_items()))
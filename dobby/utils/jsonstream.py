@@ -0,0 +1,130 @@
+"""Incremental reader for large JSON summaries.
+
+Click summaries converted to JSON are a single document whose bulk is one
+array (e.g. trace.flow for tcpmystery/tcploss). Instead of json.load-ing the
+whole document, iter_json_items walks the document in chunks and yields the
+elements of the array at a given key path one at a time, so memory stays
+bounded by a single element plus the read buffer.
+"""
+import json
+
+import dobby.utils.util as util
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+
+
+class JSONStreamReader(object):
+    """Chunked reader over a text stream that decodes one JSON value at a time.
+    """
+    def __init__(self, file_stream, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.file_stream = file_stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """Read the next chunk, dropping the already consumed part of the buffer.
+        """
+        if self.eof:
+            return False
+        chunk = self.file_stream.read(self.chunk_size)
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode('utf-8')
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non whitespace character without consuming it.
+        Returns None at end of input.
+        """
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return None
+
+    def expect(self, chars):
+        char = self.peek()
+        if char is None or char not in chars:
+            raise json.JSONDecodeError("Expecting one of '{0}'".format(chars), self.buf, self.pos)
+        self.pos += 1
+        return char
+
+    def decode(self):
+        """Decode the next complete JSON value, reading more input as needed.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Most likely a value cut at the chunk boundary
+                if not self._fill():
+                    raise
+                continue
+            # A scalar ending exactly at the buffer end may continue in the next chunk
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def iter_items(self, path):
+        """Yield the elements of the array found at the given key path.
+        A single object at that path (one element documents) is yielded as is.
+        """
+        path = tuple(path)
+        depth = 0
+        self.expect('{')
+        while depth < len(path):
+            if self.peek() == '}':
+                # Key path not present in this document
+                return
+            key = self.decode()
+            self.expect(':')
+            if key != path[depth]:
+                self.decode()
+                if self.expect(',}') == '}':
+                    return
+                continue
+            depth += 1
+            if depth < len(path):
+                if self.peek() != '{':
+                    return
+                self.expect('{')
+        char = self.peek()
+        if char == '[':
+            self.expect('[')
+            if self.peek() == ']':
+                return
+            while True:
+                yield self.decode()
+                if self.expect(',]') == ']':
+                    return
+        elif char == '{':
+            yield self.decode()
+
+
+def iter_json_items(file_stream, path, chunk_size=DEFAULT_CHUNK_SIZE, failures=None):
+    """Yield the array elements at path (e.g. ('trace', 'flow')) from a JSON stream.
+    Raises util.DecodeError if the input is not valid JSON, so that a window
+    with a truncated stream is not taken for a complete one; the failure is
+    also counted in failures (a util.Failures).
+    """
+    reader = JSONStreamReader(file_stream, chunk_size=chunk_size)
+    try:
+        for item in reader.iter_items(path):
+            yield item
+    except json.JSONDecodeError as e:
+        util.count_decode_failure('json', failures)
+        raise util.DecodeError("Invalid JSON input ({0}) at position {1}".format(e.msg, e.pos)) from e
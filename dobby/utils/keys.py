@@ -0,0 +1,52 @@
+"""Keys used by the network summary dicts.
+
+IPv4 addresses are keyed by their packed 32-bit integer and TCP flows by the
+(src_ip, sport, dst_ip, dport) tuple of integers. The dotted and
+"src-sport-dst-dport" string forms are only built for display or export.
+"""
+import ipaddress
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+# Address strings already parsed; click repeats the same few addresses in
+# every flow, so a lookup here replaces building an IPv4Address. Cleared once
+# it holds MAX_PARSED_IPS of them, so a long running collector seeing many
+# addresses keeps a bounded cache
+MAX_PARSED_IPS = 1 << 16
+_parsed_ips = {}
+
+
+def ip_key(address):
+    """Return an IPv4 address (string, IPv4Address or int) as an integer.
+    Raises ValueError for anything that is not an IPv4 address.
+    """
+    key = _parsed_ips.get(address, None)
+    if key is None:
+        if isinstance(address, int):
+            return int(ipaddress.IPv4Address(address))
+        key = int(ipaddress.IPv4Address(address))
+        if isinstance(address, str):
+            if len(_parsed_ips) >= MAX_PARSED_IPS:
+                _parsed_ips.clear()
+            _parsed_ips[address] = key
+    return key
+
+def format_ip(key):
+    return str(ipaddress.IPv4Address(key))
+
+def flow_key(src_ip, sport, dst_ip, dport):
+    """Key of a flow in NetworkSummary.ip_flows, addresses given as integers.
+    """
+    return (src_ip, int(sport), dst_ip, int(dport))
+
+def format_flow_key(key):
+    """The src-sport-dst-dport string form of a flow key.
+    """
+    src_ip, sport, dst_ip, dport = key
+    return "{0}-{1}-{2}-{3}".format(format_ip(src_ip), sport, format_ip(dst_ip), dport)
+
+def parse_flow_key(key_string):
+    """Inverse of format_flow_key.
+    """
+    src_ip, sport, dst_ip, dport = key_string.split('-')
+    return flow_key(ip_key(src_ip), int(sport), ip_key(dst_ip), int(dport))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import pickle
+import unittest
+
+import dobby.nwmetrics.metrics as metrics
+import dobby.nwmodel.edge as edge
+import dobby.nwmodel.endpoint as endpoint
+import dobby.nwmodel.flow as flow
+import dobby.nwmodel.ipinfo as ipinfo
+import dobby.nwmodel.node as node
+import dobby.utils.compact as compact
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+
+class TestCompact(unittest.TestCase):
+    def test_compact_objects_have_no_dict(self):
+        stats = metrics.CompactStats(min_val=1.0, max_val=2.0)
+        self.assertFalse(hasattr(stats, '__dict__'))
+        self.assertEqual(stats.min_val, 1.0)
+        self.assertIsNone(stats.avg_val)
+        self.assertEqual(stats, metrics.Stats(min_val=1.0, max_val=2.0))
+        self.assertNotEqual(stats, metrics.CompactStats(min_val=1.0))
+
+    def test_unknown_attributes_go_to_extras(self):
+        stats = metrics.CompactStats(min_val=1.0, stddev=0.5)
+        self.assertEqual(stats.stddev, 0.5)
+        self.assertEqual(stats.extras, {'stddev': 0.5})
+        self.assertEqual(compact.attributes(stats)['stddev'], 0.5)
+        self.assertRaises(AttributeError, getattr, stats, 'missing')
+        wireless_metrics = metrics.CompactWirelessMetrics()
+        wireless_metrics.update_stats(total_retx=3.0, snr=20.0)
+        self.assertEqual(wireless_metrics.total_retx, 3.0)
+        self.assertEqual(wireless_metrics.snr, 20.0)
+
+    def test_nested_metrics_use_compact_classes(self):
+        tcp_flow = flow.CompactTCPFlow()
+        self.assertIsInstance(tcp_flow.flow_metrics, metrics.CompactTCPMetrics)
+        tcp_flow.update_flow_metrics(total_loss=2.0)
+        self.assertEqual(tcp_flow.flow_metrics.total_loss, 2.0)
+
+    def test_instance_fields_match_the_constructors(self):
+        for model_class, compact_class, args in [
+                (ipinfo.IPInfo, ipinfo.CompactIPInfo, ()),
+                (flow.Flow, flow.CompactFlow, ()),
+                (flow.TCPFlow, flow.CompactTCPFlow, ()),
+                (edge.Edge, edge.CompactEdge, (None, None)),
+                (endpoint.EndPoint, endpoint.CompactEndPoint, ()),
+                (node.Node, node.CompactNode, ()),
+                (metrics.Stats, metrics.CompactStats, ()),
+                (metrics.Metrics, metrics.CompactMetrics, ()),
+                (metrics.WirelessMetrics, metrics.CompactWirelessMetrics, ()),
+                (metrics.TCPMetrics, metrics.CompactTCPMetrics, ())]:
+            self.assertEqual(set(compact_class.__slots__), set(vars(model_class(*args))), model_class)
+
+    def test_compacting_builds_no_instance(self):
+        allocated = []
+        previous = node.set_id_allocator(allocated.append)
+        self.addCleanup(node.set_id_allocator, previous)
+        compact.compact_class(node.Node)
+        self.assertEqual(allocated, [])
+
+    def test_compact_objects_pickle(self):
+        stats = metrics.CompactStats(min_val=1.0, stddev=0.5)
+        copied = pickle.loads(pickle.dumps(stats))
+        self.assertEqual(copied, stats)
+        self.assertEqual(copied.stddev, 0.5)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestCompact)
+    unittest.TextTestRunner(verbosity=2).run(suite)
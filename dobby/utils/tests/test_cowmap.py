@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import pickle
+import unittest
+
+import dobby.nwmetrics.metrics as metrics
+import dobby.nwmodel.flow as flow
+import dobby.utils.cowmap as cowmap
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+
+class TestCowMap(unittest.TestCase):
+    def test_derived_maps_only_store_changes(self):
+        base = cowmap.CowMap({'a': 1, 'b': 2})
+        derived = base.derive()
+        self.assertTrue(base.frozen)
+        self.assertRaises(cowmap.FrozenMapError, base.__setitem__, 'c', 3)
+        derived['c'] = 3
+        derived['a'] = 10
+        del derived['b']
+        self.assertEqual(dict(derived), {'a': 10, 'c': 3})
+        self.assertEqual(len(derived), 2)
+        self.assertNotIn('b', derived)
+        self.assertEqual(dict(base), {'a': 1, 'b': 2})
+        self.assertEqual(derived._data, {'a': 10, 'b': cowmap._DELETED, 'c': 3})
+        self.assertRaises(KeyError, derived.__delitem__, 'b')
+        self.assertEqual(derived, {'a': 10, 'c': 3})
+
+    def test_layers_are_merged(self):
+        entries = cowmap.CowMap(dict((key, key) for key in range(100)))
+        for key in range(2 * cowmap.MAX_DEPTH):
+            entries = entries.derive()
+            entries[-key] = key
+            self.assertLessEqual(entries._depth, cowmap.MAX_DEPTH)
+        self.assertEqual(len(entries), 100 + 2 * cowmap.MAX_DEPTH - 1)
+        self.assertEqual(entries[-3], 3)
+        self.assertEqual(pickle.loads(pickle.dumps(entries)), entries)
+
+    def test_owned_values_are_copied_once(self):
+        tcp_flow = flow.TCPFlow()
+        base = cowmap.CowMap({'flow': tcp_flow})
+        derived = base.derive()
+        owned_flow = derived.owned('flow')
+        self.assertIsNot(owned_flow, tcp_flow)
+        self.assertIs(derived.owned('flow'), owned_flow)
+        owned_flow.update_flow_metrics(total_loss=1.0)
+        self.assertIsNone(tcp_flow.flow_metrics.total_loss)
+        self.assertIsNone(derived.owned('missing'))
+        self.assertIs(base.owned('flow'), tcp_flow)
+
+    def test_values_inherited_through_merged_layers_are_copied(self):
+        tcp_flow = flow.TCPFlow()
+        original = cowmap.CowMap({'flow': tcp_flow})
+        entries = original.derive()
+        for key in range(cowmap.MAX_DEPTH + 1):
+            entries[key] = key
+            entries = entries.derive()
+            if entries._parent is None:
+                break
+        # The layers were merged into a single dict holding the original flow
+        self.assertIsNone(entries._parent)
+        self.assertIs(entries['flow'], tcp_flow)
+        owned_flow = entries.owned('flow')
+        self.assertIsNot(owned_flow, tcp_flow)
+        self.assertIs(entries.owned('flow'), owned_flow)
+        owned_flow.update_flow_metrics(total_loss=1.0)
+        self.assertIsNone(original['flow'].flow_metrics.total_loss)
+        entries_copy = entries.copy()
+        self.assertIsNot(entries_copy.owned('flow'), owned_flow)
+
+    def test_compact_values_can_be_copied(self):
+        stats = metrics.CompactWirelessMetrics(total_retx=1.0)
+        stats_copy = cowmap.copy_entry(stats)
+        stats_copy.update_stats(total_retx=2.0)
+        self.assertEqual(stats.total_retx, 1.0)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestCowMap)
+    unittest.TextTestRunner(verbosity=2).run(suite)
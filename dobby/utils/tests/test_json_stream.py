@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import dobby.utils.jsonstream as jsonstream
+import dobby.utils.util as util
+
+import io
+import json
+import unittest
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+class TestJSONStream(unittest.TestCase):
+    def setUp(self):
+        self.flows = [{'@src': '192.168.1.{0}'.format(i), '@sport': str(1000 + i),
+                       'stream': [{'@dir': '0', '@nack': '2'}, {'@dir': '1', '@nack': '3'}]}
+                      for i in range(50)]
+        self.doc = {'trace': {'@file': '/tmp/dobby.pcap', 'other': [1, 2.5, "x]"],
+                              'flow': self.flows}}
+
+    def tearDown(self):
+        self.doc = None
+
+    def test_iter_json_items_yields_all_items(self):
+        stream = io.StringIO(json.dumps(self.doc))
+        self.assertEqual(list(jsonstream.iter_json_items(stream, ('trace', 'flow'))), self.flows)
+
+    def test_iter_json_items_works_across_small_chunks(self):
+        for chunk_size in [1, 3, 7, 64]:
+            stream = io.StringIO(json.dumps(self.doc, indent=4, sort_keys=True))
+            items = list(jsonstream.iter_json_items(stream, ('trace', 'flow'), chunk_size=chunk_size))
+            self.assertEqual(items, self.flows)
+
+    def test_iter_json_items_works_for_bytes_stream(self):
+        stream = io.BytesIO(json.dumps(self.doc).encode('utf-8'))
+        self.assertEqual(list(jsonstream.iter_json_items(stream, ('trace', 'flow'))), self.flows)
+
+    def test_iter_json_items_single_object(self):
+        stream = io.StringIO(json.dumps({'trace': {'flow': self.flows[0]}}))
+        self.assertEqual(list(jsonstream.iter_json_items(stream, ('trace', 'flow'))), [self.flows[0]])
+
+    def test_iter_json_items_missing_path_is_empty(self):
+        stream = io.StringIO(json.dumps({'trace': {'@file': 'foo'}}))
+        self.assertEqual(list(jsonstream.iter_json_items(stream, ('trace', 'flow'))), [])
+        stream = io.StringIO(json.dumps({'trace': {'flow': []}}))
+        self.assertEqual(list(jsonstream.iter_json_items(stream, ('trace', 'flow'))), [])
+
+    def test_iter_json_items_is_lazy(self):
+        text = json.dumps(self.doc)
+        stream = io.StringIO(text)
+        items = jsonstream.iter_json_items(stream, ('trace', 'flow'), chunk_size=128)
+        self.assertEqual(next(items), self.flows[0])
+        self.assertLess(stream.tell(), len(text))
+
+    def test_iter_json_items_raises_on_invalid_json(self):
+        stream = io.StringIO('{"trace": {"flow": [{"a": 1}, {"b": ]]}')
+        items = jsonstream.iter_json_items(stream, ('trace', 'flow'))
+        json_failures = util.decode_failures['json']
+        self.assertEqual(next(items), {'a': 1})
+        self.assertRaises(util.DecodeError, next, items)
+        self.assertEqual(util.decode_failures['json'], json_failures + 1)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestJSONStream)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+import ipaddress
+import unittest
+
+import dobby.utils.keys as keys
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+
+class TestKeys(unittest.TestCase):
+    def test_ip_keys_are_integers(self):
+        self.assertEqual(keys.ip_key('192.168.1.1'), int(ipaddress.IPv4Address('192.168.1.1')))
+        self.assertEqual(keys.ip_key(ipaddress.IPv4Address('192.168.1.1')), 3232235777)
+        self.assertEqual(keys.ip_key(3232235777), 3232235777)
+        self.assertEqual(keys.format_ip(3232235777), '192.168.1.1')
+
+    def test_invalid_ip_raises(self):
+        self.assertRaises(ValueError, keys.ip_key, '192.168.1')
+        self.assertRaises(ValueError, keys.ip_key, 1 << 32)
+
+    def test_parsed_ips_are_bounded(self):
+        for key in range(keys.MAX_PARSED_IPS + 10):
+            keys.ip_key(keys.format_ip(key))
+        self.assertLessEqual(len(keys._parsed_ips), keys.MAX_PARSED_IPS)
+        self.assertEqual(keys.ip_key('0.0.0.5'), 5)
+
+    def test_flow_keys_round_trip(self):
+        flow_key = keys.flow_key(keys.ip_key('192.168.1.120'), 60194.0, keys.ip_key('192.168.1.113'), 5001.0)
+        self.assertEqual(flow_key, (3232235896, 60194, 3232235889, 5001))
+        self.assertEqual(keys.format_flow_key(flow_key), '192.168.1.120-60194-192.168.1.113-5001')
+        self.assertEqual(keys.parse_flow_key('192.168.1.120-60194-192.168.1.113-5001'), flow_key)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestKeys)
+    unittest.TextTestRunner(verbosity=2).run(suite)
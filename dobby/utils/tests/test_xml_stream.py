@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import dobby.utils.xmlstream as xmlstream
+import dobby.utils.util as util
+
+import io
+import unittest
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+TCPMYSTERY_XML = """<?xml version='1.0' standalone='yes'?>
+<trace file='/tmp/dobby.pcap'>
+<flow aggregate='1' src='192.168.1.120' sport='60194' dst='192.168.1.113' dport='5001' begin='1486757294.498616999' duration='31.338471001'>
+  <rtt source='syn' value='1.7e-05' />
+  <rtt source='min' value='1.7e-05' />
+  <stream dir='0' ndata='15037' nack='2'>
+    <semirtt source='min' value='8e-06' />
+  </stream>
+  <stream dir='1' ndata='2' nack='4614' />
+</flow>
+<flow aggregate='2' src='192.168.1.113' sport='22' dst='192.168.1.120' dport='52124'>
+  <rtt source='min' value='1.2e-05' />
+  <stream dir='0' ndata='10'><undelivered n='2' /></stream>
+  <stream dir='1' ndata='0'>some text</stream>
+</flow>
+</trace>
+"""
+
+class TestXMLStream(unittest.TestCase):
+    def test_iter_xml_items_matches_xmltodict_layout(self):
+        flows = list(xmlstream.iter_xml_items(io.StringIO(TCPMYSTERY_XML), ('trace', 'flow')))
+        self.assertEqual(len(flows), 2)
+        self.assertEqual(flows[0], {'@aggregate': '1', '@src': '192.168.1.120', '@sport': '60194',
+                                    '@dst': '192.168.1.113', '@dport': '5001',
+                                    '@begin': '1486757294.498616999', '@duration': '31.338471001',
+                                    'rtt': [{'@source': 'syn', '@value': '1.7e-05'},
+                                            {'@source': 'min', '@value': '1.7e-05'}],
+                                    'stream': [{'@dir': '0', '@ndata': '15037', '@nack': '2',
+                                                'semirtt': {'@source': 'min', '@value': '8e-06'}},
+                                               {'@dir': '1', '@ndata': '2', '@nack': '4614'}]})
+        # Single children stay dicts, text goes to #text
+        self.assertEqual(flows[1]['rtt'], {'@source': 'min', '@value': '1.2e-05'})
+        self.assertEqual(flows[1]['stream'][0]['undelivered'], {'@n': '2'})
+        self.assertEqual(flows[1]['stream'][1]['#text'], 'some text')
+
+    def test_iter_xml_items_works_for_bytes_stream(self):
+        stream = io.BytesIO(TCPMYSTERY_XML.encode('utf-8'))
+        flows = list(xmlstream.iter_xml_items(stream, ('trace', 'flow')))
+        self.assertEqual([flow['@aggregate'] for flow in flows], ['1', '2'])
+
+    def test_iter_xml_items_ignores_other_paths(self):
+        flows = list(xmlstream.iter_xml_items(io.StringIO(TCPMYSTERY_XML), ('links', 'link')))
+        self.assertEqual(flows, [])
+
+    def test_element_to_dict_text_and_empty(self):
+        stream = io.StringIO('<nodes><node>abc</node><node /></nodes>')
+        self.assertEqual(list(xmlstream.iter_xml_items(stream, ('nodes', 'node'))), ['abc', None])
+
+    def test_iter_xml_items_raises_on_invalid_xml(self):
+        stream = io.StringIO("<trace><flow a='1'/><flow b='2'></trace>")
+        items = xmlstream.iter_xml_items(stream, ('trace', 'flow'))
+        xml_failures = util.decode_failures['xml']
+        self.assertEqual(next(items), {'@a': '1'})
+        self.assertRaises(util.DecodeError, next, items)
+        self.assertEqual(util.decode_failures['xml'], xml_failures + 1)
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TestXMLStream)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -1,24 +1,71 @@
 """Helper functions.
 """
+import collections
 import json
 __author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
 
-def get_float_value(json_dict, key):
+# Values get_float_value could not convert, per key, since the process started
+conversion_failures = collections.Counter()
+# Summaries that were not valid JSON or XML, per format, since the process started
+decode_failures = collections.Counter()
+
+
+class Failures(object):
+    """Failures of one window: values get_float_value could not convert, per
+    key, and summaries that were not valid JSON or XML, per format. The
+    functions given one count into it as well as into the process wide
+    counters above.
+    """
+    def __init__(self):
+        self.conversion_failures = collections.Counter()
+        self.decode_failures = collections.Counter()
+
+    def add(self, other):
+        self.conversion_failures.update(other.conversion_failures)
+        self.decode_failures.update(other.decode_failures)
+
+
+class DecodeError(ValueError):
+    """Raised when a summary stream read incrementally turns out not to be
+    valid JSON or XML, after the records before the error were read.
+    """
+
+
+def count_decode_failure(summary_format, failures=None):
+    decode_failures[summary_format] += 1
+    if failures is not None:
+        failures.decode_failures[summary_format] += 1
+
+def get_float_value(json_dict, key, failures=None):
     if not json_dict or not key:
         return None
     try:
         value = float(json_dict[key]) if json_dict.get(key, None) else None
     except ValueError:
+        conversion_failures[key] += 1
+        if failures is not None:
+            failures.conversion_failures[key] += 1
         print ("Cannot convert to float", json_dict.get(key, None))
         return None
     else:
         return value
 
-def read_json(file_stream):
+def as_list(value):
+    """Summaries converted from XML hold a dict for a single child and a list
+    for repeated children. Return the children as a list in both cases.
+    """
+    if value is None:
+        return []
+    if type(value) != list:
+        return [value]
+    return value
+
+def read_json(file_stream, failures=None):
     json_to_return = None
     try:
         json_to_return = json.load(file_stream)
     except json.decoder.JSONDecodeError as e:
+        count_decode_failure('json', failures)
         print ("Invalid JSON input ({0}). Input:{1}".format(e.msg, e.doc))
         return None
     else:
@@ -0,0 +1,62 @@
+"""Incremental reader for the XML summaries written by click.
+
+Elements are converted to the same dicts that xmltodict (and hence
+scripts/xml_to_json.py) would produce: attributes are prefixed with '@',
+repeated children become lists, a single child stays a dict and text is
+stored under '#text' (or returned as is for text-only elements). This lets
+the parsers consume click's XML output directly, one record at a time.
+"""
+import xml.etree.ElementTree as ElementTree
+
+import dobby.utils.util as util
+
+__author__ = """\n""".join(['Vivek Shrivastava (vivek@obiai.tech)'])
+
+
+def element_to_dict(element):
+    """Convert an element to its xmltodict representation.
+    """
+    converted = {}
+    for key, value in element.attrib.items():
+        converted['@' + key] = value
+    for child in element:
+        child_value = element_to_dict(child)
+        existing = converted.get(child.tag, None)
+        if child.tag not in converted:
+            converted[child.tag] = child_value
+        elif type(existing) == list:
+            existing.append(child_value)
+        else:
+            converted[child.tag] = [existing, child_value]
+    text = element.text.strip() if element.text else None
+    if text:
+        if not converted:
+            return text
+        converted['#text'] = text
+    return converted if converted else None
+
+
+def iter_xml_items(xml_stream, path, failures=None):
+    """Yield, as dicts, the elements at path (e.g. ('trace', 'flow')) of an XML stream.
+    Each element is released as soon as it has been converted. Raises
+    util.DecodeError if the input is not well formed, e.g. a summary click
+    is still writing; the failure is also counted in failures (a
+    util.Failures).
+    """
+    path = tuple(path)
+    item_depth = len(path) - 1
+    stack = []
+    try:
+        for event, element in ElementTree.iterparse(xml_stream, events=('start', 'end')):
+            if event == 'start':
+                stack.append(element)
+                continue
+            stack.pop()
+            if len(stack) == item_depth and element.tag == path[-1] and \
+               all(ancestor.tag == tag for ancestor, tag in zip(stack, path)):
+                yield element_to_dict(element)
+                if stack:
+                    stack[-1].remove(element)
+    except ElementTree.ParseError as e:
+        util.count_decode_failure('xml', failures)
+        raise util.DecodeError("Invalid XML input ({0})".format(e)) from e